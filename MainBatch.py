@@ -5,17 +5,22 @@ import multiprocessing
 import json
 import sys
 import argparse
+import random
 
 from platform import python_implementation
-from tqdm import tqdm
 
 
+# 只在部分模式使用的模組（tqdm、代理模型、退火/順序搜索、增量重算、遙測、記憶體預算）
+# 在使用處才匯入，--help 與啟動時不載入（見 benchmarks/startup.py）
 from src.core.RChart import Chart
 from src.deck_gen.DeckGen import generate_decks_with_sequential_priority_pruning
-from src.deck_gen.DeckGen2 import generate_decks_with_double_cards
+from src.deck_gen.DeckGen2 import generate_decks_with_double_cards, load_simulated_decks
+from src.utils.result_stream import iter_results, read_top_results, save_sorted_index
 from src.config.CardLevelConfig import convert_deck_to_simulator_format, fix_windows_console_encoding, CARD_CACHE
 from src.core.SkillResolver import SkillEffectType
-from src.core.Simulator_core import run_game_simulation, MUSIC_DB
+from src.core.Simulator_core import run_game_simulation, prepare_chart, compile_card_specs, MUSIC_DB
+from src.core import profiling
+from src.core.engines import certified_engine
 
 # 導入配置管理器（如果不存在則使用傳統配置）
 try:
@@ -34,6 +39,18 @@ logging.basicConfig(
 # Default placeholder; actual value will be set after chart is loaded
 BONUS_SFL = None
 CENTERCHAR = None
+# 命令列選項（由 parse_arguments 填入）
+RUN_OPTIONS = {
+    "search": "exhaustive",  # exhaustive=窮舉, anneal=模擬退火搜索, order=每個組合只搜索出牌順序
+    "order_audit": 0,        # >0 時抽樣該數量的組合比較順序搜索與窮舉，不輸出結果
+    "delta": False,          # 增量重算：只模擬含新增/練度變動卡牌的組合
+    "rerank": 0,             # >0 時只重新模擬既有結果的前 K 名
+    "engine": "reference",   # 模擬引擎（src/core/engines.py），非參考實作需先通過一致性測試
+    "profile": False,        # 記錄模擬迴圈的效能計數，每首歌結束時輸出彙總表
+    "memory_budget": None,   # 主行程記憶體上限 (MB)，設定時調整批次大小、改用磁碟合併、壓縮去重集合
+}
+# 實際使用的模擬函式（由 parse_arguments 依 --engine 設定）
+SIMULATE = run_game_simulation
 LIMITBREAK_BONUS = {
     1: 1, 2: 1, 3: 1, 4: 1, 5: 1,
     6: 1, 7: 1, 8: 1, 9: 1, 10: 1,
@@ -90,6 +107,29 @@ def save_simulation_results(results_data: list, filename: str = os.path.join("lo
     custom_card_levels: 自定義卡牌練度 (從配置檔案讀取)
     """
 
+    processed_results = best_unique_results(results_data)
+    if calc_pt:
+        processed_results = score2pt(processed_results, custom_card_levels)
+        # 合并既有log
+        if os.path.exists(filename):
+            with open(filename, 'r', encoding='utf-8') as f:
+                processed_results.extend(json.load(f))
+        processed_results.sort(key=lambda i: i["pt"], reverse=True)
+    else:
+        processed_results.sort(key=lambda i: i["score"], reverse=True)
+    try:
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(processed_results, f, ensure_ascii=False, indent=0)
+        if calc_pt:
+            # 按 pt 排序的結果同時寫出二進位索引，求解器讀取前 N 名時不必解析整個檔案
+            save_sorted_index(filename, processed_results)
+        logger.info(f"Simulation results saved to {filename}")
+    except Exception as e:
+        logger.error(f"Error saving simulation results to JSON: {e}")
+
+
+def best_unique_results(results_data: list) -> list:
+    """每個組合（不論順序）只保留最高分的結果"""
     unique_decks_best_scores = {}  # Key: tuple of sorted card IDs, Value: {'deck_card_ids': original_list, 'score': best_score}
 
     for result in results_data:
@@ -111,22 +151,129 @@ def save_simulation_results(results_data: list, filename: str = os.path.join("lo
             }
 
     # Convert the unique decks dictionary back to a list of results
-    processed_results = list(unique_decks_best_scores.values())
-    if calc_pt:
-        processed_results = score2pt(processed_results, custom_card_levels)
-        # 合并既有log
-        if os.path.exists(filename):
-            with open(filename, 'r', encoding='utf-8') as f:
-                processed_results.extend(json.load(f))
-        processed_results.sort(key=lambda i: i["pt"], reverse=True)
-    else:
-        processed_results.sort(key=lambda i: i["score"], reverse=True)
-    try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(processed_results, f, ensure_ascii=False, indent=0)
-        logger.info(f"Simulation results saved to {filename}")
-    except Exception as e:
-        logger.error(f"Error saving simulation results to JSON: {e}")
+    return list(unique_decks_best_scores.values())
+
+
+def prepare_delta_run(log_path: str, fingerprint: dict, custom_card_levels=None):
+    """
+    增量重算：與既有結果的指紋比對，刪除失效結果、必要時重算 pt。
+
+    Returns:
+        None: 不限制枚舉範圍（沒有指紋、需完整重跑、或舊結果不是同條件的完整窮舉），
+              已在 log 中的組合仍照常跳過
+        set:  組合必須包含其中一張卡牌；空集合表示不需要模擬
+    """
+    from src.utils.result_fingerprint import diff_fingerprint, filter_stale_results, load_fingerprint
+
+    old_fingerprint = load_fingerprint(log_path)
+    if old_fingerprint is None or not os.path.exists(log_path):
+        logger.info("[Delta] 沒有可比對的結果指紋，按一般模式運行")
+        return None
+
+    diff = diff_fingerprint(old_fingerprint, fingerprint)
+    if diff["full_rerun"]:
+        stale_path = os.path.splitext(log_path)[0] + ".stale.json"
+        os.replace(log_path, stale_path)
+        logger.info(f"[Delta] {diff['reason']}，舊結果全部失效（已移至 {stale_path}）")
+        return None
+
+    total = 0
+
+    def counted(records):
+        nonlocal total
+        for record in records:
+            total += 1
+            yield record
+
+    kept = filter_stale_results(counted(iter_results(log_path)), diff)
+    if diff["pt_changed"] or len(kept) != total:
+        if diff["pt_changed"]:
+            kept = score2pt(kept, custom_card_levels)
+        kept.sort(key=lambda i: i["pt"], reverse=True)
+        with open(log_path, 'w', encoding='utf-8') as f:
+            json.dump(kept, f, ensure_ascii=False, indent=0)
+        save_sorted_index(log_path, kept)
+    logger.info(f"[Delta] 新增卡牌 {sorted(diff['added_cards'])}，練度變動 {sorted(diff['changed_cards'])}，"
+                f"移除 {sorted(diff['removed_cards'])}，pt 重算: {diff['pt_changed']}")
+    logger.info(f"[Delta] 保留 {len(kept)} / {total} 筆舊結果")
+
+    if not diff["exhaustive_base"]:
+        logger.info("[Delta] 舊結果不是同條件（搜索方式、必帶卡、必備技能、強制 DR）下的完整窮舉，"
+                    "枚舉全部組合（跳過已有結果）")
+        return None
+    return diff["added_cards"] | diff["changed_cards"]
+
+
+def run_rerank(log_path: str, top_k: int, chart, mastery_level: int, leader_designation=0,
+               custom_card_levels=None):
+    """
+    重排模式：以當前設定（熟練度、C位/顏色覆蓋、練度、Fan Lv）重新模擬既有結果的前 K 名，
+    保持原本的出牌順序與C位選擇，輸出到 *_rerank.json。
+
+    C位規則與 task_generator_func 相同：指定隊長時只有隊長卡可當C位，否則為C位角色的卡。
+    原C位卡不符合當前規則時（如改了 center_override 或隊長），改為測試所有符合規則的卡。
+    """
+    from tqdm import tqdm
+
+    if not os.path.exists(log_path):
+        logger.error(f"[Rerank] 找不到結果檔: {log_path}")
+        return
+    entries = read_top_results(log_path, top_k)
+    logger.info(f"[Rerank] 讀取 {log_path} 前 {len(entries)} 名")
+
+    center_char_id = chart.music.CenterCharacterId
+    leader = int(leader_designation)
+
+    def can_center(card_id) -> bool:
+        return card_id == leader if leader else card_id // 1000 == center_char_id
+
+    tasks = []
+    skipped = 0
+    for rank, entry in enumerate(entries):
+        deck = list(entry["deck_card_ids"])
+        center_card = entry.get("center_card")
+        if not any(can_center(card_id) for card_id in deck):
+            # 不含隊長或C位角色的卡組不會由一般模式產生，無法以相同規則模擬
+            skipped += 1
+            continue
+        if center_card in deck and can_center(center_card):
+            sim_deck_format = convert_deck_to_simulator_format(deck, custom_card_levels)
+            tasks.append((sim_deck_format, chart, mastery_level, rank, deck, deck.index(center_card)))
+        else:
+            for task in task_generator_func([deck], chart, mastery_level, leader, custom_card_levels):
+                tasks.append(task[:3] + (rank,) + task[4:])
+    if skipped:
+        logger.info(f"[Rerank] {skipped} 個卡組不含{f'隊長 {leader}' if leader else f'C位角色 {center_char_id}'}，已略過")
+
+    num_processes = os.cpu_count() or 1
+    best_by_rank = {}
+    with multiprocessing.Pool(processes=num_processes, **profiling.pool_kwargs(num_processes)) as pool:
+        for result in tqdm(pool.imap_unordered(SIMULATE, tasks, max(1, len(tasks) // (num_processes * 4))),
+                           total=len(tasks), desc="Rerank"):
+            rank = result["original_deck_index"]
+            if rank not in best_by_rank or result["final_score"] > best_by_rank[rank]["score"]:
+                best_by_rank[rank] = {
+                    "deck_card_ids": result["deck_card_ids"],
+                    "center_card": result["center_card"],
+                    "score": result["final_score"],
+                    "previous_rank": rank + 1,
+                    "previous_score": entries[rank]["score"],
+                    "previous_pt": entries[rank].get("pt"),
+                }
+        profile_summary = profiling.collect(pool, num_processes)
+    if profile_summary is not None:
+        for line in profile_summary.format_table():
+            logger.info(line)
+
+    reranked = score2pt(list(best_by_rank.values()), custom_card_levels)
+    reranked.sort(key=lambda i: i["pt"], reverse=True)
+    output_path = os.path.splitext(log_path)[0] + "_rerank.json"
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(reranked, f, ensure_ascii=False, indent=0)
+    logger.info(f"[Rerank] 結果已保存至 {output_path}")
+    for new_rank, entry in enumerate(reranked[:10], 1):
+        logger.info(f"  #{new_rank} (原 #{entry['previous_rank']}) pt={entry['pt']:,} score={entry['score']:,} "
+                    f"{entry['deck_card_ids']}")
 
 
 def task_generator_func(decks_generator, chart, player_level, leader_designation, custom_card_levels=None):
@@ -173,6 +320,12 @@ def task_generator_func(decks_generator, chart, player_level, leader_designation
             task_index += 1
 
 
+def parse_memory_budget(text: str) -> float:
+    """--memory-budget 的參數型別：只在指定時才匯入 memory_budget（其中的 NumPy 匯入較慢）"""
+    from src.utils.memory_budget import parse_size_mb
+    return parse_size_mb(text)
+
+
 def parse_arguments(unified_config):
     """
     解析命令列參數，支援單首或多首歌曲配置
@@ -184,7 +337,16 @@ def parse_arguments(unified_config):
         python MainBatch.py  # 使用預設配置
         python MainBatch.py --debug  # Debug模式：使用配置中的牌組
         python MainBatch.py --debug 1032528 1022701 1032530 1042802 1031530 1031533  # Debug模式：指定牌組
+        python MainBatch.py --search anneal  # 卡池過大時改用模擬退火搜索
+        python MainBatch.py --search order  # 每個組合只搜索數十個出牌順序
+        python MainBatch.py --search order --order-audit 200  # 抽樣 200 個組合評估順序搜索
+        python MainBatch.py --delta  # 只重算卡池/練度變動影響到的組合
+        python MainBatch.py --rerank 5000  # 以當前設定重新模擬既有結果前 5000 名
+        python MainBatch.py --engine fast  # 使用已通過一致性測試的模擬引擎
+        python MainBatch.py --profile  # 輸出模擬迴圈各部分的次數與耗時
+        python MainBatch.py --memory-budget 12G  # 主行程記憶體維持在 12 GB 以下
     """
+    global SIMULATE
     parser = argparse.ArgumentParser(description='批次模擬卡組得分')
     parser.add_argument('songs', nargs='*',
                        help='歌曲配置，格式：music_id difficulty mastery_level leader_id [music_id2 difficulty2 mastery_level2 leader_id2 ...]')
@@ -194,8 +356,43 @@ def parse_arguments(unified_config):
                        help='Debug模式：可選指定6張卡牌ID（按順序），不指定則使用配置中的牌組')
     parser.add_argument('--center-index', type=int, default=-1,
                        help='Debug模式：指定C位卡在牌組中的索引（0-5），-1表示測試所有C位選擇（預設：-1）')
+    parser.add_argument('--search', choices=['exhaustive', 'anneal', 'order'], default='exhaustive',
+                       help='搜索方式：exhaustive=窮舉所有卡組（預設），anneal=模擬退火（用於窮舉不完的大卡池），'
+                            'order=窮舉組合但每個組合只局部搜索出牌順序')
+    parser.add_argument('--order-audit', type=int, default=0, metavar='N',
+                       help='配合 --search order：抽樣 N 個組合同時跑窮舉，報告漏掉最佳順序的比例（不輸出結果）')
+
+    parser.add_argument('--delta', action='store_true',
+                       help='增量重算：與上次結果的指紋比對，只模擬含新增或練度變動卡牌的組合')
+
+    parser.add_argument('--rerank', type=int, default=0, metavar='K',
+                       help='重排模式：以當前設定只重新模擬既有結果的前 K 名，輸出到 *_rerank.json')
+
+    parser.add_argument('--engine', type=str, default='reference', metavar='NAME',
+                       help='模擬引擎（預設：reference）；其他引擎需先執行 python -m src.utils.parity --engine NAME --certify')
+
+    parser.add_argument('--profile', action='store_true',
+                       help='效能計數：統計各事件、技能效果、堆積操作與血線重算的次數與耗時，每首歌結束時輸出')
+
+    parser.add_argument('--memory-budget', type=parse_memory_budget, default=None, metavar='SIZE',
+                       help='主行程記憶體上限（如 12G、800M，純數字為 MB）：依 RSS 調整批次大小、'
+                            '合併階段改用磁碟上的外部合併、以壓縮格式保存已模擬組合')
 
     args = parser.parse_args()
+    try:
+        SIMULATE = certified_engine(args.engine)
+    except (ValueError, ImportError, AttributeError) as e:
+        logger.error(f"無法使用模擬引擎 {args.engine}: {e}")
+        sys.exit(1)
+    RUN_OPTIONS["engine"] = args.engine
+    RUN_OPTIONS["profile"] = args.profile
+    RUN_OPTIONS["memory_budget"] = args.memory_budget
+    if args.profile:
+        profiling.enable()
+    RUN_OPTIONS["rerank"] = args.rerank
+    RUN_OPTIONS["search"] = args.search
+    RUN_OPTIONS["order_audit"] = args.order_audit
+    RUN_OPTIONS["delta"] = args.delta
 
     # 如果提供了 --config 參數，從 YAML 載入配置
     if args.config:
@@ -286,12 +483,7 @@ def run_debug_mode(deck_cards, center_index, config, custom_card_levels=None):
 
     # 初始化 Chart
     try:
-        pre_initialized_chart = Chart(MUSIC_DB, fixed_music_id, fixed_difficulty)
-        pre_initialized_chart.ChartEvents = [(float(t), e) for t, e in pre_initialized_chart.ChartEvents]
-
-        if pypy_impl:
-            from sortedcontainers import SortedList
-            pre_initialized_chart.ChartEvents = SortedList(pre_initialized_chart.ChartEvents)
+        pre_initialized_chart = prepare_chart(Chart(MUSIC_DB, fixed_music_id, fixed_difficulty))
 
         if center_override:
             pre_initialized_chart.music.CenterCharacterId = center_override
@@ -515,6 +707,12 @@ if __name__ == "__main__":
     # 解析命令列參數或使用預設配置
     SONGS_CONFIG = parse_arguments(UNIFIED_CONFIG)
 
+    # 每次模擬都會用到的模組，解析參數後才匯入
+    from tqdm import tqdm
+    from src.utils.memory_budget import MemoryTracker
+    from src.utils.result_fingerprint import build_fingerprint, fingerprint_path, load_fingerprint, save_fingerprint
+    from src.utils.telemetry import SongTelemetry
+
     # 檢查是否使用 YAML 配置
     use_yaml_config = False
     yaml_config = None
@@ -567,6 +765,10 @@ if __name__ == "__main__":
     for idx, config in enumerate(SONGS_CONFIG, 1):
         logger.info(f"  歌曲 {idx}: ID={config['music_id']}, 難度={config['difficulty']}, 熟練度={config['mastery_level']}")
 
+    # 在建立行程池前編譯卡池中所有卡牌在設定練度下的 CardSpec，子行程 fork 後直接共用
+    spec_count = compile_card_specs(convert_deck_to_simulator_format(card_ids, custom_card_levels))
+    logger.info(f"已編譯 {spec_count} 個卡牌 spec")
+
 
 
 
@@ -604,13 +806,7 @@ if __name__ == "__main__":
         logger.info(f"{'='*60}")
 
         try:
-            pre_initialized_chart = Chart(MUSIC_DB, fixed_music_id, fixed_difficulty)
-            pre_initialized_chart.ChartEvents = [(float(t), e) for t, e in pre_initialized_chart.ChartEvents]
-            # pre_initialized_chart.ChartEvents = [(int(float(t) * 1_000_000) , e) for t, e in pre_initialized_chart.ChartEvents]
-
-            if pypy_impl:
-                from sortedcontainers import SortedList
-                pre_initialized_chart.ChartEvents = SortedList(pre_initialized_chart.ChartEvents)
+            pre_initialized_chart = prepare_chart(Chart(MUSIC_DB, fixed_music_id, fixed_difficulty))
 
             if center_override:
                 pre_initialized_chart.music.CenterCharacterId = center_override
@@ -735,6 +931,13 @@ if __name__ == "__main__":
         logger.info(f"Computed BONUS_SFL={BONUS_SFL:.4f} (mode={SEASON_MODE}, singers={singer_ids}, fan_lv_overrides={FAN_LEVELS})")
         # -------------------------------------------------------------------------
 
+        if RUN_OPTIONS["rerank"] > 0:
+            run_rerank(
+                os.path.join(FINAL_OUTPUT_DIR, f"simulation_results_{fixed_music_id}_{fixed_difficulty}.json"),
+                RUN_OPTIONS["rerank"], pre_initialized_chart, mastery_level, leader_designation, custom_card_levels
+            )
+            continue
+
         # DR剪枝处理（可通过 ENABLE_DR_PRUNING 配置）
         if ENABLE_DR_PRUNING:
             # 旧逻辑：移除非C位角色DR，如果有C位DR则强制使用
@@ -760,30 +963,121 @@ if __name__ == "__main__":
             force_dr = False
             logger.info(f"[No DR Pruning] Using all {len(current_card_ids)} cards, algorithm decides DR usage.")
 
-        logger.info("Pre-calculating deck amount...")
-
-        # 3. 获取卡组生成器
-        decks_generator = generate_decks_with_double_cards(
-            cardpool=current_card_ids,
-            mustcards=[mustcards_all, mustcards_any, mustskills_all],
-            center_char=pre_initialized_chart.music.CenterCharacterId,
-            force_dr=force_dr,
-            log_path=os.path.join(FINAL_OUTPUT_DIR, f"simulation_results_{fixed_music_id}_{fixed_difficulty}.json")
+        log_path = os.path.join(FINAL_OUTPUT_DIR, f"simulation_results_{fixed_music_id}_{fixed_difficulty}.json")
+        surrogate_enabled = use_yaml_config and yaml_config and yaml_config.get_surrogate_config()["enabled"]
+        fingerprint = build_fingerprint(
+            current_card_ids, custom_card_levels, song_config, FAN_LEVELS, SEASON_MODE,
+            [mustcards_all, mustcards_any, mustskills_all],
+            "surrogate" if surrogate_enabled and RUN_OPTIONS["search"] == "exhaustive" else RUN_OPTIONS["search"],
+            force_dr
         )
-        total_decks_to_simulate = decks_generator.total_decks
-        logger.info(f"{total_decks_to_simulate} decks to be simulated.")
+        previous_fingerprint = load_fingerprint(log_path)
+        had_previous_results = os.path.exists(log_path)
+
+        delta_cards = None
+        if RUN_OPTIONS["delta"]:
+            delta_cards = prepare_delta_run(log_path, fingerprint, custom_card_levels)
+            had_previous_results = os.path.exists(log_path)
+            if delta_cards is not None and not delta_cards:
+                logger.info("[Delta] 沒有需要重新模擬的組合")
+                save_fingerprint(log_path, fingerprint)
+                continue
 
-        # 4. 创建模拟任务生成器
-        # task_generator_func 会按需从 generated_decks_generator 中拉取卡组
-        # 指定C位的點在`task_generator_func`裡面。上面卡組沒有做到這點
-        
-        simulation_tasks_generator = task_generator_func(
-            decks_generator, pre_initialized_chart, mastery_level, leader_designation, custom_card_levels
-        )
+        memory_tracker = MemoryTracker()
+        memory_budget = None
+        if RUN_OPTIONS["memory_budget"]:
+            from src.utils.memory_budget import MemoryBudget, external_merge, load_compact_decks
+            memory_budget = MemoryBudget(RUN_OPTIONS["memory_budget"])
+        # 預算模式下以串流讀取既有結果，已模擬組合以壓縮格式保存
+        simulated_decks = None
+        memory_tracker.start("generation")
+        if memory_budget and os.path.exists(log_path):
+            simulated_decks = load_compact_decks(log_path)
+
+        surrogate_screen = None
+        if RUN_OPTIONS["search"] == "anneal":
+            # 模擬退火：不預計算卡組數量，直接在進程池中跑多條搜索鏈
+            from src.deck_gen.DeckSearch import SearchSpace, search_results
+            if use_yaml_config and yaml_config:
+                search_config = yaml_config.get_search_config()
+            else:
+                from src.config.config_manager import ConfigManager
+                search_config = ConfigManager.DEFAULT_SEARCH_CONFIG.copy()
+            search_space = SearchSpace(
+                current_card_ids, [mustcards_all, mustcards_any, mustskills_all],
+                center_char=pre_initialized_chart.music.CenterCharacterId,
+                force_dr=force_dr, leader_designation=leader_designation
+            )
+            # 已在 log 中的組合不再重複輸出（保存時會與既有 log 合併）
+            if simulated_decks is None:
+                simulated_decks = load_simulated_decks(log_path)
+            total_decks_to_simulate = None
+            logger.info(f"[Search] 模擬退火搜索: {search_config}")
+        else:
+            # 代理模型篩選（YAML 中 surrogate.enabled 開啟）
+            if use_yaml_config and yaml_config:
+                surrogate_config = yaml_config.get_surrogate_config()
+                if surrogate_config["enabled"]:
+                    from src.deck_gen.SurrogateScreen import build_screen
+                    surrogate_screen = build_screen(
+                        surrogate_config, pre_initialized_chart, FINAL_OUTPUT_DIR, MUSIC_DB,
+                        result_filename=os.path.basename(log_path)
+                    )
+
+            logger.info("Pre-calculating deck amount...")
+
+            # 3. 获取卡组生成器
+            decks_generator = generate_decks_with_double_cards(
+                cardpool=current_card_ids,
+                mustcards=[mustcards_all, mustcards_any, mustskills_all],
+                center_char=pre_initialized_chart.music.CenterCharacterId,
+                force_dr=force_dr,
+                log_path=log_path,
+                composition_filter=surrogate_screen,
+                required_cards=delta_cards,
+                simulated_decks=simulated_decks,
+                count_orders=RUN_OPTIONS["search"] != "order"
+            )
+            total_decks_to_simulate = decks_generator.total_decks
+            if RUN_OPTIONS["search"] == "order":
+                logger.info(f"{total_decks_to_simulate} compositions to be searched.")
+            else:
+                logger.info(f"{total_decks_to_simulate} decks to be simulated.")
+            if surrogate_screen:
+                logger.info("[Surrogate] 篩選已啟用，實際模擬數量會少於上方預估")
+
+            # 4. 创建模拟任务生成器
+            # task_generator_func 会按需从 generated_decks_generator 中拉取卡组
+            # 指定C位的點在`task_generator_func`裡面。上面卡組沒有做到這點
+
+            if RUN_OPTIONS["search"] == "order":
+                # 每個組合一個任務，由子進程搜索出牌順序
+                from src.deck_gen.OrderSearch import audit_composition, optimize_order, summarize_audit
+                if use_yaml_config and yaml_config:
+                    order_config = yaml_config.get_order_search_config()
+                else:
+                    from src.config.config_manager import ConfigManager
+                    order_config = ConfigManager.DEFAULT_ORDER_SEARCH_CONFIG.copy()
+                simulation_tasks_generator = (
+                    (tuple(composition), SIMULATE, pre_initialized_chart, mastery_level, custom_card_levels,
+                     leader_designation, order_config, index)
+                    for index, composition in enumerate(decks_generator.iter_compositions())
+                )
+                logger.info(f"[Order] 出牌順序搜索: {order_config}")
+            else:
+                simulation_tasks_generator = task_generator_func(
+                    decks_generator, pre_initialized_chart, mastery_level, leader_designation, custom_card_levels
+                )
 
+        memory_tracker.stop("generation")
         os.makedirs(TEMP_OUTPUT_DIR, exist_ok=True)
         os.makedirs(FINAL_OUTPUT_DIR, exist_ok=True)
 
+        batch_size = BATCH_SIZE
+        if memory_budget:
+            batch_size = memory_budget.batch_size(BATCH_SIZE)
+            logger.info(f"[Memory] 記憶體預算 {memory_budget.limit_mb:,.0f} MB，暫存批次大小 {batch_size:,}")
+
         # Use multiprocessing.Pool with imap_unordered
         num_processes = os.cpu_count() or 1
         logger.info(f"Starting parallel simulations using {num_processes} processes...")
@@ -795,21 +1089,68 @@ if __name__ == "__main__":
         temp_files = []            # 存储所有临时文件的路径
         batch_counter = 0          # 批次计数器
         results_processed_count = 0  # 已处理结果的总数
+        simulations_run = 0          # 实际模拟次数（顺序搜索模式下一个结果对应多次模拟）
 
-        with multiprocessing.Pool(processes=num_processes) as pool:
+        if use_yaml_config and yaml_config:
+            telemetry_config = yaml_config.get_telemetry_config()
+        else:
+            from src.config.config_manager import ConfigManager
+            telemetry_config = ConfigManager.DEFAULT_TELEMETRY_CONFIG.copy()
+        telemetry = SongTelemetry(telemetry_config, f"{fixed_music_id}_{fixed_difficulty}",
+                                  total_decks_to_simulate, num_processes, FINAL_OUTPUT_DIR)
+
+        profile_summary = None
+        memory_tracker.start("simulation")
+        with multiprocessing.Pool(processes=num_processes, **profiling.pool_kwargs(num_processes)) as pool:
             # 優化：經過測試，chunksize=7500 在 PyPy 下性能最佳（比 10000 快 1.3%）
+            # 可用 python -m benchmarks --only mainbatch --chunksize N 重新比較
             if pypy_impl:
                 chunksize = 7500
             else:
                 chunksize = 500
-            results_iterator = pool.imap_unordered(run_game_simulation, simulation_tasks_generator, chunksize)
+            if RUN_OPTIONS["search"] == "order" and RUN_OPTIONS["order_audit"] > 0:
+                # 抽樣組合（蓄水池抽樣），窮舉與順序搜索對照
+                rng = random.Random(order_config["seed"])
+                sample = []
+                for index, task in enumerate(simulation_tasks_generator):
+                    if len(sample) < RUN_OPTIONS["order_audit"]:
+                        sample.append(task)
+                    else:
+                        j = rng.randrange(index + 1)
+                        if j < RUN_OPTIONS["order_audit"]:
+                            sample[j] = task
+                reports = [report for report in tqdm(pool.imap_unordered(audit_composition, sample),
+                                                     total=len(sample), desc="Order audit")
+                           if report is not None]
+                logger.info(summarize_audit(reports))
+                memory_tracker.close()
+                continue
 
-            for result in tqdm(results_iterator, total=total_decks_to_simulate):
+            if RUN_OPTIONS["search"] == "anneal":
+                results_iterator = search_results(
+                    pool, search_config["chains"] or num_processes, search_space, SIMULATE,
+                    pre_initialized_chart, mastery_level, custom_card_levels, search_config
+                )
+            elif RUN_OPTIONS["search"] == "order":
+                results_iterator = pool.imap_unordered(telemetry.wrap_worker(optimize_order),
+                                                       telemetry.wrap_tasks(simulation_tasks_generator),
+                                                       max(1, chunksize // order_config["max_evals"]))
+            else:
+                results_iterator = pool.imap_unordered(telemetry.wrap_worker(SIMULATE),
+                                                       telemetry.wrap_tasks(simulation_tasks_generator), chunksize)
+
+            telemetry.start()
+            for result in tqdm(telemetry.watch(results_iterator), total=total_decks_to_simulate):
+                if result is None:
+                    # 順序搜索：組合沒有合法排列（窮舉模式對這種組合不產生任何排列）
+                    continue
                 current_score = result['final_score']
                 original_index = result['original_deck_index']
                 current_log = result["cards_played_log"]
                 deck_card_ids = result['deck_card_ids']
                 center_card = result['center_card']
+                if RUN_OPTIONS["search"] == "anneal" and tuple(sorted(deck_card_ids)) in simulated_decks:
+                    continue
 
                 # 记录当前卡组的得分、卡牌、C位卡牌，添加到结果列表中
                 current_batch_results.append({
@@ -818,6 +1159,9 @@ if __name__ == "__main__":
                     "score": current_score,
                 })
                 results_processed_count += 1
+                simulations_run += result.get("simulations", 1)
+                if surrogate_screen:
+                    surrogate_screen.update(deck_card_ids, current_score)
 
                 if current_score > highest_score_overall:
                     highest_score_overall = current_score
@@ -830,10 +1174,12 @@ if __name__ == "__main__":
                     logger.info(f"\nNEW HI-SCORE! Deck: {original_index}, Score: {current_score:,}")
                     logger.info(f"  Deck: {deck_card_ids}")
 
-                if len(current_batch_results) >= BATCH_SIZE:
+                if len(current_batch_results) >= batch_size or (
+                        memory_budget and memory_budget.should_flush(len(current_batch_results))):
                     batch_counter += 1
                     temp_filename = os.path.join(TEMP_OUTPUT_DIR, f"temp_batch_{batch_counter:0>3}.json")
-                    save_simulation_results(current_batch_results, temp_filename, calc_pt=False, custom_card_levels=custom_card_levels)
+                    with telemetry.io(), memory_tracker.stage("flush"):
+                        save_simulation_results(current_batch_results, temp_filename, calc_pt=False, custom_card_levels=custom_card_levels)
                     temp_files.append(temp_filename)
                     current_batch_results = []  # 清空当前批次列表
 
@@ -841,27 +1187,69 @@ if __name__ == "__main__":
             if current_batch_results:
                 batch_counter += 1
                 temp_filename = os.path.join(TEMP_OUTPUT_DIR, f"temp_batch_{batch_counter:0>3}.json")
-                save_simulation_results(current_batch_results, temp_filename, calc_pt=False, custom_card_levels=custom_card_levels)
+                with telemetry.io(), memory_tracker.stage("flush"):
+                    save_simulation_results(current_batch_results, temp_filename, calc_pt=False, custom_card_levels=custom_card_levels)
                 temp_files.append(temp_filename)
                 current_batch_results = []  # 清空
+            telemetry.finish()
+
+            profile_summary = profiling.collect(pool, num_processes)
+        memory_tracker.stop("simulation")
 
         song_end_time = time.time()
         logger.info(f"--- Song {fixed_music_id} simulation completed! ---")
         logger.info(f"Simulation time: {song_end_time - start_time:.2f} seconds")
+        if surrogate_screen:
+            logger.info(surrogate_screen.summary())
+        if profile_summary is not None:
+            for line in profile_summary.format_table():
+                logger.info(line)
 
         # --- Step 4: Save all results to JSON ---
-        all_simulation_results = []
-        for temp_file in tqdm(temp_files, desc="Merging Files"):
-            with open(temp_file, 'r') as f:
-                all_simulation_results.extend(json.load(f))
-            os.remove(temp_file)
         json_output_filename = os.path.join(FINAL_OUTPUT_DIR, f"simulation_results_{fixed_music_id}_{fixed_difficulty}.json")
-        save_simulation_results(all_simulation_results, json_output_filename, calc_pt=True, custom_card_levels=custom_card_levels)
+        if memory_budget and memory_budget.needs_external_merge(results_processed_count, json_output_filename):
+            # 在記憶體中合併會超出預算：改為在磁碟上分桶去重、k 路合併
+            buckets = memory_budget.bucket_count(results_processed_count)
+            logger.info(f"[Memory] 合併估計需要 "
+                        f"{memory_budget.merge_estimate_mb(results_processed_count, json_output_filename):,.0f} MB，"
+                        f"改用外部合併 ({buckets} 桶)")
+            merged_count = external_merge(
+                temp_files, json_output_filename,
+                lambda records: score2pt(best_unique_results(records), custom_card_levels),
+                os.path.join(TEMP_OUTPUT_DIR, "merge"), buckets, memory_tracker
+            )
+            logger.info(f"Simulation results saved to {json_output_filename} ({merged_count:,} results)")
+        else:
+            all_simulation_results = []
+            with memory_tracker.stage("merge"):
+                for temp_file in tqdm(temp_files, desc="Merging Files"):
+                    with open(temp_file, 'r') as f:
+                        all_simulation_results.extend(json.load(f))
+                    os.remove(temp_file)
+            with memory_tracker.stage("pt"):
+                save_simulation_results(all_simulation_results, json_output_filename, calc_pt=True, custom_card_levels=custom_card_levels)
+            del all_simulation_results
+        memory_tracker.close()
+        logger.info(memory_tracker.summary())
+
+        # 記錄結果指紋；與舊結果設定不一致（且非增量模式）時，合併後的結果來源不明，移除舊指紋
+        if not had_previous_results or (RUN_OPTIONS["delta"] and previous_fingerprint is not None):
+            save_fingerprint(json_output_filename, fingerprint)
+        elif previous_fingerprint is not None:
+            same_settings = {k: v for k, v in previous_fingerprint.items() if k != "search"} == \
+                {k: v for k, v in fingerprint.items() if k != "search"}
+            if same_settings:
+                if previous_fingerprint.get("search") != fingerprint["search"]:
+                    fingerprint["search"] = "mixed"
+                save_fingerprint(json_output_filename, fingerprint)
+            else:
+                os.remove(fingerprint_path(json_output_filename))
+                logger.info("[Delta] 設定與既有結果不一致，已移除舊指紋（下次 --delta 將無法比對）")
 
         # --- Step 5: Final Summary ---
         logger.info(f"\n--- Final Simulation Summary for {fixed_music_id} ---")
         logger.info(f"Map: {MUSIC_DB.get_music_by_id(fixed_music_id).Title} ({fixed_difficulty})")
-        logger.info(f"Total simulations run: {total_decks_to_simulate}")
+        logger.info(f"Total simulations run: {simulations_run}")
         if highest_score_overall != -1:
             logger.info(f"Overall Highest Score: {highest_score_overall:,}")
             logger.info(f"Highest Score Deck: {highest_score_deck_info['original_index']}")
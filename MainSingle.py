@@ -1,13 +1,11 @@
 import logging
 import time
-import os
 
-from src.core.RCardData import db_load
-from src.core.RChart import Chart, MusicDB
+from src.core import tracing
+from src.core.RChart import Chart
 from src.core.RDeck import Deck
-from src.core.RLiveStatus import PlayerAttributes
-from src.core.SkillResolver import UseCardSkill, ApplyCenterSkillEffect, ApplyCenterAttribute, CheckCenterSkillCondition
-from src.config.CardLevelConfig import convert_deck_to_simulator_format, fix_windows_console_encoding, DEATH_NOTE
+from src.core.Simulator_core import run_game_simulation, prepare_chart, MUSIC_DB, DB_CARDDATA, DB_SKILL
+from src.config.CardLevelConfig import convert_deck_to_simulator_format, fix_windows_console_encoding
 
 logger = logging.getLogger(__name__)
 
@@ -45,18 +43,13 @@ if __name__ == "__main__":
         logger.info("使用 CardLevelConfig.py 中的練度設定")
         pass
 
-    # 读取歌曲、卡牌、技能db
-    musicdb = MusicDB()
-    db_carddata = db_load(os.path.join("Data", "CardDatas.json"))
-    db_skill = db_load(os.path.join("Data", "RhythmGameSkills.json"))
-    db_skill.update(db_load(os.path.join("Data", "CenterSkills.json")))
-    db_skill.update(db_load(os.path.join("Data", "CenterAttributes.json")))
+    # 歌曲、卡牌、技能db 由 Simulator_core 在匯入時读取
 
     # 配置卡组、练度
     # 完整格式: (CardSeriesId, [卡牌等级, C位技能等级, 技能等级])
 
     """
-    d = Deck(db_carddata, db_skill, [(1011501, [120, 1, 9]),  # 沙知
+    d = Deck(DB_CARDDATA, DB_SKILL, [(1011501, [120, 1, 9]),  # 沙知
                                      (1021523, [120, 7, 7]),  # 银河梢
                                      (1023901, [80, 1, 7]),  # BR慈
                                      (1033514, [100, 1, 1]),  # P乃
@@ -68,13 +61,9 @@ if __name__ == "__main__":
     # 此时需要在CardLevelConfig中自定义练度，未定义则默认全满级
     # 如果有 YAML 配置，會優先使用 YAML 中的 card_levels
 
-    d = Deck(
-        db_carddata, db_skill,
-        convert_deck_to_simulator_format(
-            [1032532, 1042519, 1052901, 1033902, 1033528, 1051503],
-            custom_card_levels
-        )
-    )
+    deck_card_ids = [1032532, 1042519, 1052901, 1033902, 1033528, 1051503]
+    deck_card_data = convert_deck_to_simulator_format(deck_card_ids, custom_card_levels)
+    d = Deck(DB_CARDDATA, DB_SKILL, deck_card_data)
 
     # 歌曲、难度设置
     # 难度 01 / 02 / 03 / 04 对应 Normal / Hard / Expert / Master
@@ -93,9 +82,7 @@ if __name__ == "__main__":
     # -1: 测试所有C位选择并输出对比（会运行多次模拟）
     center_card_choice = -1
 
-    c = Chart(musicdb, fixed_music_id, fixed_difficulty)
-    player = PlayerAttributes(fixed_player_master_level)
-    player.set_deck(d)
+    c = prepare_chart(Chart(MUSIC_DB, fixed_music_id, fixed_difficulty))
 
     if center_override:
         c.music.CenterCharacterId = center_override
@@ -108,21 +95,7 @@ if __name__ == "__main__":
 
     # 找出所有C位角色的卡片
     center_char_id = c.music.CenterCharacterId
-    center_cards_indices = []
-    afk_mental = 0
-    flag_hanabi_ginko = False
-
-    for idx, card in enumerate(d.cards):
-        cid = int(card.card_id)
-        if cid in DEATH_NOTE:
-            if afk_mental:
-                afk_mental = min(afk_mental, DEATH_NOTE[cid])
-            else:
-                afk_mental = DEATH_NOTE[cid]
-        if cid == 1041517:
-            flag_hanabi_ginko = True
-        if card.characters_id == center_char_id:
-            center_cards_indices.append((idx, card))
+    center_cards_indices = [(idx, card) for idx, card in enumerate(d.cards) if card.characters_id == center_char_id]
 
     logging.info(f"\n找到 {len(center_cards_indices)} 张C位角色 ({center_char_id}) 的卡片")
     for idx, card in center_cards_indices:
@@ -155,209 +128,23 @@ if __name__ == "__main__":
         logging.error(f"错误：center_card_choice={center_card_choice} 无效！")
         exit(1)
 
-    # 注意：由于原有代码结构的限制，这里只能选择一个C位来运行
-    # 如果要测试所有C位，需要重构整个模拟循环
-    # 这里我们选择第一个来运行，并输出警告
-    if len(center_cards_to_test) > 1:
-        logging.warning(f"\n{'='*80}")
-        logging.warning(f"警告：MainSingle.py 暂不支持运行多次模拟对比")
-        logging.warning(f"将只使用第一个C位选择运行")
-        logging.warning(f"如需测试所有C位，请使用 MainBatch.py")
-        logging.warning(f"{'='*80}\n")
-
-    center_idx, centercard = center_cards_to_test[0]
-    logging.info(f"\n使用 {centercard.full_name} 作为C位 (索引 {center_idx})")
-
-    logging.debug("\n--- 应用C位特性 ---")
-    if centercard:
-        for target, effect in centercard.get_center_attribute():
-            ApplyCenterAttribute(player, effect, target)
-
-    logging.debug("\n--- C位特性应用完毕 ---")
-    for card in d.cards:
-        logging.debug(f"Cost: {card.cost:2}\t{card.full_name}")
-
-    # 根据歌曲颜色计算三围、基础分
-    d.appeal_calc(c.music.MusicType)
-    player.hp_calc()
-    player.basescore_calc(c.AllNoteSize)
-
-    logging.debug(f"Appeal: {player.deck.appeal}")
-    logging.debug(f"技能CD: {player.cooldown} 秒")
-
-    # 插入开局cd
-    c.ChartEvents.append((str(player.cooldown), "CDavailable"))
-    c.ChartEvents.sort(key=lambda event: float(event[0]))
-
-    MISS_TIMING = {
-        "Single": 0.125,
-        "Hold": 0.125,
-        "Flick": 0.100,
-        "HoldMid": 0.070,
-        "Trace": 0.070,
-    }
-
-    logging.info(f"\n--- 开始模拟: {c.music.Title} ({fixed_difficulty})  ---")
-    i = 0
-    combo_count = 0
-    cardnow = d.topcard()
-    while i < len(c.ChartEvents):
-        timestamp, event = c.ChartEvents[i]
-        i += 1
-        match event:
-            case "Single" | "Hold" | "HoldMid" | "Flick" | "Trace":
-                combo_count += 1
-                if combo_count in []:  # 按需模拟其他判定/策略
-                    player.combo_add("GOOD")
-                    # player.combo_add("BAD", event)
-
-                elif afk_mental and player.mental.get_rate() > afk_mental:
-                    # 不同note类型和判定会影响扣血多少
-                    # 模拟开局挂机到背水时需向combo_add()传入note类型(即event)
-                    # 卡组有p吟/BR吟时自动模拟背水，可在DEATH_NOTE中添加其他背水血线
-
-                    # 檢查 MISS 是否會導致血量歸零
-                    if event == "Trace" or event == "HoldMid":
-                        miss_damage = player.mental.traceMinus
-                    else:
-                        miss_damage = player.mental.missMinus
-
-                    will_die = (player.mental.current_hp <= miss_damage)
-
-                    if will_die:
-                        # 如果 MISS 會導致遊戲結束，改為 PERFECT
-                        player.combo_add("PERFECT")
-                        logger.timing(f"[连击{player.combo}x]\t总分: {player.score}\t时间: {timestamp}\t{event} (避免血量歸零)")
-                    else:
-                        # 需要仰卧起坐时，将 MISS 时机按判定窗口延后以提高精度
-                        if flag_hanabi_ginko:
-                            misstime = str(float(timestamp) + MISS_TIMING[event])
-                            c.ChartEvents.append((misstime, "_" + event))
-                            c.ChartEvents.sort(key=lambda event: float(event[0]))
-                        else:
-                            player.combo_add("MISS", event)
-                            logger.timing(f"[连击{player.combo}x]\t总分: {player.score}\t时间: {timestamp}\t{event}")
-                elif combo_count in []:
-                    player.combo_add("GREAT")
-                    # 连击计数、AP速度更新、回复AP、扣血
-                    logger.timing(f"[连击{player.combo}x]\t总分: {player.score}\t时间: {timestamp}\t{event}")
-                else:
-                    player.combo_add("PERFECT+")
-                    # 连击计数、AP速度更新、回复AP、扣血
-                    logger.timing(f"[连击{player.combo}x]\t总分: {player.score}\t时间: {timestamp}\t{event}")
-                # AP足够 且 冷却完毕 时打出技能
-                if cardnow and player.ap >= cardnow.cost and player.CDavailable:
-                    player.ap -= cardnow.cost
-                    logger.debug(f"\n打出技能: {cardnow.full_name}\t时间: {timestamp}")
-
-                    # 記錄打出前被除外的卡片數量
-                    cards_except_before = sum(1 for card in d.cards if card.is_except)
-
-                    conditions, effects = d.topskill()
-                    UseCardSkill(player, effects, conditions, cardnow)
-
-                    # 檢查是否有新的卡片被除外，重新計算血線
-                    cards_except_after = sum(1 for card in d.cards if card.is_except)
-                    if cards_except_after > cards_except_before:
-                        # 動態重新計算血線
-                        new_afk_mental = 0
-                        for card in d.cards:
-                            if not card.is_except:
-                                cid = int(card.card_id)
-                                if cid in DEATH_NOTE:
-                                    if new_afk_mental:
-                                        new_afk_mental = min(new_afk_mental, DEATH_NOTE[cid])
-                                    else:
-                                        new_afk_mental = DEATH_NOTE[cid]
-                        # 如果沒有剩餘的背水卡，血線重置為0（禁用背水）
-                        afk_mental = new_afk_mental
-                        if logger.isEnabledFor(logging.DEBUG):
-                            logger.debug(f"  動態血線更新: {afk_mental}%")
-
-                    player.CDavailable = False
-                    cdtime = str(float(timestamp) + player.cooldown)
-                    c.ChartEvents.append((cdtime, "CDavailable"))
-                    c.ChartEvents.sort(key=lambda event: float(event[0]))
-                    cardnow = d.topcard()
-
-            case "CDavailable":
-                player.CDavailable = True
-                logger.timing(f"[CD结束]\t总分: {player.score}\t时间: {timestamp}")
-                if cardnow and player.ap >= cardnow.cost:
-                    player.ap -= cardnow.cost
-                    logger.debug(f"\n打出技能: {cardnow.full_name}\t时间: {timestamp}")
-
-                    # 記錄打出前被除外的卡片數量
-                    cards_except_before = sum(1 for card in d.cards if card.is_except)
-
-                    conditions, effects = d.topskill()
-                    UseCardSkill(player, effects, conditions, cardnow)
-
-                    # 檢查是否有新的卡片被除外，重新計算血線
-                    cards_except_after = sum(1 for card in d.cards if card.is_except)
-                    if cards_except_after > cards_except_before:
-                        # 動態重新計算血線
-                        new_afk_mental = 0
-                        for card in d.cards:
-                            if not card.is_except:
-                                cid = int(card.card_id)
-                                if cid in DEATH_NOTE:
-                                    if new_afk_mental:
-                                        new_afk_mental = min(new_afk_mental, DEATH_NOTE[cid])
-                                    else:
-                                        new_afk_mental = DEATH_NOTE[cid]
-                        # 如果沒有剩餘的背水卡，血線重置為0（禁用背水）
-                        afk_mental = new_afk_mental
-                        if logger.isEnabledFor(logging.DEBUG):
-                            logger.debug(f"  動態血線更新: {afk_mental}%")
-
-                    player.CDavailable = False
-                    cdtime = str(float(timestamp) + player.cooldown)
-                    c.ChartEvents.append((cdtime, "CDavailable"))
-                    c.ChartEvents.sort(key=lambda event: float(event[0]))
-                    cardnow = d.topcard()
-
-            case event if event[0] == "_":
-                if player.mental.get_rate() > afk_mental:
-                    # 延遲的 MISS（花火吟子模式）
-                    note_type = event[1:]
-                    if note_type == "Trace" or note_type == "HoldMid":
-                        miss_damage = player.mental.traceMinus
-                    else:
-                        miss_damage = player.mental.missMinus
-
-                    will_die = (player.mental.current_hp <= miss_damage)
-
-                    if will_die:
-                        # 如果 MISS 會導致遊戲結束，改為 PERFECT
-                        player.combo_add("PERFECT")
-                        logger.timing(f"[连击{player.combo}x]\t总分: {player.score}\t时间: {timestamp}\t{note_type} (避免血量歸零)")
-                    else:
-                        player.combo_add("MISS", note_type)
-                        logger.timing(f"[连击{player.combo}x]\t总分: {player.score}\t时间: {timestamp}\tMISS: {note_type}")
-                else:
-                    player.combo_add("PERFECT+")
-                    logger.timing(f"[连击{player.combo}x]\t总分: {player.score}\t时间: {timestamp}\t{event[1:]} (延后)")
-
-            case "LiveStart" | "LiveEnd" | "FeverStart":
-                if event == "FeverStart":
-                    player.voltage.set_fever(True)
-                    logging.debug(f"\n【FEVER开始】\t时间: {timestamp}")
-                if centercard != None:
-                    logger.debug(f"\n尝试应用C位技能: {centercard.full_name}")
-                    for condition, effect in centercard.get_center_skill():
-                        if CheckCenterSkillCondition(player, condition, centercard, event):
-                            ApplyCenterSkillEffect(player, effect)
-                if event == "LiveEnd":
-                    break
-
-            case "FeverEnd":
-                player.voltage.set_fever(False)
-                logging.debug(f"\n【FEVER结束】\t时间: {timestamp}")
-            case _:
-                logging.warning(f"未定义的事件: {event}\t时间: {timestamp}")
-
-    logging.debug("\n--- 模拟结束 ---")
-    logging.info(player)
-    logging.info(f"打出记录: {d.card_log}")
-    logging.info(f"打出次数: {len(d.card_log)}")
+    # 与 MainBatch 使用同一个模拟引擎，过程由 LogTracer 输出：
+    # 音符判定与 CD 结束为 TIMING 等级，技能、条件、效果为 DEBUG 等级
+    # 模拟其他判定/策略（GOOD、MISS 等）请修改 Simulator_core.run_game_simulation
+    results = []
+    for center_idx, centercard in center_cards_to_test:
+        logging.info(f"\n使用 {centercard.full_name} 作为C位 (索引 {center_idx})")
+        logging.info(f"\n--- 开始模拟: {c.music.Title} ({fixed_difficulty})  ---")
+        with tracing.attached(tracing.LogTracer(logger, level=logging.DEBUG, note_level=logging.TIMING)):
+            result = run_game_simulation(
+                (deck_card_data, c, fixed_player_master_level, 0, deck_card_ids, center_idx)
+            )
+        logging.info(f"总分: {result['final_score']:,}")
+        logging.info(f"打出记录: {result['cards_played_log']}")
+        logging.info(f"打出次数: {len(result['cards_played_log'])}")
+        results.append((result["final_score"], centercard))
+
+    if len(results) > 1:
+        logging.info("\n--- C位对比 ---")
+        for score, centercard in sorted(results, key=lambda r: r[0], reverse=True):
+            logging.info(f"{score:>12,}\t{centercard.full_name}")
@@ -0,0 +1,159 @@
+"""
+多歌曲求解器 Cython 核心效能測試
+
+以固定種子產生三首歌的合成卡組資料（按 pt 降序），比較不同卡牌種類數下
+optimizer_core.optimize_decks 的搜尋時間：
+
+    - 64 張卡：單 word 遮罩的基準
+    - 64 張卡分散到 128 個 bit 位：搜尋樹與基準完全相同，只測多 word 遮罩的額外開銷
+    - 128 張卡：實際的大卡池
+
+指定 --results 時改用實際的結果檔，比較卡牌排除上限表（不使用 / 單張卡 / 卡牌對）
+的搜尋時間，加上 --nodes 時另以純 Python 版本統計展開的節點數。
+
+使用方法：
+    python benchmark_optimizer.py
+    python benchmark_optimizer.py --decks 50000 --cards 64 128 192
+    python benchmark_optimizer.py --results log/simulation_results_405119_02.json \
+        log/simulation_results_405121_02.json log/simulation_results_405107_02.json --nodes
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+from src.optimizer.disjoint_search import order_songs, search_disjoint
+from src.optimizer.exclusion import EXCLUDE_CARDS, EXCLUDE_NONE, EXCLUDE_PAIRS
+from src.optimizer.expansion import LevelPool
+from src.utils.result_stream import load_top_results
+
+logger = logging.getLogger(__name__)
+
+
+def generate_levels(n_cards: int, n_decks: int, seed: int = 0, bit_stride: int = 1) -> list[list[dict]]:
+    """
+    產生三首歌的合成卡組資料
+
+    少數強卡出現在大部分高 pt 卡組中，模擬實際結果檔中卡組高度重疊的情況。
+
+    Args:
+        n_cards: 卡牌種類數
+        n_decks: 每首歌的卡組數
+        seed: 隨機種子
+        bit_stride: 卡牌 bit 位間隔（>1 時把同樣的卡池分散到更多 word）
+    """
+    rng = random.Random(seed)
+    strength = [rng.random() ** 3 for _ in range(n_cards)]
+    weights = [s + 0.1 for s in strength]
+    levels = []
+    for _ in range(3):
+        seen = set()
+        decks = []
+        while len(decks) < n_decks:
+            cards = tuple(sorted(set(rng.choices(range(n_cards), weights=weights, k=8))))[:6]
+            if len(cards) < 6 or cards in seen:
+                continue
+            seen.add(cards)
+            mask = 0
+            for c in cards:
+                mask |= 1 << (c * bit_stride)
+            pt = int(sum(strength[c] for c in cards) * 1e6 + rng.random() * 3e5)
+            decks.append({"mask": mask, "score": pt * 3, "pt": pt})
+        decks.sort(key=lambda d: d["pt"], reverse=True)
+        for rank, deck in enumerate(decks, start=1):
+            deck["rank"] = rank
+        levels.append(decks)
+    return levels
+
+
+def time_search(optimizer_core, levels: list[list[dict]], repeat: int, threads: int = 1) -> tuple[float, object]:
+    """返回多次執行中最短的搜尋時間與結果"""
+    best_time = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = optimizer_core.optimize_decks(*levels, threads=threads)
+        elapsed = time.perf_counter() - start
+        if best_time is None or elapsed < best_time:
+            best_time = elapsed
+    return best_time, result
+
+
+def load_result_levels(paths: list[str], top_n: int) -> list[list[dict]]:
+    """讀取實際結果檔各自的前 top_n 名，按求解器的搜尋順序排列"""
+    levels = LevelPool([load_top_results(path, top_n)[0] for path in paths]).levels
+    return [levels[i] for i in order_songs(levels)]
+
+
+def compare_exclusion(optimizer_core, levels: list[list[dict]], k: int, repeat: int, threads: int, nodes: bool):
+    """比較不同卡牌排除上限的搜尋時間（與展開節點數）"""
+    cases = [("none", EXCLUDE_NONE), ("cards", EXCLUDE_CARDS), ("pairs", EXCLUDE_PAIRS)]
+    baseline = None
+    logger.info(f"{'Exclusion':<12}{'Time (s)':>10}{'Ratio':>8}{'Nodes':>14}{'Excluded':>14}  Best pt")
+    for name, exclusion in cases:
+        best_time = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = optimizer_core.optimize_songs_top_k(levels, k, threads=threads, exclusion=exclusion)
+            elapsed = time.perf_counter() - start
+            best_time = elapsed if best_time is None else min(best_time, elapsed)
+        if baseline is None:
+            baseline = best_time
+        counts = f"{'-':>14}{'-':>14}"
+        if nodes:
+            stats = {}
+            search_disjoint(levels, k, exclusion=exclusion, stats=stats)
+            counts = f"{stats['nodes']:>14,}{stats['excluded']:>14,}"
+        best_pt = result[0][0] if result else -1
+        logger.info(f"{name:<12}{best_time:>10.3f}{best_time / baseline:>8.2f}{counts}  {best_pt:,}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    parser = argparse.ArgumentParser(description='多歌曲求解器 Cython 核心效能測試')
+    parser.add_argument('--decks', type=int, default=20000, help='每首歌的卡組數 (預設: 20000)')
+    parser.add_argument('--cards', type=int, nargs='+', default=[64, 128], help='卡牌種類數 (預設: 64 128)')
+    parser.add_argument('--repeat', type=int, default=3, help='每個案例重複次數，取最短時間 (預設: 3)')
+    parser.add_argument('--seed', type=int, default=0, help='隨機種子')
+    parser.add_argument('--threads', type=int, default=1, help='搜尋執行緒數 (預設: 1)')
+    parser.add_argument('--results', nargs='+', metavar='FILE',
+                        help='改用實際結果檔 (simulation_results_*.json)，比較卡牌排除上限')
+    parser.add_argument('--top-n', type=int, default=50000, help='--results 時每首歌保留的卡組數 (預設: 50000)')
+    parser.add_argument('--top-k', type=int, default=1, help='--results 時保留的組合數 (預設: 1)')
+    parser.add_argument('--nodes', action='store_true', help='--results 時以純 Python 版本統計展開節點數（較慢）')
+    args = parser.parse_args()
+
+    try:
+        sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'cython')))
+        import optimizer_core
+    except ImportError as e:
+        logger.error(f"✗ Failed to import Cython module 'optimizer_core': {e}")
+        logger.error("請先編譯 Cython 模組：cd cython && python setup.py build_ext --inplace")
+        sys.exit(1)
+
+    if args.results:
+        result_levels = load_result_levels(args.results, args.top_n)
+        logger.info(f"Decks: {' × '.join(str(len(level)) for level in result_levels)}, "
+                    f"cards: {max(deck['mask'].bit_length() for level in result_levels for deck in level)}")
+        compare_exclusion(optimizer_core, result_levels, args.top_k, args.repeat, args.threads, args.nodes)
+        sys.exit(0)
+
+    cases = [(f"{args.cards[0]} cards", args.cards[0], 1),
+             (f"{args.cards[0]} cards spread to {args.cards[0] * 2} bits", args.cards[0], 2)]
+    cases += [(f"{n} cards", n, 1) for n in args.cards[1:]]
+
+    baseline = None
+    logger.info(f"{'Case':<32}{'Time (s)':>10}{'Ratio':>8}  Best pt")
+    for name, n_cards, stride in cases:
+        if n_cards * stride > optimizer_core.MAX_CARDS:
+            logger.warning(f"{name}: 超過 MAX_CARDS ({optimizer_core.MAX_CARDS})，跳過")
+            continue
+        levels = generate_levels(n_cards, args.decks, args.seed, stride)
+        elapsed, result = time_search(optimizer_core, levels, args.repeat, args.threads)
+        if baseline is None:
+            baseline = elapsed
+        best_pt = result[0] if result else -1
+        logger.info(f"{name:<32}{elapsed:>10.3f}{elapsed / baseline:>8.2f}  {best_pt:,}")
@@ -0,0 +1 @@
+"""效能測試套件，執行方式見 benchmarks/__main__.py"""
@@ -0,0 +1,161 @@
+"""
+效能測試套件
+
+以固定卡池、固定種子測量：
+
+    - simulator: run_game_simulation 每秒模擬的卡組數（每份譜面一筆，按音符數排列）
+    - deckgen:   DeckGeneratorWithDoubleCards 在不同卡池大小下每秒產生的卡組數
+    - mainbatch: MainBatch 的多行程模擬流程在 1/2/4/N 個行程下的吞吐量
+    - optimizer: 多歌曲求解器在不同 TOP_N 下的搜尋時間（合成卡組或實際結果檔）
+    - startup:   各入口腳本 --help 的啟動時間與最慢的匯入（見 benchmarks/startup.py）
+
+未指定 --data 時，以 src/utils/synthetic_data.py 在暫存目錄產生固定種子的合成資料，
+使用三種規模（300 / 800 / 2000 判定）的 Master 譜面，乾淨的 checkout 也能執行。
+結果以 JSON 輸出，指定基準檔時逐項比較，退步超過容許範圍時以狀態碼 1 結束。
+
+使用方法（在專案根目錄執行）：
+    python -m benchmarks
+    python -m benchmarks --data . --charts 405119:02 405121:04 --only simulator mainbatch
+    python -m benchmarks --save-baseline                  # 把本次結果存為基準
+    python -m benchmarks --baseline benchmarks/baseline.json --tolerance 0.05
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+from platform import python_implementation
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "cython"))
+
+from benchmarks import cases, startup  # noqa: E402
+from benchmarks.report import compare, load_report, save_report  # noqa: E402
+from src.utils.synthetic_data import DIFFICULTIES, generate_fixture  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+GROUPS = ["simulator", "deckgen", "mainbatch", "optimizer", "startup"]
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+
+def parse_args():
+    cpu = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description='模擬器、卡組生成器與求解器的效能測試')
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=GROUPS, help='只執行指定的案例組')
+    parser.add_argument('--data', type=str, metavar='DIR', help='包含 Data/ 的目錄 (預設: 產生合成資料)')
+    parser.add_argument('--charts', nargs='+', metavar='ID:DIFF',
+                        help='測試譜面 (預設: 合成資料的全部 Master 譜面；指定 --data 時必須指定)')
+    parser.add_argument('--fixture-seed', type=int, default=0, help='合成資料的隨機種子')
+    parser.add_argument('--sim-decks', type=int, default=1000, help='simulator: 每份譜面模擬的卡組數 (預設: 1000)')
+    parser.add_argument('--pool-sizes', type=int, nargs='+', default=[12, 18, len(cases.CARD_POOL)],
+                        help=f'deckgen: 卡池大小 (預設: 12 18 {len(cases.CARD_POOL)})')
+    parser.add_argument('--gen-decks', type=int, default=100000, help='deckgen: 每個卡池最多產生的卡組數 (預設: 100000)')
+    parser.add_argument('--processes', type=int, nargs='+', default=sorted({1, 2, 4, cpu}),
+                        help='mainbatch: 行程數 (預設: 1 2 4 與 CPU 核心數)')
+    parser.add_argument('--batch-tasks', type=int, default=20000, help='mainbatch: 模擬的任務數 (預設: 20000)')
+    parser.add_argument('--chunksize', type=int, default=7500 if python_implementation() == "PyPy" else 500,
+                        help='mainbatch: imap_unordered 的 chunksize (預設與 MainBatch 相同)')
+    parser.add_argument('--top-n', type=int, nargs='+', default=[5000, 20000, 50000],
+                        help='optimizer: TOP_N (預設: 5000 20000 50000)')
+    parser.add_argument('--top-k', type=int, default=1, help='optimizer: 保留的組合數 (預設: 1)')
+    parser.add_argument('--results', nargs='+', metavar='FILE',
+                        help='optimizer: 改用實際結果檔 (simulation_results_*.json) 代替合成卡組')
+    parser.add_argument('--cards', type=int, default=96, help='optimizer: 合成卡組的卡牌種類數 (預設: 96)')
+    parser.add_argument('--seed', type=int, default=0, help='optimizer: 合成卡組的隨機種子')
+    parser.add_argument('--top-imports', type=int, default=10, help='startup: 記錄自身耗時最多的匯入數 (預設: 10)')
+    parser.add_argument('--repeat', type=int, default=3, help='每個案例重複次數，取最短時間 (預設: 3)')
+    parser.add_argument('--output', type=str, default=os.path.join(ROOT, "benchmark_results.json"),
+                        help='結果 JSON 檔 (預設: benchmark_results.json)')
+    parser.add_argument('--baseline', type=str, default=DEFAULT_BASELINE,
+                        help='比較用的基準 JSON 檔 (預設: benchmarks/baseline.json，不存在時不比較)')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次結果另存為基準檔')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='容許的效能退步比例 (預設: 0.10)')
+    return parser.parse_args()
+
+
+def run_simulation_groups(args) -> list[dict]:
+    """在資料目錄下執行需要譜面的案例組"""
+    missing = cases.missing_data()
+    if missing:
+        logger.warning(f"{args.data} 缺少模擬器資料 {missing}，跳過 simulator / deckgen / mainbatch")
+        return []
+
+    charts = {}
+    for text in args.charts:
+        music_id, _, difficulty = text.partition(":")
+        difficulty = difficulty or "02"
+        chart = cases.load_chart(music_id, difficulty)
+        if chart is None:
+            logger.warning(f"找不到譜面 {music_id}_{difficulty}，跳過")
+            continue
+        charts[f"{music_id}_{difficulty}"] = chart
+    if not charts:
+        logger.warning("沒有可用的譜面，跳過 simulator / deckgen / mainbatch")
+        return []
+    # 卡組生成與端到端測試使用音符最多的譜面
+    longest = max(charts.values(), key=lambda c: c.AllNoteSize)
+
+    results = []
+    if "simulator" in args.only:
+        results += cases.bench_simulator(charts, args.sim_decks, args.repeat)
+    if "deckgen" in args.only:
+        results += cases.bench_deck_generator(longest, args.pool_sizes, args.gen_decks, args.repeat)
+    if "mainbatch" in args.only:
+        results += cases.bench_mainbatch(longest, args.processes, args.batch_tasks, args.chunksize, args.repeat)
+    return results
+
+
+def optimizer_levels(args) -> list[list[dict]]:
+    from benchmark_optimizer import generate_levels, load_result_levels
+    if args.results:
+        return load_result_levels(args.results, max(args.top_n))
+    return generate_levels(args.cards, max(args.top_n), args.seed)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    args = parse_args()
+
+    results = []
+    if set(args.only) & {"simulator", "deckgen", "mainbatch", "startup"}:
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory(prefix="sukushow-bench-") as fixture:
+            if args.data is None:
+                music_ids = generate_fixture(fixture, seed=args.fixture_seed,
+                                             carddata_path=os.path.join(ROOT, "Data", "CardDatas.json"))
+                args.charts = args.charts or [f"{music_id}:{DIFFICULTIES[-1]}" for music_id in music_ids]
+            elif not args.charts:
+                logger.error("指定 --data 時需要以 --charts 指定譜面")
+                return 2
+            os.chdir(args.data or fixture)
+            try:
+                if set(args.only) & {"simulator", "deckgen", "mainbatch"}:
+                    results += run_simulation_groups(args)
+                if "startup" in args.only:
+                    results += startup.bench_startup(os.getcwd(), args.repeat, args.top_imports)
+            finally:
+                os.chdir(cwd)
+    if "optimizer" in args.only:
+        results += cases.bench_optimizer(optimizer_levels(args), args.top_n, args.top_k, args.repeat)
+
+    logger.info(f"{'Case':<28}{'Value':>14}  Unit")
+    for result in results:
+        logger.info(f"{result['name']:<28}{result['value']:>14,.3f}  {result['unit']}")
+
+    save_report(args.output, results, vars(args))
+    if args.save_baseline:
+        save_report(args.baseline, results, vars(args))
+        return 0
+    if os.path.exists(args.baseline):
+        regressions = compare(results, load_report(args.baseline), args.tolerance)
+        if regressions:
+            logger.error(f"{len(regressions)} 個案例的效能退步超過 {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+效能測試案例
+
+每個案例返回一筆或多筆結果：
+    {"name": 唯一名稱, "group": 案例組, "value": 數值, "unit": 單位,
+     "higher_is_better": 是否越大越好, "params": 固定參數}
+
+模擬器相關的案例以相對路徑讀取 Data/，呼叫前需先切換到資料目錄（見 __main__.py）。
+"""
+import itertools
+import logging
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# 固定卡池（與 DeckGen2 測試用卡池相同），較小的卡池按角色輪流取卡，保持角色分布
+CARD_POOL = [
+    1011501,  # 沙知
+    1021523, 1021901, 1021512, 1021701,  # 梢
+    1022521, 1022701, 1022901, 1022504,  # 缀
+    1023520, 1023701, 1023901,  # 慈
+    1031519, 1031530, 1031901,  # 帆
+    1032518, 1032528, 1032901,  # 沙
+    1033514, 1033524, 1033901,  # 乃
+    1041513,  # 吟
+    1043515,  # 芽
+    1052901, 1052503,  # 塞
+]
+
+# 模擬器需要的資料檔（相對於資料目錄）
+REQUIRED_DATA = [
+    os.path.join("Data", "CardDatas.json"),
+    os.path.join("Data", "Musics.yaml"),
+    os.path.join("Data", "RhythmGameSkills.json"),
+    os.path.join("Data", "CenterSkills.json"),
+    os.path.join("Data", "CenterAttributes.json"),
+]
+
+PLAYER_LEVEL = 50
+
+
+def missing_data() -> list[str]:
+    """目前目錄下缺少的模擬器資料檔"""
+    return [path for path in REQUIRED_DATA if not os.path.exists(path)]
+
+
+def card_pool(size: int) -> list[int]:
+    """取 CARD_POOL 的前 size 張卡（按角色輪流）"""
+    by_char = defaultdict(list)
+    for card_id in CARD_POOL:
+        by_char[card_id // 1000].append(card_id)
+    interleaved = [c for group in itertools.zip_longest(*by_char.values()) for c in group if c]
+    return interleaved[:size]
+
+
+def default_mustskills():
+    """MainBatch 預設的必備技能類型"""
+    from src.core.SkillResolver import SkillEffectType
+    return [
+        SkillEffectType.DeckReset,
+        SkillEffectType.ScoreGain,
+        SkillEffectType.VoltagePointChange,
+        SkillEffectType.NextAPGainRateChange,
+        SkillEffectType.NextVoltageGainRateChange,
+    ]
+
+
+def load_chart(music_id: str, difficulty: str):
+    """
+    以 MainBatch 相同的方式初始化譜面（事件時間轉為 float），譜面不存在時返回 None
+    """
+    from src.core.RChart import Chart
+    from src.core.Simulator_core import MUSIC_DB, prepare_chart
+    if MUSIC_DB.get_music_by_id(music_id) is None:
+        return None
+    chart = Chart(MUSIC_DB, music_id, difficulty)
+    if not chart.AllNoteSize:
+        return None
+    return prepare_chart(chart)
+
+
+def deck_generator(chart, pool_size: int):
+    from src.deck_gen.DeckGen2 import generate_decks_with_double_cards
+    return generate_decks_with_double_cards(card_pool(pool_size), [[], [], default_mustskills()],
+                                            chart.music.CenterCharacterId)
+
+
+def best_time(func, repeat: int) -> float:
+    """多次執行中最短的時間"""
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+
+def bench_simulator(charts: dict, n_decks: int, repeat: int) -> list[dict]:
+    """run_game_simulation 每秒模擬的卡組數，每份譜面各測一次"""
+    from src.config.CardLevelConfig import convert_deck_to_simulator_format
+    from src.core.Simulator_core import run_game_simulation
+
+    results = []
+    for label, chart in sorted(charts.items(), key=lambda item: item[1].AllNoteSize):
+        decks = list(itertools.islice(deck_generator(chart, len(CARD_POOL)), n_decks))
+        tasks = [(convert_deck_to_simulator_format(list(deck)), chart, PLAYER_LEVEL, i, list(deck), -1)
+                 for i, deck in enumerate(decks)]
+
+        def run():
+            for task in tasks:
+                run_game_simulation(task)
+
+        elapsed = best_time(run, repeat)
+        results.append({"name": f"simulator/{label}", "group": "simulator", "value": len(tasks) / elapsed,
+                        "unit": "decks/s", "higher_is_better": True,
+                        "params": {"notes": chart.AllNoteSize, "decks": len(tasks)}})
+    return results
+
+
+def bench_deck_generator(chart, pool_sizes: list[int], max_decks: int, repeat: int) -> list[dict]:
+    """DeckGeneratorWithDoubleCards 每秒產生的卡組數（不含預先計數的時間）"""
+    results = []
+    for size in pool_sizes:
+        generator = deck_generator(chart, size)
+        count = 0
+
+        def run():
+            nonlocal count
+            count = sum(1 for _ in itertools.islice(generator, max_decks))
+
+        elapsed = best_time(run, repeat)
+        if not count:
+            logger.warning(f"卡池 {size} 張時沒有符合條件的卡組，跳過")
+            continue
+        results.append({"name": f"deckgen/pool{size}", "group": "deckgen", "value": count / elapsed,
+                        "unit": "decks/s", "higher_is_better": True,
+                        "params": {"pool": size, "decks": count, "total_decks": generator.total_decks}})
+    return results
+
+
+def bench_mainbatch(chart, processes: list[int], n_tasks: int, chunksize: int, repeat: int) -> list[dict]:
+    """
+    MainBatch 的模擬流程（卡組生成 -> 任務轉換 -> 多行程模擬）的端到端吞吐量，
+    計時包含行程池的建立與結束，不含結果存檔
+    """
+    from MainBatch import task_generator_func
+    from src.core.Simulator_core import run_game_simulation
+
+    results = []
+    for n in processes:
+        def run():
+            tasks = task_generator_func(deck_generator(chart, len(CARD_POOL)), chart, PLAYER_LEVEL, 0)
+            with multiprocessing.Pool(processes=n) as pool:
+                for _ in pool.imap_unordered(run_game_simulation, itertools.islice(tasks, n_tasks), chunksize):
+                    pass
+
+        elapsed = best_time(run, repeat)
+        results.append({"name": f"mainbatch/p{n}", "group": "mainbatch", "value": n_tasks / elapsed,
+                        "unit": "decks/s", "higher_is_better": True,
+                        "params": {"processes": n, "tasks": n_tasks, "chunksize": chunksize,
+                                   "notes": chart.AllNoteSize}})
+    return results
+
+
+def load_search_engine():
+    """依序嘗試 Cython、NumPy、純 Python 搜尋核心，返回 (名稱, search)"""
+    try:
+        import optimizer_core
+        return "Cython", optimizer_core.optimize_songs_top_k
+    except ImportError:
+        pass
+    try:
+        from src.optimizer.numpy_search import search_numpy
+        return "NumPy", search_numpy
+    except ImportError:
+        from src.optimizer.disjoint_search import search_disjoint
+        return "Python", search_disjoint
+
+
+def bench_optimizer(levels: list[list[dict]], top_ns: list[int], k: int, repeat: int) -> list[dict]:
+    """多歌曲求解器在不同 TOP_N 下的搜尋時間"""
+    from src.optimizer.disjoint_search import solve
+
+    engine, search = load_search_engine()
+    results = []
+    for top_n in top_ns:
+        sub = [level[:top_n] for level in levels]
+        best_pt = None
+
+        def run():
+            nonlocal best_pt
+            combos = solve(sub, len(sub), k, search=search)
+            best_pt = combos[0][0] if combos else None
+
+        elapsed = best_time(run, repeat)
+        results.append({"name": f"optimizer/top{top_n}", "group": "optimizer", "value": elapsed,
+                        "unit": "s", "higher_is_better": False,
+                        "params": {"top_n": top_n, "top_k": k, "engine": engine, "best_pt": best_pt}})
+    return results
@@ -0,0 +1,85 @@
+"""
+效能測試結果的 JSON 輸出與基準比較
+"""
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def environment() -> dict:
+    """執行環境資訊，與基準比較時環境不同會提示"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def save_report(path: str, results: list[dict], args: dict):
+    report = {"environment": environment(), "args": args, "results": results}
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"Benchmark results saved to {path}")
+
+
+def load_report(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float) -> list[dict]:
+    """
+    與基準比較，返回退步超過 tolerance 的案例
+
+    參數不同的同名案例（如卡組數、TOP_N 引擎不同）不比較。
+
+    Returns:
+        [{"name", "value", "baseline", "change"}, ...]：change 為效能變化比例（負數為退步）
+    """
+    env = environment()
+    base_env = baseline.get("environment", {})
+    for key in ("implementation", "machine", "cpu_count"):
+        if base_env.get(key) != env[key]:
+            logger.warning(f"基準的執行環境不同 ({key}: {base_env.get(key)} -> {env[key]})，比較結果僅供參考")
+
+    base = {r["name"]: r for r in baseline.get("results", [])}
+    regressions = []
+    logger.info(f"{'Case':<28}{'Value':>14}{'Baseline':>14}{'Change':>9}")
+    for result in results:
+        old = base.get(result["name"])
+        if old is None or not _same_setup(old, result):
+            continue
+        if result["higher_is_better"]:
+            change = result["value"] / old["value"] - 1
+        else:
+            change = old["value"] / result["value"] - 1
+        flag = "  REGRESSION" if change < -tolerance else ""
+        logger.info(f"{result['name']:<28}{result['value']:>14,.3f}{old['value']:>14,.3f}{change:>+9.1%}{flag}")
+        if flag:
+            regressions.append({"name": result["name"], "value": result["value"], "baseline": old["value"],
+                                "change": change})
+    return regressions
+
+
+def _same_setup(old: dict, new: dict) -> bool:
+    # 求解器結果的最佳總 Pt 只是附帶資訊，不影響可比性
+    ignore = {"best_pt"}
+    return ({k: v for k, v in old["params"].items() if k not in ignore}
+            == {k: v for k, v in new["params"].items() if k not in ignore})
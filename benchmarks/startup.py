@@ -0,0 +1,149 @@
+"""
+入口腳本的啟動時間
+
+以子行程執行各入口的 --help（只匯入模組、解析參數，不做實際工作），測量：
+
+    - 牆鐘時間（重複執行取最短）
+    - python -X importtime 報告中自身耗時最多的模組，找出拖慢啟動的匯入
+
+每個入口有啟動時間預算 (ms)。MainBatch 的每次執行都需要完整的資料庫，
+仍在匯入時載入 Simulator_core，預算較寬；tqdm 與只在部分模式使用的模組（代理模型、退火/順序搜索、
+增量重算、遙測、記憶體預算）則在使用處才匯入。其餘入口只在需要時載入 tqdm、資料庫與 MusicDB
+（名稱查詢見 src/utils/names.py）。預算以一般桌機為準，較慢的機器可用 --budget-scale 放寬。
+
+使用方法（在專案根目錄執行）：
+    python -m benchmarks.startup                          # 以合成資料測量全部入口，超過預算時狀態碼為 1
+    python -m benchmarks.startup --data . --only multi_optimizer_2 --top 20
+    python -m benchmarks --only startup                   # 併入效能測試報告，與基準比較
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger(__name__)
+
+# 入口名稱 -> (python 之後的參數, 啟動時間預算 ms)
+ENTRY_POINTS = {
+    "MainBatch": (["MainBatch.py", "--help"], 600),
+    "multi_optimizer_2": (["multi_optimizer_2.py", "--help"], 250),
+    "multi_optimizer_2_cython": (["multi_optimizer_2_cython.py", "--help"], 250),
+    "multi_song_optimizer": (["multi_song_optimizer.py", "--help"], 250),
+    "optimizer_session": (["optimizer_session.py", "--help"], 250),
+    "benchmark_optimizer": (["benchmark_optimizer.py", "--help"], 250),
+    "parity": (["-m", "src.utils.parity", "--help"], 250),
+    "synthetic_data": (["-m", "src.utils.synthetic_data", "--help"], 250),
+}
+
+
+def _command(args: list[str], importtime: bool = False) -> list[str]:
+    if args[0].endswith(".py"):
+        args = [os.path.join(ROOT, args[0])] + args[1:]
+    return [sys.executable] + (["-X", "importtime"] if importtime else []) + args
+
+
+def _env() -> dict:
+    # 在資料目錄下以 -m 執行時也能找到 src
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    return env
+
+
+def measure(args: list[str], cwd: str, repeat: int) -> float:
+    """
+    執行 repeat 次，返回最短的牆鐘時間（秒）
+
+    Raises:
+        RuntimeError: 入口以非 0 狀態碼結束
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(_command(args), cwd=cwd, env=_env(), capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}")
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def import_times(args: list[str], cwd: str) -> list[tuple[str, int, int]]:
+    """
+    以 -X importtime 執行一次，返回 [(模組, 自身耗時 us, 累計耗時 us), ...]，按自身耗時降序
+    """
+    proc = subprocess.run(_command(args, importtime=True), cwd=cwd, env=_env(), capture_output=True, text=True)
+    modules = []
+    for line in proc.stderr.splitlines():
+        # import time:       self [us] |  cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue  # 標題行
+        modules.append((fields[2].strip(), self_us, cumulative_us))
+    modules.sort(key=lambda m: m[1], reverse=True)
+    return modules
+
+
+def bench_startup(cwd: str, repeat: int, top: int = 10, only: list[str] = None) -> list[dict]:
+    """各入口 --help 的啟動時間 (ms)，並記錄自身耗時最多的 top 個匯入"""
+    results = []
+    for name, (args, budget_ms) in ENTRY_POINTS.items():
+        if only and name not in only:
+            continue
+        try:
+            elapsed = measure(args, cwd, repeat)
+        except RuntimeError as e:
+            logger.warning(f"{name} 無法啟動，跳過: {e}")
+            continue
+        slowest = import_times(args, cwd)[:top]
+        logger.info(f"{name}: {elapsed * 1e3:,.0f} ms (budget {budget_ms:,} ms)")
+        for module, self_us, cumulative_us in slowest:
+            logger.info(f"    {module:<48}{self_us / 1e3:>9.1f} ms self{cumulative_us / 1e3:>9.1f} ms cumulative")
+        results.append({"name": f"startup/{name}", "group": "startup", "value": elapsed * 1e3,
+                        "unit": "ms", "higher_is_better": False,
+                        "params": {"args": args, "budget_ms": budget_ms},
+                        "slowest_imports": [{"module": m, "self_us": s, "cumulative_us": c} for m, s, c in slowest]})
+    return results
+
+
+def over_budget(results: list[dict], scale: float = 1.0) -> list[dict]:
+    """超過預算（乘以 scale）的入口"""
+    return [r for r in results if r["value"] > r["params"]["budget_ms"] * scale]
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description='入口腳本的啟動時間與匯入耗時報告')
+    parser.add_argument('--data', type=str, metavar='DIR', help='包含 Data/ 的目錄 (預設: 產生合成資料)')
+    parser.add_argument('--only', nargs='+', choices=list(ENTRY_POINTS), help='只測量指定的入口')
+    parser.add_argument('--repeat', type=int, default=5, help='每個入口重複次數，取最短時間 (預設: 5)')
+    parser.add_argument('--top', type=int, default=10, help='列出自身耗時最多的匯入數 (預設: 10)')
+    parser.add_argument('--budget-scale', type=float, default=1.0, help='預算倍率，較慢的機器可放寬 (預設: 1.0)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="sukushow-startup-") as fixture:
+        if args.data is None:
+            sys.path.insert(0, ROOT)
+            from src.utils.synthetic_data import generate_fixture
+            generate_fixture(fixture, carddata_path=os.path.join(ROOT, "Data", "CardDatas.json"))
+        results = bench_startup(os.path.abspath(args.data or fixture), args.repeat, args.top, args.only)
+
+    failed = over_budget(results, args.budget_scale)
+    for result in failed:
+        logger.error(f"{result['name']}: {result['value']:,.0f} ms 超過預算 "
+                     f"{result['params']['budget_ms'] * args.budget_scale:,.0f} ms")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
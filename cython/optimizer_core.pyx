@@ -7,34 +7,539 @@
 """
 Cython 優化的卡組搜尋核心模組
 
-使用純 C 類型和位元運算實現三重迴圈搜尋，
+使用純 C 類型和位元運算實現多首歌（最多 MAX_SONGS 首）的分支定界搜尋，
 大幅提升效能（預估 10-50x 加速）
+
+第二首歌起使用倒排索引：每張卡牌對應一個「不含該卡」的卡組 bitset，
+第一個相容卡組即為已用卡牌 bitset 的 AND 之最低位，逐 word 掃描。
+展開卡組前先以卡牌排除上限表剪枝（見 src/optimizer/exclusion.py）。
+演算法與 src/optimizer/disjoint_search.py 相同。
+
+多執行緒時，各執行緒以原子計數器輪流領取第一首歌的卡組，
+並透過原子變數共享剪枝門檻；同分組合按各首歌卡組索引的字典序排列（即單執行緒的搜尋順序），
+因此結果與執行緒數無關。
 """
 
-from libc.stdint cimport int64_t
+import threading
+
+from libc.stdint cimport int64_t, uint64_t
 from libc.stdlib cimport malloc, free
 
 
+cdef extern from *:
+    """
+    #include <stdint.h>
+    #if defined(_MSC_VER)
+    #include <intrin.h>
+    static __inline int ctz64(unsigned long long x) { unsigned long i; _BitScanForward64(&i, x); return (int)i; }
+    static __inline int64_t atomic_load_i64(int64_t* p) { return InterlockedCompareExchange64((volatile long long*)p, 0, 0); }
+    static __inline void atomic_max_i64(int64_t* p, int64_t v) {
+        int64_t cur = atomic_load_i64(p);
+        while (v > cur) {
+            int64_t prev = InterlockedCompareExchange64((volatile long long*)p, v, cur);
+            if (prev == cur) break;
+            cur = prev;
+        }
+    }
+    static __inline int atomic_fetch_add_int(int* p, int v) { return (int)InterlockedExchangeAdd((volatile long*)p, v); }
+    static __inline int atomic_load_int(int* p) { return (int)InterlockedCompareExchange((volatile long*)p, 0, 0); }
+    static __inline void atomic_store_int(int* p, int v) { InterlockedExchange((volatile long*)p, v); }
+    #else
+    static inline int ctz64(unsigned long long x) { return __builtin_ctzll(x); }
+    static inline int64_t atomic_load_i64(int64_t* p) { return __atomic_load_n(p, __ATOMIC_RELAXED); }
+    static inline void atomic_max_i64(int64_t* p, int64_t v) {
+        int64_t cur = __atomic_load_n(p, __ATOMIC_RELAXED);
+        while (v > cur && !__atomic_compare_exchange_n(p, &cur, v, 1, __ATOMIC_RELAXED, __ATOMIC_RELAXED)) {}
+    }
+    static inline int atomic_fetch_add_int(int* p, int v) { return __atomic_fetch_add(p, v, __ATOMIC_RELAXED); }
+    static inline int atomic_load_int(int* p) { return __atomic_load_n(p, __ATOMIC_RELAXED); }
+    static inline void atomic_store_int(int* p, int v) { __atomic_store_n(p, v, __ATOMIC_RELAXED); }
+    #endif
+    """
+    int ctz64(unsigned long long x) nogil
+    int64_t atomic_load_i64(int64_t* p) nogil
+    void atomic_max_i64(int64_t* p, int64_t v) nogil
+    int atomic_fetch_add_int(int* p, int v) nogil
+    int atomic_load_int(int* p) nogil
+    void atomic_store_int(int* p, int v) nogil
+
+
+cdef enum:
+    WORD_BITS = 64
+    MASK_WORDS = 4                           # 卡組遮罩的 word 數
+    MASK_BITS = MASK_WORDS * WORD_BITS       # 卡牌種類上限
+    MAX_LEVELS = 6                           # 歌曲數上限
+    NO_DECK = -1                             # 排除上限表中「沒有相容卡組」的值
+    EXCLUDE_CARDS = 1                        # exclusion 參數：只用單張卡
+    EXCLUDE_PAIRS = 2                        # exclusion 參數：另加卡牌對
+
+# 供 Python 端檢查卡牌種類與歌曲數上限
+MAX_CARDS = MASK_BITS
+MAX_SONGS = MAX_LEVELS
+
+
 cdef struct Deck:
-    int64_t mask      # 卡組位元遮罩
+    uint64_t mask[MASK_WORDS]  # 卡組位元遮罩（多 word，低位在前）
     int rank          # 排名
     int64_t score     # 分數（可能超過 2^31）
     int64_t pt        # Pt 值（可能超過 2^31）
     int deck_idx      # 原始資料索引
 
 
+cdef struct DeckIndex:
+    uint64_t* rows    # rows[w * n_cards + c]: 第 w 個 word 中不含卡牌 c 的卡組
+    uint64_t* acc     # restrict_index 的結果：不含指定卡牌的卡組
+    int acc_start     # acc 中第一個非零 word
+    int size          # 卡組數
+    int n_words       # word 數
+    int n_cards       # 卡牌 bit 位數（rows 的列寬）
+
+
+cdef inline uint64_t valid_word(DeckIndex* index, int w) noexcept nogil:
+    """第 w 個 word 中實際存在的卡組位元"""
+    cdef int count = index.size - w * WORD_BITS
+    if count >= WORD_BITS:
+        return <uint64_t>-1
+    return ((<uint64_t>1) << count) - 1
+
+
+cdef inline int mask_cards(Deck* deck, int* cards) noexcept nogil:
+    """將卡組遮罩展開為卡牌 bit 位列表，返回卡牌數"""
+    cdef uint64_t m
+    cdef int w
+    cdef int k = 0
+    for w in range(MASK_WORDS):
+        m = deck.mask[w]
+        while m:
+            cards[k] = w * WORD_BITS + ctz64(m)
+            k += 1
+            m &= m - 1
+    return k
+
+
+cdef int set_mask(Deck* deck, object mask) except -1:
+    """將 Python 整數遮罩拆分為多個 word，返回最高卡牌 bit 位 + 1"""
+    cdef int w
+    cdef int n_bits = mask.bit_length()
+    if n_bits > MASK_BITS:
+        raise ValueError(f"卡牌種類超過 {MASK_BITS} 張，請增加 MASK_WORDS 後重新編譯")
+    for w in range(MASK_WORDS):
+        deck.mask[w] = mask & 0xFFFFFFFFFFFFFFFF
+        mask >>= WORD_BITS
+    return n_bits
+
+
+cdef int build_index(DeckIndex* index, Deck* level, int n, int n_cards) noexcept:
+    """建立倒排索引，記憶體不足時返回 -1"""
+    cdef int w, c, r, k, j
+    cdef uint64_t full
+    cdef int cards[MASK_BITS]
+
+    index.size = n
+    index.n_words = (n + WORD_BITS - 1) // WORD_BITS
+    index.n_cards = n_cards
+    index.acc_start = 0
+    index.rows = <uint64_t*>malloc((index.n_words * n_cards + 1) * sizeof(uint64_t))
+    index.acc = <uint64_t*>malloc((index.n_words + 1) * sizeof(uint64_t))
+    if not index.rows or not index.acc:
+        return -1
+
+    for w in range(index.n_words):
+        full = valid_word(index, w)
+        index.acc[w] = full
+        for c in range(n_cards):
+            index.rows[w * n_cards + c] = full
+
+    for r in range(n):
+        k = mask_cards(&level[r], cards)
+        for j in range(k):
+            index.rows[(r // WORD_BITS) * n_cards + cards[j]] &= ~((<uint64_t>1) << (r % WORD_BITS))
+    return 0
+
+
+cdef void free_index(DeckIndex* index) noexcept:
+    free(index.rows)
+    free(index.acc)
+
+
+cdef inline void restrict_index(DeckIndex* index, int* cards, int n_cards) noexcept nogil:
+    """acc = 不含 cards 中任何卡牌的卡組（每個 deck1 計算一次，供內層迴圈重複使用）"""
+    cdef int w, j
+    cdef uint64_t x
+    cdef uint64_t* row
+
+    index.acc_start = index.n_words
+    for w in range(index.n_words - 1, -1, -1):
+        row = index.rows + w * index.n_cards
+        x = valid_word(index, w)
+        for j in range(n_cards):
+            x &= row[cards[j]]
+        index.acc[w] = x
+        if x:
+            index.acc_start = w
+
+
+cdef inline int next_restricted(DeckIndex* index, int start) noexcept nogil:
+    """返回 acc 中索引 >= start 的第一個卡組，找不到時返回 -1"""
+    cdef int w
+    cdef uint64_t x
+
+    if start >= index.size:
+        return -1
+    w = start // WORD_BITS
+    if w < index.acc_start:
+        w = index.acc_start
+        x = index.acc[w] if w < index.n_words else 0
+    else:
+        x = index.acc[w] & ((<uint64_t>-1) << (start % WORD_BITS))
+    while w < index.n_words:
+        if x:
+            return w * WORD_BITS + ctz64(x)
+        w += 1
+        if w < index.n_words:
+            x = index.acc[w]
+    return -1
+
+
+cdef inline int first_compatible(DeckIndex* index, int* cards, int n_cards, int start) noexcept nogil:
+    """返回 acc 中索引 >= start 且同時不含 cards 中任何卡牌的第一個卡組，找不到時返回 -1"""
+    return scan_compatible(index, index.acc, index.acc_start, cards, n_cards, start)
+
+
+cdef inline int scan_compatible(
+    DeckIndex* index, uint64_t* base, int base_start,
+    int* cards, int n_cards, int start
+) noexcept nogil:
+    """返回 base 中索引 >= start 且同時不含 cards 中任何卡牌的第一個卡組，找不到時返回 -1"""
+    cdef int w, j, w0
+    cdef uint64_t x
+    cdef uint64_t* row
+    cdef int c0, c1, c2, c3, c4, c5
+
+    if start >= index.size:
+        return -1
+    w0 = start // WORD_BITS
+    if w0 < base_start:
+        w0 = base_start
+        start = w0 * WORD_BITS
+
+    if n_cards == 6:
+        # 常見情況：卡組恰好 6 張卡，展開內層迴圈
+        c0, c1, c2, c3, c4, c5 = cards[0], cards[1], cards[2], cards[3], cards[4], cards[5]
+        for w in range(w0, index.n_words):
+            row = index.rows + w * index.n_cards
+            x = base[w] & row[c0] & row[c1] & row[c2] & row[c3] & row[c4] & row[c5]
+            if w == w0:
+                x &= (<uint64_t>-1) << (start % WORD_BITS)
+            if x:
+                return w * WORD_BITS + ctz64(x)
+        return -1
+
+    for w in range(w0, index.n_words):
+        x = base[w]
+        if w == w0:
+            x &= (<uint64_t>-1) << (start % WORD_BITS)
+        row = index.rows + w * index.n_cards
+        for j in range(n_cards):
+            x &= row[cards[j]]
+        if x:
+            return w * WORD_BITS + ctz64(x)
+    return -1
+
+
 cdef struct BestCombo:
-    int64_t pt        # 總 Pt（可能超過 2^31）
-    int deck1_idx     # deck1 在 level0 中的索引
-    int deck2_idx     # deck2 在 level1 中的索引
-    int deck3_idx     # deck3 在 level2 中的索引
+    int64_t pt              # 總 Pt（可能超過 2^31）
+    int idx[MAX_LEVELS]     # 各首歌所選卡組的索引（未使用的歌曲為 0）
+
+
+cdef inline bint combo_worse(BestCombo* a, BestCombo* b) noexcept nogil:
+    """
+    a 是否排在 b 之後：pt 較低，或同分但卡組索引的字典序較大
+
+    深度優先搜尋按索引遞增的順序展開，字典序即單執行緒時的找到順序。
+    """
+    cdef int j
+    if a.pt != b.pt:
+        return a.pt < b.pt
+    for j in range(MAX_LEVELS):
+        if a.idx[j] != b.idx[j]:
+            return a.idx[j] > b.idx[j]
+    return False
+
+
+cdef inline void heap_sift_down(BestCombo* heap, int count, int i) noexcept nogil:
+    """最小堆積下沉，堆頂為目前第 K 名"""
+    cdef int child
+    cdef BestCombo tmp
+    while True:
+        child = 2 * i + 1
+        if child >= count:
+            return
+        if child + 1 < count and combo_worse(&heap[child + 1], &heap[child]):
+            child += 1
+        if not combo_worse(&heap[child], &heap[i]):
+            return
+        tmp = heap[i]
+        heap[i] = heap[child]
+        heap[child] = tmp
+        i = child
+
+
+cdef inline void heap_push(BestCombo* heap, int* count, int k, BestCombo* item) noexcept nogil:
+    """加入堆積；已滿時取代堆頂（呼叫前需確認 item 優於堆頂）"""
+    cdef int i, parent
+    cdef BestCombo tmp
+    if count[0] == k:
+        heap[0] = item[0]
+        heap_sift_down(heap, k, 0)
+        return
+    i = count[0]
+    heap[i] = item[0]
+    count[0] += 1
+    while i > 0:
+        parent = (i - 1) // 2
+        if not combo_worse(&heap[i], &heap[parent]):
+            return
+        tmp = heap[i]
+        heap[i] = heap[parent]
+        heap[parent] = tmp
+        i = parent
+
+
+cdef Deck* load_level(list data, int* n_cards) except NULL:
+    """將 Python 卡組資料複製到 C 陣列，並更新最高卡牌 bit 位"""
+    cdef int n = len(data)
+    cdef int i
+    cdef Deck* level = <Deck*>malloc((n + 1) * sizeof(Deck))
+    if not level:
+        raise MemoryError("Failed to allocate memory for deck arrays")
+    try:
+        for i in range(n):
+            n_cards[0] = max(n_cards[0], set_mask(&level[i], data[i]["mask"]))
+            level[i].rank = data[i]["rank"]
+            level[i].score = data[i]["score"]
+            level[i].pt = data[i]["pt"]
+            level[i].deck_idx = i
+    except BaseException:
+        free(level)
+        raise
+    return level
+
+
+cdef struct SearchLevel:
+    Deck* decks
+    int n
+    DeckIndex index
+    uint64_t* layers                    # layers[d * n_words + w]: 深度 d 時與前 d-1 個已選卡組相容的卡組
+    int layer_start[MAX_LEVELS + 1]     # 各層第一個非零 word
+    int64_t* excl                       # excl[j * n + i]: 第 j 首歌中不含第 i 個卡組任一張卡（或任一對卡）的最高 Pt 上限
+
+
+cdef struct SearchShared:
+    int n_levels
+    int k
+    int n_roots         # 第一首歌的卡組數
+    int next_root       # 下一個待領取的第一首歌卡組（原子操作）
+    int64_t floor       # 只搜尋總 Pt 大於此值的組合
+    int64_t bound       # 各執行緒第 K 名總 Pt 的最大值（原子操作），低於此值者必不在前 K 名
+
+
+cdef struct SearchState:
+    SearchShared* shared
+    SearchLevel* levels
+    int n_levels
+    BestCombo* heap
+    int k
+    int count
+    int64_t bound       # 本執行緒的剪枝門檻：目前第 K 名的總 Pt（未滿 K 個時為 floor）
+    int idx[MAX_LEVELS]
+
+
+cdef inline bint is_pruned(SearchState* s, int64_t upper) noexcept nogil:
+    """
+    總 Pt 上限為 upper 的組合是否可剪枝
+
+    本執行緒的第 K 名：同分時先找到者優先，故 <= 即可剪枝；
+    其他執行緒的第 K 名：同分時可能排在本執行緒的組合之後，只剪去 < 的組合。
+    """
+    return upper <= s.bound or upper < atomic_load_i64(&s.shared.bound)
+
+
+cdef inline int restrict_layer(SearchLevel* lv, int d, int* cards, int n_cards) noexcept nogil:
+    """layers[d + 1] = layers[d] 中不含 cards 的卡組，返回其中第一個卡組，找不到時返回 -1"""
+    cdef int n_words = lv.index.n_words
+    cdef uint64_t* src = lv.layers + d * n_words
+    cdef uint64_t* dst = src + n_words
+    cdef uint64_t* row
+    cdef uint64_t x
+    cdef int w, j
+    cdef int start = n_words
+    cdef int first = -1
+
+    for w in range(lv.layer_start[d], n_words):
+        x = src[w]
+        if x:
+            row = lv.index.rows + w * lv.index.n_cards
+            for j in range(n_cards):
+                x &= row[cards[j]]
+            if x and first < 0:
+                start = w
+                first = w * WORD_BITS + ctz64(x)
+        dst[w] = x
+    lv.layer_start[d + 1] = start
+    return first
+
+
+cdef int init_level(SearchLevel* lv, list data, int* n_cards) except -1:
+    """複製卡組資料（倒排索引在得知卡牌總數後由 build_level_index 建立）"""
+    lv.decks = load_level(data, n_cards)
+    lv.n = len(data)
+    return 0
+
+
+cdef int build_level_index(SearchLevel* lv, int n_cards) except -1:
+    """建立倒排索引（各執行緒共用，唯讀）"""
+    if build_index(&lv.index, lv.decks, lv.n, n_cards) < 0:
+        raise MemoryError("Failed to allocate memory for deck index")
+    return 0
+
+
+cdef int64_t first_avoiding(DeckIndex* index, Deck* decks, int c1, int c2) noexcept nogil:
+    """同時不含卡牌 c1、c2 的最高 Pt 卡組的 pt（c1 == c2 時為單張卡），找不到時返回 NO_DECK"""
+    cdef int w
+    cdef uint64_t x
+    cdef uint64_t* row
+    for w in range(index.n_words):
+        row = index.rows + w * index.n_cards
+        x = row[c1] & row[c2]
+        if x:
+            return decks[w * WORD_BITS + ctz64(x)].pt
+    return NO_DECK
+
+
+cdef int build_exclusion(SearchLevel* levels, int n_levels, int n_cards, int exclusion) except -1:
+    """
+    建立各首歌的排除上限：先為第 j 首歌建立卡牌（對）排除表，
+    再對排在前面的每首歌的每個卡組取其卡牌（對）對應值的最小值
+    """
+    cdef int64_t* table = NULL
+    cdef int64_t* excl
+    cdef int64_t bound, v
+    cdef int cards[MASK_BITS]
+    cdef int d, j, i, a, b, k, c1, c2
+    cdef int64_t width = n_cards
+
+    for d in range(n_levels - 1):
+        levels[d].excl = <int64_t*>malloc((n_levels * <int64_t>levels[d].n + 1) * sizeof(int64_t))
+        if not levels[d].excl:
+            raise MemoryError("Failed to allocate memory for exclusion bounds")
+
+    table = <int64_t*>malloc((width * width + 1) * sizeof(int64_t))
+    if not table:
+        raise MemoryError("Failed to allocate memory for exclusion bounds")
+    try:
+        with nogil:
+            for j in range(1, n_levels):
+                for c1 in range(n_cards):
+                    table[c1 * width + c1] = first_avoiding(&levels[j].index, levels[j].decks, c1, c1)
+                if exclusion >= EXCLUDE_PAIRS:
+                    for c1 in range(n_cards):
+                        for c2 in range(c1 + 1, n_cards):
+                            if table[c1 * width + c1] == NO_DECK or table[c2 * width + c2] == NO_DECK:
+                                v = NO_DECK
+                            else:
+                                v = first_avoiding(&levels[j].index, levels[j].decks, c1, c2)
+                            table[c1 * width + c2] = v
+                            table[c2 * width + c1] = v
+
+                for d in range(j):
+                    excl = levels[d].excl + j * <int64_t>levels[d].n
+                    for i in range(levels[d].n):
+                        k = mask_cards(&levels[d].decks[i], cards)
+                        bound = table[cards[0] * width + cards[0]] if k > 0 else NO_DECK
+                        for a in range(k):
+                            for b in range(a, k if exclusion >= EXCLUDE_PAIRS else a + 1):
+                                v = table[cards[a] * width + cards[b]]
+                                if v < bound:
+                                    bound = v
+                        excl[i] = bound
+    finally:
+        free(table)
+    return 0
+
+
+cdef inline int64_t exclusion_upper(SearchState* s, int d, int i, int64_t subtotal, int64_t* heads) noexcept nogil:
+    """選定第 d 首歌的第 i 個卡組後的總 Pt 上限；剩餘某首歌沒有相容卡組時返回 NO_DECK"""
+    cdef SearchLevel* lv = &s.levels[d]
+    cdef int64_t upper = subtotal
+    cdef int64_t b
+    cdef int j
+    for j in range(d + 1, s.n_levels):
+        b = lv.excl[j * <int64_t>lv.n + i]
+        if b == NO_DECK:
+            return NO_DECK
+        upper += heads[j] if heads[j] < b else b
+    return upper
+
+
+cdef int alloc_layers(SearchLevel* lv, int n_levels) except -1:
+    """配置各深度的候選集合（每個執行緒一份），深度 0、1 為全部卡組"""
+    cdef int w
+    lv.layers = <uint64_t*>malloc(((n_levels + 1) * lv.index.n_words + 1) * sizeof(uint64_t))
+    if not lv.layers:
+        raise MemoryError("Failed to allocate memory for deck index")
+    for w in range(lv.index.n_words):
+        lv.layers[w] = valid_word(&lv.index, w)
+        lv.layers[lv.index.n_words + w] = lv.layers[w]
+    lv.layer_start[0] = 0
+    lv.layer_start[1] = 0
+    return 0
+
+
+cdef class SearchJob:
+    """單一執行緒的搜尋工作：共用卡組與倒排索引，各自持有候選集合與前 K 名堆積"""
+    cdef SearchShared* shared
+    cdef SearchLevel levels[MAX_LEVELS]
+    cdef BestCombo* heap
+    cdef int count
+
+    def __cinit__(self):
+        cdef int j
+        self.heap = NULL
+        self.count = 0
+        for j in range(MAX_LEVELS):
+            self.levels[j].layers = NULL
+
+    cdef int setup(self, SearchShared* shared, SearchLevel* levels) except -1:
+        cdef int j
+        self.shared = shared
+        for j in range(shared.n_levels):
+            self.levels[j] = levels[j]
+            self.levels[j].layers = NULL
+        for j in range(1, shared.n_levels):
+            alloc_layers(&self.levels[j], shared.n_levels)
+        self.heap = <BestCombo*>malloc(shared.k * sizeof(BestCombo))
+        if not self.heap:
+            raise MemoryError("Failed to allocate memory for result heap")
+        return 0
+
+    def run(self):
+        with nogil:
+            self.count = search_top_combos(self.shared, self.levels, self.heap)
+
+    def __dealloc__(self):
+        cdef int j
+        for j in range(MAX_LEVELS):
+            free(self.levels[j].layers)
+        free(self.heap)
 
 
 def optimize_decks(
     list level0_data,
     list level1_data,
     list level2_data,
-    callback=None
+    callback=None,
+    int threads=1
 ):
     """
     使用 Cython 優化的三重迴圈搜尋最優卡組組合
@@ -44,150 +549,232 @@ def optimize_decks(
         level1_data: 第二首歌的卡組資料
         level2_data: 第三首歌的卡組資料
         callback: 可選的進度回呼函式 callback(current, total)
+        threads: 執行緒數，結果與單執行緒相同
 
     Returns:
         (best_pt, deck1_idx, deck2_idx, deck3_idx) 或 None
     """
-    cdef int n0 = len(level0_data)
-    cdef int n1 = len(level1_data)
-    cdef int n2 = len(level2_data)
+    combos = optimize_decks_top_k(level0_data, level1_data, level2_data, 1, callback, threads)
+    return combos[0] if combos else None
 
-    # 初始化指標為 NULL
-    cdef Deck* level0 = NULL
-    cdef Deck* level1 = NULL
-    cdef Deck* level2 = NULL
-    cdef int i
-    cdef BestCombo result
 
-    try:
-        # 分配 C 陣列
-        level0 = <Deck*>malloc(n0 * sizeof(Deck))
-        level1 = <Deck*>malloc(n1 * sizeof(Deck))
-        level2 = <Deck*>malloc(n2 * sizeof(Deck))
+def optimize_decks_top_k(
+    list level0_data,
+    list level1_data,
+    list level2_data,
+    int k,
+    callback=None,
+    int threads=1
+):
+    """
+    搜尋總 Pt 最高的 K 個卡組組合（三首歌的卡組互不重複）
 
-        if not level0 or not level1 or not level2:
-            raise MemoryError("Failed to allocate memory for deck arrays")
+    Args:
+        level0_data / level1_data / level2_data: 同 optimize_decks
+        k: 保留的組合數
+        callback: 可選的進度回呼函式 callback(current, total)
+        threads: 執行緒數，結果與單執行緒相同
 
-        # 將 Python 資料複製到 C 結構
-        for i in range(n0):
-            level0[i].mask = level0_data[i]["mask"]
-            level0[i].rank = level0_data[i]["rank"]
-            level0[i].score = level0_data[i]["score"]
-            level0[i].pt = level0_data[i]["pt"]
-            level0[i].deck_idx = i
-
-        for i in range(n1):
-            level1[i].mask = level1_data[i]["mask"]
-            level1[i].rank = level1_data[i]["rank"]
-            level1[i].score = level1_data[i]["score"]
-            level1[i].pt = level1_data[i]["pt"]
-            level1[i].deck_idx = i
-
-        for i in range(n2):
-            level2[i].mask = level2_data[i]["mask"]
-            level2[i].rank = level2_data[i]["rank"]
-            level2[i].score = level2_data[i]["score"]
-            level2[i].pt = level2_data[i]["pt"]
-            level2[i].deck_idx = i
-
-        # 執行核心搜尋
-        result = search_best_combo(
-            level0, n0,
-            level1, n1,
-            level2, n2,
-            callback
-        )
+    Returns:
+        [(total_pt, deck1_idx, deck2_idx, deck3_idx), ...]，按總 Pt 降序（同分時按卡組索引的字典序）
+    """
+    combos = optimize_songs_top_k([level0_data, level1_data, level2_data], k, callback, threads)
+    return [(pt,) + indices for pt, indices in combos]
 
-        if result.pt <= 0:
-            return None
 
-        return (result.pt, result.deck1_idx, result.deck2_idx, result.deck3_idx)
+def optimize_songs_top_k(list levels_data, int k, callback=None, int threads=1, int64_t floor=-1,
+                         int exclusion=EXCLUDE_PAIRS):
+    """
+    按給定順序搜尋 N 首歌（1 至 MAX_SONGS 首）卡組互不重複的前 K 名組合
 
-    finally:
-        # 無論如何都釋放記憶體
-        free(level0)
-        free(level1)
-        free(level2)
+    介面同 src/optimizer/disjoint_search.search_disjoint。
 
+    Args:
+        levels_data: 每首歌的卡組資料，格式同 optimize_decks，按 pt 降序
+        k: 保留的組合數
+        callback: 可選的進度回呼函式 callback(current, total)，以第一首歌的卡組計算
+        threads: 執行緒數，結果與單執行緒相同
+        floor: 只保留總 Pt 大於此值的組合（遞增搜尋時傳入已知的第 K 名）
+        exclusion: 卡牌排除上限：0 不使用、1 只用單張卡、2 另加卡牌對
 
-cdef BestCombo search_best_combo(
-    Deck* level0, int n0,
-    Deck* level1, int n1,
-    Deck* level2, int n2,
-    callback
-) noexcept nogil:
+    Returns:
+        [(total_pt, (deck_idx, ...)), ...]，按總 Pt 降序（同分時按卡組索引的字典序）
     """
-    核心搜尋演算法（C 類型，無 GIL）
+    cdef int n_levels = len(levels_data)
+    cdef SearchLevel levels[MAX_LEVELS]
+    cdef SearchShared shared
+    cdef SearchJob job
+    cdef int n_cards = 0
+    cdef int i, j
+
+    if k < 1:
+        raise ValueError("k 必須 >= 1")
+    if threads < 1:
+        raise ValueError("threads 必須 >= 1")
+    if n_levels < 1 or n_levels > MAX_LEVELS:
+        raise ValueError(f"歌曲數必須介於 1 與 {MAX_LEVELS} 之間")
+    if not all(levels_data):
+        return []
 
-    使用三重迴圈 + 多級剪枝尋找最優組合
-    """
-    cdef BestCombo best
-    best.pt = -1
-    best.deck1_idx = -1
-    best.deck2_idx = -1
-    best.deck3_idx = -1
+    # 初始化指標為 NULL
+    for j in range(n_levels):
+        levels[j].decks = NULL
+        levels[j].index.rows = NULL
+        levels[j].index.acc = NULL
+        levels[j].layers = NULL
+        levels[j].excl = NULL
+
+    jobs = []
+    workers = []
+    try:
+        # 將 Python 資料複製到 C 結構
+        for j in range(n_levels):
+            init_level(&levels[j], levels_data[j], &n_cards)
+        for j in range(1, n_levels):
+            build_level_index(&levels[j], n_cards)
+        if exclusion and n_levels > 1:
+            build_exclusion(levels, n_levels, n_cards, exclusion)
+
+        shared.n_levels = n_levels
+        shared.k = k
+        shared.n_roots = levels[0].n
+        shared.next_root = 0
+        shared.floor = floor
+        shared.bound = floor
+
+        for i in range(threads):
+            job = SearchJob()
+            job.setup(&shared, levels)
+            jobs.append(job)
+
+        # 執行核心搜尋：搜尋本身不持有 GIL，主執行緒只負責回報進度
+        workers = [threading.Thread(target=job.run, daemon=True) for job in jobs]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(0.1)
+                if callback is not None:
+                    callback(min(atomic_load_int(&shared.next_root), shared.n_roots), shared.n_roots)
+
+        combos = []
+        for job in jobs:
+            combos.extend([(job.heap[i].pt, tuple([job.heap[i].idx[j] for j in range(n_levels)]))
+                           for i in range(job.count)])
+        combos.sort(key=lambda c: (-c[0], c[1]))
+        return combos[:k]
 
-    cdef int i1, i2, i3
-    cdef int64_t mask1, mask2, mask3, mask12
-    cdef int64_t pt1, pt2, pt3, pt12, total_pt
-    cdef int64_t max_possible
-    cdef int64_t max_pt1 = level0[0].pt if n0 > 0 else 0
-    cdef int64_t max_pt2 = level1[0].pt if n1 > 0 else 0
-    cdef int64_t max_pt3 = level2[0].pt if n2 > 0 else 0
+    finally:
+        # 中斷時讓各執行緒在目前的卡組結束後停止，再釋放共用記憶體
+        atomic_store_int(&shared.next_root, levels[0].n if levels[0].decks else 0)
+        for worker in workers:
+            worker.join()
+        for j in range(n_levels):
+            free(levels[j].decks)
+            free(levels[j].excl)
+            free_index(&levels[j].index)
 
-    cdef int progress_step = n0 // 100 if n0 >= 100 else 1
 
-    # 三重迴圈主體
-    for i1 in range(n0):
-        mask1 = level0[i1].mask
-        pt1 = level0[i1].pt
+cdef void search_node(SearchState* s, int d, int64_t total, int* cards, int n_cards) noexcept nogil:
+    """
+    深度 d 的節點：已選 s.idx[:d]，cards 為第 d-1 首歌所選卡組的卡牌
 
-        # 剪枝 1: 即使選取剩餘兩關最高 pt，也無法超越當前最優
-        max_possible = pt1 + max_pt2 + max_pt3
-        if max_possible <= best.pt:
+    levels[j].layers 第 d 層 (j >= d) 為與前 d-1 個已選卡組相容的卡組，
+    本節點計算第 d+1 層供子節點使用，並以此取得剩餘歌曲各自相容的最高 Pt 作為上限。
+    """
+    cdef SearchLevel* lv = &s.levels[d]
+    cdef int j, i, first, k_next
+    cdef int64_t rest = 0
+    cdef int64_t subtotal
+    cdef int64_t heads[MAX_LEVELS]
+    cdef int next_cards[MASK_BITS]
+
+    for j in range(d + 1, s.n_levels):
+        first = restrict_layer(&s.levels[j], d, cards, n_cards)
+        if first < 0:
+            return
+        heads[j] = s.levels[j].decks[first].pt
+        rest += heads[j]
+
+    # deck 按 pt 降序排列，依序取出相容卡組，直到總 Pt 上限不再超過第 K 名
+    i = scan_compatible(&lv.index, lv.layers + d * lv.index.n_words, lv.layer_start[d], cards, n_cards, 0)
+    while i >= 0:
+        subtotal = total + lv.decks[i].pt
+        if is_pruned(s, subtotal + rest):
             break
+        s.idx[d] = i
+        if d == s.n_levels - 1:
+            push_combo(s, subtotal)
+        elif lv.excl == NULL or not is_pruned(s, exclusion_upper(s, d, i, subtotal, heads)):
+            k_next = mask_cards(&lv.decks[i], next_cards)
+            search_node(s, d + 1, subtotal, next_cards, k_next)
+        i = scan_compatible(&lv.index, lv.layers + d * lv.index.n_words, lv.layer_start[d], cards, n_cards, i + 1)
+
+
+cdef inline void push_combo(SearchState* s, int64_t total_pt) noexcept nogil:
+    """以目前已選卡組建立組合並加入堆積，堆積已滿時更新本執行緒與共享的門檻"""
+    cdef BestCombo item
+    cdef int j
+    item.pt = total_pt
+    for j in range(MAX_LEVELS):
+        item.idx[j] = s.idx[j] if j < s.n_levels else 0
+    heap_push(s.heap, &s.count, s.k, &item)
+    if s.count == s.k:
+        s.bound = s.heap[0].pt
+        atomic_max_i64(&s.shared.bound, s.bound)
+
+
+cdef int search_top_combos(SearchShared* shared, SearchLevel* levels, BestCombo* heap) noexcept nogil:
+    """
+    核心搜尋演算法（C 類型，無 GIL）
 
-        # 進度回呼（需要取得 GIL）
-        if callback is not None and i1 % progress_step == 0:
-            with gil:
-                callback(i1, n0)
-
-        for i2 in range(n1):
-            mask2 = level1[i2].mask
-            pt2 = level1[i2].pt
-
-            # 衝突檢測：deck1 和 deck2 是否有重複卡牌
-            if mask1 & mask2:
-                continue
-
-            pt12 = pt1 + pt2
-            mask12 = mask1 | mask2
-
-            # 剪枝 2: deck3 最高 pt 都不夠超越當前最優
-            if pt12 + max_pt3 <= best.pt:
-                break
-
-            for i3 in range(n2):
-                mask3 = level2[i3].mask
-                pt3 = level2[i3].pt
+    以原子計數器領取第一首歌的卡組（索引遞增），之後各首歌以深度優先搜尋
+    透過倒排索引直接跳到相容卡組。以最小堆積保留前 K 名。
 
-                # 衝突檢測：deck1+deck2 和 deck3 是否有重複卡牌
-                if mask12 & mask3:
-                    continue
+    Returns:
+        堆積中的組合數
+    """
+    cdef SearchState s
+    cdef int i1, k1, j
+    cdef int cards[MASK_BITS]
+    cdef int64_t pt1
+    cdef int64_t rest = 0
+    cdef int64_t heads[MAX_LEVELS]
+
+    s.shared = shared
+    s.levels = levels
+    s.n_levels = shared.n_levels
+    s.heap = heap
+    s.k = shared.k
+    s.count = 0
+    s.bound = shared.floor
+
+    # 剩餘歌曲的靜態上限：各自的最高 pt
+    for j in range(1, s.n_levels):
+        heads[j] = levels[j].decks[0].pt
+        rest += heads[j]
+
+    while True:
+        i1 = atomic_fetch_add_int(&shared.next_root, 1)
+        if i1 >= shared.n_roots:
+            break
+        pt1 = levels[0].decks[i1].pt
 
-                total_pt = pt12 + pt3
+        # 剪枝: 即使選取剩餘各關最高 pt，也無法超越目前第 K 名（之後的卡組 pt 更低）
+        if is_pruned(&s, pt1 + rest):
+            atomic_store_int(&shared.next_root, shared.n_roots)
+            break
 
-                if total_pt > best.pt:
-                    best.pt = total_pt
-                    best.deck1_idx = i1
-                    best.deck2_idx = i2
-                    best.deck3_idx = i3
-                else:
-                    # 剪枝 3: 由於 deck 按 pt 降序排列，
-                    # 後續 deck3 的 pt 只會更低，直接跳出
-                    break
+        s.idx[0] = i1
+        if s.n_levels == 1:
+            push_combo(&s, pt1)
+        elif levels[0].excl != NULL and is_pruned(&s, exclusion_upper(&s, 0, i1, pt1, heads)):
+            continue
+        else:
+            k1 = mask_cards(&levels[0].decks[i1], cards)
+            search_node(&s, 1, pt1, cards, k1)
 
-    return best
+    return s.count
 
 
 def optimize_decks_debug(
@@ -217,40 +804,32 @@ def optimize_decks_debug(
     cdef Deck* level0 = NULL
     cdef Deck* level1 = NULL
     cdef Deck* level2 = NULL
-    cdef int i
+    cdef int n_cards = 0
     cdef int64_t iterations = 0
     cdef int64_t conflicts = 0
     cdef int64_t pruned = 0
     cdef BestCombo best
+    cdef DeckIndex index1
+    cdef DeckIndex index2
+    index1.rows = NULL
+    index1.acc = NULL
+    index2.rows = NULL
+    index2.acc = NULL
 
     try:
-        level0 = <Deck*>malloc(n0 * sizeof(Deck))
-        level1 = <Deck*>malloc(n1 * sizeof(Deck))
-        level2 = <Deck*>malloc(n2 * sizeof(Deck))
+        level0 = load_level(level0_data, &n_cards)
+        level1 = load_level(level1_data, &n_cards)
+        level2 = load_level(level2_data, &n_cards)
 
-        if not level0 or not level1 or not level2:
+        if build_index(&index1, level1, n1, n_cards) < 0 or build_index(&index2, level2, n2, n_cards) < 0:
             raise MemoryError("Failed to allocate memory")
 
-        for i in range(n0):
-            level0[i].mask = level0_data[i]["mask"]
-            level0[i].pt = level0_data[i]["pt"]
-            level0[i].deck_idx = i
-
-        for i in range(n1):
-            level1[i].mask = level1_data[i]["mask"]
-            level1[i].pt = level1_data[i]["pt"]
-            level1[i].deck_idx = i
-
-        for i in range(n2):
-            level2[i].mask = level2_data[i]["mask"]
-            level2[i].pt = level2_data[i]["pt"]
-            level2[i].deck_idx = i
-
         # 執行帶統計的搜尋
         best = search_best_combo_debug(
             level0, n0,
             level1, n1,
             level2, n2,
+            &index1, &index2,
             &iterations,
             &conflicts,
             &pruned
@@ -258,9 +837,9 @@ def optimize_decks_debug(
 
         return {
             "best_pt": best.pt,
-            "deck1_idx": best.deck1_idx,
-            "deck2_idx": best.deck2_idx,
-            "deck3_idx": best.deck3_idx,
+            "deck1_idx": best.idx[0],
+            "deck2_idx": best.idx[1],
+            "deck3_idx": best.idx[2],
             "iterations": iterations,
             "conflicts": conflicts,
             "pruned": pruned
@@ -271,77 +850,83 @@ def optimize_decks_debug(
         free(level0)
         free(level1)
         free(level2)
+        free_index(&index1)
+        free_index(&index2)
 
 
 cdef BestCombo search_best_combo_debug(
     Deck* level0, int n0,
     Deck* level1, int n1,
     Deck* level2, int n2,
+    DeckIndex* index1, DeckIndex* index2,
     int64_t* iterations,
     int64_t* conflicts,
     int64_t* pruned
 ) noexcept nogil:
-    """偵錯版本的搜尋演算法，記錄統計資訊"""
+    """
+    偵錯版本的搜尋演算法，記錄統計資訊
+
+    iterations: deck1+deck2 組合的 deck3 索引查詢次數
+    conflicts:  透過索引跳過的衝突卡組數
+    """
     cdef BestCombo best
     best.pt = -1
-    best.deck1_idx = -1
-    best.deck2_idx = -1
-    best.deck3_idx = -1
+    best.idx[0] = -1
+    best.idx[1] = -1
+    best.idx[2] = -1
 
     iterations[0] = 0
     conflicts[0] = 0
     pruned[0] = 0
 
-    cdef int i1, i2, i3
-    cdef int64_t mask1, mask2, mask3, mask12
-    cdef int64_t pt1, pt2, pt3, pt12, total_pt
+    cdef int i1, i2, i3, next_i2
+    cdef int k1, k2
+    cdef int cards[MASK_BITS]
+    cdef int64_t span   # 以 64 位元計算剪枝數量，避免 int 溢位
+    cdef int64_t pt1, pt12, total_pt
     cdef int64_t max_possible
     cdef int64_t max_pt1 = level0[0].pt if n0 > 0 else 0
     cdef int64_t max_pt2 = level1[0].pt if n1 > 0 else 0
     cdef int64_t max_pt3 = level2[0].pt if n2 > 0 else 0
 
     for i1 in range(n0):
-        mask1 = level0[i1].mask
         pt1 = level0[i1].pt
 
         max_possible = pt1 + max_pt2 + max_pt3
         if max_possible <= best.pt:
-            pruned[0] += (n0 - i1) * n1 * n2
+            span = n0 - i1
+            pruned[0] += span * n1 * n2
             break
 
-        for i2 in range(n1):
-            mask2 = level1[i2].mask
-            pt2 = level1[i2].pt
-
-            if mask1 & mask2:
-                conflicts[0] += 1
-                continue
-
-            pt12 = pt1 + pt2
-            mask12 = mask1 | mask2
+        k1 = mask_cards(&level0[i1], cards)
+        restrict_index(index1, cards, k1)
+        restrict_index(index2, cards, k1)
+        i2 = next_restricted(index1, 0)
+        conflicts[0] += (i2 if i2 >= 0 else n1)
+        while i2 >= 0:
+            pt12 = pt1 + level1[i2].pt
 
             if pt12 + max_pt3 <= best.pt:
-                pruned[0] += (n1 - i2) * n2
+                span = n1 - i2
+                pruned[0] += span * n2
                 break
 
-            for i3 in range(n2):
-                iterations[0] += 1
-                mask3 = level2[i3].mask
-                pt3 = level2[i3].pt
-
-                if mask12 & mask3:
-                    conflicts[0] += 1
-                    continue
-
-                total_pt = pt12 + pt3
-
+            iterations[0] += 1
+            k2 = mask_cards(&level1[i2], cards)
+            i3 = first_compatible(index2, cards, k2, 0)
+            conflicts[0] += (i3 if i3 >= 0 else n2)
+            if i3 >= 0:
+                total_pt = pt12 + level2[i3].pt
                 if total_pt > best.pt:
                     best.pt = total_pt
-                    best.deck1_idx = i1
-                    best.deck2_idx = i2
-                    best.deck3_idx = i3
+                    best.idx[0] = i1
+                    best.idx[1] = i2
+                    best.idx[2] = i3
                 else:
                     pruned[0] += (n2 - i3)
-                    break
+
+            next_i2 = next_restricted(index1, i2 + 1)
+            conflicts[0] += ((next_i2 if next_i2 >= 0 else n1) - i2 - 1)
+            i2 = next_i2
 
     return best
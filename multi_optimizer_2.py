@@ -1,15 +1,21 @@
-import json
 import logging
 import os
 import time
 import sys
 import argparse
-from tqdm import tqdm
 
 
 from src.config.CardLevelConfig import fix_windows_console_encoding
-from src.core.Simulator_core import DB_CARDDATA
-from src.core.RChart import MusicDB
+from src.optimizer.disjoint_search import MAX_SONGS, search_disjoint
+from src.optimizer.expansion import LevelPool, solve_until_proven
+from src.utils.names import format_deck_with_names, get_song_title
+from src.utils.result_stream import TopResultSource
+
+# 已安装 NumPy 时使用向量化的搜索核心，结果与纯 Python 版本相同
+try:
+    from src.optimizer.numpy_search import search_numpy as search_engine
+except ImportError:
+    search_engine = search_disjoint
 
 logger = logging.getLogger(__name__)
 
@@ -22,89 +28,31 @@ logging.basicConfig(
 # 配置求解歌曲，格式: ("歌曲ID", "难度"),
 # 求解前需运行 MainBatch.py 生成对应的卡组得分记录
 CHALLENGE_SONGS = [
-    # 若只输入两首歌则会寻找仅针对两面的最优解，不考虑第三面
+    # 可输入 2–6 首歌；只输入两首歌则只寻找两面的最优解
     ("405119", "02"),  # 一生に夢が咲くように
     ("405121", "02"),  # ハートにQ
     ("405107", "02"),  # Shocking Party
 ]
 
+# 找不到所有歌曲的解时逐步减少歌曲数，最少保留的歌曲数
+MIN_SONGS = 2
+
 # 每首歌只保留得分排名前 N 名的卡组用于求解
 TOP_N = 5000
 
-# 禁止使用的卡牌 ID 列表 (三面均生效)
+# 无法证明结果为最佳时，每首歌自动扩充到的卡组数上限（不大于 TOP_N 时不扩充）
+MAX_TOP_N = 400000
+
+# 输出总 Pt 前 K 名的组合
+TOP_K = 1
+
+# 禁止使用的卡牌 ID 列表 (所有歌曲均生效)
 # 填写格式: [卡牌id1, 卡牌id2, ...]
 FORBIDDEN_CARD = []
 
 # 在控制台与文件输出中显示卡牌名称
 SHOWNAME = True
 
-# 角色名称映射
-CHARACTER_NAMES = {
-    1011: "大賀美沙知",
-    1021: "乙宗梢",
-    1022: "夕霧綴理",
-    1023: "藤島慈",
-    1031: "日野下花帆",
-    1032: "村野さやか",
-    1033: "大沢瑠璃乃",
-    1041: "百生吟子",
-    1042: "徒町小鈴",
-    1043: "安養寺姫芽",
-    1051: "桂城泉",
-    1052: "セラス 柳田 リリエンフェルト",
-}
-
-
-def get_character_name(character_id: int) -> str:
-    """根据角色ID获取角色名称"""
-    return CHARACTER_NAMES.get(character_id, f'Unknown({character_id})')
-
-
-def get_card_name(card_id: int) -> str:
-    """根据卡面ID获取卡面名称"""
-    card_key = str(card_id)
-    if card_key in DB_CARDDATA:
-        return DB_CARDDATA[card_key].get('Name', f'Unknown({card_id})')
-    return f'Unknown({card_id})'
-
-
-def get_card_full_info(card_id: int) -> tuple[str, str]:
-    """
-    根据卡面ID获取角色名和卡面名
-
-    Returns:
-        (角色名, 卡面名) 元组
-    """
-    card_key = str(card_id)
-    if card_key in DB_CARDDATA:
-        card_data = DB_CARDDATA[card_key]
-        character_id = card_data.get('CharactersId')
-        character_name = get_character_name(character_id) if character_id else 'Unknown'
-        card_name = card_data.get('Name', f'Unknown({card_id})')
-        return character_name, card_name
-    return 'Unknown', f'Unknown({card_id})'
-
-
-def format_deck_with_names(deck_card_ids: list) -> str:
-    """格式化卡组，显示ID和名称"""
-    lines = []
-    for card_id in deck_card_ids:
-        character_name, card_name = get_card_full_info(card_id)
-        lines.append(f"      {card_id}: {character_name} - {card_name}")
-    return '\n'.join(lines)
-
-
-def get_song_title(music_id: str) -> str:
-    """根据歌曲ID获取歌名"""
-    try:
-        music_db = MusicDB()
-        music = music_db.get_music_by_id(music_id)
-        if music:
-            return music.Title
-    except Exception:
-        pass
-    return f'Unknown({music_id})'
-
 
 if __name__ == "__main__":
     fix_windows_console_encoding()
@@ -113,6 +61,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='多歌曲卡組最佳化求解器')
     parser.add_argument('--config', type=str, metavar='CONFIG_FILE',
                        help='YAML配置檔案路徑（例如：config/member-alice.yaml）')
+    parser.add_argument('--top-k', type=int, metavar='K',
+                       help='輸出總 Pt 前 K 名的組合（覆蓋配置檔的 optimizer.top_k）')
     args = parser.parse_args()
 
     start_time = time.time()
@@ -134,209 +84,85 @@ if __name__ == "__main__":
 
         # 從配置讀取優化器設定（覆蓋全局常量）
         TOP_N = config.get_optimizer_top_n()
+        MAX_TOP_N = config.get_optimizer_max_top_n()
+        TOP_K = config.get_optimizer_top_k()
         SHOWNAME = config.get_optimizer_show_names()
         FORBIDDEN_CARD = config.get_forbidden_cards()
 
-        logger.info(f"優化器配置: TOP_N={TOP_N}, SHOWNAME={SHOWNAME}, "
+        logger.info(f"優化器配置: TOP_N={TOP_N}, MAX_TOP_N={MAX_TOP_N}, TOP_K={TOP_K}, SHOWNAME={SHOWNAME}, "
                    f"FORBIDDEN_CARD={FORBIDDEN_CARD if FORBIDDEN_CARD else '[]'}")
 
     except (ImportError, ValueError, FileNotFoundError) as e:
         # 如果沒有配置管理器或找不到配置，使用默認的 log 目錄和全局常量
         LOG_DIR = "log"
         logger.info(f"配置管理器不可用或找不到配置檔 ({e})，使用默認值")
-        logger.info(f"log 目錄: {LOG_DIR}, TOP_N={TOP_N}, SHOWNAME={SHOWNAME}, "
+        logger.info(f"log 目錄: {LOG_DIR}, TOP_N={TOP_N}, MAX_TOP_N={MAX_TOP_N}, TOP_K={TOP_K}, SHOWNAME={SHOWNAME}, "
                    f"FORBIDDEN_CARD={FORBIDDEN_CARD if FORBIDDEN_CARD else '[]'}")
 
+    if args.top_k is not None:
+        TOP_K = args.top_k
+        logger.info(f"使用命令列指定的 TOP_K={TOP_K}")
+    if TOP_K < 1:
+        logger.error(f"TOP_K 必須 >= 1 (目前: {TOP_K})")
+        sys.exit(1)
+
+    if not 2 <= len(CHALLENGE_SONGS) <= MAX_SONGS:
+        logger.error(f"CHALLENGE_SONGS 必須包含 2 至 {MAX_SONGS} 首歌 (目前: {len(CHALLENGE_SONGS)})")
+        sys.exit(1)
+
     level_files = []
     for music_id, difficulty in CHALLENGE_SONGS:
         level_files.append(os.path.join(LOG_DIR, f"simulation_results_{music_id}_{difficulty}.json"))
 
     # === 读取与准备数据 ===
     logger.info("Preparing data...")
-    levels_raw = []
-    all_cards = set()
+    sources = []
 
     for i, f in enumerate(level_files):
-        with open(f, "r", encoding="utf-8") as fh:
-            data = json.load(fh)
-            total = len(data)
-            data.sort(key=lambda x: x["pt"], reverse=True)
-            
-            # 在切片前先過濾禁卡，確保 TOP_N 是有效的卡組
-            if FORBIDDEN_CARD:
-                original_count = len(data)
-                data = [d for d in data if not any(cid in d["deck_card_ids"] for cid in FORBIDDEN_CARD)]
-                filtered_count = len(data)
-                if original_count != filtered_count:
-                    logger.info(f"  Filtered {original_count - filtered_count} decks containing forbidden cards")
-
-            data = data[:TOP_N]
-            levels_raw.append(data)
-            for deck in data:
-                all_cards.update(deck["deck_card_ids"])
+        # 串流读取，只保留 pt 前 TOP_N 名的非禁卡卡组（禁卡在取前 N 名前过滤，确保 TOP_N 是有效的卡组）
+        # 无法证明结果为最佳时再扩充
+        source = TopResultSource(f, TOP_N, FORBIDDEN_CARD)
+        stats = source.stats
+        if stats["forbidden"]:
+            logger.info(f"  Filtered {stats['forbidden']} of {stats['scanned']} scanned decks containing forbidden cards")
+        sources.append(source)
         song_id, difficulty = CHALLENGE_SONGS[i]
         song_title = get_song_title(song_id)
-        logger.info(f"Loaded top {TOP_N} of {total} results for {song_id}_{difficulty} ({song_title})")
-
-    # 仅针对两首歌曲求解时，第三首歌填充假数据
-    if len(CHALLENGE_SONGS) == 2:
-        levels_raw.append([{
-            "deck_card_ids": [],
-            "score": 0,
-            "pt": 0
-        }])
-
-    # === 根据每关最高 Pt 重新排序（默认按大、小、中顺序）===
-    # 保存原始歌曲順序，創建工作副本
-    original_songs = list(CHALLENGE_SONGS)
+        logger.info(f"Loaded top {TOP_N} of {stats['total']} results for {song_id}_{difficulty} ({song_title})")
+
+    # 歌曲按原順序輸出，求解順序由 solve 按分支數決定
     working_songs = list(CHALLENGE_SONGS)
 
-    if len(working_songs) == 3:
-        best = [deck[0]["pt"] for deck in levels_raw]
-        i_max = max(range(3), key=lambda i: best[i])
-        i_min = min(range(3), key=lambda i: best[i])
-        i_mid = 3 - i_max - i_min
-        sorted_indices = [i_max, i_min, i_mid]
-        # 重排工作副本和 levels_raw
-        working_songs = [working_songs[i] for i in sorted_indices]
-        levels_raw = [levels_raw[i] for i in sorted_indices]
-        logger.info(f"Challenge songs reordered for optimization: {working_songs}")
-
-    # === 建立卡牌ID到bit位的映射 ===
-    card_to_bit = {cid: i for i, cid in enumerate(sorted(all_cards))}
+    # === 建立卡牌ID到bit位的映射，并转换deck为bitmask ===
+    # 禁卡已在載入時過濾，此處無需再次檢查
+    pool = LevelPool([source.results for source in sources])
+    card_to_bit = pool.card_to_bit
+    levels = pool.levels
     logger.info(f"Loaded {len(card_to_bit)} unique cards")
-    assert len(card_to_bit) <= 64, "卡牌种类超过64张时需使用更复杂的bitarray方案"
-    assert len(card_to_bit) >= 6 * len(working_songs), "可用卡牌过少，必定出现重复卡牌"
-
-    # === 转换deck为bitmask ===
-    def deck_to_mask(deck):
-        mask = 0
-        for cid in deck["deck_card_ids"]:
-            mask |= 1 << card_to_bit[cid]
-        return mask
-
-    levels = []
-    for data in levels_raw:
-        decks = []
-        for i, deck in enumerate(data, start=1):
-            # 禁卡已在載入時過濾，此處無需再次檢查
-            decks.append({
-                "mask": deck_to_mask(deck),
-                "rank": i,
-                "score": deck["score"],
-                "pt": deck["pt"],
-                "deck": deck["deck_card_ids"]
-            })
-        levels.append(decks)
-
-    logger.info("Starting deck optimization...")
-    # === 主搜索逻辑 ===
-    best_pt = -1
-    best_combo = None
-    combo_song_count = 3  # 追蹤最佳組合包含的歌曲數量
-
-    # 三重循环 + 多级剪枝
-    for i1, deck1 in tqdm(enumerate(levels[0]), total=len(levels[0]), desc="Song 1", leave=True, position=0):
-        mask1, pt1 = deck1["mask"], deck1["pt"]
-
-        # 上限剪枝：即便选取剩下两关最高pt，也不可能超过best_pt
-        max_possible = pt1 + levels[1][0]["pt"] + levels[2][0]["pt"]
-        if max_possible <= best_pt:
-            break
-
-        for i2, deck2 in enumerate(levels[1]):
-            mask2, pt2 = deck2["mask"], deck2["pt"]
-
-            # 检查冲突
-            if mask1 & mask2:
-                continue
-
-            pt12 = pt1 + pt2
-
-            # 第二层剪枝：deck3最高pt都不够超越当前最优
-            if pt12 + levels[2][0]["pt"] <= best_pt:
-                break
-
-            for i3, deck3 in enumerate(levels[2]):
-                mask3, pt3 = deck3["mask"], deck3["pt"]
-
-                # 冲突检测
-                if (mask1 | mask2) & mask3:
-                    continue
 
-                total_pt = pt12 + pt3
-
-                if total_pt > best_pt:
-                    best_pt = total_pt
-                    best_combo = (deck1, deck2, deck3)
-                    combo_song_count = 3
-                    logger.info(f"New best total pt found: {best_pt}")
-                    for i, d in enumerate(best_combo):
-                        # 只顯示有效的歌曲（當只有2首歌時，第3首是假數據）
-                        if i < len(working_songs):
-                            logger.info(f"  Song {i+1} {working_songs[i]}: ")
-                            logger.info(f"    Pt: {d['pt']:,}\tScore: {d['score']:,}\tRank: {d['rank']}")
-                            logger.info(f"    Deck (ID): {d['deck']}")
-                else:
-                    break
-
-    # === 降級處理：如果找不到三首歌的解，嘗試兩首歌的組合 ===
-    if best_pt <= 0 and len(working_songs) == 3:
-        logger.warning("\n" + "=" * 60)
-        logger.warning("無法找到三首歌的有效組合，嘗試降級為兩首歌...")
-        logger.warning("=" * 60 + "\n")
-
-        # 嘗試所有兩兩組合 (0-1, 0-2, 1-2)
-        two_song_combinations = [(0, 1), (0, 2), (1, 2)]
-
-        for idx1, idx2 in two_song_combinations:
-            song1_id, song1_diff = working_songs[idx1]
-            song2_id, song2_diff = working_songs[idx2]
-            song1_title = get_song_title(song1_id)
-            song2_title = get_song_title(song2_id)
-
-            logger.info(f"嘗試組合 [{idx1+1}+{idx2+1}]:")
-            logger.info(f"  • Song {idx1+1}: {song1_title} ({song1_id})")
-            logger.info(f"  • Song {idx2+1}: {song2_title} ({song2_id})")
-
-            temp_best_pt = -1
-            temp_best_combo = None
-
-            for deck1 in tqdm(levels[idx1], desc=f"Searching {idx1+1}+{idx2+1}", leave=False):
-                mask1, pt1 = deck1["mask"], deck1["pt"]
-
-                # 剪枝
-                if temp_best_pt > 0 and pt1 + levels[idx2][0]["pt"] <= temp_best_pt:
-                    break
-
-                for deck2 in levels[idx2]:
-                    mask2, pt2 = deck2["mask"], deck2["pt"]
-
-                    # 檢查衝突
-                    if mask1 & mask2:
-                        continue
-
-                    total_pt = pt1 + pt2
-
-                    if total_pt > temp_best_pt:
-                        temp_best_pt = total_pt
-                        temp_best_combo = (idx1, deck1, idx2, deck2)
-                    else:
-                        break
-
-            # 更新全局最佳
-            if temp_best_pt > best_pt:
-                best_pt = temp_best_pt
-                # 將兩首歌的組合轉換為統一格式，第三首用 None 佔位
-                song1_idx, deck1, song2_idx, deck2 = temp_best_combo
-                if song1_idx == 0 and song2_idx == 1:
-                    best_combo = (deck1, deck2, None)
-                elif song1_idx == 0 and song2_idx == 2:
-                    best_combo = (deck1, None, deck2)
-                else:  # 1-2
-                    best_combo = (None, deck1, deck2)
-                combo_song_count = 2
-                logger.info(f"✓ 找到新的最佳兩首歌組合: {best_pt:,} pt\n")
+    logger.info(f"Starting deck optimization... (engine: {'NumPy' if search_engine is not search_disjoint else 'Python'})")
+    # === 主搜索逻辑：N 首歌分支定界并证明最佳 ===
+    # 已载入的前 N 名中找不到组合时先扩充卡组（用到 TOP_N 以外卡组的组合可能存在），
+    # 证明不可行或达到 MAX_TOP_N 后才逐步减少歌曲数
+    from tqdm import tqdm
+    labels = [f"{song_id}_{difficulty}" for song_id, difficulty in working_songs]
+    with tqdm(unit="deck") as pbar:
+        def progress_callback(current, total):
+            pbar.total = total
+            pbar.n = current
+            pbar.refresh()
+
+        best_combos, combo_song_count, unproven_bound = solve_until_proven(
+            pool, sources, len(working_songs), TOP_K, search_engine, MAX_TOP_N, min_songs=MIN_SONGS,
+            callback=progress_callback, labels=labels,
+            on_song_count=lambda n: pbar.set_description(f"Searching {n} songs"))
+    if best_combos:
+        if unproven_bound is None:
+            logger.info("Optimality: proven for all decks (not only the loaded top N)")
+        else:
+            logger.warning(f"Optimality: not proven, a combination using unloaded decks may reach "
+                           f"{unproven_bound:,} total pt")
+        logger.info(f"Best total pt found: {best_combos[0][0]:,}")
 
     end_time = time.time()
     logger.info("--- Optimization completed! ---")
@@ -344,22 +170,34 @@ if __name__ == "__main__":
 
     # === 输出结果 ===
     output = []
-    if combo_song_count == 3:
-        output.append("=== Best Combination (3 Songs) ===")
+    songs_label = f"{combo_song_count} Songs"
+    if combo_song_count < len(working_songs):
+        songs_label += " - Downgraded"
+    if len(best_combos) > 1:
+        output.append(f"=== Top {len(best_combos)} Combinations ({songs_label}) ===")
     else:
-        output.append("=== Best Combination (2 Songs - Downgraded) ===")
+        output.append(f"=== Best Combination ({songs_label}) ===")
     output.append("")
 
-    if best_pt > 0:
-        output.append(f"Total Pt: {best_pt:,}")
+    if best_combos:
+        output.append(f"Decks Searched: {' / '.join(str(len(decks)) for decks in levels)}")
+        if unproven_bound is None:
+            output.append("Optimality: proven")
+        else:
+            output.append(f"Optimality: not proven (unloaded decks may reach {unproven_bound:,})")
         output.append("")
 
-        for i, d in enumerate(best_combo):
-            # 跳過 None（降級時未使用的歌曲）
-            if d is None:
-                continue
+        for rank, (total_pt, combo) in enumerate(best_combos, start=1):
+            if len(best_combos) > 1:
+                output.append(f"#{rank}")
+            output.append(f"Total Pt: {total_pt:,}")
+            output.append("")
+
+            for i, d in enumerate(combo):
+                # 跳過 None（降級時未使用的歌曲）
+                if d is None:
+                    continue
 
-            if i < len(working_songs):
                 song_id, difficulty = working_songs[i]
                 song_title = get_song_title(song_id)
                 output.append(f"Song {i+1}: {song_id} (Difficulty: {difficulty}) - {song_title}")
@@ -373,14 +211,17 @@ if __name__ == "__main__":
         output = "\n".join(output)
         logger.info(f"\n{output}")
 
-        output_filename = "best_3_song_combo.txt" if combo_song_count == 3 else "best_2_song_combo.txt"
+        output_filename = f"best_{combo_song_count}_song_combo.txt"
         with open(output_filename, "w", encoding="utf-8") as f:
             f.write(output)
             f.write("\n")
-        logger.info(f"Best combination saved to {output_filename}")
+        if len(best_combos) > 1:
+            logger.info(f"Top {len(best_combos)} combinations saved to {output_filename}")
+        else:
+            logger.info(f"Best combination saved to {output_filename}")
     else:
         logger.warning("=" * 60)
-        logger.warning("警告: 無法找到有效的卡組組合（已嘗試三首歌和兩首歌的所有組合）")
+        logger.warning(f"警告: 無法找到有效的卡組組合（已嘗試 {MIN_SONGS} 首歌以上的所有組合）")
         logger.warning("=" * 60)
         logger.warning("可能的原因:")
         logger.warning("  1. 禁卡設定過於嚴格，導致可用卡組不足")
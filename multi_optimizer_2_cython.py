@@ -5,20 +5,23 @@
 
 使用前請先編譯 Cython 模組：
     python setup.py build_ext --inplace
+
+未編譯時若已安裝 NumPy，自動改用 NumPy 向量化版本 (src/optimizer/numpy_search.py)
 """
 
-import json
 import logging
 import os
 import time
 import sys
 import argparse
-from tqdm import tqdm
+import functools
 
 
 from src.config.CardLevelConfig import fix_windows_console_encoding
-from src.core.Simulator_core import DB_CARDDATA
-from src.core.RChart import MusicDB
+from src.optimizer.disjoint_search import MAX_SONGS, order_songs
+from src.optimizer.expansion import LevelPool, solve_until_proven
+from src.utils.names import format_deck_with_names, get_song_title
+from src.utils.result_stream import TopResultSource
 
 logger = logging.getLogger(__name__)
 
@@ -31,107 +34,62 @@ logging.basicConfig(
 # 配置求解歌曲，格式: ("歌曲ID", "難度"),
 # 求解前需執行 MainBatch.py 產生對應的卡組得分記錄
 CHALLENGE_SONGS = [
-    # 若只輸入兩首歌則會尋找僅針對兩面的最優解，不考慮第三面
+    # 可輸入 2–6 首歌；只輸入兩首歌則只尋找兩面的最優解
     ("405119", "02"),  # 一生に夢が咲くように
     ("405121", "02"),  # ハートにQ
     ("405107", "02"),  # Shocking Party
 ]
 
+# 找不到所有歌曲的解時逐步減少歌曲數，最少保留的歌曲數
+MIN_SONGS = 2
+
 # 每首歌只保留得分排名前 N 名的卡組用於求解
 TOP_N = 5000
 
+# 無法證明結果為最佳時，每首歌自動擴充到的卡組數上限（不大於 TOP_N 時不擴充）
+MAX_TOP_N = 400000
+
+# 輸出總 Pt 前 K 名的組合
+TOP_K = 1
+
+# 搜尋執行緒數（None 表示使用 CPU 核心數）
+THREADS = 1
+
 # 禁止使用的卡牌（這些卡牌將不會出現在任何卡組中）
 FORBIDDEN_CARD = []
 
 # 是否在輸出中顯示卡牌名稱
 SHOWNAME = True
 
-# 角色名稱映射
-CHARACTER_NAMES = {
-    1011: "大賀美沙知",
-    1021: "乙宗梢",
-    1022: "夕霧綴理",
-    1023: "藤島慈",
-    1031: "日野下花帆",
-    1032: "村野さやか",
-    1033: "大沢瑠璃乃",
-    1041: "百生吟子",
-    1042: "徒町小鈴",
-    1043: "安養寺姫芽",
-    1051: "桂城泉",
-    1052: "セラス 柳田 リリエンフェルト",
-}
-
-
-def get_character_name(character_id: int) -> str:
-    """根據角色ID取得角色名稱"""
-    return CHARACTER_NAMES.get(character_id, f'Unknown({character_id})')
-
-
-def get_card_name(card_id: int) -> str:
-    """根據卡面ID取得卡面名稱"""
-    card_key = str(card_id)
-    if card_key in DB_CARDDATA:
-        return DB_CARDDATA[card_key].get('Name', f'Unknown({card_id})')
-    return f'Unknown({card_id})'
-
-
-def get_card_full_info(card_id: int) -> tuple[str, str]:
-    """
-    根據卡面ID取得角色名和卡面名
-
-    Returns:
-        (角色名, 卡面名) 元組
-    """
-    card_key = str(card_id)
-    if card_key in DB_CARDDATA:
-        card_data = DB_CARDDATA[card_key]
-        character_id = card_data.get('CharactersId')
-        character_name = get_character_name(character_id) if character_id else 'Unknown'
-        card_name = card_data.get('Name', f'Unknown({card_id})')
-        return character_name, card_name
-    return 'Unknown', f'Unknown({card_id})'
-
-
-def format_deck_with_names(deck_card_ids: list) -> str:
-    """格式化卡組，顯示ID和名稱"""
-    lines = []
-    for card_id in deck_card_ids:
-        character_name, card_name = get_card_full_info(card_id)
-        lines.append(f"      {card_id}: {character_name} - {card_name}")
-    return '\n'.join(lines)
-
-
-def get_song_title(music_id: str, music_db=None) -> str:
-    """根據歌曲ID取得歌名"""
-    try:
-        if music_db is None:
-            music_db = MusicDB()
-        music = music_db.get_music_by_id(music_id)
-        if music:
-            return music.Title
-    except Exception:
-        pass
-    return f'Unknown({music_id})'
-
 
 if __name__ == "__main__":
     fix_windows_console_encoding()
 
-    # 嘗試匯入 Cython 模組（從 cython 目錄）
+    # 嘗試匯入 Cython 模組（從 cython 目錄），未編譯時改用 NumPy 向量化版本
+    search_numpy = None
     try:
         sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'cython')))
         import optimizer_core
         logger.info("✓ Cython module loaded successfully")
     except ImportError as e:
-        logger.error("✗ Failed to import Cython module 'optimizer_core'")
-        logger.error(f"  Error: {e}")
-        logger.error("\n請先編譯 Cython 模組：")
-        logger.error("  python setup.py build_ext --inplace\n")
-        logger.error("如果編譯失敗，請確保已安裝：")
-        logger.error("  pip install cython")
-        logger.error("  並安裝 C 編譯器 (Windows: Visual Studio Build Tools, Linux: gcc)")
-        sys.exit(1)
+        optimizer_core = None
+        try:
+            from src.optimizer.numpy_search import search_numpy
+        except ImportError:
+            logger.error("✗ Failed to import Cython module 'optimizer_core'")
+            logger.error(f"  Error: {e}")
+            logger.error("\n請先編譯 Cython 模組：")
+            logger.error("  python setup.py build_ext --inplace\n")
+            logger.error("如果編譯失敗，請確保已安裝：")
+            logger.error("  pip install cython")
+            logger.error("  並安裝 C 編譯器 (Windows: Visual Studio Build Tools, Linux: gcc)")
+            logger.error("\n或安裝 NumPy 使用向量化版本：")
+            logger.error("  pip install numpy")
+            sys.exit(1)
+        logger.warning("✗ Failed to import Cython module 'optimizer_core'，改用 NumPy 向量化版本")
+        logger.warning(f"  Error: {e}")
+        logger.warning("  編譯 Cython 模組可進一步加速：python setup.py build_ext --inplace")
+    engine = "Cython" if optimizer_core is not None else "NumPy"
 
     # 解析命令列參數
     parser = argparse.ArgumentParser(description='多歌曲卡組最佳化求解器 (Cython 加速版)')
@@ -139,6 +97,10 @@ if __name__ == "__main__":
                        help='YAML配置檔案路徑（例如：config/member-alice.yaml）')
     parser.add_argument('--debug', action='store_true',
                        help='啟用偵錯模式，顯示詳細統計資訊')
+    parser.add_argument('--top-k', type=int, metavar='K',
+                       help='輸出總 Pt 前 K 名的組合（覆蓋配置檔的 optimizer.top_k）')
+    parser.add_argument('--threads', type=int, metavar='N',
+                       help='搜尋執行緒數，0 表示使用 CPU 核心數（覆蓋配置檔的 optimizer.threads）')
     args = parser.parse_args()
 
     start_time = time.time()
@@ -158,59 +120,64 @@ if __name__ == "__main__":
 
         # 讀取優化器配置
         TOP_N = config.get_optimizer_top_n()
+        MAX_TOP_N = config.get_optimizer_max_top_n()
+        TOP_K = config.get_optimizer_top_k()
+        THREADS = config.get_optimizer_threads()
         SHOWNAME = config.get_optimizer_show_names()
         FORBIDDEN_CARD = config.get_forbidden_cards()
-        logger.info(f"優化器配置: TOP_N={TOP_N}, SHOWNAME={SHOWNAME}, "
+        logger.info(f"優化器配置: TOP_N={TOP_N}, MAX_TOP_N={MAX_TOP_N}, TOP_K={TOP_K}, THREADS={THREADS}, SHOWNAME={SHOWNAME}, "
                    f"FORBIDDEN_CARD={FORBIDDEN_CARD if FORBIDDEN_CARD else '[]'}")
     except (ImportError, ValueError, FileNotFoundError) as e:
         LOG_DIR = "log"
         logger.info(f"配置管理器不可用或找不到配置檔 ({e})，使用預設 log 目錄: {LOG_DIR}")
-        logger.info(f"使用預設優化器配置: TOP_N={TOP_N}, SHOWNAME={SHOWNAME}, "
+        logger.info(f"使用預設優化器配置: TOP_N={TOP_N}, MAX_TOP_N={MAX_TOP_N}, TOP_K={TOP_K}, THREADS={THREADS}, SHOWNAME={SHOWNAME}, "
                    f"FORBIDDEN_CARD={FORBIDDEN_CARD if FORBIDDEN_CARD else '[]'}")
 
+    if args.top_k is not None:
+        TOP_K = args.top_k
+        logger.info(f"使用命令列指定的 TOP_K={TOP_K}")
+    if TOP_K < 1:
+        logger.error(f"TOP_K 必須 >= 1 (目前: {TOP_K})")
+        sys.exit(1)
+
+    if args.threads is not None:
+        THREADS = args.threads
+        logger.info(f"使用命令列指定的 THREADS={THREADS}")
+    THREADS = THREADS or os.cpu_count() or 1
+    if THREADS < 1:
+        logger.error(f"THREADS 必須 >= 1 (目前: {THREADS})")
+        sys.exit(1)
+    if optimizer_core is None and THREADS > 1:
+        logger.warning(f"NumPy 版本只使用單一執行緒，忽略 THREADS={THREADS}")
+
+    if not 2 <= len(CHALLENGE_SONGS) <= MAX_SONGS:
+        logger.error(f"CHALLENGE_SONGS 必須包含 2 至 {MAX_SONGS} 首歌 (目前: {len(CHALLENGE_SONGS)})")
+        sys.exit(1)
+
     level_files = []
     for music_id, difficulty in CHALLENGE_SONGS:
         level_files.append(os.path.join(LOG_DIR, f"simulation_results_{music_id}_{difficulty}.json"))
 
     # === 讀取與準備資料 ===
     logger.info("Preparing data...")
-    levels_raw = []
-    all_cards = set()
-
-    # 初始化一次 MusicDB 避免重複載入
-    try:
-        music_db = MusicDB()
-    except Exception:
-        music_db = None
-        logger.warning("Failed to load MusicDB, song titles will show as Unknown")
+    sources = []
 
     for i, f in enumerate(level_files):
-        with open(f, "r", encoding="utf-8") as fh:
-            data = json.load(fh)
-            total = len(data)
-            data.sort(key=lambda x: x["pt"], reverse=True)
-
-            # 過濾禁卡
-            if FORBIDDEN_CARD:
-                original_count = len(data)
-                data = [deck for deck in data if not any(cid in deck["deck_card_ids"] for cid in FORBIDDEN_CARD)]
-                filtered_count = len(data)
-                if original_count != filtered_count:
-                    logger.info(f"  Filtered {original_count - filtered_count} decks containing forbidden cards")
-
-            data = data[:TOP_N]
-            levels_raw.append(data)
-            for deck in data:
-                all_cards.update(deck["deck_card_ids"])
+        # 串流讀取，只保留 pt 前 TOP_N 名的非禁卡卡組；無法證明最佳時再擴充
+        source = TopResultSource(f, TOP_N, FORBIDDEN_CARD)
+        stats = source.stats
+        if stats["forbidden"]:
+            logger.info(f"  Filtered {stats['forbidden']} of {stats['scanned']} scanned decks containing forbidden cards")
+        sources.append(source)
         song_id, difficulty = CHALLENGE_SONGS[i]
-        song_title = get_song_title(song_id, music_db)
-        logger.info(f"Loaded top {TOP_N} of {total} results for {song_id}_{difficulty} ({song_title})")
+        song_title = get_song_title(song_id)
+        logger.info(f"Loaded top {TOP_N} of {stats['total']} results for {song_id}_{difficulty} ({song_title})")
 
     # 檢查是否有歌曲沒有可用卡組（禁卡後可能導致）
-    for i, data in enumerate(levels_raw):
-        if len(data) == 0:
+    for i, source in enumerate(sources):
+        if len(source.results) == 0:
             song_id, difficulty = CHALLENGE_SONGS[i]
-            song_title = get_song_title(song_id, music_db)
+            song_title = get_song_title(song_id)
             logger.error(f"警告: 歌曲 {song_id}_{difficulty} ({song_title}) 沒有可用的卡組")
             logger.error("可能原因:")
             logger.error("  1. 禁卡設定過於嚴格，過濾掉所有卡組")
@@ -218,168 +185,83 @@ if __name__ == "__main__":
             logger.error("  3. 模擬結果檔案損壞或格式錯誤")
             sys.exit(1)
 
-    # 僅針對兩首歌曲求解時，第三首歌填充假資料
-    if len(CHALLENGE_SONGS) == 2:
-        levels_raw.append([{
-            "deck_card_ids": [],
-            "score": 0,
-            "pt": 0
-        }])
-
-    # === 根據每關最高 Pt 重新排序（預設按大、小、中順序）===
-    # 保存原始歌曲順序，創建工作副本
-    original_songs = list(CHALLENGE_SONGS)
+    # 歌曲按原順序輸出，求解順序由 solve 按分支數決定
     working_songs = list(CHALLENGE_SONGS)
 
-    if len(working_songs) == 3:
-        best = [deck[0]["pt"] for deck in levels_raw]
-        i_max = max(range(3), key=lambda i: best[i])
-        i_min = min(range(3), key=lambda i: best[i])
-        i_mid = 3 - i_max - i_min
-        sorted_indices = [i_max, i_min, i_mid]
-        working_songs = [working_songs[i] for i in sorted_indices]
-        levels_raw = [levels_raw[i] for i in sorted_indices]
-        logger.info(f"Challenge songs reordered for optimization: {working_songs}")
-
-    # === 建立卡牌ID到bit位的映射 ===
-    card_to_bit = {cid: i for i, cid in enumerate(sorted(all_cards))}
+    # === 建立卡牌ID到bit位的映射，並轉換deck為bitmask ===
+    pool = LevelPool([source.results for source in sources])
+    card_to_bit = pool.card_to_bit
+    levels = pool.levels
     logger.info(f"Loaded {len(card_to_bit)} unique cards")
-    assert len(card_to_bit) <= 64, "卡牌種類超過64張時需使用更複雜的bitarray方案"
-    assert len(card_to_bit) >= 6 * len(working_songs), "可用卡牌過少，必定出現重複卡牌"
-
-    # === 轉換deck為bitmask ===
-    def deck_to_mask(deck):
-        mask = 0
-        for cid in deck["deck_card_ids"]:
-            mask |= 1 << card_to_bit[cid]
-        return mask
-
-    levels = []
-    for data in levels_raw:
-        decks = []
-        for i, deck in enumerate(data, start=1):
-            decks.append({
-                "mask": deck_to_mask(deck),
-                "rank": i,
-                "score": deck["score"],
-                "pt": deck["pt"],
-                "deck": deck["deck_card_ids"]
-            })
-        levels.append(decks)
-
-    logger.info("Starting Cython-optimized deck search...")
-    logger.info(f"Search space: {len(levels[0])} × {len(levels[1])} × {len(levels[2])} = {len(levels[0]) * len(levels[1]) * len(levels[2]):,} combinations")
+    max_cards = optimizer_core.MAX_CARDS if optimizer_core is not None else None
+    if max_cards is not None and len(card_to_bit) > max_cards:
+        logger.error(f"卡牌種類 ({len(card_to_bit)}) 超過 Cython 模組上限 {max_cards}，"
+                     f"請調大 cython/optimizer_core.pyx 的 MASK_WORDS 後重新編譯，或改用 multi_optimizer_2.py")
+        sys.exit(1)
+
+    logger.info(f"Starting {engine}-optimized deck search...")
+    search_space = 1
+    for decks in levels:
+        search_space *= len(decks)
+    logger.info(f"Search space: {' × '.join(str(len(decks)) for decks in levels)} = {search_space:,} combinations")
 
     # === 使用 Cython 核心搜尋 ===
+    from tqdm import tqdm
     search_start = time.time()
-
-    # 進度條回呼
-    pbar = tqdm(total=len(levels[0]), desc="Cython Search", unit="deck")
-
-    def progress_callback(current, total):
-        pbar.n = current
-        pbar.refresh()
-
-    if args.debug:
-        # 偵錯模式：使用帶統計的版本
-        result = optimizer_core.optimize_decks_debug(
-            levels[0],
-            levels[1],
-            levels[2]
-        )
-        pbar.close()
+    labels = [f"{song_id}_{difficulty}" for song_id, difficulty in working_songs]
+    # 偵錯模式求得的三首歌結果，None 時由 solve_until_proven 求解
+    best_combos = None
+    if optimizer_core is not None:
+        search = functools.partial(optimizer_core.optimize_songs_top_k, threads=THREADS)
+    else:
+        search = search_numpy
+
+    if args.debug and optimizer_core is None:
+        logger.warning("偵錯模式需要 Cython 模組，改用一般模式")
+    elif args.debug and len(working_songs) == 3:
+        # 偵錯模式：使用帶統計的版本（只求最佳組合）
+        if TOP_K > 1:
+            logger.warning(f"偵錯模式只輸出最佳組合，忽略 TOP_K={TOP_K}")
+        order = order_songs(levels)
+        logger.info(f"Search order: {[labels[s] for s in order]}")
+        result = optimizer_core.optimize_decks_debug(*[levels[s] for s in order])
 
         logger.info("\n=== Debug Statistics ===")
         logger.info(f"Total iterations: {result['iterations']:,}")
         logger.info(f"Conflicts detected: {result['conflicts']:,}")
         logger.info(f"Pruned combinations: {result['pruned']:,}")
 
-        best_pt = result["best_pt"]
-        if best_pt > 0:
-            i1, i2, i3 = result["deck1_idx"], result["deck2_idx"], result["deck3_idx"]
+        best_combos = []
+        if result["best_pt"] > 0:
+            combo = [None] * 3
+            for s, key in zip(order, ("deck1_idx", "deck2_idx", "deck3_idx")):
+                combo[s] = levels[s][result[key]]
+            best_combos = [(result["best_pt"], tuple(combo))]
+    elif args.debug:
+        logger.warning("偵錯模式只支援三首歌，改用一般模式")
+
+    # 正常模式：N 首歌分支定界，返回總 Pt 前 K 名並證明最佳
+    # 已載入的前 N 名中找不到組合時先擴充卡組，證明不可行或達到 MAX_TOP_N 後才逐步減少歌曲數
+    with tqdm(unit="deck") as pbar:
+        def progress_callback(current, total):
+            pbar.total = total
+            pbar.n = current
+            pbar.refresh()
+
+        best_combos, combo_song_count, unproven_bound = solve_until_proven(
+            pool, sources, len(working_songs), TOP_K, search, MAX_TOP_N, min_songs=MIN_SONGS,
+            max_cards=max_cards, callback=progress_callback, labels=labels, best=best_combos,
+            on_song_count=lambda n: pbar.set_description(f"{engine} Search ({n} songs)"))
+    if best_combos:
+        if unproven_bound is None:
+            logger.info("Optimality: proven for all decks (not only the loaded top N)")
         else:
-            i1, i2, i3 = -1, -1, -1
-    else:
-        # 正常模式：使用優化版本
-        result = optimizer_core.optimize_decks(
-            levels[0],
-            levels[1],
-            levels[2],
-            callback=progress_callback
-        )
-        pbar.close()
-
-        if result is None:
-            best_pt = -1
-        else:
-            best_pt, i1, i2, i3 = result
+            logger.warning(f"Optimality: not proven, a combination using unloaded decks may reach "
+                           f"{unproven_bound:,} total pt")
 
     search_end = time.time()
     search_time = search_end - search_start
-
-    # 追蹤使用的歌曲數量
-    combo_song_count = 3
-    best_combo = None
-
-    if best_pt > 0:
-        best_combo = (levels[0][i1], levels[1][i2], levels[2][i3])
-
-    # === 降級處理：如果找不到三首歌的解，嘗試兩首歌的組合 ===
-    if best_pt <= 0 and len(working_songs) == 3:
-        logger.warning("\n" + "=" * 60)
-        logger.warning("無法找到三首歌的有效組合，嘗試降級為兩首歌...")
-        logger.warning("=" * 60 + "\n")
-
-        # 嘗試所有兩兩組合 (0-1, 0-2, 1-2)
-        two_song_combinations = [(0, 1), (0, 2), (1, 2)]
-
-        for idx1, idx2 in two_song_combinations:
-            song1_id, song1_diff = working_songs[idx1]
-            song2_id, song2_diff = working_songs[idx2]
-            song1_title = get_song_title(song1_id, music_db)
-            song2_title = get_song_title(song2_id, music_db)
-
-            logger.info(f"嘗試組合 [{idx1+1}+{idx2+1}]:")
-            logger.info(f"  • Song {idx1+1}: {song1_title} ({song1_id})")
-            logger.info(f"  • Song {idx2+1}: {song2_title} ({song2_id})")
-
-            temp_best_pt = -1
-            temp_best_combo = None
-
-            for deck1 in tqdm(levels[idx1], desc=f"Searching {idx1+1}+{idx2+1}", leave=False):
-                mask1, pt1 = deck1["mask"], deck1["pt"]
-
-                # 剪枝
-                if temp_best_pt > 0 and pt1 + levels[idx2][0]["pt"] <= temp_best_pt:
-                    break
-
-                for deck2 in levels[idx2]:
-                    mask2, pt2 = deck2["mask"], deck2["pt"]
-
-                    # 檢查衝突
-                    if mask1 & mask2:
-                        continue
-
-                    total_pt = pt1 + pt2
-                    if total_pt > temp_best_pt:
-                        temp_best_pt = total_pt
-                        temp_best_combo = (idx1, deck1, idx2, deck2)
-                    else:
-                        break
-
-            # 更新全局最佳
-            if temp_best_pt > best_pt:
-                best_pt = temp_best_pt
-                # 將兩首歌的組合轉換為統一格式，第三首用 None 佔位
-                song1_idx, deck1, song2_idx, deck2 = temp_best_combo
-                if song1_idx == 0 and song2_idx == 1:
-                    best_combo = (deck1, deck2, None)
-                elif song1_idx == 0 and song2_idx == 2:
-                    best_combo = (deck1, None, deck2)
-                else:  # 1-2
-                    best_combo = (None, deck1, deck2)
-                combo_song_count = 2
-                logger.info(f"✓ 找到新的最佳兩首歌組合: {best_pt:,} pt\n")
+    best_pt = best_combos[0][0] if best_combos else -1
 
     end_time = time.time()
     total_time = end_time - start_time
@@ -389,25 +271,40 @@ if __name__ == "__main__":
 
     # === 輸出結果 ===
     output = []
-    if combo_song_count == 3:
-        output.append("=== Best Combination (3 Songs - Cython Optimized) ===")
+    if combo_song_count < len(working_songs):
+        songs_label = f"{combo_song_count} Songs - Downgraded - {engine}"
     else:
-        output.append("=== Best Combination (2 Songs - Downgraded - Cython) ===")
+        songs_label = f"{combo_song_count} Songs - {engine} Optimized"
+    if len(best_combos) > 1:
+        output.append(f"=== Top {len(best_combos)} Combinations ({songs_label}) ===")
+    else:
+        output.append(f"=== Best Combination ({songs_label}) ===")
     output.append("")
 
-    if best_pt > 0:
-        output.append(f"Total Pt: {best_pt:,}")
+    if best_combos:
+        if len(best_combos) == 1:
+            output.append(f"Total Pt: {best_pt:,}")
         output.append(f"Search Time: {search_time:.2f} seconds")
+        output.append(f"Decks Searched: {' / '.join(str(len(decks)) for decks in levels)}")
+        if unproven_bound is None:
+            output.append("Optimality: proven")
+        else:
+            output.append(f"Optimality: not proven (unloaded decks may reach {unproven_bound:,})")
         output.append("")
 
-        for i, d in enumerate(best_combo):
-            # 跳過 None（降級時未使用的歌曲）
-            if d is None:
-                continue
+        for rank, (total_pt, combo) in enumerate(best_combos, start=1):
+            if len(best_combos) > 1:
+                output.append(f"#{rank}")
+                output.append(f"Total Pt: {total_pt:,}")
+                output.append("")
+
+            for i, d in enumerate(combo):
+                # 跳過 None（降級時未使用的歌曲）
+                if d is None:
+                    continue
 
-            if i < len(working_songs):
                 song_id, difficulty = working_songs[i]
-                song_title = get_song_title(song_id, music_db)
+                song_title = get_song_title(song_id)
                 output.append(f"Song {i+1}: {song_id} (Difficulty: {difficulty}) - {song_title}")
                 output.append(f"  Score: {d['score']:,}")
                 output.append(f"  Pt: {d['pt']:,}  (Rank: #{d['rank']})")
@@ -421,14 +318,17 @@ if __name__ == "__main__":
         output = "\n".join(output)
         logger.info(f"\n{output}")
 
-        output_filename = "best_3_song_combo_cython.txt" if combo_song_count == 3 else "best_2_song_combo_cython.txt"
+        output_filename = f"best_{combo_song_count}_song_combo_cython.txt"
         with open(output_filename, "w", encoding="utf-8") as f:
             f.write(output)
             f.write("\n")
-        logger.info(f"Best combination saved to {output_filename}")
+        if len(best_combos) > 1:
+            logger.info(f"Top {len(best_combos)} combinations saved to {output_filename}")
+        else:
+            logger.info(f"Best combination saved to {output_filename}")
     else:
         logger.warning("=" * 60)
-        logger.warning("警告: 無法找到有效的卡組組合（已嘗試三首歌和兩首歌的所有組合）")
+        logger.warning(f"警告: 無法找到有效的卡組組合（已嘗試 {MIN_SONGS} 首歌以上的所有組合）")
         logger.warning("=" * 60)
         logger.warning("可能的原因:")
         logger.warning("  1. 禁卡設定過於嚴格，導致可用卡組不足")
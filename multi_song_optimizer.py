@@ -4,113 +4,18 @@ import os
 import time
 import sys
 import argparse
-from tqdm import tqdm
 
 
 from src.config.CardLevelConfig import fix_windows_console_encoding
-from src.core.Simulator_core import DB_CARDDATA
+from src.optimizer.disjoint_search import solve
+from src.utils.names import get_card_full_info, get_song_title
+from src.utils.result_stream import load_top_results
 
 
 # Set up logging for this script
 logger = logging.getLogger(__name__)
 
 
-# 角色名称映射
-CHARACTER_NAMES = {
-    1011: "大賀美沙知",
-    1021: "乙宗梢",
-    1022: "夕霧綴理",
-    1023: "藤島慈",
-    1031: "日野下花帆",
-    1032: "村野さやか",
-    1033: "大沢瑠璃乃",
-    1041: "百生吟子",
-    1042: "徒町小鈴",
-    1043: "安養寺姫芽",
-    1051: "桂城泉",
-    1052: "セラス 柳田 リリエンフェルト",
-}
-
-
-def get_character_name(character_id: int) -> str:
-    """
-    根据角色ID获取角色名称
-
-    Args:
-        character_id: 角色ID (例如 1031)
-
-    Returns:
-        角色名称，如果找不到则返回角色ID字符串
-    """
-    return CHARACTER_NAMES.get(character_id, f'Unknown({character_id})')
-
-
-def get_card_name(card_id: int) -> str:
-    """
-    根据卡面ID获取卡面名称
-
-    Args:
-        card_id: 卡面ID (例如 1031519)
-
-    Returns:
-        卡面名称，如果找不到则返回卡面ID字符串
-    """
-    card_key = str(card_id)
-    if card_key in DB_CARDDATA:
-        return DB_CARDDATA[card_key].get('Name', f'Unknown({card_id})')
-    return f'Unknown({card_id})'
-
-
-def get_card_full_info(card_id: int) -> tuple[str, str]:
-    """
-    根据卡面ID获取角色名和卡面名
-
-    Args:
-        card_id: 卡面ID (例如 1031519)
-
-    Returns:
-        (角色名, 卡面名) 元组
-    """
-    card_key = str(card_id)
-    if card_key in DB_CARDDATA:
-        card_data = DB_CARDDATA[card_key]
-        character_id = card_data.get('CharactersId')
-        character_name = get_character_name(character_id) if character_id else 'Unknown'
-        card_name = card_data.get('Name', f'Unknown({card_id})')
-        return character_name, card_name
-    return 'Unknown', f'Unknown({card_id})'
-
-
-def format_deck_with_names(deck_card_ids: list) -> str:
-    """
-    格式化卡组，显示ID和名称
-
-    Args:
-        deck_card_ids: 卡面ID列表
-
-    Returns:
-        格式化的字符串
-    """
-    lines = []
-    for card_id in deck_card_ids:
-        card_name = get_card_name(card_id)
-        lines.append(f"      {card_id}: {card_name}")
-    return '\n'.join(lines)
-
-
-def get_song_title(music_id: str) -> str:
-    """根据歌曲ID获取歌名"""
-    try:
-        from RChart import MusicDB
-        music_db = MusicDB()
-        music = music_db.get_music_by_id(music_id)
-        if music:
-            return music.Title
-    except Exception:
-        pass
-    return f'Unknown({music_id})'
-
-
 logging.basicConfig(
     level=logging.INFO,  # Adjust logging level as needed (e.g., INFO, DEBUG)
     format='%(asctime)s - %(levelname)s - %(message)s'
@@ -129,16 +34,12 @@ CHALLENGE_SONGS = [
 # 每首歌只保留得分排名前 N 名的卡组用于求解
 TOP_N_CANDIDATES = 5000
 
-# 仅根据每面最高分剪枝，不考虑重复卡
-# 三面分差较大时适用，小分差时很慢
-simple_pruning_mode = False
-
 
 def load_song_simulation_results_from_file(filename: str, music_id: str, difficulty: str) -> list[dict]:
     """
     Loads simulation results for a specific song and difficulty from a JSON file.
-    Deduplicates decks based on card composition (ignoring order) and keeps the highest score
-    for each unique composition. Then filters and returns the top N candidates.
+    Deduplicates decks based on card composition (ignoring order) and keeps the highest pt
+    for each unique composition. Then returns the top N candidates.
 
     Args:
         filename (str): The path to the JSON file.
@@ -155,41 +56,14 @@ def load_song_simulation_results_from_file(filename: str, music_id: str, difficu
         return []
 
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            raw_results = json.load(f)
-
-        # --- New Logic: Deduplicate and keep highest score for each unique card combination ---
-        unique_decks_best_pts = {}  # Key: tuple of sorted card IDs, Value: {'deck_card_ids': original_list, 'score': best_score}
-
-        for result in raw_results:
-            current_deck_card_ids = result['deck_card_ids']
-            current_score = result['score']
-            current_pt = result['pt']
-
-            # Create a standardized key for comparison (sorted tuple of card IDs)
-            # Ensure card IDs are integers for consistent sorting if they are not already
-            sorted_card_ids_tuple = tuple(sorted(map(int, current_deck_card_ids)))
-
-            if sorted_card_ids_tuple not in unique_decks_best_pts or \
-               current_pt > unique_decks_best_pts[sorted_card_ids_tuple]['pt']:
-                # If this is a new unique combination or we found a higher score for it
-                unique_decks_best_pts[sorted_card_ids_tuple] = {
-                    'deck_card_ids': current_deck_card_ids,
-                    'score': current_score,
-                    'pt': current_pt
-                }
-
-        # Convert the unique decks dictionary back to a list of results
-        processed_results = list(unique_decks_best_pts.values())
-        logger.info(f"Loaded {len(raw_results)} raw results for {music_id}-{difficulty}.")
-        logger.info(f"After deduplication, {len(processed_results)} unique deck compositions remain.")
-
-        # Sort results by score in descending order
-        processed_results.sort(key=lambda x: x['pt'], reverse=True)
-
-        # Return only the top N candidates
-        logger.info(f"Returning top {TOP_N_CANDIDATES} candidates for {music_id}-{difficulty}.")
-        return processed_results[:TOP_N_CANDIDATES]
+        # Stream the file and keep only the best TOP_N_CANDIDATES unique card combinations
+        # (ignoring order, highest pt wins), so memory stays O(N) regardless of the file size.
+        top_results, stats = load_top_results(filename, TOP_N_CANDIDATES, dedupe=True)
+        processed_results = [{'deck_card_ids': r['deck_card_ids'], 'score': r['score'], 'pt': r['pt']}
+                             for r in top_results]
+        logger.info(f"Loaded {stats['scanned']} of {stats['total']} raw results for {music_id}-{difficulty}.")
+        logger.info(f"Returning top {len(processed_results)} unique deck compositions for {music_id}-{difficulty}.")
+        return processed_results
 
     except json.JSONDecodeError as e:
         logger.error(f"Error decoding JSON from {filename}: {e}")
@@ -199,139 +73,59 @@ def load_song_simulation_results_from_file(filename: str, music_id: str, difficu
         return []
 
 
-# --- Core Optimization Logic (Backtracking) ---
-# Global variables to store the best result found during backtracking
-best_global_pt = -1
-best_global_decks = []  # Stores a list of {"song_id": ..., "deck_card_ids": [...], "score": ...} for the best combination
-
-
-def find_best_three_decks(
-    song_idx: int,
-    all_song_candidates: dict[str, list[dict]],
-    challenge_song_ids: list[str],
-    current_selected_decks_info: list[dict],
-    used_card_ids_set: set[int],
-    current_total_pt: int,
-):
+# --- Core Optimization Logic (Branch and Bound) ---
+def find_best_decks(all_song_candidates: dict[str, list[dict]], challenge_song_ids: list[str]) -> tuple[int, list[dict]]:
     """
-    Recursively searches for the best combination of three decks (one for each song)
-    such that no card ID is repeated across the three decks.
+    Searches for the best combination of decks (one for each song)
+    such that no card ID is repeated across the decks.
+
+    The search itself is done by src.optimizer.disjoint_search, which orders the songs,
+    prunes with conflict-aware upper bounds and tracks used cards as bitmasks.
 
     Args:
-        song_idx (int): The current song index being processed (0, 1, or 2).
-        all_song_candidates (dict): Dictionary mapping song_id to its list of candidate decks.
-        challenge_song_ids (list): An ordered list of the song IDs for the challenge.
-        current_selected_decks_info (list): List of dictionaries, each describing a deck
-                                            selected for previous songs in the current path.
-                                            Format: [{"song_id": ..., "deck_card_ids": [...], "score": ...}]
-        used_card_ids_set (set): A set of card IDs already used in current_selected_decks_info.
-        current_total_pt (float): The accumulated pt from decks in current_selected_decks_info.
-    """
-    global best_global_pt
-    global best_global_decks
-
-    # Base Case: All three songs have been assigned a deck
-    if song_idx == len(challenge_song_ids):  # Check if we've processed all songs
-        if current_total_pt > best_global_pt:
-            best_global_pt = current_total_pt
-            # Deep copy to store the current best combination
-            best_global_decks = list(current_selected_decks_info)
-            logger.info(f"New best total pt found: {best_global_pt}")
-            for i, deck_info in enumerate(best_global_decks):
-                logger.info(f"  Song {i+1} ({deck_info['music_id']}): ")
-                logger.info(f"    Pt: {deck_info['pt']:,}\tScore: {deck_info['score']:,}\tRank: {deck_info['rank']}")
-                logger.info(f"    Deck (ID): {deck_info['deck_card_ids']}")
-            # Optionally print the decks for the new best score
-            # for deck_info in best_global_decks:
-            #     logger.info(f"  Song {deck_info['music_id']}: Score {deck_info['score']:.2f}, Cards {deck_info['deck_card_ids']}")
-        return
-
-    current_song_id = challenge_song_ids[song_idx]
-    candidates_for_current_song = all_song_candidates.get(current_song_id, [])
-
-    if simple_pruning_mode:
-        # 切换到更简单的剪枝策略：
-        # 1. 只考虑剩余最高分，不排除卡牌冲突
-        # 2. 如果当前total_pt加上剩余最高分小于等于best_global_pt，立即剪枝
-        # 在三面分数相差较大时很快，分数接近时基本无效
-        remaining_max_pt_estimate = 0
-        for i in range(song_idx, len(challenge_song_ids)):
-            next_song_id = challenge_song_ids[i]
-            remaining_max_pt_estimate += all_song_candidates[next_song_id][0]['pt']
-
-        if current_total_pt + remaining_max_pt_estimate <= best_global_pt and best_global_pt != -1:
-            return
+        all_song_candidates (dict): Dictionary mapping song key to its list of candidate decks.
+        challenge_song_ids (list): An ordered list of the song keys for the challenge.
 
-    else:
-        # Pruning: 基于可用卡牌池的动态剪枝
-        remaining_max_pt_estimate = 0
-        # 模拟剩下的歌曲
-        for i in range(song_idx, len(challenge_song_ids)):
-            next_song_id = challenge_song_ids[i]
-
-            # 在all_song_candidates中寻找与当前used_card_ids_set无冲突的最高分卡组
-            # 这是一个关键的内层循环，可能会带来一些开销，但比无意义的递归要少
-            found_candidate_pt = 0
-            for candidate in all_song_candidates.get(next_song_id, []):
-                deck_card_ids = candidate['deck_card_ids']
-                has_conflict = False
-                for card_id in deck_card_ids:
-                    if card_id in used_card_ids_set:
-                        has_conflict = True
-                        break
-
-                if not has_conflict:
-                    # 找到第一个无冲突的最高分卡组
-                    found_candidate_pt = candidate['pt']
-                    break
-
-            remaining_max_pt_estimate += found_candidate_pt
-
-        # 如果当前路径即使加上所有无冲突的最高分也无法超越全局最佳，则剪枝
-        if best_global_pt != -1 and current_total_pt + remaining_max_pt_estimate <= best_global_pt:
-            return
-
-    iterable = candidates_for_current_song
-    if song_idx == 0:
-        iterable = tqdm(candidates_for_current_song, desc=f"Searching decks for {current_song_id}", unit="deck")
-
-    for index, candidate_deck_info in enumerate(iterable):
-        deck_card_ids = candidate_deck_info['deck_card_ids']
-        deck_score = candidate_deck_info['score']
-        deck_pt = candidate_deck_info['pt']
-
-        # Check for card conflicts
-        has_conflict = False
-        for card_id in deck_card_ids:
-            if card_id in used_card_ids_set:
-                has_conflict = True
-                break
-
-        if not has_conflict:
-            # If no conflict, make the choice
-            new_used_card_ids_set = used_card_ids_set.union(set(deck_card_ids))
-            new_selected_decks_info = current_selected_decks_info + [{
-                "music_id": current_song_id,
-                "difficulty": CHALLENGE_SONGS[song_idx][1],  # Get difficulty from CHALLENGE_SONGS
-                "deck_card_ids": deck_card_ids,
-                "score": deck_score,
-                "pt": deck_pt,
-                "rank": index + 1
-            }]
-            new_total_pt = current_total_pt + deck_pt
-
-            # Recurse
-            find_best_three_decks(
-                song_idx + 1,
-                all_song_candidates,
-                challenge_song_ids,
-                new_selected_decks_info,
-                new_used_card_ids_set,
-                new_total_pt
-            )
-            # No explicit 'backtrack' needed here for the list and set as we create new ones
-            # for each recursive call. This simplifies the code but might use more memory
-            # for very deep recursion with many branches. For 3 songs, it's fine.
+    Returns:
+        (best total pt, list of deck info dicts), or (-1, []) if no valid combination exists.
+    """
+    all_cards = sorted({card_id for candidates in all_song_candidates.values()
+                        for candidate in candidates for card_id in candidate['deck_card_ids']})
+    card_to_bit = {card_id: i for i, card_id in enumerate(all_cards)}
+
+    levels = []
+    for song_key in challenge_song_ids:
+        decks = []
+        for index, candidate in enumerate(all_song_candidates[song_key]):
+            mask = 0
+            for card_id in candidate['deck_card_ids']:
+                mask |= 1 << card_to_bit[card_id]
+            decks.append({**candidate, "mask": mask, "rank": index + 1})
+        levels.append(decks)
+
+    from tqdm import tqdm
+    with tqdm(desc="Searching decks", unit="deck") as pbar:
+        def progress_callback(current, total):
+            pbar.total = total
+            pbar.n = current
+            pbar.refresh()
+
+        results = solve(levels, callback=progress_callback, labels=challenge_song_ids)
+    if not results:
+        return -1, []
+
+    best_pt, combo = results[0]
+    best_decks = []
+    for song_idx, (song_key, deck) in enumerate(zip(challenge_song_ids, combo)):
+        best_decks.append({
+            "music_id": song_key,
+            "difficulty": CHALLENGE_SONGS[song_idx][1],  # Get difficulty from CHALLENGE_SONGS
+            "deck_card_ids": deck['deck_card_ids'],
+            "score": deck['score'],
+            "pt": deck['pt'],
+            "rank": deck['rank']
+        })
+    return best_pt, best_decks
 
 
 # --- Main Execution Block ---
@@ -384,23 +178,9 @@ if __name__ == "__main__":
 
     logger.info(f"Loaded candidates for {len(all_song_candidates_data)} songs.")
 
-    # Step 2: Initiate the backtracking search
-    logger.info("Starting backtracking search for best 3-deck combination...")
-    challenge_song_ids_ordered.sort(key=lambda song_key: all_song_candidates_data[song_key][0]['pt'], reverse=True)
-    logger.info(f"Challenge songs reordered for optimization: {challenge_song_ids_ordered}")
-
-    # Initialize global bests
-    best_global_pt = -1
-    best_global_decks = []
-
-    find_best_three_decks(
-        song_idx=0,
-        all_song_candidates=all_song_candidates_data,
-        challenge_song_ids=challenge_song_ids_ordered,
-        current_selected_decks_info=[],
-        used_card_ids_set=set(),
-        current_total_pt=0
-    )
+    # Step 2: Run the branch-and-bound search
+    logger.info(f"Starting branch-and-bound search for best {len(challenge_song_ids_ordered)}-deck combination...")
+    best_global_pt, best_global_decks = find_best_decks(all_song_candidates_data, challenge_song_ids_ordered)
 
     end_time = time.time()
     logger.info("--- Multi-song optimization completed! ---")
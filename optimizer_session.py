@@ -0,0 +1,159 @@
+"""
+多歌曲卡組最佳化求解器 - 互動工作階段
+
+每首歌的候選卡組只在第一次用到時載入，之後調整禁卡、替換歌曲或 TOP_K 時
+直接在記憶體中篩選並重新搜尋，不必重新讀取結果檔（見 src/optimizer/session.py）。
+
+使用方法：
+    python optimizer_session.py
+    python optimizer_session.py --config config/member-alice.yaml --songs 405119:02 405121:02 405107:02
+
+指令（每行一個，修改設定後自動重新求解；也可以從檔案或管線輸入）：
+    songs 405119:02 405121:02 405107:02   設定歌曲
+    swap 2 405107:02                      替換第 2 首歌
+    forbid 1011501 1052506                加入禁卡
+    allow 1011501                         移除禁卡
+    topk 5                                輸出總 Pt 前 5 名
+    run                                   以目前設定重新求解
+    show                                  顯示目前設定
+    quit                                  結束
+"""
+import argparse
+import functools
+import logging
+import os
+import sys
+import time
+
+from src.config.CardLevelConfig import fix_windows_console_encoding
+from src.optimizer.disjoint_search import MAX_SONGS, search_disjoint
+from src.optimizer.session import OptimizerSession
+
+logger = logging.getLogger(__name__)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(message)s'
+)
+
+# 預設求解歌曲，格式: ("歌曲ID", "難度")
+CHALLENGE_SONGS = [
+    ("405119", "02"),
+    ("405121", "02"),
+    ("405107", "02"),
+]
+
+# 找不到所有歌曲的解時逐步減少歌曲數，最少保留的歌曲數
+MIN_SONGS = 2
+
+
+def load_search_engine(threads: int):
+    """依序嘗試 Cython、NumPy、純 Python 搜尋核心，返回 (名稱, search, 卡牌種類上限)"""
+    try:
+        sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'cython')))
+        import optimizer_core
+        return "Cython", functools.partial(optimizer_core.optimize_songs_top_k, threads=threads), optimizer_core.MAX_CARDS
+    except ImportError:
+        pass
+    try:
+        from src.optimizer.numpy_search import search_numpy
+        return "NumPy", search_numpy, None
+    except ImportError:
+        return "Python", search_disjoint, None
+
+
+def parse_song(text: str) -> tuple[str, str]:
+    """解析 "歌曲ID:難度"（難度預設 02）"""
+    music_id, _, difficulty = text.partition(":")
+    return music_id, difficulty or "02"
+
+
+def print_result(result: dict, songs: list[tuple], elapsed: float):
+    """輸出一次查詢的結果"""
+    combos = result["combos"]
+    if not combos:
+        logger.warning(f"無法找到 {MIN_SONGS} 首歌以上的有效組合")
+        return
+    label = f"{result['song_count']} Songs"
+    if result["song_count"] < len(songs):
+        label += " - Downgraded"
+    optimality = "proven" if result["bound"] is None else f"not proven (unloaded decks may reach {result['bound']:,})"
+    logger.info(f"=== Top {len(combos)} ({label}) - {elapsed:.2f} seconds ===")
+    logger.info(f"Decks Searched: {' / '.join(str(n) for n in result['decks'])}, Optimality: {optimality}")
+    for rank, (total_pt, combo) in enumerate(combos, start=1):
+        logger.info(f"#{rank} Total Pt: {total_pt:,}")
+        for (music_id, difficulty), d in zip(songs, combo):
+            if d is not None:
+                logger.info(f"  {music_id}_{difficulty}: Pt {d['pt']:,} (Rank #{d['rank']})  {d['deck']}")
+
+
+if __name__ == "__main__":
+    fix_windows_console_encoding()
+
+    parser = argparse.ArgumentParser(description='多歌曲卡組最佳化求解器 - 互動工作階段')
+    parser.add_argument('--config', type=str, metavar='CONFIG_FILE',
+                        help='YAML配置檔案路徑（例如：config/member-alice.yaml）')
+    parser.add_argument('--songs', nargs='+', metavar='ID:DIFF', help='初始歌曲（預設為 CHALLENGE_SONGS）')
+    parser.add_argument('--top-k', type=int, metavar='K', help='輸出總 Pt 前 K 名的組合')
+    parser.add_argument('--threads', type=int, metavar='N', help='Cython 搜尋執行緒數，0 表示使用 CPU 核心數')
+    args = parser.parse_args()
+
+    from src.config.config_manager import get_config
+    config = get_config(args.config) if args.config else get_config()
+    top_k = args.top_k if args.top_k is not None else config.get_optimizer_top_k()
+    threads = args.threads if args.threads is not None else config.get_optimizer_threads()
+    threads = threads or os.cpu_count() or 1
+    forbidden = set(config.get_forbidden_cards())
+    songs = [parse_song(s) for s in args.songs] if args.songs else list(CHALLENGE_SONGS)
+
+    engine, search, max_cards = load_search_engine(threads)
+    session = OptimizerSession(config.get_log_dir(), config.get_optimizer_top_n(), config.get_optimizer_max_top_n(),
+                               search, max_cards=max_cards, min_songs=MIN_SONGS)
+    logger.info(f"Engine: {engine}, TOP_N={session.top_n}, MAX_TOP_N={session.max_top_n}, TOP_K={top_k}")
+
+    def run():
+        if not 2 <= len(songs) <= MAX_SONGS:
+            logger.error(f"歌曲數必須介於 2 與 {MAX_SONGS} 之間 (目前: {len(songs)})")
+            return
+        start = time.time()
+        try:
+            result = session.query(songs, forbidden, top_k)
+        except (FileNotFoundError, ValueError) as e:
+            logger.error(str(e))
+            return
+        print_result(result, songs, time.time() - start)
+
+    run()
+    interactive = sys.stdin.isatty()
+    while True:
+        if interactive:
+            print("> ", end="", flush=True)
+        line = sys.stdin.readline()
+        if not line:
+            break
+        command, *params = line.split() or [""]
+        try:
+            if command in ("quit", "exit"):
+                break
+            elif command == "songs":
+                songs = [parse_song(p) for p in params]
+            elif command == "swap":
+                songs[int(params[0]) - 1] = parse_song(params[1])
+            elif command == "forbid":
+                forbidden.update(int(p) for p in params)
+            elif command == "allow":
+                forbidden.difference_update(int(p) for p in params)
+            elif command == "topk":
+                top_k = max(1, int(params[0]))
+            elif command == "show":
+                logger.info(f"Songs: {[f'{m}_{d}' for m, d in songs]}, TOP_K={top_k}, "
+                            f"Forbidden: {sorted(forbidden) if forbidden else '[]'}")
+                continue
+            elif command != "run":
+                if command:
+                    logger.warning(f"未知指令: {command}（可用: songs, swap, forbid, allow, topk, run, show, quit）")
+                continue
+        except (IndexError, ValueError):
+            logger.warning(f"指令格式錯誤: {line.strip()}")
+            continue
+        run()
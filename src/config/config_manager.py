@@ -30,10 +30,52 @@ class ConfigManager:
     # 優化器預設配置
     DEFAULT_OPTIMIZER_CONFIG = {
         "top_n": 50000,
+        "max_top_n": 400000,
+        "top_k": 1,
+        "threads": 1,
         "show_card_names": True,
         "forbidden_cards": []
     }
 
+    # 代理模型篩選預設配置 (src/deck_gen/SurrogateScreen.py)
+    DEFAULT_SURROGATE_CONFIG = {
+        "enabled": False,
+        "top_k": 1000,
+        "margin": 0.05,
+        "warmup": 2000,
+        "refresh_interval": 1000,
+        "training_log_dir": None,
+        "max_samples_per_song": 20000,
+        "epochs": 5,
+        "l2": 1e-4,
+        "learning_rate": 0.02,
+        "seed": 0,
+    }
+
+    # 模擬退火搜索預設配置 (src/deck_gen/DeckSearch.py，MainBatch.py --search anneal)
+    DEFAULT_SEARCH_CONFIG = {
+        "chains": None,
+        "steps": 2000,
+        "t_start": 0.02,
+        "t_end": 0.0005,
+        "seed": 0,
+    }
+
+    # 出牌順序搜索預設配置 (src/deck_gen/OrderSearch.py，MainBatch.py --search order)
+    DEFAULT_ORDER_SEARCH_CONFIG = {
+        "max_evals": 40,
+        "random_seeds": 2,
+        "seed": 0,
+    }
+
+    # 吞吐量監測預設配置 (src/utils/telemetry.py，MainBatch.py)
+    DEFAULT_TELEMETRY_CONFIG = {
+        "enabled": False,
+        "interval": 10,
+        "jsonl_path": None,
+        "prometheus_path": None,
+    }
+
     def __init__(self, config_file: Optional[str] = None):
         """
         初始化配置管理器
@@ -222,7 +264,7 @@ class ConfigManager:
         會將使用者配置與預設配置合併，確保所有欄位都存在
 
         Returns:
-            包含 top_n, show_card_names, forbidden_cards 的字典
+            包含 top_n, max_top_n, top_k, threads, show_card_names, forbidden_cards 的字典
         """
         user_config = self.config.get("optimizer", {})
         if user_config is None:
@@ -234,6 +276,50 @@ class ConfigManager:
         
         return merged_config
 
+    def get_surrogate_config(self) -> Dict[str, Any]:
+        """
+        獲取代理模型篩選配置 (用於 MainBatch.py)
+
+        向下兼容：沒有 surrogate 區塊時返回預設值（停用）
+        """
+        user_config = self.config.get("surrogate", {}) or {}
+        merged_config = self.DEFAULT_SURROGATE_CONFIG.copy()
+        merged_config.update(user_config)
+        return merged_config
+
+    def get_search_config(self) -> Dict[str, Any]:
+        """
+        獲取模擬退火搜索配置 (用於 MainBatch.py --search anneal)
+
+        向下兼容：沒有 search 區塊時返回預設值
+        """
+        user_config = self.config.get("search", {}) or {}
+        merged_config = self.DEFAULT_SEARCH_CONFIG.copy()
+        merged_config.update(user_config)
+        return merged_config
+
+    def get_order_search_config(self) -> Dict[str, Any]:
+        """
+        獲取出牌順序搜索配置 (用於 MainBatch.py --search order)
+
+        向下兼容：沒有 order_search 區塊時返回預設值
+        """
+        user_config = self.config.get("order_search", {}) or {}
+        merged_config = self.DEFAULT_ORDER_SEARCH_CONFIG.copy()
+        merged_config.update(user_config)
+        return merged_config
+
+    def get_telemetry_config(self) -> Dict[str, Any]:
+        """
+        獲取吞吐量監測配置 (用於 MainBatch.py)
+
+        向下兼容：沒有 telemetry 區塊時返回預設值（停用）
+        """
+        user_config = self.config.get("telemetry", {}) or {}
+        merged_config = self.DEFAULT_TELEMETRY_CONFIG.copy()
+        merged_config.update(user_config)
+        return merged_config
+
     def get_forbidden_cards(self) -> List[int]:
         """
         獲取禁用卡牌列表
@@ -250,6 +336,30 @@ class ConfigManager:
         """
         return self.get_optimizer_config()["top_n"]
 
+    def get_optimizer_max_top_n(self) -> int:
+        """
+        獲取無法證明結果為最佳時，每首歌自動擴充到的卡組數上限
+
+        向下兼容：預設 400000；不大於 top_n 時不擴充
+        """
+        return self.get_optimizer_config()["max_top_n"]
+
+    def get_optimizer_top_k(self) -> int:
+        """
+        獲取優化器輸出的組合數量（前 K 名）
+
+        向下兼容：預設 1（只輸出最佳組合）
+        """
+        return self.get_optimizer_config()["top_k"]
+
+    def get_optimizer_threads(self) -> Optional[int]:
+        """
+        獲取 Cython 優化器的搜尋執行緒數 (None 表示使用 CPU 核心數)
+
+        向下兼容：預設 1（單執行緒）
+        """
+        return self.get_optimizer_config()["threads"]
+
     def get_optimizer_show_names(self) -> bool:
         """
         獲取是否顯示卡牌名稱
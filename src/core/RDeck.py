@@ -1,10 +1,11 @@
 import logging
 import os
 from .RSkill import *
-from copy import copy
 from math import ceil
 from enum import Enum
 from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
@@ -62,6 +63,7 @@ def _interpolate_value(curve, lv):
     return curve[-1][1]
 
 
+@lru_cache(maxsize=None)
 def _get_card_status(rarity: Rarity, lv: int) -> tuple[float, float, int]:
     status = _interpolate_value(STATUS_CURVES[rarity], lv)
     hp = _interpolate_value(HP_CURVES[rarity], lv)
@@ -77,37 +79,128 @@ def _get_evolution(rarity: Rarity, lv: int) -> int:
     return stages[-1][1]
 
 
-def cardobj_cache(cls):
-    cache: dict[int, Card] = {}
+# 未指定练度时的 [卡牌等级, C位技能等级, 技能等级]
+DEFAULT_LEVELS = (140, 14, 14)
+
+
+@dataclass(frozen=True, slots=True)
+class CardSpec:
+    """
+    卡牌在一组练度下不变的数据（三围、HP、技能费用与技能），由 CardSpecTable 编译一次后共用
+    技能对象只读；模拟中会改变的状态在 Card 上
+    """
+    index: int
+    card_id: str
+    levels: tuple[int, int, int]
+    full_name: str
+    characters_id: int
+    smile: int
+    pure: int
+    cool: int
+    mental: int
+    cost: int
+    center_attribute: CenterAttribute
+    center_skill: CenterSkill
+    skill_unit: Skill
+
+
+class CardSpecTable:
+    """
+    按 (卡牌ID, 卡牌等级, C位技能等级, 技能等级) 编号的 CardSpec 表
+    同一张卡在不同练度下是不同的 spec；specs[i].index == i
+    """
+
+    def __init__(self, db_card, db_skill):
+        self.db_card = db_card
+        self.db_skill = db_skill
+        self.specs: list[CardSpec] = []
+        self._index: dict[tuple, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.specs)
+
+    def index_of(self, series_id, lv_list=None) -> int:
+        """返回卡牌在该练度下的 spec 编号，第一次出现时编译"""
+        key = (int(series_id), DEFAULT_LEVELS if lv_list is None else tuple(lv_list))
+        index = self._index.get(key)
+        if index is None:
+            index = self._index[key] = len(self.specs)
+            self.specs.append(self._compile(index, *key))
+        return index
+
+    def get(self, series_id, lv_list=None) -> CardSpec:
+        return self.specs[self.index_of(series_id, lv_list)]
+
+    def compile(self, deck_card_data) -> int:
+        """
+        预先编译 [(卡牌ID, 练度), ...] 的所有 spec（MainBatch 在建立行程池前调用，子行程直接共用）
+
+        Returns:
+            表中的 spec 数
+        """
+        for series_id, lv_list in deck_card_data:
+            self.index_of(series_id, lv_list)
+        return len(self.specs)
+
+    def _compile(self, index: int, series_id: int, levels: tuple) -> CardSpec:
+        card_id = str(series_id)
+        data = self.db_card[card_id]
+        status_norm, hp_norm, evo = _get_card_status(Rarity(data["Rarity"]), levels[0])
+        skill_unit = Skill(self.db_skill, int(f"3{card_id[1:]}{evo}"), levels[2])
+        return CardSpec(
+            index=index,
+            card_id=card_id,
+            levels=levels,
+            full_name=f"[{data['Name']}] {data['Description']}".replace('\xa0', ' '),
+            characters_id=data["CharactersId"],
+            smile=ceil(data["MaxSmile"][-3] * status_norm / 100),
+            pure=ceil(data["MaxPure"][-3] * status_norm / 100),
+            cool=ceil(data["MaxCool"][-3] * status_norm / 100),
+            mental=ceil(data["MaxMental"][-3] * hp_norm / 100),
+            cost=skill_unit.cost,
+            center_attribute=CenterAttribute(self.db_skill, data["CenterAttributeSeriesId"]),
+            center_skill=CenterSkill(self.db_skill, data["CenterSkillSeriesId"], levels[1]),
+            skill_unit=skill_unit,
+        )
+
+
+_SPEC_TABLES: dict[tuple[int, int], CardSpecTable] = {}
 
-    def wrapper(*args, **kwargs):
-        key = args[2]  # 仅检查卡牌id
-        if key not in cache:
-            cache[key] = cls(*args, **kwargs)
-        return copy(cache[key])
-    return wrapper
+
+def card_spec_table(db_card, db_skill) -> CardSpecTable:
+    """同一组卡牌、技能数据库共用的 CardSpecTable（表中保留数据库的引用）"""
+    key = (id(db_card), id(db_skill))
+    table = _SPEC_TABLES.get(key)
+    if table is None:
+        table = _SPEC_TABLES[key] = CardSpecTable(db_card, db_skill)
+    return table
 
 
-@cardobj_cache
 class Card():
+    """模拟中的一张卡：引用 CardSpec，并保存会被 C位特性与技能改变的状态"""
+    __slots__ = ("spec", "card_id", "full_name", "characters_id", "card_level", "smile", "pure", "cool", "mental",
+                 "center_attribute", "center_skill", "skill_unit", "cost", "active_count", "is_except")
+
     def __init__(self, db_card, db_skill, series_id, lv_list=None):
-        if lv_list == None:
-            lv_list = [140, 14, 14]
-        self.card_id: str = f"{series_id}"
-        self.full_name: str = f"[{db_card[self.card_id]['Name']}] {db_card[self.card_id]['Description']}".replace('\xa0', ' ')
-        self.characters_id: int = db_card[self.card_id]["CharactersId"]
-        self.card_level: int = lv_list[0]
-
-        self.smile: int
-        self.pure: int
-        self.cool: int
-        self.mental: int
-
-        evo = self._init_status(db_card)
-        self.center_attribute: CenterAttribute = CenterAttribute(db_skill, db_card[self.card_id]["CenterAttributeSeriesId"])
-        self.center_skill: CenterSkill = CenterSkill(db_skill, db_card[self.card_id]["CenterSkillSeriesId"], lv_list[1])
-        self.skill_unit: Skill = Skill(db_skill, int(f"3{self.card_id[1:]}{evo}"), lv_list[2])
-        self.cost: int = self.skill_unit.cost
+        spec = card_spec_table(db_card, db_skill).get(series_id, lv_list)
+        self.spec: CardSpec = spec
+        self.card_id: str = spec.card_id
+        self.full_name: str = spec.full_name
+        self.characters_id: int = spec.characters_id
+        self.card_level: int = spec.levels[0]
+        self.center_attribute: CenterAttribute = spec.center_attribute
+        self.center_skill: CenterSkill = spec.center_skill
+        self.skill_unit: Skill = spec.skill_unit
+        self.reset()
+
+    def reset(self):
+        """恢复模拟前的状态（C位特性改变的三围、技能费用、打出次数、除外），供重用卡牌对象"""
+        spec = self.spec
+        self.smile: int = spec.smile
+        self.pure: int = spec.pure
+        self.cool: int = spec.cool
+        self.mental: int = spec.mental
+        self.cost: int = spec.cost
         self.active_count: int = 0
         self.is_except: bool = False
 
@@ -125,15 +218,6 @@ class Card():
             # f"Cost: {self.cost}\n{self.skill_unit}"
         )
 
-    def _init_status(self, db_card):
-        rarity = Rarity(db_card[self.card_id]["Rarity"])
-        status_norm, hp_norm, evo = _get_card_status(rarity, self.card_level)
-        self.smile = ceil(db_card[self.card_id]["MaxSmile"][-3] * status_norm / 100)
-        self.pure = ceil(db_card[self.card_id]["MaxPure"][-3] * status_norm / 100)
-        self.cool = ceil(db_card[self.card_id]["MaxCool"][-3] * status_norm / 100)
-        self.mental = ceil(db_card[self.card_id]["MaxMental"][-3] * hp_norm / 100)
-        return evo
-
     def get_skill(self):
         self.active_count += 1
         return self.skill_unit.condition, self.skill_unit.effect
@@ -149,13 +233,20 @@ class Card():
 
 
 class Deck():
+    __slots__ = ("cards", "queue", "appeal", "card_log")
+
     def __init__(self, db_card, db_skill, card_info: list) -> None:
-        self.cards: list[Card] = []
         self.queue: deque[Card] = deque()
+        self.load([Card(db_card, db_skill, card[0], card[1]) for card in card_info])
+
+    def load(self, cards: list) -> None:
+        """
+        换上一组卡牌并恢复初始状态，供重用卡组对象
+        card_log 每次换成新的列表（模拟结果会引用它）
+        """
+        self.cards: list[Card] = cards
         self.appeal: int = 0
         self.card_log: list[str] = []
-        for card in card_info:
-            self.cards.append(Card(db_card, db_skill, card[0], card[1]))
         self.reset()
 
     def reset(self):
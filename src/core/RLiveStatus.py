@@ -2,6 +2,7 @@ import logging
 from functools import lru_cache
 from platform import python_implementation
 from .RDeck import Deck
+from . import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +29,7 @@ class Voltage:
     N <= 20时，达到 N 级总共需要的点数为 5 * N * (N + 1)。
     N >= 20时，固定为每200 Pt一级。
     """
+    __slots__ = ("_current_points", "_current_level", "level", "bonus", "fever")
 
     def __init__(self, initial_points: int = 0):
         self._current_points = 0  # 内部存储实际点数
@@ -39,6 +41,14 @@ class Voltage:
         # 设置初始点数并计算初始等级
         self.set_points(initial_points)
 
+    def reset(self):
+        """恢复为 0 Pt、非 Fever 的初始状态（与 Voltage(0) 相同），供重用对象"""
+        self._current_points = 0
+        self._current_level = 0
+        self.level = 0
+        self.bonus = 1.0
+        self.fever = False
+
     # 辅助函数：计算达到某个等级所需的总点数
     # 使用 lru_cache 装饰器进行结果缓存
     @staticmethod
@@ -77,9 +87,8 @@ class Voltage:
             self.level *= 2
         self.bonus = (self.level + 10) / 10
 
-        if logger.isEnabledFor(logging.DEBUG):
-            if old_level != self.level:
-                logger.debug(f"  Voltage等级变化: 从 Lv.{old_level} -> Lv.{self.level}")
+        if old_level != self.level and tracing.TRACER is not None:
+            tracing.TRACER.voltage_level_changed(old_level, self.level, self._current_points)
 
     def add_points(self, amount: int):
         """
@@ -93,9 +102,6 @@ class Voltage:
             self._current_points = 0
         self._update_level()
 
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.debug(f"  VoltagePt {'+' if amount >= 0 else '-'}{abs(amount)} 点 (当前: {self._current_points} Pt)")
-
     def set_points(self, new_points: int):
         """
         直接设置 Voltage 点数，并自动更新等级。
@@ -103,10 +109,7 @@ class Voltage:
         if not isinstance(new_points, int) or new_points < 0:
             raise ValueError("设置的 VoltagePt 必须是非负整数。")
 
-        old_points = self._current_points
         self._current_points = new_points
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.debug(f"  VoltagePt 从 {old_points} -> {self._current_points} 点")
         self._update_level()
 
     def get_points(self) -> int:
@@ -135,7 +138,13 @@ class MentalDown(Exception):
 
 
 class Mental:
+    __slots__ = ("current_hp", "max_hp", "badMinus", "missMinus", "traceMinus")
+
     def __init__(self) -> None:
+        self.reset()
+
+    def reset(self):
+        """恢复 set_hp 之前的初始值，供重用对象"""
         self.current_hp: int = 100
         self.max_hp: int = 100
         self.badMinus: int = 30
@@ -181,26 +190,40 @@ class PlayerAttributes:
     """
     模拟游戏中的玩家属性
     """
+    __slots__ = ("ap", "cooldown", "ap_rate", "combo", "ap_gain_rate", "voltage_gain_rate", "mental", "score",
+                 "voltage", "next_score_gain_rate", "next_voltage_gain_rate", "CDavailable", "deck", "masterlv",
+                 "base_score", "note_score", "half_ap_plus", "full_ap_plus", "tracer")
 
     def __init__(self, masterlv=1):
+        self.mental = Mental()
+        self.voltage = Voltage(0)
+        self.next_score_gain_rate = []
+        self.next_voltage_gain_rate = []
+        self.deck: Deck
+        self.base_score: float
+        self.half_ap_plus: float
+        self.full_ap_plus: float
+        self.reset(masterlv)
+
+    def reset(self, masterlv=1):
+        """
+        恢复初始状态，供重用对象（mental、voltage 与加成列表就地重设）
+        """
         self.ap = 0            # 初始AP
         self.cooldown = 5.0     # 初始技能冷却时间
         self.ap_rate = 1
         self.combo = 0
         self.ap_gain_rate = 100
         self.voltage_gain_rate = 100
-        self.mental = Mental()
+        self.mental.reset()
         self.score = 0
-        self.voltage = Voltage(0)
-        self.next_score_gain_rate = []
-        self.next_voltage_gain_rate = []
+        self.voltage.reset()
+        self.next_score_gain_rate.clear()
+        self.next_voltage_gain_rate.clear()
         self.CDavailable = False
-        self.deck: Deck
         self.masterlv: int = masterlv
-        self.base_score: float
         self.note_score: dict = dict()
-        self.half_ap_plus: float
-        self.full_ap_plus: float
+        self.tracer = tracing.TRACER  # 建立或重設時附加的追蹤器 (src/core/tracing.py)
 
     def __str__(self) -> str:
         return (
@@ -283,6 +306,8 @@ class PlayerAttributes:
                 self.mental.sub(judgement, note_type)
                 if judgement == "BAD":  # 只有BAD计分，MISS不计分
                     self.score_note(judgement)
+        if self.tracer is not None:
+            self.tracer.note_judged(judgement, note_type, self)
 
 
 if __name__ == "__main__":
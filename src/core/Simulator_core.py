@@ -1,10 +1,13 @@
 import logging
 import os
+from platform import python_implementation
+from time import perf_counter
 # 导入所有 R 模块和 db_load 函数
 from .RCardData import db_load
 from .RChart import Chart, MusicDB
-from .RDeck import Deck
+from .RDeck import Card, Deck, card_spec_table
 from .RLiveStatus import PlayerAttributes
+from . import profiling, tracing
 from .SkillResolver import UseCardSkill, ApplyCenterSkillEffect, ApplyCenterAttribute, CheckCenterSkillCondition
 from ..config.CardLevelConfig import DEATH_NOTE
 
@@ -39,8 +42,90 @@ MISS_TIMING = {
 }
 
 
+class StatePool:
+    """
+    每個行程重用的模擬狀態物件
+
+    連續的模擬依序使用同一組 Deck / PlayerAttributes / 事件堆積，卡牌物件按 CardSpec 編號（卡牌 ID + 練度）各保留一份，
+    acquire 時就地重設（卡組 6 張卡，與譜面長度無關），不再為每個任務重新建立與複製。
+    模擬結果只引用 card_log（每次換新）與字串、數值，重用不影響已返回的結果。
+    行程池的子行程各自擁有一份（fork 後互不影響）；不可在多個執行緒中同時模擬。
+    """
+
+    def __init__(self, db_card: dict, db_skill: dict):
+        self.db_card = db_card
+        self.db_skill = db_skill
+        self.specs = card_spec_table(db_card, db_skill)
+        self.cards = {}
+        self.deck = Deck(db_card, db_skill, [])
+        self.player = PlayerAttributes()
+        self.extra_events = []
+
+    def _card(self, series_id, lv_list, in_use: list):
+        index = self.specs.index_of(series_id, lv_list)
+        card = self.cards.get(index)
+        if card is None:
+            card = self.cards[index] = Card(self.db_card, self.db_skill, series_id, lv_list)
+        elif card in in_use:
+            # 同一卡組中重複的卡需要各自的狀態
+            return Card(self.db_card, self.db_skill, series_id, lv_list)
+        else:
+            card.reset()
+        return card
+
+    def acquire(self, deck_card_data, player_master_level: int) -> tuple[Deck, PlayerAttributes, list]:
+        """返回重設後的 (卡組, 玩家狀態, 空的事件堆積)"""
+        cards = []
+        for series_id, lv_list in deck_card_data:
+            cards.append(self._card(series_id, lv_list, cards))
+        self.deck.load(cards)
+        self.player.reset(player_master_level)
+        self.player.set_deck(self.deck)
+        self.extra_events.clear()
+        return self.deck, self.player, self.extra_events
+
+
+_STATE_POOL: StatePool = None
+
+
+def state_pool() -> StatePool:
+    """本行程的 StatePool，第一次呼叫時建立"""
+    global _STATE_POOL
+    if _STATE_POOL is None:
+        _STATE_POOL = StatePool(DB_CARDDATA, DB_SKILL)
+    return _STATE_POOL
+
+
+def compile_card_specs(deck_card_data) -> int:
+    """
+    預先編譯 [(卡牌ID, 練度), ...] 的 CardSpec，在建立行程池前呼叫時子行程直接共用
+
+    資料庫中沒有的卡牌跳過（與之前相同，在模擬時才報錯）
+
+    Returns:
+        已編譯的 spec 數
+    """
+    missing = [series_id for series_id, _ in deck_card_data if str(series_id) not in DB_CARDDATA]
+    if missing:
+        logger.warning(f"CardDatas 中沒有這些卡牌，略過預先編譯: {missing}")
+    return card_spec_table(DB_CARDDATA, DB_SKILL).compile(
+        (series_id, lv_list) for series_id, lv_list in deck_card_data if str(series_id) in DB_CARDDATA)
+
+
+def prepare_chart(chart: Chart) -> Chart:
+    """
+    把譜面事件的時間轉為 float 供 run_game_simulation 使用（PyPy 下另轉為 SortedList）
+    """
+    chart.ChartEvents = [(float(t), e) for t, e in chart.ChartEvents]
+    if python_implementation() == "PyPy":
+        from sortedcontainers import SortedList
+        chart.ChartEvents = SortedList(chart.ChartEvents)
+    return chart
+
+
 def run_game_simulation(
-    task_args: tuple  # This will be (deck_card_data, chart_obj, player_master_level, original_deck_index)
+    task_args: tuple,  # This will be (deck_card_data, chart_obj, player_master_level, original_deck_index)
+    trace: list = None
 ) -> dict:
     """
     Runs a single game simulation and includes the original deck index in the result.
@@ -52,6 +137,9 @@ def run_game_simulation(
             Example: [(1011501, [120, 1, 12]), ...]
         chart_obj (Chart): The music chart to simulate (e.g., Chart(MUSIC_DB, "103105", "02").
         player_master_level (int): The player's master level. 1 ~ 50.
+        trace (list): 若提供，每處理一個事件前記錄 (時間, 事件, 分數, AP, 血量, Voltage點數)，
+            結束時再記錄一筆 (None, "End", ...)，供一致性測試定位第一個分歧的事件；
+            未提供且已附加追蹤器 (src/core/tracing.py) 時，由追蹤器接收
 
     Returns:
         dict: A dictionary containing key simulation results (e.g., final score, card log).
@@ -61,10 +149,18 @@ def run_game_simulation(
     # and inherited by child processes (copy-on-write).
     deck_card_data, chart_obj, player_master_level, original_deck_index, deck_card_ids, center_card_index = task_args
 
-    d = Deck(DB_CARDDATA, DB_SKILL, deck_card_data)
+    prof = profiling.PROFILE
+    clock = None
+    if prof is not None:
+        sim_start = perf_counter()
+        if trace is None:
+            # 以 trace 介面計時每個事件，不在模擬迴圈中另加判斷
+            trace = clock = prof.event_clock()
+    if trace is None and tracing.TRACER is not None:
+        trace = tracing.TRACER
+
+    d, player, extra_events = state_pool().acquire(deck_card_data, player_master_level)
     c: Chart = chart_obj
-    player = PlayerAttributes(masterlv=player_master_level)
-    player.set_deck(d)
 
     centercard = None
     afk_mental = 0
@@ -120,7 +216,7 @@ def run_game_simulation(
     # Use pre-sorted chart events + heap for dynamic events
     import heapq
     chart_events = c.ChartEvents  # Pre-sorted list (read-only)
-    extra_events = list()         # Heap for dynamic events
+    # extra_events: heap for dynamic events (reused, empty)
     heapq.heappush(extra_events, (player.cooldown, "CDavailable"))
 
     i_event = 0
@@ -133,6 +229,8 @@ def run_game_simulation(
     def recalculate_afk_mental():
         """重新檢查牌組中未除外的卡片，計算當前血線"""
         nonlocal afk_mental
+        if prof is not None:
+            prof.afk_recalcs += 1
         new_afk_mental = 0
         for card in d.cards:
             # 只檢查未被除外的卡片
@@ -150,13 +248,15 @@ def run_game_simulation(
     def try_use_skill():
         nonlocal cardnow, afk_mental
         if cardnow and player.ap >= cardnow.cost:
+            if prof is not None:
+                skill_start = perf_counter()
             player.ap -= cardnow.cost
 
             # 記錄打出前是否有卡片被除外
             cards_except_before = [card for card in d.cards if card.is_except]
 
             conditions, effects = d.topskill()
-            UseCardSkill(player, effects, conditions, cardnow)
+            UseCardSkill(player, effects, conditions, cardnow, prof)
 
             # 檢查是否有新的卡片被除外
             cards_except_after = [card for card in d.cards if card.is_except]
@@ -168,6 +268,9 @@ def run_game_simulation(
             cdtime_float = timestamp + player.cooldown
             heapq.heappush(extra_events, (cdtime_float, "CDavailable"))
             cardnow = d.topcard()
+            if prof is not None:
+                prof.skill_plays += 1
+                prof.skill_time += perf_counter() - skill_start
 
     while i_event < chart_length or extra_events:
         # Choose the earliest event from either queue
@@ -177,6 +280,10 @@ def run_game_simulation(
         else:
             timestamp, event = heapq.heappop(extra_events)
 
+        if trace is not None:
+            trace.append((timestamp, event, player.score, player.ap, player.mental.current_hp,
+                          player.voltage._current_points))
+
         match event:
             case "Single" | "Hold" | "HoldMid" | "Flick" | "Trace":
                 combo_count += 1
@@ -191,7 +298,7 @@ def run_game_simulation(
 
                     if will_die:
                         # 如果 MISS 會導致遊戲結束，改為 PERFECT
-                        player.combo_add("PERFECT")
+                        player.combo_add("PERFECT", event)
                     else:
                         # 需要仰卧起坐时，将 MISS 时机按判定窗口延后以提高精度
                         if flag_hanabi_ginko:
@@ -199,7 +306,7 @@ def run_game_simulation(
                         else:
                             player.combo_add("MISS", event)
                 else:
-                    player.combo_add("PERFECT+")
+                    player.combo_add("PERFECT+", event)
 
                 if player.CDavailable:
                     try_use_skill()
@@ -209,9 +316,9 @@ def run_game_simulation(
                 try_use_skill()
 
             case event if event[0] == "_":
+                # 延遲的 MISS（花火吟子模式）
+                note_type = event[1:]
                 if player.mental.get_rate() > afk_mental:
-                    # 延遲的 MISS（花火吟子模式）
-                    note_type = event[1:]
                     if note_type == "Trace" or note_type == "HoldMid":
                         miss_damage = player.mental.traceMinus
                     else:
@@ -221,19 +328,24 @@ def run_game_simulation(
 
                     if will_die:
                         # 如果 MISS 會導致遊戲結束，改為 PERFECT
-                        player.combo_add("PERFECT")
+                        player.combo_add("PERFECT", note_type)
                     else:
                         player.combo_add("MISS", note_type)
                 else:
-                    player.combo_add("PERFECT+")
+                    player.combo_add("PERFECT+", note_type)
 
             case "LiveStart" | "LiveEnd" | "FeverStart":
                 if event == "FeverStart":
                     player.voltage.set_fever(True)
                 if centercard is not None:
+                    if prof is not None:
+                        center_start = perf_counter()
                     for condition, effect in centercard.get_center_skill():
                         if CheckCenterSkillCondition(player, condition, centercard, event):
                             ApplyCenterSkillEffect(player, effect)
+                    if prof is not None:
+                        prof.center_checks += 1
+                        prof.center_time += perf_counter() - center_start
                 if event == "LiveEnd":
                     break
 
@@ -242,6 +354,17 @@ def run_game_simulation(
             case _:
                 pass
 
+    if trace is not None:
+        trace.append((None, "End", player.score, player.ap, player.mental.current_hp,
+                      player.voltage._current_points))
+    if prof is not None:
+        prof.simulations += 1
+        prof.total_time += perf_counter() - sim_start
+        if clock is not None:
+            # 非譜面事件都來自堆積；LiveEnd 提前結束時堆積中可能還有未取出的事件
+            heap_pops = clock.processed - i_event
+            prof.heap_pop += heap_pops
+            prof.heap_push += heap_pops + len(extra_events)
     return {
         "final_score": player.score,
         "cards_played_log": d.card_log,
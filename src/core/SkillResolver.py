@@ -1,8 +1,10 @@
 import logging
 from enum import Enum
 from functools import lru_cache
+from time import perf_counter
 from .RLiveStatus import *
 from .RDeck import Card
+from . import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -42,11 +44,10 @@ def CheckTarget(target_id: str, card: Card = None):
     # 使用缓存加速重复检查
     cache_key = (target_id, card.characters_id if card else None)
     if cache_key in _target_check_cache:
+        if tracing.TRACER is not None:
+            _trace_target(target_id, card, _target_check_cache[cache_key])
         return _target_check_cache[cache_key]
 
-    if logger.isEnabledFor(logging.DEBUG):
-        logger.debug(f"\n--- 检查C位特性目标ID: {target_id} ---")
-
     # 所有目标ID都是5位数字
     if len(target_id) != 5:
         logger.error(f"  错误: 目标ID '{target_id}' 长度不符合已知规则 (应为5位)。 -> 不满足")
@@ -61,29 +62,20 @@ def CheckTarget(target_id: str, card: Card = None):
         _target_check_cache[cache_key] = False
         return False
 
-    if logger.isEnabledFor(logging.DEBUG):
-        logger.debug(f"  解析结果: 目标类型={target_type.name}, 数值={target_value}")
-
     is_satisfied = False
 
     match target_type:
         case TargetType.Member:
             if card.characters_id == target_value:
                 is_satisfied = True
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(f"  条件: 指定成员 -> {'满足' if is_satisfied else '不满足'} {card.full_name}")
 
         case TargetType.Unit:
             if card.characters_id in UNIT_DICT[target_value]:
                 is_satisfied = True
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(f"  条件: 指定小组 -> {'满足' if is_satisfied else '不满足'} {card.full_name}")
 
         case TargetType.Generation:
             if str(card.characters_id).startswith(str(target_value)):
                 is_satisfied = True
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(f"  条件: 指定期数 -> {'满足' if is_satisfied else '不满足'} {card.full_name}")
 
         case TargetType.StyleType:
             # 暂无实装此条件的卡牌
@@ -96,9 +88,19 @@ def CheckTarget(target_id: str, card: Card = None):
             logger.error(f"  未知条件类型: {target_type.name} ({target_id})。 -> 不满足")
 
     _target_check_cache[cache_key] = is_satisfied
+    if tracing.TRACER is not None:
+        _trace_target(target_id, card, is_satisfied)
     return is_satisfied
 
 
+def _trace_target(target_id: str, card: Card, is_satisfied: bool):
+    try:
+        condition = (TargetType(int(target_id[0])), None, int(target_id[1:]))
+    except (ValueError, IndexError):
+        condition = None
+    tracing.TRACER.condition_evaluated("target", target_id, is_satisfied, condition, card=card)
+
+
 def CheckMultiTarget(target_id: str, card=None):
     # 如果没有逗号，直接检查单个目标，避免split
     if ',' not in target_id:
@@ -128,6 +130,12 @@ class CenterAttributeEffectType(Enum):
     APRateChangeResetGuard = 13
 
 
+# 數值直接以 ValueData 表示的 C 位特性（其餘以 1/100 % 或 1/100 秒表示）
+_RAW_VALUE_ATTRIBUTES = {CenterAttributeEffectType.SmileValueChange, CenterAttributeEffectType.PureValueChange,
+                         CenterAttributeEffectType.CoolValueChange, CenterAttributeEffectType.MentalValueChange,
+                         CenterAttributeEffectType.ConsumeAPChange}
+
+
 def ApplyCenterAttribute(player_attrs: PlayerAttributes, effect_id: int, target: str = None):
     """
     根据EffectsID解析并应用C位特性。
@@ -136,8 +144,6 @@ def ApplyCenterAttribute(player_attrs: PlayerAttributes, effect_id: int, target:
         effect_id (int): C位特性效果的ID。
         target (str)
     """
-    if logger.isEnabledFor(logging.DEBUG):
-        logger.debug(f"\n--- 解析效果ID: {effect_id} ---")
 
     # 预先筛选符合目标条件的卡牌，避免重复检查
     if target:
@@ -161,9 +167,6 @@ def ApplyCenterAttribute(player_attrs: PlayerAttributes, effect_id: int, target:
         logger.error(f"错误: 效果ID '{effect_id}' 长度不符合已知规则 (8或9位)。")
         return
 
-    if logger.isEnabledFor(logging.DEBUG):
-        logger.debug(f"  解析结果: 类型编号={enum_base_value}, 方向={change_direction}, 数值={value_data}")
-
     # 根据解析结果应用效果
     try:
         effect_type = CenterAttributeEffectType(enum_base_value)
@@ -180,112 +183,77 @@ def ApplyCenterAttribute(player_attrs: PlayerAttributes, effect_id: int, target:
             multiplier = 1 + change_amount
             for card in target_cards:
                 card.smile *= multiplier
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "增加" if change_direction == 0 else "减少"
-                logger.debug(f"  对满足要求的目标应用效果: Smile值 {action} {change_amount*100:.0f}%")
 
         case CenterAttributeEffectType.PureRateChange:
             change_amount = value_data / 10000.0
             multiplier = 1 + change_amount
             for card in target_cards:
                 card.pure *= multiplier
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "增加" if change_direction == 0 else "减少"
-                logger.debug(f"  对满足要求的目标应用效果: Pure值 {action} {change_amount*100:.0f}%")
 
         case CenterAttributeEffectType.CoolRateChange:
             change_amount = value_data / 10000.0
             multiplier = 1 + change_amount
             for card in target_cards:
                 card.cool *= multiplier
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "增加" if change_direction == 0 else "减少"
-                logger.debug(f"  对满足要求的目标应用效果: Cool值 {action} {change_amount*100:.0f}%")
 
         case CenterAttributeEffectType.SmileValueChange:
             # 暂未实装，占位代码
             value_change = value_data * change_sign
             for card in target_cards:
                 card.smile += value_change
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "增加" if change_direction == 0 else "减少"
-                logger.debug(f"  对满足要求的目标应用效果: Smile值 {action} {value_data}")
 
         case CenterAttributeEffectType.PureValueChange:
             # 暂未实装，占位代码
             value_change = value_data * change_sign
             for card in target_cards:
                 card.pure += value_change
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "增加" if change_direction == 0 else "减少"
-                logger.debug(f"  对满足要求的目标应用效果: Pure值 {action} {value_data}")
 
         case CenterAttributeEffectType.CoolValueChange:
             # 暂未实装，占位代码
             value_change = value_data * change_sign
             for card in target_cards:
                 card.cool += value_change
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "增加" if change_direction == 0 else "减少"
-                logger.debug(f"  对满足要求的目标应用效果: Cool值 {action} {value_data}")
 
         case CenterAttributeEffectType.MentalRateChange:
             change_amount = value_data / 10000.0
             multiplier = 1 + change_amount * change_sign
             for card in target_cards:
                 card.mental = ceil(card.mental * multiplier)
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "增加" if change_direction == 0 else "减少"
-                logger.debug(f"  对满足要求的目标应用效果: 血量 {action} {change_amount*100:.0f}%")
 
         case CenterAttributeEffectType.MentalValueChange:
             value_change = value_data * change_sign
             for card in target_cards:
                 card.mental += value_change
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "增加" if change_direction == 0 else "减少"
-                logger.debug(f"  对满足要求的目标应用效果: 血量 {action} {value_data}")
 
         case CenterAttributeEffectType.ConsumeAPChange:
             value_change = value_data * change_sign
             for card in target_cards:
                 card.cost_change(value_change)
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "增加" if change_direction == 0 else "减少"
-                logger.debug(f"  对满足要求的目标应用效果: AP消耗 {action} {value_data}")
 
         case CenterAttributeEffectType.CoolTimeChange:
             change_amount_seconds = value_data / 100.0
             player_attrs.cooldown += change_amount_seconds * change_sign
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "增加" if change_direction == 0 else "减少"
-                logger.debug(f"  应用效果: 技能CD {action} {change_amount_seconds:.0f}s")
 
         case CenterAttributeEffectType.APGainRateChange:
             change_amount = value_data / 100.0
             player_attrs.ap_gain_rate += change_amount * change_sign
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "增加" if change_direction == 0 else "减少"
-                logger.debug(f"  应用效果: AP Gain Rate {action} {change_amount:.2f}%")
 
         case CenterAttributeEffectType.VoltageGainRateChange:
             change_amount = value_data / 100.0
             player_attrs.voltage_gain_rate += change_amount * change_sign
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "增加" if change_direction == 0 else "减少"
-                logger.debug(f"  应用效果: Voltage Gain Rate {action} {change_amount:.2f}%")
 
         case CenterAttributeEffectType.APRateChangeResetGuard:
             # 暂未实装，占位代码
             change_amount = value_data / 100.0
             player_attrs.ap_rate += change_amount * change_sign
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "增加" if change_direction == 0 else "减少"
-                logger.debug(f"  应用效果: APRateChangeResetGuard {action} {change_amount:.2f}%")
 
         case _:
             logger.error(f"  未知效果类型: {effect_type.name} ({enum_base_value})")
 
+    if tracing.TRACER is not None:
+        value = value_data if effect_type in _RAW_VALUE_ATTRIBUTES else value_data / 100
+        tracing.TRACER.effect_applied("attribute", effect_type, change_direction, value, player_attrs)
+
 
 class SkillConditionType(Enum):
     """
@@ -343,8 +311,8 @@ def CheckSkillCondition(player_attrs: PlayerAttributes, condition_id: str, card:
 
     # 特殊ID "0" 表示无条件，总是满足
     if condition_id == "0":
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.debug("  条件: 无条件 -> 满足")
+        if tracing.TRACER is not None:
+            tracing.TRACER.condition_evaluated("skill", condition_id, True)
         return True
 
     # 处理多个条件（AND 逻辑）
@@ -356,32 +324,25 @@ def CheckSkillCondition(player_attrs: PlayerAttributes, condition_id: str, card:
             if not CheckSkillCondition(player_attrs, cond, card):
                 result = False
                 break
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.debug(f"  多条件 AND 检查 [{condition_id}] -> {'满足' if result else '不满足'}")
         return result
 
     condition_type, operator_or_flag, condition_value = parse_condition_id(condition_id)
 
     is_satisfied = False
+    current_value = None
 
     match condition_type:
         case SkillConditionType.FeverTime:
             is_satisfied = player_attrs.voltage.fever
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(f"  条件: Fever 中 -> {'满足' if is_satisfied else '不满足'}")
 
         case SkillConditionType.VoltageLevel:
             # 获取 Voltage 对象的当前等级进行比较
-            current_level = player_attrs.voltage.level
+            current_value = player_attrs.voltage.level
 
             if operator_or_flag == SkillComparisonOperator.ABOVE_OR_EQUAL:  # >=
-                is_satisfied = (current_level >= condition_value)
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"  条件: Voltage Lv. >= {condition_value} (当前: Lv.{current_level}) -> {'满足' if is_satisfied else '不满足'}")
+                is_satisfied = (current_value >= condition_value)
             elif operator_or_flag == SkillComparisonOperator.BELOW_OR_EQUAL:  # <
-                is_satisfied = (current_level <= condition_value)
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"  条件: Voltage Lv. <= {condition_value} (当前: Lv.{current_level}) -> {'满足' if is_satisfied else '不满足'}")
+                is_satisfied = (current_value <= condition_value)
             else:
                 logger.error(f"  错误: 未知的 VoltageLevel 运算符 '{operator_or_flag}'。 -> 不满足")
 
@@ -392,12 +353,8 @@ def CheckSkillCondition(player_attrs: PlayerAttributes, condition_id: str, card:
 
             if operator_or_flag == SkillComparisonOperator.ABOVE_OR_EQUAL:  # >=
                 is_satisfied = (current_value >= required_rate)
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"  条件: HP >= {required_rate:.2f}% (当前: {current_value:.2f}%) -> {'满足' if is_satisfied else '不满足'}")
             elif operator_or_flag == SkillComparisonOperator.BELOW_OR_EQUAL:  # <
                 is_satisfied = (current_value <= required_rate)
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"  条件: HP <= {required_rate:.2f}% (当前: {current_value:.2f}%) -> {'满足' if is_satisfied else '不满足'}")
             else:
                 logger.error(f"  错误: 未知的 MentalRate 运算符 '{operator_or_flag}'。 -> 不满足")
 
@@ -407,12 +364,8 @@ def CheckSkillCondition(player_attrs: PlayerAttributes, condition_id: str, card:
 
             if operator_or_flag == SkillComparisonOperator.ABOVE_OR_EQUAL:  # >=
                 is_satisfied = (current_value >= condition_value)
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"  条件: 合计技能次数 >= {condition_value} (当前: {current_value}) -> {'满足' if is_satisfied else '不满足'}")
             elif operator_or_flag == SkillComparisonOperator.BELOW_OR_EQUAL:  # <
                 is_satisfied = (current_value <= condition_value)
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"  条件: 合计技能次数 <= {condition_value} (当前: {current_value}) -> {'满足' if is_satisfied else '不满足'}")
             else:
                 logger.error(f"  错误: 未知的 UsedAllSkillCount 运算符 '{operator_or_flag}'。 -> 不满足")
 
@@ -422,18 +375,17 @@ def CheckSkillCondition(player_attrs: PlayerAttributes, condition_id: str, card:
 
             if operator_or_flag == SkillComparisonOperator.ABOVE_OR_EQUAL:  # >=
                 is_satisfied = (current_value >= condition_value)
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"  条件: 卡牌 {card.full_name} 使用次数 >= {condition_value} (当前: {current_value}) -> {'满足' if is_satisfied else '不满足'}")
             elif operator_or_flag == SkillComparisonOperator.BELOW_OR_EQUAL:  # <=
                 is_satisfied = (current_value <= condition_value)
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"  条件: 卡牌 {card.full_name} 使用次数 <= {condition_value} (当前: {current_value}) -> {'满足' if is_satisfied else '不满足'}")
             else:
                 logger.error(f"  错误: 未知的 UsedSkillCount 运算符 '{operator_or_flag}'。 -> 不满足")
 
         case _:
             logger.error(f"  未知条件类型: {condition_type.name} ({condition_id})。 -> 不满足")
 
+    if tracing.TRACER is not None:
+        tracing.TRACER.condition_evaluated("skill", condition_id, is_satisfied,
+                                           (condition_type, operator_or_flag, condition_value), current_value, card)
     return is_satisfied
 
 
@@ -522,22 +474,14 @@ def ApplySkillEffect(player_attrs: PlayerAttributes, effect_id: int, card: Card
             else:
                 ap_amount = value_data * change_factor / 10000.0
             player_attrs.ap = max(0, player_attrs.ap + ap_amount)
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "恢复" if change_direction == 0 else "消耗"  # AP is typically recovered
-                logger.debug(f"  应用效果: AP {action} {ap_amount:.1f} 点")
 
         case SkillEffectType.ScoreGain:
             # Direct score gain, value is a percentage (e.g., 122.85% -> 12285). Divide by 100.0
             score_rate = 100
             if player_attrs.next_score_gain_rate:
                 score_rate += player_attrs.next_score_gain_rate.pop(0)
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"分加成: * {score_rate:.2f}%")
             result = value_data * score_rate / 1000000
             player_attrs.score_add(result)
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "获得" if change_direction == 0 else "减少"
-                logger.debug(f"  应用效果: {action} Appeal值 {value_data / 100:.2f}% 的得分")
 
         case SkillEffectType.VoltagePointChange:
             # Voltage point change, value is direct points
@@ -545,29 +489,19 @@ def ApplySkillEffect(player_attrs: PlayerAttributes, effect_id: int, card: Card
             if change_factor == 1:
                 if player_attrs.next_voltage_gain_rate:
                     voltage_rate += player_attrs.next_voltage_gain_rate.pop(0)
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(f"电加成: * {voltage_rate:.2f}%")
                 result = ceil(value_data * voltage_rate / 100)
             else:
                 result = -1 * value_data
             player_attrs.voltage.add_points(result)
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "增加" if change_direction == 0 else "减少"
-                logger.debug(f"  应用效果: Voltage Pt {action} {value_data} 点")
 
         case SkillEffectType.MentalRateChange:
             # MentalRateChange here is HP change, value is a percentage (e.g., 20.00% -> 2000). Divide by 100.0
             hp_percent = value_data / 100.0
             player_attrs.mental.skill_add(hp_percent * change_factor)
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "恢复" if change_direction == 0 else "扣除"
-                logger.debug(f"  应用效果: HP {action} {hp_percent:.2f}%")
 
         case SkillEffectType.DeckReset:
             # Deck reset, this is an action, typically no numerical value
             player_attrs.deck.reset()
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(f"  应用效果: 重置牌库")
 
         case SkillEffectType.CardExcept:
             card.is_except = True
@@ -578,8 +512,6 @@ def ApplySkillEffect(player_attrs: PlayerAttributes, effect_id: int, card: Card
                 if deckcard.is_except:
                     del player_attrs.deck.queue[index]
                     break
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(f"  应用效果: 卡牌除外: {card.full_name}")
 
         case SkillEffectType.NextAPGainRateChange:
             bonus_percent = value_data / 100.0
@@ -588,8 +520,6 @@ def ApplySkillEffect(player_attrs: PlayerAttributes, effect_id: int, card: Card
                     player_attrs.next_score_gain_rate[i] += bonus_percent
                 else:
                     player_attrs.next_score_gain_rate.append(bonus_percent)
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(f"  应用效果: 分加成 {bonus_percent:.2f}% ({usage_count} 次)")
 
         case SkillEffectType.NextVoltageGainRateChange:
             bonus_percent = value_data / 100.0
@@ -598,22 +528,41 @@ def ApplySkillEffect(player_attrs: PlayerAttributes, effect_id: int, card: Card
                     player_attrs.next_voltage_gain_rate[i] += bonus_percent
                 else:
                     player_attrs.next_voltage_gain_rate.append(bonus_percent)
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(f"  应用效果: 电加成 {bonus_percent:.2f}% ({usage_count} 次)")
 
         case _:
             logger.error(f"  未知技能效果类型: {effect_type.name} ({effect_id})")
-    if logger.isEnabledFor(logging.DEBUG):
-        logger.debug(player_attrs)
+
+    if tracing.TRACER is not None:
+        if effect_type is SkillEffectType.APChange:
+            value = abs(ap_amount)
+        elif effect_type is SkillEffectType.VoltagePointChange:
+            value = value_data
+        else:
+            value = value_data / 100
+        tracing.TRACER.effect_applied("skill", effect_type, change_direction, value, player_attrs, card, usage_count)
 
 
-def UseCardSkill(player_attrs: PlayerAttributes, effects: list = None, conditions: list = None, card: Card = None):
+def UseCardSkill(player_attrs: PlayerAttributes, effects: list = None, conditions: list = None, card: Card = None,
+                 profile=None):
+    """
+    profile: 若提供 (src/core/profiling.SimProfile)，記錄每種技能效果的次數與耗時
+    """
+    if tracing.TRACER is not None:
+        tracing.TRACER.skill_played(card, player_attrs)
     flags = []
     for condition in conditions:
         flags.append(CheckSkillCondition(player_attrs, condition, card))
+    if profile is None:
+        for flag, effect in zip(flags, effects):
+            if flag:
+                ApplySkillEffect(player_attrs, effect, card)
+        return
     for flag, effect in zip(flags, effects):
         if flag:
+            start = perf_counter()
             ApplySkillEffect(player_attrs, effect, card)
+            parsed = parse_effect_id(effect)
+            profile.add_effect(parsed[0].name if parsed else "Unknown", perf_counter() - start)
 
 
 class CenterSkillConditionType(Enum):
@@ -662,39 +611,28 @@ def CheckCenterSkillCondition(player_attrs: PlayerAttributes, condition_id: str,
             return False
 
         is_satisfied = False
+        current_value = None
 
         match condition_type:
             case CenterSkillConditionType.LiveStart:
                 is_satisfied = (event == "LiveStart")
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"  条件: Live开始时 -> {'满足' if is_satisfied else '不满足'}")
 
             case CenterSkillConditionType.LiveEnd:
                 is_satisfied = (event == "LiveEnd")
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"  条件: Live结束时 -> {'满足' if is_satisfied else '不满足'}")
 
             case CenterSkillConditionType.FeverStart:
                 is_satisfied = (event == "FeverStart")
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"  条件: Fever开始时 -> {'满足' if is_satisfied else '不满足'}")
 
             case CenterSkillConditionType.FeverTime:
                 is_satisfied = player_attrs.voltage.fever
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"  条件: Fever Time 中 -> {'满足' if is_satisfied else '不满足'}")
 
             case CenterSkillConditionType.VoltageLevel:
-                current_level = player_attrs.voltage.level
+                current_value = player_attrs.voltage.level
 
                 if operator_or_flag == SkillComparisonOperator.ABOVE_OR_EQUAL:  # >=
-                    is_satisfied = (current_level >= condition_value)
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(f"  条件: Voltage Lv. >= {condition_value} (当前: Lv.{current_level}) -> {'满足' if is_satisfied else '不满足'}")
+                    is_satisfied = (current_value >= condition_value)
                 elif operator_or_flag == SkillComparisonOperator.BELOW_OR_EQUAL:  # <
-                    is_satisfied = (current_level <= condition_value)
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(f"  条件: Voltage Lv. <= {condition_value} (当前: Lv.{current_level}) -> {'满足' if is_satisfied else '不满足'}")
+                    is_satisfied = (current_value <= condition_value)
                 else:
                     logger.error(f"  错误: 未知的 VoltageLevel 运算符 '{condition_id}'。 -> 不满足")
 
@@ -705,12 +643,8 @@ def CheckCenterSkillCondition(player_attrs: PlayerAttributes, condition_id: str,
 
                 if operator_or_flag == SkillComparisonOperator.ABOVE_OR_EQUAL:  # >=
                     is_satisfied = (current_value >= required_rate)
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(f"  条件: HP >= {required_rate:.2f}% (当前: {current_value:.2f}%) -> {'满足' if is_satisfied else '不满足'}")
                 elif operator_or_flag == SkillComparisonOperator.BELOW_OR_EQUAL:  # <
                     is_satisfied = (current_value <= required_rate)
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(f"  条件: HP <= {required_rate:.2f}% (当前: {current_value:.2f}%) -> {'满足' if is_satisfied else '不满足'}")
                 else:
                     logger.error(f"  错误: 未知的 MentalRate 运算符 '{operator_or_flag}'。 -> 不满足")
 
@@ -720,17 +654,16 @@ def CheckCenterSkillCondition(player_attrs: PlayerAttributes, condition_id: str,
 
                 if operator_or_flag == SkillComparisonOperator.ABOVE_OR_EQUAL:  # >=
                     is_satisfied = (current_value >= condition_value)
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(f"  条件: 合计技能次数 >= {condition_value} (当前: {current_value}) -> {'满足' if is_satisfied else '不满足'}")
                 elif operator_or_flag == SkillComparisonOperator.BELOW_OR_EQUAL:  # <
                     is_satisfied = (current_value <= condition_value)
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(f"  条件: 合计技能次数 <= {condition_value} (当前: {current_value}) -> {'满足' if is_satisfied else '不满足'}")
                 else:
                     logger.error(f"  错误: 未知的 UsedAllSkillCount 运算符 '{operator_or_flag}'。 -> 不满足")
 
             case _:
                 logger.error(f"  未知条件类型: {condition_type.name} ({condition_id})。 -> 不满足")
+        if tracing.TRACER is not None:
+            tracing.TRACER.condition_evaluated("center", condition_id, is_satisfied,
+                                               (condition_type, operator_or_flag, condition_value), current_value, card)
         result = result and is_satisfied
 
     return result
@@ -762,8 +695,7 @@ def ApplyCenterSkillEffect(player_attrs: PlayerAttributes, effect_id: int):
     # The change direction is *always* the second digit from the left.
 
     if len(id_str) != 9:
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.error(f"错误: 效果ID '{effect_id}' 长度不符合已知规则 (应为9位)。")
+        logger.debug(f"错误: 效果ID '{effect_id}' 长度不符合已知规则 (应为9位)。")
         return
 
     try:
@@ -788,9 +720,6 @@ def ApplyCenterSkillEffect(player_attrs: PlayerAttributes, effect_id: int):
             else:
                 ap_amount = value_data * change_factor / 10000.0
             player_attrs.ap = max(0, player_attrs.ap + ap_amount)
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "恢复" if change_direction == 0 else "消耗"  # AP is typically recovered
-                logger.debug(f"  应用效果: AP {action} {ap_amount:.1f} 点")
 
         case CenterSkillEffectType.ScoreGain:
             # Direct score gain, value is a percentage (e.g., 122.85% -> 12285). Divide by 100.0
@@ -798,13 +727,8 @@ def ApplyCenterSkillEffect(player_attrs: PlayerAttributes, effect_id: int):
 
             if player_attrs.next_score_gain_rate:
                 score_rate += player_attrs.next_score_gain_rate.pop(0)
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"分加成: * {score_rate:.2f}%")
             result = value_data * score_rate / 1000000
             player_attrs.score_add(result)
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "获得" if change_direction == 0 else "减少"
-                logger.debug(f"  应用效果: {action} Appeal值 {value_data / 100:.2f}% 的分数")
 
         case CenterSkillEffectType.VoltagePointChange:
             # Voltage point change, value is direct points
@@ -812,29 +736,30 @@ def ApplyCenterSkillEffect(player_attrs: PlayerAttributes, effect_id: int):
             if change_factor == 1:
                 if player_attrs.next_voltage_gain_rate:
                     voltage_rate += player_attrs.next_voltage_gain_rate.pop(0)
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(f"电加成: * {voltage_rate:.2f}%")
                 result = ceil(value_data * voltage_rate / 100)
             else:
                 result = -1 * value_data
             player_attrs.voltage.add_points(result)
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "增加" if change_direction == 0 else "减少"
-                logger.debug(f"  应用效果: Voltage Points {action} {value_data} 点")
 
         case CenterSkillEffectType.MentalRateChange:
             # MentalRateChange here is HP change, value is a percentage (e.g., 20.00% -> 2000). Divide by 100.0
             hp_percent = value_data / 100.0
             player_attrs.mental.skill_add(hp_percent * change_factor)
-            if logger.isEnabledFor(logging.DEBUG):
-                action = "恢复" if change_direction == 0 else "扣除"
-                logger.debug(f"  应用效果: HP {action} {hp_percent:.2f}%")
 
-    if logger.isEnabledFor(logging.DEBUG):
-        logger.debug(player_attrs)
+    if tracing.TRACER is not None:
+        if effect_type is CenterSkillEffectType.APChange:
+            value = abs(ap_amount)
+        elif effect_type is CenterSkillEffectType.VoltagePointChange:
+            value = value_data
+        else:
+            value = value_data / 100
+        tracing.TRACER.effect_applied("center", effect_type, change_direction, value, player_attrs)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format='%(message)s')
+    tracing.attach(tracing.LogTracer())
+
     # 实例化玩家属性，用于模拟变化
     player_attrs = PlayerAttributes()
     logger.debug("--- 初始玩家属性 ---")
@@ -0,0 +1,120 @@
+"""
+模擬引擎登錄表
+
+MainBatch 預設使用參考實作 run_game_simulation。其他引擎（向量化、編譯、跳過事件等）
+以 "模組:函式" 登錄，介面與 run_game_simulation 相同：接收同一個任務 tuple，返回同格式的結果，
+可另外接受 trace 關鍵字參數記錄事件。
+
+參考實作以外的引擎需先通過一致性測試 (python -m src.utils.parity --engine NAME --certify)，
+寫出證書後 MainBatch 才會使用。證書記錄引擎與參考實作的原始碼指紋，
+任一方修改後證書即失效，需重新測試。
+"""
+import hashlib
+import importlib
+import inspect
+import json
+import logging
+import os
+from platform import python_implementation
+
+logger = logging.getLogger(__name__)
+
+REFERENCE = "reference"
+
+# 引擎名稱 -> "模組:函式"
+ENGINES = {
+    REFERENCE: "src.core.Simulator_core:run_game_simulation",
+}
+
+CERTIFICATE_DIR = os.path.join("log", "parity")
+
+# 參考實作的原始碼目錄（模擬結果取決於整個 src/core）
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def register_engine(name: str, target: str):
+    """登錄引擎，target 格式為 "模組:函式" """
+    ENGINES[name] = target
+
+
+def engine_target(name: str) -> str:
+    """引擎名稱對應的 "模組:函式"；名稱本身含 ":" 時視為未登錄的引擎直接使用"""
+    if name in ENGINES:
+        return ENGINES[name]
+    if ":" in name:
+        return name
+    raise ValueError(f"未知的模擬引擎: {name}（已登錄: {', '.join(ENGINES)}）")
+
+
+def load_engine(name: str):
+    module_name, _, func_name = engine_target(name).partition(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def supports_trace(engine) -> bool:
+    """引擎是否接受 trace 關鍵字參數"""
+    try:
+        return "trace" in inspect.signature(engine).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def _hash_files(paths: list[str]) -> str:
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def fingerprint(name: str) -> dict:
+    """引擎與參考實作的原始碼指紋"""
+    # 登錄表本身不影響模擬結果，登錄新引擎不應使既有證書失效
+    core_files = [os.path.join(CORE_DIR, f) for f in os.listdir(CORE_DIR)
+                  if f.endswith(".py") and f != os.path.basename(__file__)]
+    module = importlib.import_module(engine_target(name).partition(":")[0])
+    engine_files = [inspect.getsourcefile(module)]
+    return {"reference": _hash_files(core_files), "engine": _hash_files(engine_files)}
+
+
+def certificate_path(name: str) -> str:
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+    return os.path.join(CERTIFICATE_DIR, f"{safe}.json")
+
+
+def save_certificate(name: str, report: dict):
+    """一致性測試通過後寫出證書"""
+    os.makedirs(CERTIFICATE_DIR, exist_ok=True)
+    certificate = {
+        "engine": name,
+        "target": engine_target(name),
+        "implementation": python_implementation(),
+        "fingerprint": fingerprint(name),
+        "checked": report["checked"],
+        "strata": report["strata"],
+    }
+    with open(certificate_path(name), "w", encoding="utf-8") as f:
+        json.dump(certificate, f, ensure_ascii=False, indent=2)
+    logger.info(f"Certificate saved to {certificate_path(name)}")
+
+
+def certified_engine(name: str):
+    """
+    取得 MainBatch 可使用的引擎：參考實作直接返回，其他引擎需有有效的證書
+
+    Raises:
+        ValueError: 引擎未登錄、沒有證書，或證書已因原始碼修改或 Python 實作不同而失效
+    """
+    if name == REFERENCE:
+        return load_engine(name)
+    path = certificate_path(name)
+    if not os.path.exists(path):
+        raise ValueError(f"引擎 {name} 尚未通過一致性測試，請先執行 python -m src.utils.parity --engine {name} --certify")
+    with open(path, "r", encoding="utf-8") as f:
+        certificate = json.load(f)
+    if certificate.get("implementation") != python_implementation():
+        raise ValueError(f"引擎 {name} 的證書是在 {certificate.get('implementation')} 下取得的，"
+                         f"請在 {python_implementation()} 下重新測試")
+    if certificate.get("target") != engine_target(name) or certificate.get("fingerprint") != fingerprint(name):
+        raise ValueError(f"引擎 {name} 或參考實作在取得證書後已修改，請重新執行一致性測試")
+    return load_engine(name)
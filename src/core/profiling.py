@@ -0,0 +1,193 @@
+"""
+模擬迴圈的效能計數器（預設關閉）
+
+啟用後 run_game_simulation 記錄：
+
+    - 每種事件（Single / Hold / CDavailable / 延遲 MISS 等）的次數與累計耗時
+    - 打出技能的次數與耗時，以及每種技能效果 (SkillEffectType) 的次數與耗時
+    - 動態事件堆積 (heapq) 的 push / pop 次數
+    - 背水血線重新計算 (recalculate_afk_mental) 的次數
+    - C 位技能條件檢查的次數與耗時
+
+事件計時沿用 run_game_simulation 的 trace 介面（兩次 append 之間的時間即為前一個事件的處理時間），
+未啟用時模擬迴圈不增加任何逐事件的判斷，只在打出技能等少數位置多一次 None 比較。
+
+計數器存在各行程的全域變數中，MainBatch 以 pool_kwargs() 建立行程池、在歌曲結束時以 collect()
+取回並合併每個子行程的計數，輸出彙總表。
+"""
+import logging
+import multiprocessing
+from collections import Counter
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+
+# 目前行程的計數器，None 表示未啟用
+PROFILE = None
+
+# 取回子行程計數時，確保每個子行程各處理一個取回任務
+_BARRIER = None
+
+# 等待所有子行程到齊的上限（秒）
+COLLECT_TIMEOUT = 60
+
+
+class SimProfile:
+    """單一行程（或合併後）的計數器"""
+
+    def __init__(self):
+        self.simulations = 0
+        self.total_time = 0.0
+        self.events = Counter()
+        self.event_time = Counter()
+        self.skill_plays = 0
+        self.skill_time = 0.0
+        self.effects = Counter()
+        self.effect_time = Counter()
+        self.heap_push = 0
+        self.heap_pop = 0
+        self.afk_recalcs = 0
+        self.center_checks = 0
+        self.center_time = 0.0
+
+    def event_clock(self) -> "EventClock":
+        """供 run_game_simulation 當作 trace 使用的事件計時器"""
+        return EventClock(self)
+
+    def add_effect(self, name: str, elapsed: float):
+        self.effects[name] += 1
+        self.effect_time[name] += elapsed
+
+    def merge(self, other: "SimProfile"):
+        self.simulations += other.simulations
+        self.total_time += other.total_time
+        self.events.update(other.events)
+        self.event_time.update(other.event_time)
+        self.skill_plays += other.skill_plays
+        self.skill_time += other.skill_time
+        self.effects.update(other.effects)
+        self.effect_time.update(other.effect_time)
+        self.heap_push += other.heap_push
+        self.heap_pop += other.heap_pop
+        self.afk_recalcs += other.afk_recalcs
+        self.center_checks += other.center_checks
+        self.center_time += other.center_time
+
+    def format_table(self) -> list[str]:
+        """彙總表（每行一個字串）"""
+        if not self.simulations:
+            return ["Profile: no simulations recorded"]
+        sims = self.simulations
+        total = self.total_time or 1e-12
+
+        def row(name, count, seconds):
+            return (f"  {name:<28}{count:>14,}{count / sims:>12,.1f}{seconds:>12.3f}"
+                    f"{seconds / total:>8.1%}{seconds / count * 1e6 if count else 0:>10.2f}")
+
+        header = f"  {'':<28}{'Count':>14}{'Per sim':>12}{'Time (s)':>12}{'Share':>8}{'us/each':>10}"
+        lines = [f"Profile: {sims:,} simulations, {self.total_time:.3f}s in simulator "
+                 f"({self.total_time / sims * 1e3:.3f} ms/sim)", header, "  Events:"]
+        for name, count in self.events.most_common():
+            lines.append(row(name, count, self.event_time[name]))
+        lines.append("  Skills:")
+        lines.append(row("UseCardSkill", self.skill_plays, self.skill_time))
+        for name, count in self.effects.most_common():
+            lines.append(row(f"  {name}", count, self.effect_time[name]))
+        lines.append("  Other:")
+        lines.append(row("Center skill checks", self.center_checks, self.center_time))
+        lines.append(f"  {'Heap push / pop':<28}{self.heap_push:>14,} / {self.heap_pop:,}")
+        lines.append(f"  {'AFK recalculations':<28}{self.afk_recalcs:>14,}")
+        return lines
+
+
+class EventClock:
+    """
+    實作 trace 的 append 介面：每次 append 代表開始處理一個新事件，
+    與上一次 append 的時間差計入上一個事件
+    """
+
+    __slots__ = ("profile", "last_event", "last_time", "processed")
+
+    def __init__(self, profile: SimProfile):
+        self.profile = profile
+        self.last_event = None
+        self.last_time = perf_counter()
+        self.processed = 0  # 本次模擬處理的事件數
+
+    def append(self, item: tuple):
+        now = perf_counter()
+        if self.last_event is not None:
+            self.profile.event_time[self.last_event] += now - self.last_time
+        event = item[1]
+        if event == "End":
+            self.last_event = None
+        else:
+            # 延遲的 MISS 事件合併為一類
+            self.last_event = "_MISS" if event[0] == "_" else event
+            self.profile.events[self.last_event] += 1
+            self.processed += 1
+        self.last_time = now
+
+
+def enable():
+    """在目前行程啟用計數器"""
+    global PROFILE
+    PROFILE = SimProfile()
+
+
+def disable():
+    global PROFILE
+    PROFILE = None
+
+
+def drain() -> SimProfile:
+    """取出目前行程的計數並重設"""
+    global PROFILE
+    profile = PROFILE
+    if profile is not None:
+        PROFILE = SimProfile()
+    return profile
+
+
+def _init_worker(barrier):
+    global _BARRIER
+    _BARRIER = barrier
+    enable()
+
+
+def _drain_worker(_) -> SimProfile:
+    # 已取回的子行程在屏障前等待，其餘的取回任務只能由尚未取回的子行程處理
+    _BARRIER.wait(COLLECT_TIMEOUT)
+    return drain()
+
+
+def pool_kwargs(processes: int) -> dict:
+    """
+    啟用時返回 multiprocessing.Pool 需要的 initializer 參數，未啟用時返回 {}
+
+    用法：
+        with multiprocessing.Pool(processes=n, **profiling.pool_kwargs(n)) as pool:
+            ...
+            summary = profiling.collect(pool, n)
+    """
+    if PROFILE is None:
+        return {}
+    return {"initializer": _init_worker, "initargs": (multiprocessing.Barrier(processes),)}
+
+
+def collect(pool, processes: int) -> SimProfile:
+    """
+    取回並合併行程池中每個子行程的計數（需在 pool_kwargs 建立的行程池上、所有模擬結束後呼叫），
+    未啟用時返回 None
+    """
+    if PROFILE is None:
+        return None
+    summary = SimProfile()
+    try:
+        for profile in pool.map(_drain_worker, range(processes), chunksize=1):
+            if profile is not None:
+                summary.merge(profile)
+    except Exception as e:
+        # 屏障逾時（子行程異常結束等）時只返回已取得的部分
+        logger.warning(f"無法取回全部子行程的效能計數: {e}")
+    return summary
@@ -0,0 +1,330 @@
+"""
+模擬過程的追蹤介面（預設關閉）
+
+附加追蹤器 (attach) 後，模擬器與技能解析在以下時機呼叫對應的方法：
+
+    - event_started:          處理每個譜面 / 動態事件前（沿用 run_game_simulation 的 trace 介面）
+    - note_judged:            音符判定後（連擊數、分數已更新）
+    - skill_played:           打出卡牌技能時（效果套用前）
+    - condition_evaluated:    檢查技能、C 位技能、C 位特性目標的單一條件後
+    - effect_applied:         套用技能、C 位技能、C 位特性的效果後
+    - voltage_level_changed:  Voltage 等級（含 Fever 加倍）變化時
+
+未附加時各處只多一次 None 比較，不做任何 logging 判斷與字串格式化。
+
+內建的追蹤器：
+    LogTracer:     輸出與舊版 DEBUG 日誌相同內容的可讀日誌（MainSingle 使用）
+    CounterTracer: 只計數
+    BinaryTracer:  每筆事件一筆固定長度的二進位記錄，可存檔後以 decode() 讀回
+
+用法：
+    with tracing.attached(tracing.LogTracer()):
+        run_game_simulation(task)
+
+追蹤器存在各行程的全域變數中，只影響目前行程；MainBatch 的子行程不追蹤。
+"""
+import logging
+import struct
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# 目前行程的追蹤器，None 表示未附加
+TRACER = None
+
+
+class Tracer:
+    """追蹤器基底類別，所有方法預設不做任何事，子類別只需覆寫需要的部分"""
+
+    def __init__(self):
+        self.time = None  # 目前處理中的事件時間
+
+    def append(self, item: tuple):
+        # run_game_simulation 的 trace 介面: (時間, 事件, 分數, AP, 血量, Voltage點數)
+        self.time = item[0]
+        self.event_started(item[0], item[1], item[2:])
+
+    def event_started(self, time, event: str, state: tuple):
+        """state: (分數, AP, 血量, Voltage點數)；模擬結束時 time 為 None、event 為 "End" """
+
+    def note_judged(self, judgement: str, note_type: str, player):
+        pass
+
+    def skill_played(self, card, player):
+        pass
+
+    def condition_evaluated(self, kind: str, condition_id: str, satisfied: bool, condition: tuple = None,
+                            current=None, card=None):
+        """
+        kind: "skill" / "center" / "target"
+        condition: (條件類型 Enum, 比較運算子 Enum 或 None, 條件數值)
+        current: 比較時的當前值（無數值比較時為 None）
+        """
+
+    def effect_applied(self, kind: str, effect_type, direction: int, value: float, player, card=None,
+                       count: int = 1):
+        """
+        kind: "skill" / "center" / "attribute"
+        direction: 0 為增加、1 為減少
+        value: 效果的數值（AP 點數、百分比、Voltage 點數等，與日誌顯示的單位相同）
+        count: 分加成、電加成的作用次數
+        """
+
+    def voltage_level_changed(self, old_level: int, new_level: int, points: int):
+        pass
+
+
+def attach(tracer: Tracer):
+    """在目前行程附加追蹤器"""
+    global TRACER
+    TRACER = tracer
+
+
+def detach():
+    global TRACER
+    TRACER = None
+
+
+@contextmanager
+def attached(tracer: Tracer):
+    previous = TRACER
+    attach(tracer)
+    try:
+        yield tracer
+    finally:
+        attach(previous)
+
+
+# --- 可讀日誌 ---
+
+_SATISFIED = {True: "满足", False: "不满足"}
+
+_OPERATORS = {"ABOVE_OR_EQUAL": ">=", "BELOW_OR_EQUAL": "<="}
+
+_CONDITION_LABELS = {
+    "FeverTime": "Fever 中",
+    "VoltageLevel": "Voltage Lv.",
+    "MentalRate": "HP",
+    "UsedAllSkillCount": "合计技能次数",
+    "AfterUsedAllSkillCount": "合计技能次数",
+    "UsedSkillCount": "卡牌使用次数",
+    "LiveStart": "Live开始时",
+    "LiveEnd": "Live结束时",
+    "FeverStart": "Fever开始时",
+    "Member": "指定成员",
+    "Unit": "指定小组",
+    "Generation": "指定期数",
+    "StyleType": "指定类型",
+    "All": "全体",
+}
+
+# 效果名稱 -> (顯示名稱, 單位格式)
+_EFFECT_LABELS = {
+    "APChange": ("AP", "{:.1f} 点"),
+    "ScoreGain": ("得分 (Appeal值)", "{:.2f}%"),
+    "VoltagePointChange": ("Voltage Pt", "{:.0f} 点"),
+    "MentalRateChange": ("HP", "{:.2f}%"),
+    "DeckReset": ("重置牌库", None),
+    "CardExcept": ("卡牌除外", None),
+    "NextAPGainRateChange": ("分加成", "{:.2f}%"),
+    "NextVoltageGainRateChange": ("电加成", "{:.2f}%"),
+    "SmileRateChange": ("Smile值", "{:.0f}%"),
+    "PureRateChange": ("Pure值", "{:.0f}%"),
+    "CoolRateChange": ("Cool值", "{:.0f}%"),
+    "SmileValueChange": ("Smile值", "{:.0f}"),
+    "PureValueChange": ("Pure值", "{:.0f}"),
+    "CoolValueChange": ("Cool值", "{:.0f}"),
+    "MentalValueChange": ("血量", "{:.0f}"),
+    "ConsumeAPChange": ("AP消耗", "{:.0f}"),
+    "CoolTimeChange": ("技能CD", "{:.0f}s"),
+    "APGainRateChange": ("AP Gain Rate", "{:.2f}%"),
+    "VoltageGainRateChange": ("Voltage Gain Rate", "{:.2f}%"),
+    "APRateChangeResetGuard": ("APRateChangeResetGuard", "{:.2f}%"),
+}
+
+
+class LogTracer(Tracer):
+    """
+    以 logging 輸出可讀的模擬過程
+
+    Args:
+        log: 輸出用的 logger（預設為本模組的 logger）
+        level: 技能、條件、效果、Voltage 等級的日誌等級
+        note_level: 每個音符判定與 CD 結束的日誌等級（量大，預設與 level 相同）
+    """
+
+    def __init__(self, log: logging.Logger = None, level: int = logging.DEBUG, note_level: int = None):
+        super().__init__()
+        self.log = log or logger
+        self.level = level
+        self.note_level = level if note_level is None else note_level
+
+    def event_started(self, time, event, state):
+        match event:
+            case "CDavailable":
+                self.log.log(self.note_level, f"[CD结束]\t总分: {state[0]}\t时间: {time}")
+            case "FeverStart":
+                self.log.log(self.level, f"\n【FEVER开始】\t时间: {time}")
+            case "FeverEnd":
+                self.log.log(self.level, f"\n【FEVER结束】\t时间: {time}")
+            case "End":
+                self.log.log(self.level, "\n--- 模拟结束 ---")
+
+    def note_judged(self, judgement, note_type, player):
+        note = f"{note_type} {judgement}" if note_type else judgement
+        self.log.log(self.note_level, f"[连击{player.combo}x]\t总分: {player.score}\t时间: {self.time}\t{note}")
+
+    def skill_played(self, card, player):
+        self.log.log(self.level, f"\n打出技能: {card.full_name}\t时间: {self.time}")
+
+    def condition_evaluated(self, kind, condition_id, satisfied, condition=None, current=None, card=None):
+        if condition is None:
+            self.log.log(self.level, f"  条件: 无条件 -> {_SATISFIED[satisfied]}")
+            return
+        condition_type, operator, value = condition
+        label = _CONDITION_LABELS.get(condition_type.name, condition_type.name)
+        op = _OPERATORS.get(operator.name) if operator is not None else None
+        if condition_type.name == "MentalRate":
+            text = f"{label} {op} {value / 100:.2f}% (当前: {current:.2f}%)"
+        elif op is not None and current is not None:
+            text = f"{label} {op} {value} (当前: {current})"
+        else:
+            text = label
+        if card is not None and kind != "center":
+            text += f" {card.full_name}"
+        self.log.log(self.level, f"  条件: {text} -> {_SATISFIED[satisfied]}")
+
+    def effect_applied(self, kind, effect_type, direction, value, player, card=None, count=1):
+        label, unit = _EFFECT_LABELS.get(effect_type.name, (effect_type.name, "{}"))
+        if unit is None:
+            text = f"{label}: {card.full_name}" if card is not None and effect_type.name == "CardExcept" else label
+        else:
+            text = f"{label} {'增加' if direction == 0 else '减少'} {unit.format(value)}"
+            if count > 1:
+                text += f" ({count} 次)"
+        self.log.log(self.level, f"  应用效果: {text}")
+        if kind != "attribute":
+            self.log.log(self.level, player)
+
+    def voltage_level_changed(self, old_level, new_level, points):
+        self.log.log(self.level, f"  Voltage等级变化: 从 Lv.{old_level} -> Lv.{new_level} ({points} Pt)")
+
+
+# --- 計數 ---
+
+class CounterTracer(Tracer):
+    """只計數的追蹤器，適合檢查大量模擬中各種事件、條件與效果的出現頻率"""
+
+    def __init__(self):
+        super().__init__()
+        self.events = Counter()
+        self.judgements = Counter()
+        self.skills = Counter()
+        self.conditions = Counter()
+        self.effects = Counter()
+        self.voltage_changes = 0
+
+    def event_started(self, time, event, state):
+        self.events[event] += 1
+
+    def note_judged(self, judgement, note_type, player):
+        self.judgements[judgement] += 1
+
+    def skill_played(self, card, player):
+        self.skills[card.card_id] += 1
+
+    def condition_evaluated(self, kind, condition_id, satisfied, condition=None, current=None, card=None):
+        self.conditions[(kind, condition_id, satisfied)] += 1
+
+    def effect_applied(self, kind, effect_type, direction, value, player, card=None, count=1):
+        self.effects[(kind, effect_type.name)] += 1
+
+    def voltage_level_changed(self, old_level, new_level, points):
+        self.voltage_changes += 1
+
+    def format_table(self) -> list[str]:
+        """彙總表（每行一個字串）"""
+        lines = ["Events:"]
+        lines += [f"  {name:<28}{count:>12,}" for name, count in self.events.most_common()]
+        lines.append("Judgements:")
+        lines += [f"  {name:<28}{count:>12,}" for name, count in self.judgements.most_common()]
+        lines.append("Skills:")
+        lines += [f"  {card_id:<28}{count:>12,}" for card_id, count in self.skills.most_common()]
+        lines.append("Conditions:")
+        lines += [f"  {kind:<7}{condition_id:<12}{_SATISFIED[satisfied]:<9}{count:>12,}"
+                  for (kind, condition_id, satisfied), count in self.conditions.most_common()]
+        lines.append("Effects:")
+        lines += [f"  {kind:<10}{name:<26}{count:>12,}" for (kind, name), count in self.effects.most_common()]
+        lines.append(f"Voltage level changes: {self.voltage_changes:,}")
+        return lines
+
+
+# --- 二進位記錄 ---
+
+# 記錄格式: 類型 (u8), 子類型 (u8), 小整數 (i16), 時間 (f64), 數值 (i64)
+RECORD = struct.Struct("<BBhdq")
+
+EVENT, NOTE, SKILL, CONDITION, EFFECT, VOLTAGE = range(6)
+RECORD_TYPES = ["event", "note", "skill", "condition", "effect", "voltage"]
+
+EVENT_NAMES = ["LiveStart", "LiveEnd", "FeverStart", "FeverEnd", "CDavailable", "End",
+               "Single", "Hold", "HoldMid", "Flick", "Trace",
+               "_Single", "_Hold", "_HoldMid", "_Flick", "_Trace"]
+JUDGEMENTS = ["PERFECT+", "PERFECT", "GREAT", "GOOD", "BAD", "MISS"]
+KINDS = ["skill", "center", "attribute", "target"]
+
+_EVENT_CODES = {name: i for i, name in enumerate(EVENT_NAMES)}
+_JUDGEMENT_CODES = {name: i for i, name in enumerate(JUDGEMENTS)}
+_KIND_CODES = {name: i for i, name in enumerate(KINDS)}
+_UNKNOWN = 255
+
+
+class BinaryTracer(Tracer):
+    """
+    每筆事件寫入一筆 20 bytes 的記錄：
+
+        event:     子類型=事件 (EVENT_NAMES)，數值=分數
+        note:      子類型=判定 (JUDGEMENTS)，小整數=連擊數，數值=分數
+        skill:     小整數=該卡打出次數，數值=卡牌 ID
+        condition: 子類型=種類 (KINDS)，小整數=是否滿足，數值=條件 ID
+        effect:    子類型=種類 (KINDS)，小整數=效果類型編號，數值=效果數值 × 100（四捨五入）
+        voltage:   小整數=新等級，數值=Voltage 點數
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.data = bytearray()
+
+    def _write(self, record_type, sub, small, value):
+        time = self.time if self.time is not None else float("nan")
+        self.data += RECORD.pack(record_type, sub, max(-32768, min(32767, small)), time, value)
+
+    def event_started(self, time, event, state):
+        self._write(EVENT, _EVENT_CODES.get(event, _UNKNOWN), 0, state[0])
+
+    def note_judged(self, judgement, note_type, player):
+        self._write(NOTE, _JUDGEMENT_CODES.get(judgement, _UNKNOWN), player.combo, player.score)
+
+    def skill_played(self, card, player):
+        self._write(SKILL, 0, card.active_count, int(card.card_id))
+
+    def condition_evaluated(self, kind, condition_id, satisfied, condition=None, current=None, card=None):
+        self._write(CONDITION, _KIND_CODES[kind], int(satisfied), int(condition_id))
+
+    def effect_applied(self, kind, effect_type, direction, value, player, card=None, count=1):
+        sign = 1 if direction == 0 else -1
+        self._write(EFFECT, _KIND_CODES[kind], effect_type.value, round(value * sign * 100))
+
+    def voltage_level_changed(self, old_level, new_level, points):
+        self._write(VOLTAGE, 0, new_level, points)
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self.data)
+
+
+def decode(data: bytes):
+    """逐筆讀回 BinaryTracer 的記錄，返回 (類型名稱, 子類型, 小整數, 時間, 數值)"""
+    for record_type, sub, small, time, value in RECORD.iter_unpack(data):
+        yield RECORD_TYPES[record_type], sub, small, time, value
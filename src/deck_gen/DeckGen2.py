@@ -66,6 +66,59 @@ def count_skill_tags(card_ids_input: list[int]):
     return tag_counts
 
 
+def check_skill_tags(tag_counts: Counter, mustskills, force_dr=False):
+    """
+    检查卡组中的技能类型是否符合给定条件。
+    默认检查洗牌、分、电、分加成、电加成均不为0，且DR数量<=1。
+    """
+    if all(tag_counts[skill] for skill in mustskills) and \
+            tag_counts[Rarity.DR] <= 1:
+        if not force_dr:
+            return True
+        elif tag_counts[Rarity.DR] == 1:
+            return True
+    return False
+
+
+def is_valid_composition(deck, mustcards: list[list[int]], center_char=None, force_dr=False) -> bool:
+    """
+    检查一个卡组组合（不含顺序）是否符合生成器的全部规则：
+    6张不同卡牌、每个角色最多2张、包含C位角色、必带卡、卡牌冲突、技能tag。
+    供生成器以外的搜索方式（如 DeckSearch）共用。
+    """
+    if len(set(deck)) != 6:
+        return False
+    char_counts = Counter(card_id // 1000 for card_id in deck)
+    if max(char_counts.values()) > 2:
+        return False
+    if center_char and center_char not in char_counts:
+        return False
+    return _passes_card_rules(deck, mustcards, force_dr)
+
+
+def _passes_card_rules(deck, mustcards: list[list[int]], force_dr=False) -> bool:
+    """必带卡、卡牌冲突、技能tag检查（角色分布已由调用方保证）"""
+    if mustcards[0]:
+        if not all(card in deck for card in mustcards[0]):
+            return False
+    if mustcards[1]:
+        if not any(card in deck for card in mustcards[1]):
+            return False
+    if has_card_conflict(set(deck)):
+        return False
+    return check_skill_tags(count_skill_tags(deck), mustcards[2], force_dr)
+
+
+def is_valid_order(perm) -> bool:
+    """
+    排列规则：
+    - 第一位不能是分卡 (ScoreGain)
+    - 最后一位不能是洗牌卡 (DeckReset)
+    """
+    return SkillEffectType.ScoreGain not in DB_TAG[perm[0]] and \
+        SkillEffectType.DeckReset not in DB_TAG[perm[-1]]
+
+
 def generate_role_distributions(all_characters):
     """
     生成6个卡位的角色分布，允许部分角色双卡。
@@ -101,13 +154,26 @@ def load_simulated_decks(path: str):
 
 
 class DeckGeneratorWithDoubleCards:
-    def __init__(self, cardpool: list[int], mustcards: list[list[int]], center_char=None, force_dr=False, log_path: str = None):
+    def __init__(self, cardpool: list[int], mustcards: list[list[int]], center_char=None, force_dr=False, log_path: str = None,
+                 composition_filter=None, required_cards=None, simulated_decks=None, count_orders=True):
+        """
+        composition_filter: 可選，接收組合（6張卡牌ID列表）返回 bool，
+                            False 的組合不產生任何排列（如代理模型篩選）。
+                            不影響 total_decks 的預計算。
+        required_cards: 可選，組合必須至少包含其中一張（增量重算只枚舉含變動卡牌的組合）
+        simulated_decks: 可選，已模擬組合的集合（支援 in 查詢，如 CompactDeckSet），
+                         指定時不再從 log_path 載入
+        count_orders: False 時 total_decks 只計算組合數，不逐一展開排列（順序搜索每個組合只產生一筆結果）
+        """
         self.cardpool = cardpool
         self.center_char = center_char
         self.char_id_to_cards = defaultdict(list)
         self.force_dr = force_dr
         self.mustcards = mustcards
-        self.simulated_decks = load_simulated_decks(log_path)
+        self.composition_filter = composition_filter
+        self.count_orders = count_orders
+        self.required_cards = set(required_cards) if required_cards else None
+        self.simulated_decks = simulated_decks if simulated_decks is not None else load_simulated_decks(log_path)
         for card_id in self.cardpool:
             char_id = card_id // 1000
             self.char_id_to_cards[char_id].append(card_id)
@@ -129,13 +195,11 @@ class DeckGeneratorWithDoubleCards:
         检查卡组中的技能类型是否符合给定条件。
         默认检查洗牌、分、电、分加成、电加成均不为0，且DR数量<=1。
         """
-        if all(tag_counts[skill] for skill in self.mustcards[2]) and \
-                tag_counts[Rarity.DR] <= 1:
-            if not force_dr:
-                return True
-            elif tag_counts[Rarity.DR] == 1:
-                return True
-        return False
+        return check_skill_tags(tag_counts, self.mustcards[2], force_dr)
+
+    def is_valid_composition(self, deck) -> bool:
+        """检查任意组合是否符合本生成器的规则（不检查是否已模拟过）"""
+        return is_valid_composition(deck, self.mustcards, self.center_char, self.force_dr)
 
     def _generate_valid_permutations(self, deck):
         """
@@ -214,7 +278,23 @@ class DeckGeneratorWithDoubleCards:
         # 乘以C位卡數量（每張C位卡都會生成一個獨立任務）
         return valid_count * center_card_count
 
+    def iter_compositions(self):
+        """
+        只产生符合规则的组合（不展开排列），供顺序搜索等模式使用
+        """
+        if len(self.all_available_chars) < 3:
+            return
+        for char_distribution in generate_role_distributions(self.all_available_chars):
+            if self.center_char and self.center_char not in char_distribution:
+                continue
+            yield from self._generate_compositions_for_distribution(char_distribution)
+
     def _generate_decks_for_distribution(self, char_distribution):
+        for deck in self._generate_compositions_for_distribution(char_distribution):
+            # 使用优化的排列生成器，避免生成无效排列
+            yield from self._generate_valid_permutations(deck)
+
+    def _generate_compositions_for_distribution(self, char_distribution):
         char_counts = {char_id: char_distribution.count(char_id) for char_id in set(char_distribution)}
         card_choices_per_char = []
         for char_id, count in char_counts.items():
@@ -230,19 +310,14 @@ class DeckGeneratorWithDoubleCards:
             deck = []
             for item in combo:
                 deck.extend(item)
+            if self.required_cards and self.required_cards.isdisjoint(deck):
+                continue
             if tuple(sorted(deck)) in self.simulated_decks:
                 continue
-            if self.mustcards[0]:
-                if not all(card in deck for card in self.mustcards[0]):
+            if _passes_card_rules(deck, self.mustcards, self.force_dr):
+                if self.composition_filter is not None and not self.composition_filter(deck):
                     continue
-            if self.mustcards[1]:
-                if not any(card in deck for card in self.mustcards[1]):
-                    continue
-            if has_card_conflict(set(deck)):
-                continue
-            if self.check_skill_tags(count_skill_tags(deck), self.force_dr):
-                # 使用优化的排列生成器，避免生成无效排列
-                yield from self._generate_valid_permutations(deck)
+                yield deck
 
     def _count_decks_for_distribution(self, char_distribution):
         char_counts = {char_id: char_distribution.count(char_id) for char_id in set(char_distribution)}
@@ -261,19 +336,13 @@ class DeckGeneratorWithDoubleCards:
             deck = []
             for item in combo:
                 deck.extend(item)
-            if tuple(sorted(deck)) in self.simulated_decks:
+            if self.required_cards and self.required_cards.isdisjoint(deck):
                 continue
-            if self.mustcards[0]:
-                if not all(card in deck for card in self.mustcards[0]):
-                    continue
-            if self.mustcards[1]:
-                if not any(card in deck for card in self.mustcards[1]):
-                    continue
-            if has_card_conflict(set(deck)):
+            if tuple(sorted(deck)) in self.simulated_decks:
                 continue
-            if self.check_skill_tags(count_skill_tags(deck), self.force_dr):
+            if _passes_card_rules(deck, self.mustcards, self.force_dr):
                 # 使用优化的计数方法
-                total += self._count_valid_permutations(deck)
+                total += self._count_valid_permutations(deck) if self.count_orders else 1
         return total
 
     def compute_total_count(self):
@@ -287,11 +356,13 @@ class DeckGeneratorWithDoubleCards:
         return total
 
 
-def generate_decks_with_double_cards(cardpool: list[int], mustcards: list[list[int]], center_char: int = None, force_dr: bool = False, log_path: str = None):
+def generate_decks_with_double_cards(cardpool: list[int], mustcards: list[list[int]], center_char: int = None, force_dr: bool = False, log_path: str = None,
+                                     composition_filter=None, required_cards=None, simulated_decks=None, count_orders=True):
     """
     外部接口函数，返回支持双卡规则的卡组生成器
     """
-    return DeckGeneratorWithDoubleCards(cardpool, mustcards, center_char, force_dr, log_path)
+    return DeckGeneratorWithDoubleCards(cardpool, mustcards, center_char, force_dr, log_path, composition_filter, required_cards,
+                                        simulated_decks, count_orders)
 
 
 if __name__ == "__main__":
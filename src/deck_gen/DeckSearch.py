@@ -0,0 +1,191 @@
+"""
+模擬退火卡組搜索 (用於窮舉不完的大卡池)
+
+以模擬函式（MainBatch 的 SIMULATE，預設為 run_game_simulation）的分數為目標，從隨機合法卡組出發，
+透過鄰域移動探索組合與順序：
+    - same_char: 換成同角色的另一張卡
+    - swap:      交換兩個卡位
+    - replace:   換成其他角色的卡（遵守每角色最多2張）
+    - center:    有多張C位角色卡時切換C位
+
+所有鄰居都必須通過 DeckGen2 的同一套規則（必帶卡、衝突、技能tag、雙卡、排列首尾），
+多條鏈在進程池中並行，輸出與 MainBatch 相同的結果格式。
+"""
+import logging
+import math
+import random
+from collections import Counter, defaultdict
+
+from .DeckGen2 import is_valid_composition, is_valid_order
+from ..config.CardLevelConfig import convert_deck_to_simulator_format
+
+logger = logging.getLogger(__name__)
+
+MOVES = ("same_char", "swap", "replace", "center")
+
+
+class SearchSpace:
+    """
+    卡組搜索空間：封裝卡池與生成器規則，負責產生合法的初始解與鄰居
+    """
+
+    def __init__(self, cardpool: list[int], mustcards: list[list[int]], center_char=None, force_dr=False, leader_designation=0):
+        self.cardpool = list(cardpool)
+        self.mustcards = mustcards
+        self.center_char = center_char
+        self.force_dr = force_dr
+        self.leader = int(leader_designation or 0)
+        self.char_id_to_cards = defaultdict(list)
+        for card_id in self.cardpool:
+            self.char_id_to_cards[card_id // 1000].append(card_id)
+
+    def is_valid(self, order) -> bool:
+        return is_valid_order(order) and \
+            is_valid_composition(order, self.mustcards, self.center_char, self.force_dr)
+
+    def center_candidates(self, order) -> list[int]:
+        """返回可作為C位的卡位索引，與 task_generator_func 的規則一致"""
+        if self.leader:
+            return [i for i, card_id in enumerate(order) if card_id == self.leader]
+        return [i for i, card_id in enumerate(order) if card_id // 1000 == self.center_char]
+
+    def random_state(self, rng: random.Random, max_tries: int = 100000):
+        """拒絕取樣一個合法的 (order, center_index)"""
+        must = list(self.mustcards[0])
+        for _ in range(max_tries):
+            deck = list(must)
+            counts = Counter(card_id // 1000 for card_id in deck)
+            if self.center_char and self.center_char not in counts:
+                center_cards = [c for c in self.char_id_to_cards[self.center_char] if c not in deck]
+                if not center_cards:
+                    return None
+                deck.append(rng.choice(center_cards))
+                counts[self.center_char] += 1
+            candidates = [c for c in self.cardpool if c not in deck]
+            rng.shuffle(candidates)
+            for card_id in candidates:
+                if len(deck) == 6:
+                    break
+                if counts[card_id // 1000] < 2:
+                    deck.append(card_id)
+                    counts[card_id // 1000] += 1
+            if len(deck) != 6:
+                continue
+            rng.shuffle(deck)
+            if self.is_valid(deck):
+                centers = self.center_candidates(deck)
+                return tuple(deck), rng.choice(centers) if centers else -1
+        return None
+
+    def neighbor(self, state, rng: random.Random, max_tries: int = 50):
+        """隨機選擇一種移動，返回合法的鄰居或 None"""
+        order, center_index = state
+        for _ in range(max_tries):
+            move = rng.choice(MOVES)
+            new_order = list(order)
+            new_center = center_index
+            if move == "swap":
+                i, j = rng.sample(range(6), 2)
+                new_order[i], new_order[j] = new_order[j], new_order[i]
+                if new_center == i:
+                    new_center = j
+                elif new_center == j:
+                    new_center = i
+            elif move == "same_char":
+                i = rng.randrange(6)
+                options = [c for c in self.char_id_to_cards[order[i] // 1000] if c not in order]
+                if not options:
+                    continue
+                new_order[i] = rng.choice(options)
+            elif move == "replace":
+                i = rng.randrange(6)
+                counts = Counter(card_id // 1000 for card_id in order)
+                counts[order[i] // 1000] -= 1
+                options = [c for c in self.cardpool
+                           if c not in order and c // 1000 != order[i] // 1000 and counts[c // 1000] < 2]
+                if not options:
+                    continue
+                new_order[i] = rng.choice(options)
+            else:
+                centers = [i for i in self.center_candidates(order) if i != center_index]
+                if not centers:
+                    continue
+                new_center = rng.choice(centers)
+
+            if move != "center":
+                if not self.is_valid(new_order):
+                    continue
+                centers = self.center_candidates(new_order)
+                if new_center not in centers:
+                    new_center = rng.choice(centers) if centers else -1
+            return tuple(new_order), new_center
+        return None
+
+
+def run_search_chain(task_args: tuple) -> list[dict]:
+    """
+    單條退火鏈，在子進程中執行。
+
+    Args:
+        task_args: (space, simulate, chart, mastery, custom_card_levels, search_config, chain_index)，
+            simulate 為模擬函式，介面同 run_game_simulation
+
+    Returns:
+        該鏈評估過的所有 (組合, C位) 的最佳結果，格式與 run_game_simulation 相同
+    """
+    space, simulate, chart, mastery, custom_card_levels, search_config, chain_index = task_args
+    rng = random.Random(search_config["seed"] * 1000 + chain_index)
+    steps = search_config["steps"]
+    t_start = search_config["t_start"]
+    t_end = search_config["t_end"]
+
+    cache = {}
+    best_by_comp = {}
+
+    def evaluate(state):
+        if state in cache:
+            return cache[state]
+        order, center_index = state
+        result = simulate((
+            convert_deck_to_simulator_format(list(order), custom_card_levels),
+            chart, mastery, chain_index, order, center_index
+        ))
+        cache[state] = score = result["final_score"]
+        key = tuple(sorted(order))
+        if key not in best_by_comp or score > best_by_comp[key]["final_score"]:
+            best_by_comp[key] = result
+        return score
+
+    current = space.random_state(rng)
+    if current is None:
+        logger.warning(f"[Search] chain {chain_index}: 找不到符合規則的初始卡組")
+        return []
+    current_score = evaluate(current)
+
+    for step in range(steps):
+        temperature = t_start * (t_end / t_start) ** (step / max(1, steps - 1))
+        candidate = space.neighbor(current, rng)
+        if candidate is None:
+            candidate = space.random_state(rng)
+            if candidate is None:
+                break
+        score = evaluate(candidate)
+        # 以相對分差計算接受率，溫度與歌曲分數量級無關
+        delta = (score - current_score) / max(1, current_score)
+        if delta >= 0 or rng.random() < math.exp(delta / temperature):
+            current, current_score = candidate, score
+
+    logger.debug(f"[Search] chain {chain_index}: {len(cache)} 次模擬")
+    return list(best_by_comp.values())
+
+
+def search_results(pool, chains: int, space: SearchSpace, simulate, chart, mastery: int, custom_card_levels,
+                   search_config: dict):
+    """
+    在進程池中並行執行多條退火鏈，逐條返回結果（供 MainBatch 的結果迴圈消費）。
+
+    simulate 為模擬函式（須可 pickle，如 MainBatch 的 SIMULATE），與窮舉模式使用同一個引擎。
+    """
+    tasks = [(space, simulate, chart, mastery, custom_card_levels, search_config, i) for i in range(chains)]
+    for chain_results in pool.imap_unordered(run_search_chain, tasks):
+        yield from chain_results
@@ -0,0 +1,233 @@
+"""
+單一組合的出牌順序搜索
+
+MainBatch 預設對每個組合模擬全部合法排列（最多 720 × C位數），
+但通常只有少數順序有競爭力。本模組以啟發式順序為起點做局部搜索：
+    - 啟發式：加成卡在前，分卡在加成卡之後，洗牌卡放在倒數第二位
+    - 鄰域：相鄰交換、整體左/右旋轉、切換C位
+每個組合只需模擬數十次。
+
+audit_composition 會同時跑窮舉與局部搜索，用於評估漏掉最佳順序的頻率。
+"""
+import itertools
+import logging
+import random
+
+from .DeckGen2 import DB_TAG, is_valid_order
+from ..config.CardLevelConfig import convert_deck_to_simulator_format
+from ..core.SkillResolver import SkillEffectType
+
+logger = logging.getLogger(__name__)
+
+# 啟發式排序類別：數字越小越靠前
+_BONUS_EFFECTS = {SkillEffectType.NextAPGainRateChange, SkillEffectType.NextVoltageGainRateChange}
+
+
+def _heuristic_class(card_id: int) -> int:
+    tags = DB_TAG[card_id]
+    if SkillEffectType.DeckReset in tags:
+        return 3
+    if SkillEffectType.ScoreGain in tags:
+        return 2
+    if tags & _BONUS_EFFECTS:
+        return 0
+    return 1
+
+
+def _repair(order: list[int]):
+    """
+    將違反首尾規則的排列修正為合法排列，無法修正（組合沒有任何合法排列）時返回 None
+
+    先嘗試交換兩張卡；首尾都需要修正且無法以一次交換完成時，
+    另外挑選合法的第一張與最後一張，其餘卡牌保持原順序。
+    """
+    if is_valid_order(order):
+        return tuple(order)
+    for i in range(len(order)):
+        for j in range(len(order)):
+            if i == j:
+                continue
+            candidate = list(order)
+            candidate[i], candidate[j] = candidate[j], candidate[i]
+            if is_valid_order(candidate):
+                return tuple(candidate)
+    for i in range(len(order)):
+        for j in reversed(range(len(order))):
+            if i == j:
+                continue
+            candidate = [order[i]] + [c for k, c in enumerate(order) if k != i and k != j] + [order[j]]
+            if is_valid_order(candidate):
+                return tuple(candidate)
+    return None
+
+
+def heuristic_orders(composition, rng: random.Random, random_seeds: int = 2) -> list[tuple]:
+    """
+    產生局部搜索的起點：
+        1. 按 加成 → 輔助 → 分卡 排列，洗牌卡放倒數第二位
+        2. 同上但洗牌卡放最前（部分卡組需要先洗牌）
+        3. 若干隨機合法排列
+    """
+    cards = sorted(composition, key=_heuristic_class)
+    resets = [c for c in cards if _heuristic_class(c) == 3]
+    others = [c for c in cards if _heuristic_class(c) != 3]
+
+    seeds = []
+    late = others[:-1] + resets + others[-1:] if others else list(resets)
+    seeds.append(_repair(late))
+    seeds.append(_repair(resets + others))
+    for _ in range(random_seeds):
+        order = list(composition)
+        rng.shuffle(order)
+        seeds.append(_repair(order))
+
+    unique = []
+    for seed in seeds:
+        if seed is not None and seed not in unique:
+            unique.append(seed)
+    return unique
+
+
+def _neighbors(order: tuple, center_card, center_cards: list[int]):
+    """相鄰交換、旋轉、切換C位"""
+    n = len(order)
+    for i in range(n - 1):
+        new_order = list(order)
+        new_order[i], new_order[i + 1] = new_order[i + 1], new_order[i]
+        yield tuple(new_order), center_card
+    yield order[1:] + order[:1], center_card
+    yield order[-1:] + order[:-1], center_card
+    for card_id in center_cards:
+        if card_id != center_card:
+            yield order, card_id
+
+
+def center_cards_of(composition, center_char, leader_designation=0) -> list[int]:
+    """可作為C位的卡牌，與 task_generator_func 的規則一致；沒有時返回 [None]（自動選擇）"""
+    leader = int(leader_designation or 0)
+    if leader:
+        cards = [c for c in composition if c == leader]
+    else:
+        cards = [c for c in composition if c // 1000 == center_char]
+    return cards or [None]
+
+
+class _Evaluator:
+    """帶快取的模擬器調用，記錄模擬次數；simulate 為模擬函式，介面同 run_game_simulation"""
+
+    def __init__(self, simulate, chart, mastery, custom_card_levels, index):
+        self.simulate = simulate
+        self.chart = chart
+        self.mastery = mastery
+        self.custom_card_levels = custom_card_levels
+        self.index = index
+        self.cache = {}
+        self.best = None
+
+    def __call__(self, order: tuple, center_card) -> int:
+        key = (order, center_card)
+        if key in self.cache:
+            return self.cache[key]
+        center_index = order.index(center_card) if center_card is not None else -1
+        result = self.simulate((
+            convert_deck_to_simulator_format(list(order), self.custom_card_levels),
+            self.chart, self.mastery, self.index, order, center_index
+        ))
+        score = result["final_score"]
+        self.cache[key] = score
+        if self.best is None or score > self.best["final_score"]:
+            self.best = result
+        return score
+
+
+def search_order(evaluate: _Evaluator, composition, center_cards: list[int], order_config: dict, rng: random.Random):
+    """
+    對單一組合做 first-improvement 局部搜索，模擬次數上限為 max_evals；
+    組合沒有合法排列時返回 None
+    """
+    max_evals = order_config["max_evals"]
+    for seed in heuristic_orders(composition, rng, order_config["random_seeds"]):
+        if len(evaluate.cache) >= max_evals:
+            break
+        current = (seed, center_cards[0])
+        current_score = evaluate(*current)
+        improved = True
+        while improved and len(evaluate.cache) < max_evals:
+            improved = False
+            neighbors = list(_neighbors(current[0], current[1], center_cards))
+            rng.shuffle(neighbors)
+            for candidate in neighbors:
+                if not is_valid_order(candidate[0]):
+                    continue
+                if len(evaluate.cache) >= max_evals:
+                    break
+                score = evaluate(*candidate)
+                if score > current_score:
+                    current, current_score = candidate, score
+                    improved = True
+                    break
+    return evaluate.best
+
+
+def optimize_order(task_args: tuple) -> dict:
+    """
+    子進程任務：返回該組合找到的最佳順序，格式與 run_game_simulation 相同，
+    另帶 "simulations" 欄位記錄實際模擬次數。組合沒有合法排列時返回 None（與窮舉模式不產生任何排列一致）。
+
+    Args:
+        task_args: (composition, simulate, chart, mastery, custom_card_levels, leader_designation, order_config, index)，
+            simulate 為模擬函式（MainBatch 的 SIMULATE）
+    """
+    composition, simulate, chart, mastery, custom_card_levels, leader_designation, order_config, index = task_args
+    rng = random.Random(order_config["seed"] * 1_000_003 + index)
+    center_cards = center_cards_of(composition, chart.music.CenterCharacterId, leader_designation)
+    evaluate = _Evaluator(simulate, chart, mastery, custom_card_levels, index)
+    result = search_order(evaluate, composition, center_cards, order_config, rng)
+    if result is not None:
+        result["simulations"] = len(evaluate.cache)
+    return result
+
+
+def audit_composition(task_args: tuple) -> dict:
+    """
+    子進程任務：對同一組合分別做窮舉與局部搜索，task_args 同 optimize_order。
+
+    Returns:
+        {"deck_card_ids", "exhaustive_score", "search_score", "exhaustive_sims", "search_sims"}；
+        組合沒有合法排列時返回 None
+    """
+    composition, simulate, chart, mastery, custom_card_levels, leader_designation, order_config, index = task_args
+
+    center_cards = center_cards_of(composition, chart.music.CenterCharacterId, leader_designation)
+    exhaustive = _Evaluator(simulate, chart, mastery, custom_card_levels, index)
+    for perm in itertools.permutations(composition):
+        if not is_valid_order(perm):
+            continue
+        for center_card in center_cards:
+            exhaustive(tuple(perm), center_card)
+    if exhaustive.best is None:
+        return None
+
+    rng = random.Random(order_config["seed"] * 1_000_003 + index)
+    searched = _Evaluator(simulate, chart, mastery, custom_card_levels, index)
+    search_order(searched, composition, center_cards, order_config, rng)
+    return {
+        "deck_card_ids": list(composition),
+        "exhaustive_score": exhaustive.best["final_score"],
+        "search_score": searched.best["final_score"],
+        "exhaustive_sims": len(exhaustive.cache),
+        "search_sims": len(searched.cache),
+    }
+
+
+def summarize_audit(reports: list[dict]) -> str:
+    """彙總 audit 結果：漏掉最佳順序的比例、平均/最大分差、模擬次數"""
+    if not reports:
+        return "[Order] audit: 沒有可用的組合"
+    missed = [r for r in reports if r["search_score"] < r["exhaustive_score"]]
+    gaps = [(r["exhaustive_score"] - r["search_score"]) / max(1, r["exhaustive_score"]) for r in reports]
+    exhaustive_sims = sum(r["exhaustive_sims"] for r in reports)
+    search_sims = sum(r["search_sims"] for r in reports)
+    return (f"[Order] audit {len(reports)} 個組合: 漏掉最佳順序 {len(missed)} 次 ({len(missed) / len(reports):.2%}), "
+            f"平均分差 {sum(gaps) / len(gaps):.4%}, 最大分差 {max(gaps):.4%}, "
+            f"模擬次數 {search_sims} / {exhaustive_sims} ({search_sims / max(1, exhaustive_sims):.2%})")
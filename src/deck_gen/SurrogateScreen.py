@@ -0,0 +1,407 @@
+"""
+代理模型篩選 (Surrogate screening)
+
+利用既有的 simulation_results_<id>_<tier>.json 訓練一個輕量線性模型，
+預測卡組「組合」（不含順序）的得分，只完整模擬預測值落在當前 top-K 附近的組合。
+
+特徵：
+    - 單卡貢獻 / 兩兩卡牌組合貢獻
+    - 單卡 × 譜面特徵（音符數、FEVER 區間佔比）
+
+各首歌的分數先除以該檔案的中位數做正規化，模型預測的是「相對分數」，
+實際使用時再以已模擬組合的 實際分/預測分 中位數換算回絕對分數。
+
+校準用法（不需要重新模擬，直接用完整跑過的 log 當基準；按生成器的枚舉順序重播，
+卡池讀取配置的 card_ids，與 MainBatch 交給篩選器的順序相同）：
+    python -m src.deck_gen.SurrogateScreen log/simulation_results_405117_02.json --top-k 1000 --margins 0.02 0.05 0.1
+"""
+import argparse
+import heapq
+import logging
+import os
+import random
+import re
+from itertools import combinations
+from statistics import median
+
+from ..utils.result_stream import iter_results
+
+logger = logging.getLogger(__name__)
+
+RESULT_FILE_PATTERN = re.compile(r"simulation_results_(\d+)_(\d+)\.json$")
+
+
+def chart_features(chart) -> tuple[float, float]:
+    """
+    譜面特徵：(音符數/1000, FEVER 區間佔全曲比例)
+    """
+    play_time = chart.music.PlayTime / 1000 if chart.music.PlayTime else 0
+    fever = 0.0
+    if play_time > 0:
+        fever = max(0.0, chart.FeverEndTime - chart.FeverStartTime) / play_time
+    return chart.AllNoteSize / 1000, fever
+
+
+def composition_features(card_ids, chart_feats: tuple[float, float]) -> list[tuple[tuple, float]]:
+    """
+    將一個卡組組合轉為稀疏特徵 [(key, value), ...]，與卡牌順序無關。
+    """
+    notes, fever = chart_feats
+    cards = sorted(card_ids)
+    feats = [(("b",), 1.0), (("bn",), notes), (("bf",), fever)]
+    for card_id in cards:
+        feats.append((("c", card_id), 1.0))
+        feats.append((("cn", card_id), notes))
+        feats.append((("cf", card_id), fever))
+    for a, b in combinations(cards, 2):
+        feats.append((("p", a, b), 1.0))
+    return feats
+
+
+class SurrogateModel:
+    """
+    稀疏特徵的 ridge 迴歸，以 SGD 求解（純 Python，PyPy 下也能跑）
+    """
+
+    def __init__(self, l2: float = 1e-4, learning_rate: float = 0.02, epochs: int = 5, seed: int = 0):
+        self.l2 = l2
+        self.learning_rate = learning_rate
+        self.epochs = epochs
+        self.seed = seed
+        self.weights: dict[tuple, float] = {}
+
+    def predict(self, feats) -> float:
+        weights = self.weights
+        return sum(weights.get(key, 0.0) * value for key, value in feats)
+
+    def fit(self, samples: list[tuple[list, float]]):
+        """
+        samples: [(features, normalized_score), ...]
+        """
+        rng = random.Random(self.seed)
+        order = list(range(len(samples)))
+        weights = self.weights
+        for epoch in range(self.epochs):
+            rng.shuffle(order)
+            lr = self.learning_rate / (1 + epoch)
+            total_loss = 0.0
+            for i in order:
+                feats, target = samples[i]
+                err = self.predict(feats) - target
+                total_loss += err * err
+                for key, value in feats:
+                    w = weights.get(key, 0.0)
+                    weights[key] = w - lr * (err * value + self.l2 * w)
+            if samples:
+                logger.debug(f"[Surrogate] epoch {epoch + 1}/{self.epochs} mse={total_loss / len(samples):.6f}")
+        return self
+
+
+def load_result_entries(path: str) -> list[tuple[tuple, int]]:
+    """
+    串流讀取模擬結果檔，返回 [(sorted card ids, score), ...]，同組合只保留最高分。
+    """
+    best = {}
+    for result in iter_results(path):
+        key = tuple(sorted(result["deck_card_ids"]))
+        score = result["score"]
+        if score > best.get(key, -1):
+            best[key] = score
+    return list(best.items())
+
+
+def collect_training_samples(log_dir: str, music_db, exclude: set[str] = None,
+                             max_samples_per_song: int = 20000, seed: int = 0):
+    """
+    從 log 目錄收集訓練資料。
+
+    Returns:
+        (samples, scales): samples 為 [(features, normalized_score), ...]，
+        scales 為 {檔名: 該檔分數中位數}，供換算絕對分數使用。
+    """
+    from ..core.RChart import Chart
+
+    exclude = exclude or set()
+    rng = random.Random(seed)
+    samples = []
+    scales = {}
+    if not log_dir or not os.path.isdir(log_dir):
+        return samples, scales
+
+    for filename in sorted(os.listdir(log_dir)):
+        match = RESULT_FILE_PATTERN.match(filename)
+        if not match or filename in exclude:
+            continue
+        music_id, tier = match.groups()
+        try:
+            chart = Chart(music_db, music_id, tier)
+            entries = load_result_entries(os.path.join(log_dir, filename))
+        except Exception as e:
+            logger.warning(f"[Surrogate] 跳過 {filename}: {e}")
+            continue
+        if not entries or not chart.AllNoteSize:
+            continue
+
+        scale = median(score for _, score in entries) or 1
+        scales[filename] = scale
+        if len(entries) > max_samples_per_song:
+            entries = rng.sample(entries, max_samples_per_song)
+        feats = chart_features(chart)
+        for cards, score in entries:
+            samples.append((composition_features(cards, feats), score / scale))
+        logger.info(f"[Surrogate] 載入 {filename}: {len(entries)} 筆")
+    return samples, scales
+
+
+class SurrogateScreen:
+    """
+    組合篩選器，作為 DeckGeneratorWithDoubleCards 的 composition_filter 使用。
+
+    - 前 warmup 個組合（以及 top-K 湊滿之前）全部放行，用於換算預測分與實際分
+    - 之後只放行 預測分 >= 第K名實際分 × (1 - margin) 的組合
+    - 主進程每收到一筆模擬結果需呼叫 update()
+    """
+
+    def __init__(self, model: SurrogateModel, chart_feats: tuple[float, float], top_k: int = 1000,
+                 margin: float = 0.05, warmup: int = 2000, refresh_interval: int = 1000, scale: float = None):
+        self.model = model
+        self.chart_feats = chart_feats
+        self.top_k = top_k
+        self.margin = margin
+        self.warmup = warmup
+        self.refresh_interval = refresh_interval
+        self.scale = scale
+        self.threshold = None
+
+        self.best_by_comp: dict[tuple, int] = {}
+        self.pred_by_comp: dict[tuple, float] = {}
+        self._updates_since_refresh = 0
+
+        self.seen = 0
+        self.passed = 0
+
+    def predict(self, card_ids) -> float:
+        """返回正規化後的預測分"""
+        return self.model.predict(composition_features(card_ids, self.chart_feats))
+
+    def __call__(self, deck) -> bool:
+        self.seen += 1
+        key = tuple(sorted(deck))
+        pred = self.predict(key)
+        if self.seen == self.warmup + 1:
+            self.refresh()
+        if self.seen > self.warmup and self.threshold is not None and self.scale is not None:
+            if pred * self.scale < self.threshold * (1 - self.margin):
+                return False
+        self.pred_by_comp[key] = pred
+        self.passed += 1
+        return True
+
+    def seed_results(self, entries):
+        """載入既有模擬結果，讓增量模擬一開始就有 top-K 門檻"""
+        for cards, score in entries:
+            key = tuple(sorted(cards))
+            if score > self.best_by_comp.get(key, -1):
+                self.best_by_comp[key] = score
+        self.refresh()
+
+    def update(self, deck_card_ids, score: int):
+        key = tuple(sorted(deck_card_ids))
+        if score > self.best_by_comp.get(key, -1):
+            self.best_by_comp[key] = score
+        self._updates_since_refresh += 1
+        if self._updates_since_refresh >= self.refresh_interval:
+            self.refresh()
+
+    def refresh(self):
+        """重新計算第K名門檻與分數換算比例"""
+        self._updates_since_refresh = 0
+        if len(self.best_by_comp) >= self.top_k:
+            self.threshold = heapq.nlargest(self.top_k, self.best_by_comp.values())[-1]
+        ratios = [self.best_by_comp[key] / pred for key, pred in self.pred_by_comp.items()
+                  if pred > 0 and key in self.best_by_comp]
+        if ratios:
+            self.scale = median(ratios)
+
+    def summary(self) -> str:
+        rate = self.passed / self.seen if self.seen else 0
+        return (f"[Surrogate] 篩選 {self.seen} 個組合，完整模擬 {self.passed} 個 ({rate:.2%})，"
+                f"門檻={self.threshold}, margin={self.margin}")
+
+
+def build_screen(surrogate_config: dict, chart, log_dir: str, music_db, result_filename: str = None):
+    """
+    依配置訓練模型並返回 SurrogateScreen；沒有可用訓練資料時返回 None。
+
+    Args:
+        surrogate_config: ConfigManager.get_surrogate_config() 的結果
+        chart: 當前歌曲的 Chart
+        log_dir: 當前歌曲輸出目錄（既有結果用於門檻初始化）
+        result_filename: 當前歌曲結果檔名（位於 log_dir 內）
+    """
+    train_dir = surrogate_config.get("training_log_dir") or log_dir
+    samples, scales = collect_training_samples(
+        train_dir, music_db,
+        max_samples_per_song=surrogate_config["max_samples_per_song"],
+        seed=surrogate_config["seed"],
+    )
+    if not samples:
+        logger.warning(f"[Surrogate] {train_dir} 中沒有可用的模擬結果，停用篩選")
+        return None
+
+    model = SurrogateModel(
+        l2=surrogate_config["l2"],
+        learning_rate=surrogate_config["learning_rate"],
+        epochs=surrogate_config["epochs"],
+        seed=surrogate_config["seed"],
+    ).fit(samples)
+    logger.info(f"[Surrogate] 以 {len(samples)} 筆資料訓練完成，特徵數 {len(model.weights)}")
+
+    screen = SurrogateScreen(
+        model, chart_features(chart),
+        top_k=surrogate_config["top_k"],
+        margin=surrogate_config["margin"],
+        warmup=surrogate_config["warmup"],
+        refresh_interval=surrogate_config["refresh_interval"],
+    )
+    if result_filename:
+        result_path = os.path.join(log_dir, result_filename)
+        if os.path.exists(result_path):
+            entries = load_result_entries(result_path)
+            screen.seed_results(entries)
+            if os.path.abspath(train_dir) == os.path.abspath(log_dir) and result_filename in scales:
+                screen.scale = scales[result_filename]
+    return screen
+
+
+def generation_order(entries: list[tuple[tuple, int]], center_char, card_ids: list[int] = None) -> list[tuple[tuple, int]]:
+    """
+    按 DeckGeneratorWithDoubleCards.iter_compositions 的順序（逐一產生的字典序）排列 entries，
+    與 MainBatch 把組合交給篩選器的順序相同；生成器不會產生的組合按原順序接在最後。
+
+    Args:
+        entries: load_result_entries 的結果
+        center_char: 譜面的C位角色
+        card_ids: MainBatch 使用的卡池（決定枚舉順序），預設為結果中出現的卡牌
+    """
+    from .DeckGen2 import DeckGeneratorWithDoubleCards
+
+    scores = dict(entries)
+    cardpool = card_ids or sorted({card_id for cards, _ in entries for card_id in cards})
+    # 結果中的組合都已通過必帶卡與技能規則，這裡不再篩選，只重現枚舉順序
+    generator = DeckGeneratorWithDoubleCards(cardpool, [[], [], []], center_char, simulated_decks=set(),
+                                             count_orders=False)
+    order = []
+    for deck in generator.iter_compositions():
+        key = tuple(sorted(deck))
+        if key in scores:
+            order.append((key, scores.pop(key)))
+    if scores:
+        logger.warning(f"[Surrogate] {len(scores)} 個組合不在卡池的枚舉中，接在最後重播")
+        order.extend((cards, score) for cards, score in entries if cards in scores)
+    return order
+
+
+def calibrate(log_path: str, music_db, surrogate_config: dict, margins: list[float], train_dir: str = None,
+              card_ids: list[int] = None):
+    """
+    以完整模擬的 log 為基準，離線評估篩選效果。
+    按生成器產生組合的順序（generation_order）重播該曲所有組合，統計每個 margin 下：
+        - 完整模擬比例（≈ 模擬耗時比例）
+        - 真實 top-K 的召回率
+        - 真實第一名是否被保留
+
+    Returns:
+        [{"margin", "simulated", "total", "fraction", "recall", "best_kept"}, ...]
+    """
+    from ..core.RChart import Chart
+
+    filename = os.path.basename(log_path)
+    match = RESULT_FILE_PATTERN.match(filename)
+    if not match:
+        raise ValueError(f"無法從檔名解析歌曲ID與難度: {filename}")
+    music_id, tier = match.groups()
+    chart = Chart(music_db, music_id, tier)
+    train_dir = train_dir or surrogate_config.get("training_log_dir") or os.path.dirname(log_path)
+
+    samples, _ = collect_training_samples(
+        train_dir, music_db, exclude={filename},
+        max_samples_per_song=surrogate_config["max_samples_per_song"],
+        seed=surrogate_config["seed"],
+    )
+    if not samples:
+        raise ValueError(f"{train_dir} 中除了 {filename} 以外沒有可用的訓練資料")
+    model = SurrogateModel(
+        l2=surrogate_config["l2"],
+        learning_rate=surrogate_config["learning_rate"],
+        epochs=surrogate_config["epochs"],
+        seed=surrogate_config["seed"],
+    ).fit(samples)
+
+    entries = load_result_entries(log_path)
+    top_k = min(surrogate_config["top_k"], len(entries))
+    ranked = sorted(entries, key=lambda e: e[1], reverse=True)
+    true_top = {cards for cards, _ in ranked[:top_k]}
+    true_best = ranked[0][0]
+
+    order = generation_order(entries, chart.music.CenterCharacterId, card_ids)
+
+    reports = []
+    for margin in margins:
+        screen = SurrogateScreen(
+            model, chart_features(chart),
+            top_k=top_k, margin=margin,
+            warmup=surrogate_config["warmup"],
+            refresh_interval=surrogate_config["refresh_interval"],
+        )
+        kept = set()
+        for cards, score in order:
+            if screen(cards):
+                kept.add(cards)
+                screen.update(cards, score)
+        reports.append({
+            "margin": margin,
+            "simulated": len(kept),
+            "total": len(entries),
+            "fraction": len(kept) / len(entries),
+            "recall": len(kept & true_top) / top_k,
+            "best_kept": true_best in kept,
+        })
+    return reports
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    from ..core.RChart import MusicDB
+    from ..config.config_manager import ConfigManager
+
+    parser = argparse.ArgumentParser(description='代理模型篩選校準：以完整模擬結果評估召回率與加速比')
+    parser.add_argument('log_path', help='完整模擬的結果檔 simulation_results_<id>_<tier>.json')
+    parser.add_argument('--train-dir', type=str, default=None, help='訓練資料目錄（預設為結果檔所在目錄）')
+    parser.add_argument('--top-k', type=int, default=None, help='評估的 top-K（預設讀取配置）')
+    parser.add_argument('--margins', type=float, nargs='+', default=None, help='要比較的 margin 列表')
+    parser.add_argument('--warmup', type=int, default=None, help='不篩選的前置組合數')
+    args = parser.parse_args()
+
+    surrogate_config = ConfigManager.DEFAULT_SURROGATE_CONFIG.copy()
+    card_ids = None
+    try:
+        from ..config.config_manager import get_config
+        config = get_config()
+        surrogate_config = config.get_surrogate_config()
+        card_ids = config.get_card_ids() or None
+    except (ValueError, FileNotFoundError):
+        pass
+    if args.top_k is not None:
+        surrogate_config["top_k"] = args.top_k
+    if args.warmup is not None:
+        surrogate_config["warmup"] = args.warmup
+    margins = args.margins or [surrogate_config["margin"]]
+
+    reports = calibrate(args.log_path, MusicDB(), surrogate_config, margins, args.train_dir, card_ids)
+    logger.info(f"\n{'margin':>8} {'模擬比例':>10} {'加速':>8} {'top-K召回':>10} {'第一名':>6}")
+    for r in reports:
+        speedup = 1 / r["fraction"] if r["fraction"] else float("inf")
+        logger.info(f"{r['margin']:>8.3f} {r['fraction']:>10.2%} {speedup:>7.1f}x {r['recall']:>10.2%} "
+                    f"{'保留' if r['best_kept'] else '遺失':>6}")
@@ -0,0 +1,129 @@
+"""
+多歌曲求解器的卡組倒排索引
+
+每首歌的卡組按 pt 由高到低排列，求解時需要反覆尋找
+「排名 >= start 且不含某些卡牌」的第一個卡組。線性掃描在卡組高度重疊時
+會跳過成千上萬個衝突卡組，這裡改為：
+
+    對每張卡牌，建立一個以排名為位元的 bitset，標記「不含該卡牌」的卡組
+
+第一個相容卡組即為已用卡牌對應 bitset 的 AND 之最低位。
+bitset 按區塊儲存（每塊為一個 BLOCK_BITS 位元的 Python 整數，塊內 AND 由大整數運算完成），
+查詢時逐塊計算，找到非零區塊即停止。
+Cython 版本 (cython/optimizer_core.pyx) 使用相同結構，區塊為 64 位元 word。
+"""
+
+BLOCK_BITS = 4096
+BLOCK_MASK = (1 << BLOCK_BITS) - 1
+
+
+def mask_to_bits(mask: int) -> list[int]:
+    """將卡組位元遮罩展開為卡牌 bit 位列表"""
+    bits = []
+    while mask:
+        low = mask & -mask
+        bits.append(low.bit_length() - 1)
+        mask ^= low
+    return bits
+
+
+class DeckIndex:
+    """
+    單首歌的卡組倒排索引
+
+    Args:
+        masks: 按排名排列的卡組位元遮罩（bit 位由 card_to_bit 決定）
+        n_cards: 卡牌 bit 位總數
+    """
+
+    def __init__(self, masks: list[int], n_cards: int):
+        self.size = len(masks)
+        self.n_cards = n_cards
+        self.n_blocks = (self.size + BLOCK_BITS - 1) // BLOCK_BITS
+
+        # 先按卡牌收集「含該卡」的排名位元，再取補集
+        contains = [[0] * n_cards for _ in range(self.n_blocks)]
+        for rank, mask in enumerate(masks):
+            row = contains[rank // BLOCK_BITS]
+            bit = 1 << (rank % BLOCK_BITS)
+            for c in mask_to_bits(mask):
+                row[c] |= bit
+
+        # rows[b][c]: 第 b 個區塊中，不含卡牌 c 的卡組
+        self.valid = []
+        self.rows = []
+        for b in range(self.n_blocks):
+            full = (1 << min(BLOCK_BITS, self.size - b * BLOCK_BITS)) - 1
+            self.valid.append(full)
+            self.rows.append([full & ~x for x in contains[b]])
+
+    def restrict(self, cards: list[int], base: list[int] = None) -> list[int]:
+        """
+        返回不含 cards 中任何卡牌的卡組集合（按區塊），
+        可作為 first 的 base 重複使用，避免內層迴圈重算外層卡組的 AND
+
+        Args:
+            cards: 已使用卡牌的 bit 位列表
+            base: 先前 restrict 的結果，在其上繼續收窄
+        """
+        restricted = []
+        for row, x in zip(self.rows, base or self.valid):
+            if x:
+                for c in cards:
+                    x &= row[c]
+            restricted.append(x)
+        return restricted
+
+    def first(self, cards: list[int], start: int = 0, base: list[int] = None) -> int:
+        """
+        返回排名 >= start 且不含 cards 中任何卡牌的第一個卡組索引，找不到時返回 -1
+
+        Args:
+            cards: 已使用卡牌的 bit 位列表
+            start: 起始索引（0 起算）
+            base: restrict 的結果，只在其中搜尋
+        """
+        if start >= self.size:
+            return -1
+        rows = self.rows
+        base = base or self.valid
+        b = start // BLOCK_BITS
+        x = base[b] & (BLOCK_MASK << (start % BLOCK_BITS))
+        while True:
+            if x:
+                row = rows[b]
+                for c in cards:
+                    x &= row[c]
+                if x:
+                    return b * BLOCK_BITS + (x & -x).bit_length() - 1
+            b += 1
+            if b >= self.n_blocks:
+                return -1
+            x = base[b]
+
+    def iter_compatible(self, cards: list[int], start: int = 0, base: list[int] = None):
+        """
+        按排名順序產生所有不含 cards 的卡組索引
+
+        Args:
+            cards: 已使用卡牌的 bit 位列表
+            start: 起始索引（0 起算）
+            base: restrict 的結果，只在其中搜尋
+        """
+        rows = self.rows
+        base = base or self.valid
+        first_block = start // BLOCK_BITS
+        for b in range(first_block, self.n_blocks):
+            x = base[b]
+            if b == first_block:
+                x &= BLOCK_MASK << (start % BLOCK_BITS)
+            if not x:
+                continue
+            row = rows[b]
+            for c in cards:
+                x &= row[c]
+            offset = b * BLOCK_BITS
+            while x:
+                low = x & -x
+                yield offset + low.bit_length() - 1
+                x ^= low
@@ -0,0 +1,165 @@
+"""
+多歌曲不重複卡組的分支定界搜尋
+
+N 首歌各選一個卡組，卡組之間不可有重複卡牌，求總 Pt 最高的前 K 個組合：
+
+    - 歌曲按分支數排序：最高 Pt 附近卡組較少的歌曲放在外層，外層迴圈更早被上限截斷
+    - 深度優先搜尋，已用卡牌透過倒排索引 (DeckIndex) 的 bitset 逐層收窄剩餘歌曲的候選卡組
+    - 剩餘歌曲的上限為「與已選卡組相容的最高 Pt」之和，不會低估，隨已用卡牌收緊
+    - 展開卡組前先以卡牌排除上限表 (exclusion) 檢查：剩餘歌曲不含該卡組任一張卡（或任一對卡）的最高 Pt
+    - 降級為較少歌曲時只需改變 song_count，對每個歌曲子集執行同一個搜尋
+
+search_disjoint 為純 Python 實作；Cython 版本 optimizer_core.optimize_songs_top_k
+與 NumPy 版本 numpy_search.search_numpy 介面相同，可作為 solve 的 search 參數。
+"""
+import itertools
+import logging
+
+from src.optimizer.deck_index import DeckIndex, mask_to_bits
+from src.optimizer.exclusion import EXCLUDE_PAIRS, deck_bounds, exclusion_table, exclusion_upper
+from src.optimizer.top_k import TopCombos
+
+logger = logging.getLogger(__name__)
+
+# 支援的歌曲數上限（與 Cython 版本的 MAX_SONGS 一致）
+MAX_SONGS = 6
+
+
+def order_songs(levels: list[list[dict]]) -> list[int]:
+    """
+    按分支數由小到大排列歌曲，返回排序後的索引
+
+    分支數以「Pt 與該歌曲最高 Pt 相差在 window 以內的卡組數」估計，
+    window 取各歌曲 Pt 跨度的最小值，同數量時保持原順序。
+
+    Args:
+        levels: 每首歌按 pt 降序排列的卡組（不可為空）
+    """
+    window = min(level[0]["pt"] - level[-1]["pt"] for level in levels)
+
+    def branching(i):
+        floor = levels[i][0]["pt"] - window
+        return sum(1 for deck in levels[i] if deck["pt"] >= floor)
+
+    return sorted(range(len(levels)), key=lambda i: (branching(i), i))
+
+
+def search_disjoint(levels: list[list[dict]], k: int = 1, callback=None, floor: int = -1,
+                    exclusion: int = EXCLUDE_PAIRS, stats: dict = None) -> list[tuple]:
+    """
+    按給定順序搜尋卡組互不重複的前 K 名組合
+
+    Args:
+        levels: 每首歌的卡組 [{"mask": int, "pt": int, ...}, ...]，按 pt 降序
+        k: 保留的組合數
+        callback: 可選的進度回呼函式 callback(current, total)，以第一首歌的卡組計算
+        floor: 只保留總 Pt 大於此值的組合（遞增搜尋時傳入已知的第 K 名）
+        exclusion: 卡牌排除上限（EXCLUDE_NONE / EXCLUDE_CARDS / EXCLUDE_PAIRS）
+        stats: 可選的統計字典，累加展開的節點數 "nodes" 與被排除上限剪去的卡組數 "excluded"
+
+    Returns:
+        [(total_pt, (deck_idx, ...)), ...]，按總 Pt 降序（同分時按找到順序）
+    """
+    top = TopCombos(k, floor)
+    if not levels or not all(levels):
+        return []
+
+    n_levels = len(levels)
+    n_cards = max(deck["mask"].bit_length() for level in levels for deck in level)
+    pts = [[deck["pt"] for deck in level] for level in levels]
+    bits = [[mask_to_bits(deck["mask"]) for deck in level] for level in levels]
+    indexes = [None] + [DeckIndex([deck["mask"] for deck in level], n_cards) for level in levels[1:]]
+    chosen = [0] * n_levels
+    last = n_levels - 1
+    counts = {"nodes": 0, "excluded": 0}
+
+    # bounds[d][j - d - 1][i]：第 j 首歌中不含 levels[d][i] 任一張卡（或任一對卡）的最高 Pt 上限
+    bounds = []
+    if exclusion and n_levels > 1:
+        tables = [None] + [exclusion_table(indexes[j], pts[j], exclusion) for j in range(1, n_levels)]
+        bounds = [[deck_bounds(bits[d], tables[j]) for j in range(d + 1, n_levels)] for d in range(last)]
+
+    def visit(d, total, bases, cards):
+        # 深度 d：已選 chosen[:d]，cards 為 chosen[d-1] 的卡牌，
+        # bases[j - d] 為第 j 首歌中與 chosen[:d-1] 相容的卡組
+        counts["nodes"] += 1
+        children = [indexes[j].restrict(cards, base=bases[j - d]) for j in range(d + 1, n_levels)]
+
+        # 剩餘歌曲的上限：各自與已選卡組相容的最高 Pt
+        heads = []
+        for j, base in enumerate(children, start=d + 1):
+            i = indexes[j].first([], base=base)
+            if i < 0:
+                return
+            heads.append(pts[j][i])
+        rest = sum(heads)
+
+        level_pts = pts[d]
+        for i in indexes[d].iter_compatible(cards, base=bases[0]):
+            subtotal = total + level_pts[i]
+            if subtotal + rest <= top.threshold:
+                break
+            chosen[d] = i
+            if d == last:
+                top.push(subtotal, tuple(chosen))
+            elif bounds and exclusion_upper(subtotal, heads, bounds[d], i) <= top.threshold:
+                counts["excluded"] += 1
+            else:
+                visit(d + 1, subtotal, children, bits[d][i])
+
+    n0 = len(levels[0])
+    progress_step = n0 // 100 if n0 >= 100 else 1
+    root_bases = [index.valid for index in indexes[1:]]
+    heads = [level[0] for level in pts[1:]]
+    rest = sum(heads)
+    for i, pt in enumerate(pts[0]):
+        if pt + rest <= top.threshold:
+            break
+        if callback is not None and i % progress_step == 0:
+            callback(i, n0)
+        chosen[0] = i
+        if n_levels == 1:
+            top.push(pt, tuple(chosen))
+        elif bounds and exclusion_upper(pt, heads, bounds[0], i) <= top.threshold:
+            counts["excluded"] += 1
+        else:
+            visit(1, pt, root_bases, bits[0][i])
+
+    if stats is not None:
+        for key, value in counts.items():
+            stats[key] = stats.get(key, 0) + value
+    return top.results()
+
+
+def solve(levels: list[list[dict]], song_count: int = None, k: int = 1,
+          search=search_disjoint, callback=None, labels: list = None) -> list[tuple]:
+    """
+    從 levels 中選 song_count 首歌（預設全部），求卡組互不重複的前 K 名組合
+
+    每個歌曲子集按 order_songs 排序後交給 search 求解，結果合併為前 K 名。
+
+    Args:
+        levels: 每首歌的卡組，按 pt 降序
+        song_count: 使用的歌曲數
+        k: 保留的組合數
+        search: 搜尋核心，介面同 search_disjoint
+        callback: 進度回呼函式，傳給 search
+        labels: 記錄搜尋順序時使用的歌曲名稱
+
+    Returns:
+        [(total_pt, combo), ...]，combo 與 levels 等長，未選用的歌曲為 None
+    """
+    song_count = song_count or len(levels)
+    labels = labels or [f"Song {i + 1}" for i in range(len(levels))]
+    top = TopCombos(k)
+    for songs in itertools.combinations(range(len(levels)), song_count):
+        if not all(levels[s] for s in songs):
+            continue
+        order = [songs[i] for i in order_songs([levels[s] for s in songs])]
+        logger.info(f"Search order: {[labels[s] for s in order]}")
+        for total_pt, indices in search([levels[s] for s in order], k, callback):
+            combo = [None] * len(levels)
+            for s, i in zip(order, indices):
+                combo[s] = levels[s][i]
+            top.push(total_pt, tuple(combo))
+    return top.results()
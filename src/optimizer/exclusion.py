@@ -0,0 +1,100 @@
+"""
+多歌曲求解器的卡牌排除上限表
+
+搜尋時剩餘歌曲的上限為「與已選卡組相容的最高 Pt」，但展開下一個卡組前
+並不知道它與剩餘歌曲的最高 Pt 卡組是否衝突；實際結果檔中最強的幾張卡
+幾乎出現在每首歌的高 Pt 卡組中，上限因此常常偏高。這裡預先為每首歌建立：
+
+    single[c]:    不含卡牌 c 的最高 Pt 卡組的 pt
+    pair[c1][c2]: 同時不含 c1、c2 的最高 Pt 卡組的 pt
+
+選定卡組 D 之後，第 j 首歌的上限不超過 D 中每張卡（或每對卡）對應值的最小值，
+展開 D 之前先以此剪枝，省去計算子節點候選集合的開銷。
+Cython 版本 (cython/optimizer_core.pyx) 使用相同的表。
+"""
+import itertools
+
+from src.optimizer.deck_index import DeckIndex
+
+# 沒有卡組能避開該卡牌（或卡牌對）時的值
+NO_DECK = -1
+
+# exclusion 參數：0 不使用排除上限、1 只用單張卡、2 另加卡牌對
+EXCLUDE_NONE, EXCLUDE_CARDS, EXCLUDE_PAIRS = 0, 1, 2
+
+
+def exclusion_table(index: DeckIndex, pts: list[int], exclusion: int = EXCLUDE_PAIRS) -> tuple:
+    """
+    建立一首歌的排除上限表
+
+    Args:
+        index: 該首歌的倒排索引
+        pts: 該首歌按排名排列的 pt
+        exclusion: EXCLUDE_CARDS 或 EXCLUDE_PAIRS
+
+    Returns:
+        (single, pair)：single[c] 為不含卡牌 c 的最高 pt；pair[c1][c2] 為同時不含兩張卡的最高 pt
+        （只用單張卡時為 None）；沒有這樣的卡組時為 NO_DECK
+    """
+    n_cards = index.n_cards
+    single = []
+    for c in range(n_cards):
+        i = index.first([c])
+        single.append(pts[i] if i >= 0 else NO_DECK)
+    if exclusion < EXCLUDE_PAIRS:
+        return single, None
+
+    pair = [[NO_DECK] * n_cards for _ in range(n_cards)]
+    for c1 in range(n_cards):
+        pair[c1][c1] = single[c1]
+        if single[c1] == NO_DECK:
+            continue
+        for c2 in range(c1 + 1, n_cards):
+            if single[c2] == NO_DECK:
+                continue
+            i = index.first([c1, c2])
+            if i >= 0:
+                pair[c1][c2] = pair[c2][c1] = pts[i]
+    return single, pair
+
+
+def deck_bounds(deck_bits: list[list[int]], table: tuple) -> list[int]:
+    """
+    每個卡組對應的上限：另一首歌中不含該卡組任一張卡的卡組，pt 不超過此值
+
+    Args:
+        deck_bits: 每個卡組的卡牌 bit 位列表
+        table: exclusion_table 的結果
+
+    Returns:
+        與 deck_bits 等長的上限列表；NO_DECK 表示另一首歌沒有相容的卡組
+    """
+    single, pair = table
+    bounds = []
+    for cards in deck_bits:
+        bound = min(single[c] for c in cards)
+        if pair is not None and bound != NO_DECK:
+            for c1, c2 in itertools.combinations(cards, 2):
+                if pair[c1][c2] < bound:
+                    bound = pair[c1][c2]
+        bounds.append(bound)
+    return bounds
+
+
+def exclusion_upper(subtotal: int, heads: list[int], bounds: list[list[int]], i: int) -> int:
+    """
+    選定第 i 個卡組後的總 Pt 上限；剩餘某首歌沒有相容卡組時返回 NO_DECK
+
+    Args:
+        subtotal: 含該卡組在內的已選總 Pt
+        heads: 剩餘各首歌與已選卡組相容的最高 Pt
+        bounds: 剩餘各首歌的 deck_bounds 結果
+        i: 卡組索引
+    """
+    upper = subtotal
+    for head, bound in zip(heads, bounds):
+        b = bound[i]
+        if b == NO_DECK:
+            return NO_DECK
+        upper += head if head < b else b
+    return upper
@@ -0,0 +1,293 @@
+"""
+TOP_N 截斷下的最佳性證明與卡組的遞增擴充
+
+求解器每首歌只載入 pt 前 N 名的卡組。若某首歌 i 的第 N+1 名 pt 為 next_i，
+任何用到第 i 首歌 N 名以外卡組的組合，總 Pt 不超過
+
+    next_i + UB(其餘歌曲)
+
+其中 UB(S) 為歌曲集合 S 在「全部卡組」中卡組互不重複時的最高總 Pt 上限：
+
+    UB(S) = min(各首歌最高 pt 之和,
+                max(已載入卡組的最佳總 Pt, max_i (next_i + UB(S 去掉 i))))
+
+若所有這類上限都不超過目前第 K 名的總 Pt，結果即為全部卡組下的前 K 名（已證明）；
+否則對違反條件的歌曲載入更多卡組，只搜尋「至少用到一個新卡組」的組合並與原結果合併，
+不必從頭重新搜尋。已載入的卡組中找不到組合時同樣擴充（門檻為 -1），證明不可行後才降級歌曲數
+（solve_until_proven）。
+"""
+import itertools
+import logging
+
+from src.optimizer.disjoint_search import order_songs, solve
+from src.optimizer.top_k import TopCombos
+
+logger = logging.getLogger(__name__)
+
+
+class LevelPool:
+    """
+    各首歌已載入的卡組與卡牌 bit 位映射
+
+    新卡牌的 bit 位接在既有映射之後，已轉換的卡組遮罩在擴充後保持有效。
+
+    Args:
+        levels_raw: 每首歌按 pt 降序的結果 [{"deck_card_ids": [...], "score": int, "pt": int}, ...]
+        card_to_bit: 沿用的卡牌 bit 位映射（會就地擴充）；給定時結果中的 "mask" 欄位
+            視為以此映射算好的遮罩直接使用
+    """
+
+    def __init__(self, levels_raw: list[list[dict]], card_to_bit: dict = None):
+        self.masks_given = card_to_bit is not None
+        if card_to_bit is None:
+            cards = sorted({cid for data in levels_raw for deck in data for cid in deck["deck_card_ids"]})
+            card_to_bit = {cid: i for i, cid in enumerate(cards)}
+        self.card_to_bit = card_to_bit
+        self.levels = [[] for _ in levels_raw]
+        for song, data in enumerate(levels_raw):
+            self.extend(song, data)
+
+    def count_new_cards(self, records: list[dict]) -> int:
+        """records 中尚未分配 bit 位的卡牌種類數"""
+        return len({cid for deck in records for cid in deck["deck_card_ids"]} - self.card_to_bit.keys())
+
+    def extend(self, song: int, records: list[dict]):
+        """把 records 轉為遮罩卡組，接在第 song 首歌的卡組之後（排名延續）"""
+        level = self.levels[song]
+        if self.masks_given:
+            level.extend({"mask": deck["mask"], "rank": rank, "score": deck["score"], "pt": deck["pt"],
+                          "deck": deck["deck_card_ids"]}
+                         for rank, deck in enumerate(records, start=len(level) + 1))
+            return
+        for deck in records:
+            mask = 0
+            for cid in deck["deck_card_ids"]:
+                mask |= 1 << self.card_to_bit.setdefault(cid, len(self.card_to_bit))
+            level.append({
+                "mask": mask,
+                "rank": len(level) + 1,
+                "score": deck["score"],
+                "pt": deck["pt"],
+                "deck": deck["deck_card_ids"]
+            })
+
+
+def certify(levels: list[list[dict]], song_count: int, best: list[tuple], k: int,
+            next_pts: list, search) -> tuple[dict, int]:
+    """
+    檢查前 K 名結果在 TOP_N 截斷下是否已證明為最佳
+
+    先以「各首歌最高 pt 之和」估計其餘歌曲的上限，不足以證明時才以 search 求
+    已載入卡組的最佳總 Pt 收緊上限。
+
+    Args:
+        levels: 每首歌已載入的卡組，按 pt 降序
+        song_count: 組合使用的歌曲數
+        best: 目前的前 K 名 [(total_pt, combo), ...]
+        k: 保留的組合數
+        next_pts: 每首歌下一個未載入卡組的 pt，已全部載入時為 None
+        search: 搜尋核心，介面同 search_disjoint
+
+    Returns:
+        (needs, bound)：needs 為 {歌曲索引: 需要載入到的 pt}，下一個未載入卡組的 pt
+        不超過此值時該首歌不再違反條件，已證明時為空；bound 為未搜尋組合的總 Pt 上限
+        （已證明時為 None）
+    """
+    threshold = best[k - 1][0] if len(best) >= k else -1
+    tops = [level[0]["pt"] if level else None for level in levels]
+    loaded = {}
+
+    def loaded_best(songs):
+        # 已載入卡組中 songs 的最佳總 Pt，沒有不重複的組合時為 None
+        if songs not in loaded:
+            sub = [levels[s] for s in songs]
+            result = search([sub[i] for i in order_songs(sub)], 1)
+            loaded[songs] = result[0][0] if result else None
+        return loaded[songs]
+
+    def upper(songs, limit):
+        # songs 在全部卡組中的最高總 Pt 上限；只在粗略上限超過 limit 時收緊
+        if not songs:
+            return 0
+        cheap = sum(tops[s] for s in songs)
+        if cheap <= limit:
+            return cheap
+        bounds = [loaded_best(songs)]
+        for i in songs:
+            if next_pts[i] is not None:
+                rest = upper(tuple(s for s in songs if s != i), limit - next_pts[i])
+                if rest is not None:
+                    bounds.append(next_pts[i] + rest)
+        bounds = [b for b in bounds if b is not None]
+        return min(cheap, max(bounds)) if bounds else None
+
+    needs = {}
+    bound = None
+    for songs in itertools.combinations(range(len(levels)), song_count):
+        if any(tops[s] is None for s in songs):
+            continue
+        for i in songs:
+            if next_pts[i] is None:
+                continue
+            rest = upper(tuple(s for s in songs if s != i), threshold - next_pts[i])
+            if rest is None or next_pts[i] + rest <= threshold:
+                continue
+            needs[i] = min(needs.get(i, threshold - rest), threshold - rest)
+            bound = max(bound or 0, next_pts[i] + rest)
+    return needs, bound
+
+
+def solve_expanded(levels: list[list[dict]], old_sizes: list[int], song_count: int, k: int,
+                   previous: list[tuple], search, callback=None, labels: list = None) -> list[tuple]:
+    """
+    卡組擴充後的遞增求解：只搜尋至少用到一個新卡組的組合，與先前的前 K 名合併
+
+    每個歌曲子集按 order_songs 排序後，對每個有新卡組的位置 p 搜尋一次：
+    p 之前的歌曲只用舊卡組、第 p 首只用新卡組、之後的歌曲用全部卡組，
+    各次搜尋的組合互不重疊，合起來恰為所有用到新卡組的組合。
+    搜尋以目前第 K 名為下限，不可能進入前 K 名的組合直接剪去。
+
+    Args:
+        levels: 每首歌的全部卡組（舊卡組在前），按 pt 降序
+        old_sizes: 每首歌擴充前的卡組數
+        song_count: 使用的歌曲數
+        k: 保留的組合數
+        previous: 擴充前 solve 的結果
+        search: 搜尋核心，介面同 search_disjoint
+        callback: 進度回呼函式，傳給 search
+        labels: 記錄搜尋順序時使用的歌曲名稱
+
+    Returns:
+        [(total_pt, combo), ...]，格式同 solve
+    """
+    labels = labels or [f"Song {i + 1}" for i in range(len(levels))]
+    top = TopCombos(k)
+    for total_pt, combo in previous:
+        top.push(total_pt, combo)
+
+    for songs in itertools.combinations(range(len(levels)), song_count):
+        if not all(levels[s] for s in songs):
+            continue
+        order = [songs[i] for i in order_songs([levels[s] for s in songs])]
+        for p, song in enumerate(order):
+            if len(levels[song]) <= old_sizes[song]:
+                continue
+            parts = ([levels[s][:old_sizes[s]] for s in order[:p]] + [levels[song][old_sizes[song]:]]
+                     + [levels[s] for s in order[p + 1:]])
+            if not all(parts):
+                continue
+            logger.info(f"Incremental search: {[labels[s] for s in order]}, new decks of {labels[song]}")
+            for total_pt, indices in search(parts, k, callback, floor=top.threshold):
+                combo = [None] * len(levels)
+                for s, part, i in zip(order, parts, indices):
+                    combo[s] = part[i]
+                top.push(total_pt, tuple(combo))
+    return top.results()
+
+
+def expand_until_proven(pool: LevelPool, sources: list, song_count: int, k: int, best: list[tuple],
+                        search, max_n: int, max_cards: int = None, callback=None,
+                        labels: list = None) -> tuple[list[tuple], int]:
+    """
+    反覆檢查最佳性證明，未證明時擴充違反條件的歌曲並遞增求解
+
+    每首歌的卡組數每次加倍，直到下一個未載入卡組的 pt 足夠低、結果檔已讀完或達到 max_n。
+
+    Args:
+        pool: 已載入的卡組，擴充時就地更新
+        sources: 每首歌的 TopResultSource
+        song_count: 組合使用的歌曲數
+        k: 保留的組合數
+        best: solve 的結果
+        search: 搜尋核心，介面同 search_disjoint
+        max_n: 每首歌最多載入的卡組數
+        max_cards: 卡牌種類上限（Cython 模組的 MAX_CARDS），擴充後超過時停止
+        callback: 進度回呼函式，傳給 search
+        labels: 歌曲名稱
+
+    Returns:
+        (best, bound)：最終的前 K 名；bound 為未搜尋組合的總 Pt 上限，已證明最佳時為 None
+    """
+    labels = labels or [f"Song {i + 1}" for i in range(len(pool.levels))]
+    while True:
+        needs, bound = certify(pool.levels, song_count, best, k, [src.next_pt for src in sources], search)
+        if not needs:
+            return best, None
+
+        old_sizes = [len(level) for level in pool.levels]
+        added = {}
+        for song, required in sorted(needs.items()):
+            src = sources[song]
+            n = len(src.results)
+            while src.next_pt is not None and src.next_pt > required and n < max_n:
+                n = min(max_n, 2 * n)
+                src.load(n)
+            if len(src.results) > old_sizes[song]:
+                added[song] = src.results[old_sizes[song]:]
+        if not added:
+            logger.warning(f"已達 optimizer.max_top_n ({max_n})，無法證明結果為最佳")
+            return best, bound
+
+        new_cards = pool.count_new_cards([deck for records in added.values() for deck in records])
+        if max_cards is not None and len(pool.card_to_bit) + new_cards > max_cards:
+            logger.warning(f"擴充後卡牌種類 ({len(pool.card_to_bit) + new_cards}) 超過上限 {max_cards}，停止擴充")
+            return best, bound
+
+        for song, records in added.items():
+            pool.extend(song, records)
+            next_pt = sources[song].next_pt
+            logger.info(f"Expanded {labels[song]}: {old_sizes[song]} -> {len(pool.levels[song])} decks "
+                        f"(next pt: {'-' if next_pt is None else f'{next_pt:,}'}, "
+                        f"needed <= {needs[song]:,})")
+        best = solve_expanded(pool.levels, old_sizes, song_count, k, best, search, callback, labels)
+
+
+def solve_until_proven(pool: LevelPool, sources: list, song_count: int, k: int, search, max_n: int,
+                       min_songs: int = 2, max_cards: int = None, callback=None, labels: list = None,
+                       best: list[tuple] = None, on_song_count=None) -> tuple[list[tuple], int, int]:
+    """
+    求前 K 名並證明最佳；找不到組合時先擴充卡組，證明不可行後才降級為少一首歌
+
+    已載入的前 N 名卡組中沒有互不重複的組合，不代表全部卡組中也沒有：此時以空結果
+    （門檻 -1）交給 expand_until_proven，擴充到 max_n 仍找不到才降級。因達到擴充上限
+    （而非證明不可行）而降級時，返回的 bound 不為 None，結果不算已證明。
+
+    Args:
+        pool: 已載入的卡組，擴充時就地更新
+        sources: 每首歌的 TopResultSource
+        song_count: 起始歌曲數（通常為全部歌曲）
+        k: 保留的組合數
+        search: 搜尋核心，介面同 search_disjoint
+        max_n: 每首歌最多載入的卡組數
+        min_songs: 降級的最少歌曲數
+        max_cards: 卡牌種類上限（Cython 模組的 MAX_CARDS）
+        callback: 進度回呼函式，傳給 search
+        labels: 歌曲名稱
+        best: 已求得的 song_count 首歌結果（例如偵錯模式），None 時以 solve 求解
+        on_song_count: 開始求解某個歌曲數時呼叫，參數為歌曲數（更新進度條說明等）
+
+    Returns:
+        (best, song_count, bound)：bound 為未搜尋組合的總 Pt 上限，已證明最佳時為 None；
+        所有歌曲數都找不到組合時 best 為空、song_count 為 min_songs - 1
+    """
+    skipped_bound = None
+    while song_count >= min_songs:
+        if on_song_count is not None:
+            on_song_count(song_count)
+        if best is None:
+            best = solve(pool.levels, song_count, k, search=search, callback=callback, labels=labels)
+        best, bound = expand_until_proven(pool, sources, song_count, k, best, search, max_n,
+                                          max_cards=max_cards, callback=callback, labels=labels)
+        if best:
+            if skipped_bound is not None:
+                bound = max(bound or 0, skipped_bound)
+            return best, song_count, bound
+
+        if bound is None:
+            logger.warning(f"全部卡組中都沒有 {song_count} 首歌卡組互不重複的組合，降級為 {song_count - 1} 首歌")
+        else:
+            skipped_bound = max(skipped_bound or 0, bound)
+            logger.warning(f"擴充到上限仍找不到 {song_count} 首歌的組合（未證明不可行），降級為 {song_count - 1} 首歌")
+        best = None
+        song_count -= 1
+    return [], song_count, skipped_bound
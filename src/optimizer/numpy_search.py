@@ -0,0 +1,178 @@
+"""
+多歌曲不重複卡組搜尋的 NumPy 向量化版本
+
+未編譯 Cython 模組 (cython/optimizer_core.pyx) 時的替代搜尋核心，演算法與
+disjoint_search.search_disjoint 相同，但以陣列運算取代逐卡組的 Python 迴圈：
+
+    - 每首歌的卡組存為一個 int64 陣列：排名、Pt 與拆成 64 位元 word 的遮罩
+      （遮罩 word 以 uint64 拆分後按位元原樣轉為 int64，只做 AND 與零比較）
+    - 外層每選定一個卡組，以向量化 AND 一次算出剩餘各首歌的相容卡組，
+      並先依目前門檻截掉 Pt 不可能進入前 K 名的尾段
+    - 最後兩首歌以分塊的外積和 (outer sum) 一次比對一整塊卡組對，
+      塊的大小隨上限收窄，門檻提高後每塊只需比對極少數卡組
+
+結果（含同分時的順序）與 search_disjoint 完全相同，介面亦相同，可作為 solve 的 search 參數。
+"""
+import numpy as np
+
+from src.optimizer.top_k import TopCombos
+
+# 外積和每塊的元素數上限（卡組對數），控制暫存陣列的記憶體用量
+PAIR_BLOCK = 1 << 20
+# 每塊至少比對的卡組對數，塊太小時 Python 迴圈的開銷會超過陣列運算本身
+PAIR_MIN_BLOCK = 1 << 14
+
+# 卡組陣列的列：排名、Pt，之後為遮罩 word
+RANK, PT, WORDS = 0, 1, 2
+
+# 外層迴圈每次一起比對相容性的卡組數
+ROOT_BLOCK = 64
+
+
+def deck_table(level: list[dict], n_words: int) -> np.ndarray:
+    """
+    將一首歌的卡組轉為形狀為 (2 + n_words, 卡組數) 的 int64 陣列
+
+    Args:
+        level: 按 pt 降序排列的卡組
+        n_words: 遮罩的 64 位元 word 數
+    """
+    word_mask = (1 << 64) - 1
+    table = np.empty((WORDS + n_words, len(level)), dtype=np.int64)
+    table[RANK] = np.arange(len(level))
+    table[PT] = [deck["pt"] for deck in level]
+    words = np.array([[(deck["mask"] >> (64 * w)) & word_mask for deck in level] for w in range(n_words)],
+                     dtype=np.uint64).reshape(n_words, len(level))
+    table[WORDS:] = words.view(np.int64)
+    return table
+
+
+def search_numpy(levels: list[list[dict]], k: int = 1, callback=None, floor: int = -1) -> list[tuple]:
+    """
+    按給定順序搜尋卡組互不重複的前 K 名組合
+
+    Args:
+        levels: 每首歌的卡組 [{"mask": int, "pt": int, ...}, ...]，按 pt 降序
+        k: 保留的組合數
+        callback: 可選的進度回呼函式 callback(current, total)，以第一首歌的卡組計算
+        floor: 只保留總 Pt 大於此值的組合（遞增搜尋時傳入已知的第 K 名）
+
+    Returns:
+        [(total_pt, (deck_idx, ...)), ...]，按總 Pt 降序（同分時按索引字典序）
+    """
+    top = TopCombos(k, floor)
+    if not levels or not all(levels):
+        return []
+
+    n_levels = len(levels)
+    if n_levels == 1:
+        for i, deck in enumerate(levels[0][:k]):
+            top.push(deck["pt"], (i,))
+        return top.results()
+
+    n_cards = max(deck["mask"].bit_length() for level in levels for deck in level)
+    n_words = max(1, (n_cards + 63) // 64)
+    tables = [deck_table(level, n_words) for level in levels]
+    neg_pts = [-table[PT] for table in tables]
+    # 外層卡組非零的遮罩 (列, word)，比對相容性時只需檢查這幾個 word
+    words = [[[(WORDS + w, value) for w, value in enumerate(table[WORDS:, i]) if value]
+              for i in range(table.shape[1])] for table in tables[:-2]]
+    chosen = [0] * n_levels
+
+    def restrict(cand, limit, deck_words):
+        # cand 中排名 < limit 且與 deck_words 不衝突的卡組
+        cand = cand[:, :cand[RANK].searchsorted(limit)]
+        keep = None
+        for row, value in deck_words:
+            free = (cand[row] & value) == 0
+            keep = free if keep is None else keep & free
+        return cand if keep is None else cand[:, keep]
+
+    def pair_search(total, ca, cb, progress):
+        # 最後兩首歌：分塊計算 (ca × cb) 的相容矩陣與總 Pt
+        a, b = n_levels - 2, n_levels - 1
+        pa, pb = ca[PT], cb[PT]
+        neg_pa, neg_pb = -pa, -pb
+        na = len(pa)
+        step = na // 100 if na >= 100 else 1
+        s = 0
+        while s < na:
+            threshold = top.threshold
+            # 本塊內 pa 最大的是第 s 列，只有 pb > min_pb 的卡組可能進入前 K 名
+            min_pb = threshold - total - int(pa[s])
+            lim = int(neg_pb.searchsorted(-min_pb))
+            if lim == 0:
+                break
+            # 同理，只有 pa > threshold - total - pb[0] 的列需要比對
+            rows_end = int(neg_pa.searchsorted(total + int(pb[0]) - threshold))
+            e = min(rows_end, s + max(1, min(PAIR_BLOCK, max(PAIR_MIN_BLOCK, 32 * lim)) // lim))
+            if progress and (s == 0 or s // step != e // step):
+                callback(s, na)
+
+            sums = pa[s:e, None] + pb[None, :lim] + total
+            ok = sums > threshold
+            for row in range(WORDS, WORDS + n_words):
+                ok &= (ca[row, s:e, None] & cb[row, None, :lim]) == 0
+            rows, cols = np.nonzero(ok)
+            if len(rows) > k:
+                # 只有本塊中 (總 Pt 降序, 索引字典序) 的前 K 個可能留在最終結果
+                keep = np.sort(np.lexsort((cols, rows, -sums[rows, cols]))[:k])
+                rows, cols = rows[keep], cols[keep]
+            # 按字典序加入，同分時的結果與逐一搜尋相同
+            for r, c in zip(rows.tolist(), cols.tolist()):
+                chosen[a] = int(ca[RANK, s + r])
+                chosen[b] = int(cb[RANK, c])
+                top.push(int(sums[r, c]), tuple(chosen))
+            s = e
+
+    def visit(d, total, cands):
+        # 深度 d：已選 chosen[:d]，cands[j - d] 為第 j 首歌中與已選卡組相容的卡組，按排名排列
+        if d == n_levels - 2:
+            pair_search(total, cands[0], cands[1], d == 0 and callback is not None)
+            return
+
+        # 剩餘歌曲的上限：各自與已選卡組相容的最高 Pt
+        heads = [int(cand[PT, 0]) for cand in cands[1:]]
+        rest = sum(heads)
+        outer = cands[0]
+        n = outer.shape[1]
+        step = n // 100 if n >= 100 else 1
+        ranks, level_pts = outer[RANK].tolist(), outer[PT].tolist()
+        for s in range(0, n, ROOT_BLOCK):
+            threshold = top.threshold
+            subtotal = total + level_pts[s]
+            if subtotal + rest <= threshold:
+                break
+            e = min(n, s + ROOT_BLOCK)
+            # 一次算出本塊所有外層卡組與各首歌前段卡組的相容矩陣，
+            # 前段長度取本塊第一個（Pt 最高）外層卡組的上限
+            blocks = []
+            for j, cand, head in zip(range(d + 1, n_levels), cands[1:], heads):
+                limit = neg_pts[j].searchsorted(subtotal + rest - head - threshold)
+                cand = cand[:, :cand[RANK].searchsorted(limit)]
+                free = np.ones((e - s, cand.shape[1]), dtype=bool)
+                for row in range(WORDS, WORDS + n_words):
+                    free &= (outer[row, s:e, None] & cand[row, None, :]) == 0
+                blocks.append((j, cand, head, free))
+
+            for pos in range(s, e):
+                subtotal = total + level_pts[pos]
+                threshold = top.threshold
+                if subtotal + rest <= threshold:
+                    return
+                if d == 0 and callback is not None and pos % step == 0:
+                    callback(pos, n)
+                chosen[d] = ranks[pos]
+                children = []
+                for j, cand, head, free in blocks:
+                    # 排名 >= limit 的卡組即使其他歌曲取最高 Pt 也無法超過門檻
+                    end = cand[RANK].searchsorted(neg_pts[j].searchsorted(subtotal + rest - head - threshold))
+                    child = cand[:, :end][:, free[pos - s, :end]]
+                    if not child.shape[1]:
+                        break
+                    children.append(child)
+                else:
+                    visit(d + 1, subtotal, children)
+
+    visit(0, 0, tables)
+    return top.results()
@@ -0,0 +1,228 @@
+"""
+多歌曲求解器的互動工作階段
+
+調整禁卡或替換歌曲時，求解器每次都要重新讀取結果檔、重建遮罩再從頭搜尋。
+工作階段只在第一次用到一首歌時載入它的候選卡組，之後的查詢直接在記憶體中篩選：
+
+    - 每首歌按 pt 排名保存卡牌 ID、pt、score 與遮罩（工作階段內共用同一個卡牌 bit 位映射）
+    - 每張卡牌一個倒排列表，記錄含該卡的卡組排名；禁卡查詢只需標記這些排名
+    - 結果檔的已排序二進位索引 (*.sorted.bin) 作為磁碟快取，缺少時以串流方式補建，
+      下次啟動只需讀取開頭約 TOP_N 筆
+    - 同一組歌曲只多禁了幾張卡（或回到先前的禁卡）、且已證明最佳的前 K 名都不含這些卡時，
+      直接沿用先前的結果
+
+每次查詢同樣經過最佳性證明 (src/optimizer/expansion.py)：禁卡過濾後不足以證明時，
+自動從已載入（或再從索引讀取）的卡組中擴充。
+"""
+import itertools
+import logging
+import os
+from array import array
+
+from src.optimizer.expansion import LevelPool, solve_until_proven
+from src.utils.result_stream import build_sorted_index, load_top_results, open_sorted_index
+
+logger = logging.getLogger(__name__)
+
+# 每組 (歌曲, K) 保留的歷史查詢結果數
+HISTORY_SIZE = 16
+
+
+class SongCandidates:
+    """
+    一首歌已載入的候選卡組（按 pt 排名，不含禁卡過濾）
+
+    Args:
+        path: 結果檔路徑
+        card_to_bit: 工作階段共用的卡牌 bit 位映射（會就地擴充）
+        capacity: 初始載入筆數
+    """
+
+    def __init__(self, path: str, card_to_bit: dict, capacity: int):
+        self.path = path
+        self.card_to_bit = card_to_bit
+        self.rows = []  # 按排名的結果 {"deck_card_ids", "score", "pt", "mask"}，各次查詢共用（唯讀）
+        self.pts = []
+        self.ranks_with = {}  # 卡牌 ID -> 含該卡的卡組排名（遞增）
+        self.total = 0
+        self.exhausted = False
+        self.grow(capacity)
+
+    def __len__(self) -> int:
+        return len(self.pts)
+
+    def grow(self, n: int):
+        """載入到至少 n 筆（結果檔不足 n 筆時載入全部）"""
+        if n <= len(self.pts) or self.exhausted:
+            return
+        records, stats = load_top_results(self.path, n)
+        self.total = stats["total"]
+        self.exhausted = len(records) < n
+        for rank in range(len(self.pts), len(records)):
+            record = records[rank]
+            mask = 0
+            for cid in record["deck_card_ids"]:
+                mask |= 1 << self.card_to_bit.setdefault(cid, len(self.card_to_bit))
+                self.ranks_with.setdefault(cid, array("i")).append(rank)
+            self.rows.append({"deck_card_ids": record["deck_card_ids"], "score": record["score"],
+                              "pt": record["pt"], "mask": mask})
+            self.pts.append(record["pt"])
+
+    def select(self, forbidden: set, n: int) -> tuple[list[int], int]:
+        """
+        不含禁卡的前 n 個卡組排名，已載入的不足時自動載入更多
+
+        Returns:
+            (ranks, next_pt)：next_pt 為第 n+1 個不含禁卡的卡組的 pt，沒有時為 None
+        """
+        while True:
+            allowed = bytearray(b"\x01") * len(self.pts)
+            for cid in forbidden:
+                for rank in self.ranks_with.get(cid, ()):
+                    allowed[rank] = 0
+            ranks = list(itertools.islice(itertools.compress(range(len(self.pts)), allowed), n + 1))
+            if len(ranks) > n or self.exhausted:
+                break
+            self.grow(max(2 * len(self.pts), n + 1))
+        next_pt = self.pts[ranks[n]] if len(ranks) > n else None
+        return ranks[:n], next_pt
+
+    def records(self, ranks: list[int]) -> list[dict]:
+        """以排名取出結果（含以共用映射算好的遮罩），格式同 load_top_results"""
+        rows = self.rows
+        return [rows[r] for r in ranks]
+
+
+class SessionSource:
+    """
+    一次查詢中一首歌的卡組來源，介面同 TopResultSource（供 expand_until_proven 擴充）
+
+    Args:
+        candidates: 該首歌的候選卡組
+        forbidden: 禁卡 ID
+        n: 初始筆數
+    """
+
+    def __init__(self, candidates: SongCandidates, forbidden: set, n: int):
+        self.candidates = candidates
+        self.forbidden = forbidden
+        self.results = []
+        self.next_pt = None
+        self.load(n)
+
+    def load(self, n: int):
+        """取前 n 個不含禁卡的卡組"""
+        ranks, self.next_pt = self.candidates.select(self.forbidden, n)
+        self.results = self.candidates.records(ranks)
+
+
+class OptimizerSession:
+    """
+    重複查詢用的求解器工作階段
+
+    Args:
+        log_dir: 結果檔目錄
+        top_n: 每首歌初始使用的卡組數（禁卡過濾後）
+        max_top_n: 無法證明最佳時每首歌擴充到的卡組數上限
+        search: 搜尋核心，介面同 search_disjoint
+        max_cards: 搜尋核心的卡牌種類上限（Cython 模組的 MAX_CARDS），None 表示不限
+        min_songs: 找不到解時降級的最少歌曲數
+    """
+
+    def __init__(self, log_dir: str, top_n: int, max_top_n: int, search, max_cards: int = None,
+                 min_songs: int = 2):
+        self.log_dir = log_dir
+        self.top_n = top_n
+        self.max_top_n = max_top_n
+        self.search = search
+        self.max_cards = max_cards
+        self.min_songs = min_songs
+        self.card_to_bit = {}
+        self.songs = {}  # (歌曲ID, 難度) -> SongCandidates
+        self.history = {}  # (歌曲, K) -> {禁卡: 結果}，按查詢時間排列
+
+    def result_path(self, music_id: str, difficulty: str) -> str:
+        return os.path.join(self.log_dir, f"simulation_results_{music_id}_{difficulty}.json")
+
+    def candidates(self, music_id: str, difficulty: str) -> SongCandidates:
+        """取得一首歌的候選卡組，第一次使用時載入（並視需要補建磁碟上的排序索引）"""
+        key = (music_id, difficulty)
+        if key not in self.songs:
+            path = self.result_path(music_id, difficulty)
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"找不到模擬結果檔: {path}")
+            opened = open_sorted_index(path)
+            if opened is not None:
+                opened[0].close()
+            elif build_sorted_index(path):
+                logger.info(f"Built sorted index for {music_id}_{difficulty}")
+            else:
+                logger.warning(f"{path} 未按 pt 排序，無法建立索引，每次擴充都需完整讀取")
+            self.songs[key] = SongCandidates(path, self.card_to_bit, self.top_n + 1)
+            logger.info(f"Loaded {len(self.songs[key])} of {self.songs[key].total} decks for {music_id}_{difficulty}")
+        return self.songs[key]
+
+    def query(self, songs: list[tuple], forbidden_cards=(), k: int = 1, callback=None) -> dict:
+        """
+        求解一組歌曲在指定禁卡下的前 K 名組合
+
+        Args:
+            songs: [(歌曲ID, 難度), ...]
+            forbidden_cards: 禁卡 ID
+            k: 保留的組合數
+            callback: 進度回呼函式，傳給 search
+
+        Returns:
+            {"combos": [(total_pt, combo), ...]（格式同 solve）, "song_count": 組合使用的歌曲數,
+             "bound": 未證明最佳時未搜尋組合的總 Pt 上限（已證明為 None）, "decks": 各首歌搜尋的卡組數}
+        """
+        forbidden = frozenset(forbidden_cards)
+        key = (tuple(songs), k)
+        reused = self.reuse(key, forbidden)
+        if reused is not None:
+            return reused
+
+        sources = [SessionSource(self.candidates(*song), forbidden, self.top_n) for song in songs]
+        for song, source in zip(songs, sources):
+            if not source.results:
+                raise ValueError(f"歌曲 {song[0]}_{song[1]} 沒有不含禁卡的卡組")
+
+        labels = [f"{music_id}_{difficulty}" for music_id, difficulty in songs]
+        levels_raw = [source.results for source in sources]
+        if self.max_cards is None or len(self.card_to_bit) <= self.max_cards:
+            pool = LevelPool(levels_raw, card_to_bit=self.card_to_bit)
+        else:
+            # 工作階段累積的卡牌超過搜尋核心上限：只為本次查詢用到的卡牌重新編號
+            pool = LevelPool(levels_raw)
+
+        combos, song_count, bound = solve_until_proven(
+            pool, sources, len(songs), k, self.search, self.max_top_n, min_songs=self.min_songs,
+            max_cards=self.max_cards, callback=callback, labels=labels)
+        result = {"combos": combos, "song_count": song_count, "bound": bound,
+                  "decks": [len(level) for level in pool.levels]}
+        self.remember(key, forbidden, result)
+        return result
+
+    def remember(self, key: tuple, forbidden: frozenset, result: dict):
+        history = self.history.setdefault(key, {})
+        history.pop(forbidden, None)
+        history[forbidden] = result
+        if len(history) > HISTORY_SIZE:
+            del history[next(iter(history))]
+
+    def reuse(self, key: tuple, forbidden: frozenset):
+        """
+        先前查詢的結果在新禁卡下是否仍成立，成立時返回該結果，否則返回 None
+
+        禁卡只增不減時可行組合只會變少：先前已證明為全部卡組中的前 K 名（且未降級），
+        而且其中沒有組合含新增的禁卡，前 K 名就不變。
+        """
+        for previous, result in reversed(list(self.history.get(key, {}).items())):
+            if not previous <= forbidden or result["bound"] is not None or result["song_count"] < len(key[0]):
+                continue
+            added = forbidden - previous
+            if any(not added.isdisjoint(d["deck"]) for _, combo in result["combos"] for d in combo if d is not None):
+                continue
+            self.remember(key, forbidden, result)
+            return result
+        return None
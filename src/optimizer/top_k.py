@@ -0,0 +1,52 @@
+"""
+多歌曲求解器的前 K 名組合
+
+以最小堆積保留總 Pt 最高的 K 個組合，堆頂為目前第 K 名，作為剪枝門檻。
+同分時先找到的組合優先（與只取最佳組合時的行為一致）。
+"""
+import heapq
+
+
+class TopCombos:
+    """
+    前 K 名組合
+
+    Args:
+        k: 保留的組合數
+        floor: 只保留總 Pt 大於此值的組合（遞增搜尋時為已知的第 K 名）
+    """
+
+    def __init__(self, k: int = 1, floor: int = -1):
+        if k < 1:
+            raise ValueError("k 必須 >= 1")
+        self.k = k
+        self.floor = floor
+        # (總 Pt, -找到順序, 組合)，堆頂為最差的組合
+        self._heap = []
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    @property
+    def threshold(self) -> int:
+        """剪枝門檻：總 Pt 必須大於此值才能進入前 K 名（未滿 K 個時為 floor）"""
+        if len(self._heap) < self.k:
+            return self.floor
+        return self._heap[0][0]
+
+    def push(self, total_pt: int, combo) -> bool:
+        """嘗試加入組合，返回是否進入前 K 名"""
+        if total_pt <= self.threshold:
+            return False
+        item = (total_pt, -self._seq, combo)
+        self._seq += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, item)
+        else:
+            heapq.heapreplace(self._heap, item)
+        return True
+
+    def results(self) -> list[tuple]:
+        """按總 Pt 降序返回 [(總 Pt, 組合), ...]"""
+        return [(total_pt, combo) for total_pt, _, combo in sorted(self._heap, key=lambda x: (-x[0], -x[1]))]
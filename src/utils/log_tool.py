@@ -1,9 +1,9 @@
 import json
 import logging
 import os
-from tqdm import tqdm
 
 from ..config.CardLevelConfig import CARD_CACHE
+from .result_stream import save_sorted_index
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -79,12 +79,16 @@ def save_simulation_results(results_data: list, filename: str = os.path.join("lo
     try:
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(processed_results, f, ensure_ascii=False, indent=0)
+        if calc_pt:
+            save_sorted_index(filename, processed_results)
         logger.info(f"Simulation results saved to {filename}")
     except Exception as e:
         logger.error(f"Error saving simulation results to JSON: {e}")
 
 
 if __name__ == "__main__":
+    from tqdm import tqdm
+
     # 在列表中填写需要重新计算 pt 的 log 文件路径
     # 也可以用于合并未完成所有模拟就被中断时遗留的 log 缓存
     temp_files = [os.path.join("log", f"simulation_results_{MUSIC_ID}_{DIFFICULTY}.json")]
@@ -0,0 +1,313 @@
+"""
+MainBatch 的記憶體用量追蹤與記憶體預算模式
+
+MainBatch 的記憶體主要花在三處：模擬中暫存的 current_batch_results、歌曲結束時合併所有暫存檔
+（連同既有結果檔一起載入、計算 pt、排序），以及 load_simulated_decks 載入的已模擬組合集合。
+大型執行在合併階段最容易被 OOM。
+
+    - MemoryTracker: 以背景執行緒取樣主行程 RSS，記錄各階段（generation / simulation / flush /
+      merge / pt）的峰值
+    - MemoryBudget:  --memory-budget 指定上限時，依目前 RSS 調整批次大小、提早寫出暫存檔，
+      並判斷合併階段是否需要改用 external_merge
+    - CompactDeckSet: 以 8 bytes 的整數鍵取代 6 張卡的 tuple，保存已模擬組合（約為 set[tuple] 的 1/4~1/30）
+    - external_merge: 在磁碟上分桶去重、計算 pt，再以 k 路合併與既有結果檔一起寫出，
+      記憶體用量與結果總數無關
+
+RSS 以 psutil 讀取，未安裝時讀取 /proc（非 Linux 且沒有 psutil 時無法追蹤，預算模式只依估計值運作）。
+"""
+import argparse
+import heapq
+import json
+import logging
+import os
+import threading
+from array import array
+from contextlib import contextmanager
+
+from .result_stream import build_sorted_index, iter_results, write_results
+from .telemetry import rss_mb
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# 取樣間隔（秒）
+SAMPLE_INTERVAL = 0.2
+
+# 估計值：主行程中每筆結果（dict + 卡組 list）約佔的記憶體，合併時另有去重 dict 與排序用的 list
+BYTES_PER_RESULT = 1000
+# 估計值：結果檔 json.load 後的記憶體約為檔案大小的倍數
+JSON_EXPANSION = 4
+
+# 預算中可分給暫存結果與合併分桶的比例（其餘留給生成器、行程池的管線緩衝等）
+BUFFER_SHARE = 0.5
+# RSS 超過預算的此比例時提早寫出暫存檔
+SOFT_LIMIT = 0.8
+# 每累積多少筆結果檢查一次 RSS
+CHECK_EVERY = 5000
+
+MAX_BUCKETS = 256
+
+# CompactDeckSet 每張卡的位元數（最多 1024 種卡，6 張共 60 bits）
+_CARD_BITS = 10
+
+
+_SIZE_UNITS = {"K": 1 / 1024, "M": 1, "G": 1024, "T": 1024 ** 2}
+
+
+def parse_size_mb(text: str) -> float:
+    """把 "12G"、"800M"、"512" (MB) 等大小轉為 MB，供 argparse 使用"""
+    value = str(text).strip().upper().removesuffix("B")
+    unit = 1
+    if value and value[-1] in _SIZE_UNITS:
+        unit = _SIZE_UNITS[value[-1]]
+        value = value[:-1]
+    try:
+        size = float(value) * unit
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"無法解析記憶體大小: {text}")
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f"記憶體大小必須大於 0: {text}")
+    return size
+
+
+class MemoryTracker:
+    """記錄主行程在各階段的峰值 RSS (MB)"""
+
+    def __init__(self):
+        self.peaks = {}
+        self._active = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.enabled = rss_mb(os.getpid()) is not None
+
+    def start(self, name: str):
+        """開始一個階段（可巢狀，例如 simulation 中的 flush）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._active.append(name)
+        self._record(rss_mb(os.getpid()))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="memory-tracker", daemon=True)
+            self._thread.start()
+
+    def stop(self, name: str):
+        if not self.enabled:
+            return
+        self._record(rss_mb(os.getpid()))
+        with self._lock:
+            if name in self._active:
+                self._active.remove(name)
+
+    @contextmanager
+    def stage(self, name: str):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    def _record(self, rss: float):
+        if rss is None:
+            return
+        with self._lock:
+            for name in self._active:
+                if rss > self.peaks.get(name, 0):
+                    self.peaks[name] = rss
+
+    def _run(self):
+        pid = os.getpid()
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            self._record(rss_mb(pid))
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def summary(self) -> str:
+        if not self.peaks:
+            return "[Memory] 無法取得 RSS（需要 psutil 或 /proc）"
+        return "[Memory] Peak RSS: " + ", ".join(f"{name} {peak:,.0f} MB" for name, peak in self.peaks.items())
+
+
+class MemoryBudget:
+    """--memory-budget 模式：讓主行程的記憶體維持在 limit_mb 以下"""
+
+    def __init__(self, limit_mb: float):
+        self.limit_mb = limit_mb
+        self._since_check = 0
+
+    def available_mb(self) -> float:
+        """預算中尚未使用的部分；無法取得 RSS 時視為全部可用"""
+        rss = rss_mb(os.getpid())
+        return max(0.0, self.limit_mb - (rss or 0))
+
+    def batch_size(self, default: int) -> int:
+        """暫存結果的批次大小：不超過 default，且一批的估計用量不超過剩餘預算的 BUFFER_SHARE"""
+        size = int(self.available_mb() * 2 ** 20 * BUFFER_SHARE / BYTES_PER_RESULT)
+        return max(CHECK_EVERY, min(default, size))
+
+    def should_flush(self, buffered: int) -> bool:
+        """每 CHECK_EVERY 筆檢查一次，RSS 超過 SOFT_LIMIT 時提早寫出暫存檔"""
+        self._since_check += 1
+        if self._since_check < CHECK_EVERY:
+            return False
+        self._since_check = 0
+        rss = rss_mb(os.getpid())
+        if rss is not None and rss > self.limit_mb * SOFT_LIMIT:
+            logger.info(f"[Memory] RSS {rss:,.0f} MB 超過預算的 {SOFT_LIMIT:.0%}，提早寫出 {buffered:,} 筆結果")
+            return True
+        return False
+
+    def merge_estimate_mb(self, records: int, existing_path: str = None) -> float:
+        """在記憶體中合併的估計用量"""
+        existing = os.path.getsize(existing_path) if existing_path and os.path.exists(existing_path) else 0
+        return (records * BYTES_PER_RESULT * 2 + existing * JSON_EXPANSION) / 2 ** 20
+
+    def needs_external_merge(self, records: int, existing_path: str = None) -> bool:
+        return self.merge_estimate_mb(records, existing_path) > self.available_mb() * BUFFER_SHARE
+
+    def bucket_count(self, records: int) -> int:
+        """external_merge 的分桶數：每桶的估計用量不超過剩餘預算的 BUFFER_SHARE"""
+        per_bucket = max(1.0, self.available_mb() * BUFFER_SHARE) * 2 ** 20
+        return max(1, min(MAX_BUCKETS, -(-records * BYTES_PER_RESULT * 2 // int(per_bucket))))
+
+
+class CompactDeckSet:
+    """
+    已模擬組合的集合，介面與 load_simulated_decks 返回的 set[tuple] 相同（in / len）
+
+    每個卡牌 ID 對應一個 10 bit 的編號，排序後的 6 張卡組成一個 60 bit 整數；
+    有 NumPy 時存成排序後的 uint64 陣列（8 bytes/組合，以二分搜尋查詢），否則存成 int 的 set。
+    """
+
+    def __init__(self, decks):
+        self.card_index = {}
+        keys = array("Q")
+        for deck in decks:
+            keys.append(self._key(deck, add=True))
+        if np is not None:
+            self.keys = np.unique(np.frombuffer(keys, dtype=np.uint64)) if len(keys) else np.zeros(0, np.uint64)
+        else:
+            self.keys = set(keys)
+
+    def _key(self, deck, add: bool = False) -> int:
+        key = 0
+        for card_id in deck:
+            index = self.card_index.get(card_id)
+            if index is None:
+                if not add:
+                    return None
+                index = len(self.card_index)
+                if index >> _CARD_BITS:
+                    raise ValueError(f"卡牌種類超過 {1 << _CARD_BITS}，無法使用 CompactDeckSet")
+                self.card_index[card_id] = index
+            key = (key << _CARD_BITS) | index
+        return key
+
+    def __contains__(self, deck) -> bool:
+        key = self._key(deck)
+        if key is None:
+            return False
+        if np is not None:
+            pos = np.searchsorted(self.keys, np.uint64(key))
+            return bool(pos < len(self.keys) and self.keys[pos] == key)
+        return key in self.keys
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+def load_compact_decks(path: str) -> CompactDeckSet:
+    """
+    以串流方式讀取結果檔的組合（不載入整個 JSON），返回 CompactDeckSet；
+    卡牌種類過多時退回 set[tuple]
+    """
+    decks = (tuple(sorted(map(int, r["deck_card_ids"]))) for r in iter_results(path))
+    try:
+        result = CompactDeckSet(decks)
+    except ValueError as e:
+        logger.warning(f"[Memory] {e}，改用一般集合")
+        result = {tuple(sorted(map(int, r["deck_card_ids"]))) for r in iter_results(path)}
+    logger.info(f"{len(result)} simulation results loaded (compact).")
+    return result
+
+
+def _iter_jsonl(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def external_merge(temp_files: list[str], output_path: str, finalize, work_dir: str, bucket_count: int,
+                   tracker: MemoryTracker = None) -> int:
+    """
+    在磁碟上合併暫存檔並與既有結果檔合併，寫出按 pt 降序排列的結果檔與二進位索引
+
+    1. 按組合的雜湊把暫存檔的結果分到 bucket_count 個桶（同一組合必在同一桶）
+    2. 每桶載入記憶體，以 finalize 去重並計算 pt，按 pt 降序寫成一個順串 (run)
+    3. 所有順串與既有結果檔（已按 pt 降序）做 k 路合併，寫出新的結果檔
+
+    Args:
+        temp_files: 暫存檔（完成後刪除）
+        output_path: 結果檔；存在時與新結果合併
+        finalize: 接收一桶結果的 list，返回去重並加上 "pt" 的 list（與 save_simulation_results 相同）
+        work_dir: 分桶與順串檔的目錄
+        bucket_count: 分桶數
+        tracker: 可選，記錄 merge / pt 階段的峰值
+
+    Returns:
+        寫出的結果數
+    """
+    tracker = tracker or MemoryTracker()
+    os.makedirs(work_dir, exist_ok=True)
+    bucket_paths = [os.path.join(work_dir, f"bucket_{i:03}.jsonl") for i in range(bucket_count)]
+
+    with tracker.stage("merge"):
+        buckets = [open(path, "w", encoding="utf-8") for path in bucket_paths]
+        try:
+            for temp_file in temp_files:
+                for r in iter_results(temp_file):
+                    key = tuple(sorted(map(int, r["deck_card_ids"])))
+                    buckets[hash(key) % bucket_count].write(json.dumps(r, ensure_ascii=False) + "\n")
+                os.remove(temp_file)
+        finally:
+            for f in buckets:
+                f.close()
+
+    with tracker.stage("pt"):
+        run_paths = []
+        for i, bucket_path in enumerate(bucket_paths):
+            records = finalize(list(_iter_jsonl(bucket_path)))
+            os.remove(bucket_path)
+            if not records:
+                continue
+            records.sort(key=lambda r: r["pt"], reverse=True)
+            run_path = os.path.join(work_dir, f"run_{i:03}.jsonl")
+            with open(run_path, "w", encoding="utf-8") as f:
+                for r in records:
+                    f.write(json.dumps(r, ensure_ascii=False) + "\n")
+            run_paths.append(run_path)
+            del records
+
+        streams = [_iter_jsonl(path) for path in run_paths]
+        if os.path.exists(output_path):
+            streams.append(iter_results(output_path))
+        tmp_path = output_path + ".tmp"
+        count = write_results(tmp_path, heapq.merge(*streams, key=lambda r: -r["pt"]))
+        os.replace(tmp_path, output_path)
+        for path in run_paths:
+            os.remove(path)
+        build_sorted_index(output_path)
+    try:
+        os.rmdir(work_dir)
+    except OSError:
+        pass
+    return count
@@ -0,0 +1,113 @@
+"""
+卡牌與歌曲名稱查詢（共用、延遲載入、快取）
+
+求解器與工具腳本只需要顯示名稱時，不必匯入 Simulator_core（會在匯入時載入全部資料庫）：
+
+    - 卡牌名稱只讀取 Data/CardDatas.json，第一次查詢時載入
+    - 歌名只在第一次查詢時建立一次 MusicDB
+    - 同一行程已匯入 Simulator_core 時直接沿用其 DB_CARDDATA / MUSIC_DB，不重複載入
+
+資料路徑相對於目前工作目錄，與 Simulator_core 相同。
+"""
+import json
+import logging
+import os
+import sys
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+CARD_DATA_PATH = os.path.join("Data", "CardDatas.json")
+
+# 角色名稱
+CHARACTER_NAMES = {
+    1011: "大賀美沙知",
+    1021: "乙宗梢",
+    1022: "夕霧綴理",
+    1023: "藤島慈",
+    1031: "日野下花帆",
+    1032: "村野さやか",
+    1033: "大沢瑠璃乃",
+    1041: "百生吟子",
+    1042: "徒町小鈴",
+    1043: "安養寺姫芽",
+    1051: "桂城泉",
+    1052: "セラス 柳田 リリエンフェルト",
+}
+
+
+def _loaded_simulator():
+    """已匯入的 Simulator_core 模組，未匯入時返回 None（不觸發匯入）"""
+    return sys.modules.get("src.core.Simulator_core")
+
+
+@lru_cache(maxsize=None)
+def card_db() -> dict:
+    """卡牌資料 (CardDatas.json)，無法讀取時返回空 dict"""
+    simulator = _loaded_simulator()
+    if simulator is not None and hasattr(simulator, "DB_CARDDATA"):
+        return simulator.DB_CARDDATA
+    try:
+        with open(CARD_DATA_PATH, "r", encoding="UTF-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"無法讀取卡牌資料 {CARD_DATA_PATH}，卡牌名稱將顯示為 Unknown: {e}")
+        return {}
+
+
+@lru_cache(maxsize=None)
+def music_db():
+    """歌曲資料庫 (MusicDB)，無法讀取時返回 None"""
+    simulator = _loaded_simulator()
+    if simulator is not None and hasattr(simulator, "MUSIC_DB"):
+        return simulator.MUSIC_DB
+    try:
+        from ..core.RChart import MusicDB
+        return MusicDB()
+    except Exception as e:
+        logger.warning(f"無法載入 MusicDB，歌名將顯示為 Unknown: {e}")
+        return None
+
+
+def get_character_name(character_id: int) -> str:
+    """根據角色 ID 取得角色名稱"""
+    return CHARACTER_NAMES.get(character_id, f'Unknown({character_id})')
+
+
+@lru_cache(maxsize=None)
+def get_card_full_info(card_id: int) -> tuple[str, str]:
+    """
+    根據卡面 ID 取得角色名與卡面名
+
+    Returns:
+        (角色名, 卡面名)
+    """
+    card_data = card_db().get(str(card_id))
+    if card_data is None:
+        return 'Unknown', f'Unknown({card_id})'
+    character_id = card_data.get('CharactersId')
+    character_name = get_character_name(character_id) if character_id else 'Unknown'
+    return character_name, card_data.get('Name', f'Unknown({card_id})')
+
+
+def get_card_name(card_id: int) -> str:
+    """根據卡面 ID 取得卡面名稱"""
+    return get_card_full_info(card_id)[1]
+
+
+@lru_cache(maxsize=None)
+def get_song_title(music_id: str) -> str:
+    """根據歌曲 ID 取得歌名"""
+    db = music_db()
+    music = db.get_music_by_id(music_id) if db is not None else None
+    return music.Title if music else f'Unknown({music_id})'
+
+
+def format_deck_with_names(deck_card_ids: list, show_character: bool = True) -> str:
+    """格式化卡組，每行顯示卡牌 ID、角色名（可省略）與卡面名"""
+    lines = []
+    for card_id in deck_card_ids:
+        character_name, card_name = get_card_full_info(card_id)
+        label = f"{character_name} - {card_name}" if show_character else card_name
+        lines.append(f"      {card_id}: {label}")
+    return '\n'.join(lines)
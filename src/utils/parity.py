@@ -0,0 +1,301 @@
+"""
+模擬引擎一致性測試 (golden parity)
+
+向量化、編譯、跳過事件等加速方式都可能讓分數出現細微偏差（例如 RLiveStatus.py 在 PyPy 下
+使用不同的 ceil 實作）。本工具對分層抽樣的卡組與譜面，逐一比較引擎與參考實作
+run_game_simulation 的最終分數、出牌記錄與 C 位，分層包括：
+
+    - plain:       一般卡組
+    - death_note:  含背水卡 (DEATH_NOTE)
+    - hanabi:      含 1041517 與背水卡（延遲 MISS 的路徑）
+    - card_except: 含卡牌除外技能 (CardExcept)
+    - deck_reset:  含洗牌技能 (DeckReset)
+
+分數不一致時，以 trace 重新模擬兩者，回報第一個狀態分歧的事件（引擎不支援 trace 時改為回報
+第一張不同的出牌）。全部一致時可寫出證書 (src/core/engines.py)，MainBatch --engine 才會使用該引擎。
+
+也可以把參考結果存為 golden 檔，在其他 Python 實作或修改模擬器後比對。
+
+使用方法（在專案根目錄執行，未指定 --data 時使用合成資料）：
+    python -m src.utils.parity                                   # 參考實作自我檢查
+    python -m src.utils.parity --engine fast --certify           # 測試登錄的引擎並寫出證書
+    python -m src.utils.parity --engine my_module:simulate       # 測試未登錄的引擎
+    python -m src.utils.parity --save-golden log/parity/golden.json
+    pypy -m src.utils.parity --golden log/parity/golden.json     # 在 PyPy 下比對 CPython 的結果
+    python -m src.utils.parity --data . --charts 405119:02 405121:04
+
+有不一致時以狀態碼 1 結束，可直接作為測試步驟執行。
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+from collections import Counter
+from platform import python_implementation
+
+logger = logging.getLogger(__name__)
+
+STRATA = ("plain", "death_note", "hanabi", "card_except", "deck_reset")
+
+# 延遲 MISS 的卡牌（Simulator_core 的 flag_hanabi_ginko）
+HANABI_CARD = 1041517
+
+MASTER_LEVELS = (1, 30, 50)
+
+
+def stratum_cards() -> dict[str, list[list[int]]]:
+    """每個分層必須包含的卡牌組合候選"""
+    from src.config.CardLevelConfig import DEATH_NOTE
+    from src.core.Simulator_core import DB_CARDDATA
+    from src.core.SkillResolver import SkillEffectType
+    from src.deck_gen.DeckGen2 import DB_TAG
+
+    death_note = sorted(c for c in DEATH_NOTE if str(c) in DB_CARDDATA)
+    candidates = {
+        "plain": [[]],
+        "death_note": [[c] for c in death_note],
+        "hanabi": [[HANABI_CARD, c] for c in death_note if c != HANABI_CARD] if str(HANABI_CARD) in DB_CARDDATA else [],
+        "card_except": [[c] for c in sorted(DB_TAG) if SkillEffectType.CardExcept in DB_TAG[c]],
+        "deck_reset": [[c] for c in sorted(DB_TAG) if SkillEffectType.DeckReset in DB_TAG[c]],
+    }
+    return candidates
+
+
+def sample_deck(rng: random.Random, required: list[int], pool: list[int], center_char: int) -> list[int]:
+    """
+    包含 required 的隨機卡組：6 張不同的卡、每個角色最多 2 張、至少一張 C 位角色的卡（與卡組生成器相同），
+    順序隨機
+    """
+    deck = list(required)
+    chars = Counter(c // 1000 for c in deck)
+    if not chars[center_char]:
+        deck.append(rng.choice([c for c in pool if c // 1000 == center_char and c not in deck]))
+        chars[center_char] += 1
+    while len(deck) < 6:
+        card = rng.choice(pool)
+        if card in deck or chars[card // 1000] >= 2:
+            continue
+        deck.append(card)
+        chars[card // 1000] += 1
+    rng.shuffle(deck)
+    return deck
+
+
+def sample_cases(charts: dict, per_stratum: int, seed: int = 0) -> list[dict]:
+    """
+    分層抽樣：每份譜面、每個分層各 per_stratum 個卡組
+
+    Args:
+        charts: load_charts 的結果
+        per_stratum: 每份譜面每個分層的卡組數
+        seed: 隨機種子
+
+    Returns:
+        [{"chart": 譜面, "stratum": 分層, "deck": [卡牌ID, ...], "masterlv": 熟練度}, ...]
+    """
+    from src.config.CardLevelConfig import DEATH_NOTE
+    from src.core.Simulator_core import DB_CARDDATA
+
+    rng = random.Random(seed)
+    candidates = stratum_cards()
+    # 一般卡組不含背水卡與延遲 MISS 卡，這兩條路徑由各自的分層覆蓋
+    special = set(DEATH_NOTE) | {HANABI_CARD}
+    # 未公開的佔位卡（名稱為 ？？？）技能系列與卡牌 ID 不對應，模擬器無法載入
+    pool = sorted(int(c) for c, card in DB_CARDDATA.items()
+                  if any(str(s).startswith(f"3{c[1:]}") for s in card["RhythmGameSkillSeriesId"]))
+    plain_pool = [c for c in pool if c not in special]
+
+    cases = []
+    for stratum in STRATA:
+        if not candidates[stratum]:
+            logger.warning(f"卡牌資料中沒有 {stratum} 分層需要的卡牌，跳過")
+            continue
+        for label, chart in charts.items():
+            for _ in range(per_stratum):
+                required = rng.choice(candidates[stratum])
+                deck = sample_deck(rng, required, plain_pool if stratum == "plain" else pool,
+                                   chart.music.CenterCharacterId)
+                cases.append({"chart": label, "stratum": stratum, "deck": deck,
+                              "masterlv": rng.choice(MASTER_LEVELS)})
+    return cases
+
+
+def load_charts(chart_labels: list[str]) -> dict:
+    """讀取 "歌曲ID_難度" 對應的譜面，找不到時拋出 ValueError"""
+    from src.core.RChart import Chart
+    from src.core.Simulator_core import MUSIC_DB, prepare_chart
+
+    charts = {}
+    for label in chart_labels:
+        music_id, _, difficulty = label.partition("_")
+        if MUSIC_DB.get_music_by_id(music_id) is None:
+            raise ValueError(f"找不到歌曲 {music_id}")
+        chart = Chart(MUSIC_DB, music_id, difficulty)
+        if not chart.AllNoteSize:
+            raise ValueError(f"找不到譜面 {label}")
+        charts[label] = prepare_chart(chart)
+    return charts
+
+
+def make_task(case: dict, chart, index: int) -> tuple:
+    from src.config.CardLevelConfig import convert_deck_to_simulator_format
+    deck = list(case["deck"])
+    return (convert_deck_to_simulator_format(deck), chart, case["masterlv"], index, deck, -1)
+
+
+def summarize(result: dict) -> dict:
+    """用於比較的結果欄位"""
+    return {"score": result["final_score"], "cards": list(result["cards_played_log"]),
+            "center": result["center_card"]}
+
+
+def first_divergence(expected: list, actual: list) -> dict:
+    """
+    兩份 trace 中第一個狀態不同的位置
+
+    trace 記錄的是處理每個事件「之前」的狀態，第 i 筆不同表示第 i-1 個事件的處理結果不同。
+    """
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        if a != b:
+            culprit = expected[i - 1] if i else None
+            return {"index": i, "after_event": culprit[:2] if culprit else None,
+                    "expected_state": a, "actual_state": b}
+    if len(expected) != len(actual):
+        i = min(len(expected), len(actual))
+        return {"index": i, "after_event": expected[i - 1][:2] if i else None,
+                "expected_state": expected[i] if i < len(expected) else None,
+                "actual_state": actual[i] if i < len(actual) else None}
+    return None
+
+
+def first_card_divergence(expected: list, actual: list) -> dict:
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        if a != b:
+            return {"card_index": i, "expected_card": a, "actual_card": b}
+    return {"card_index": min(len(expected), len(actual)), "expected_cards": len(expected),
+            "actual_cards": len(actual)}
+
+
+def check_parity(engine_name: str, cases: list[dict], charts: dict, golden: list[dict] = None) -> dict:
+    """
+    比較引擎與參考實作（或 golden 結果）
+
+    Args:
+        engine_name: 引擎名稱或 "模組:函式"
+        cases: sample_cases 的結果
+        charts: load_charts 的結果
+        golden: 與 cases 對應的參考結果（summarize 格式），None 時即時執行參考實作
+
+    Returns:
+        {"engine", "checked", "strata": {分層: 數量}, "mismatches": [...]}
+    """
+    from src.core.engines import REFERENCE, load_engine, supports_trace
+
+    engine = load_engine(engine_name)
+    reference = load_engine(REFERENCE)
+    mismatches = []
+    for index, case in enumerate(cases):
+        chart = charts[case["chart"]]
+        actual = summarize(engine(make_task(case, chart, index)))
+        expected = golden[index] if golden is not None else summarize(reference(make_task(case, chart, index)))
+        if actual == expected:
+            continue
+
+        mismatch = dict(case, expected=expected["score"], actual=actual["score"])
+        if supports_trace(engine):
+            expected_trace, actual_trace = [], []
+            reference(make_task(case, chart, index), trace=expected_trace)
+            engine(make_task(case, chart, index), trace=actual_trace)
+            mismatch["divergence"] = first_divergence(expected_trace, actual_trace)
+        if mismatch.get("divergence") is None:
+            # 引擎不支援 trace，或差異只在 golden 與目前環境之間
+            mismatch["divergence"] = first_card_divergence(expected["cards"], actual["cards"])
+        mismatches.append(mismatch)
+
+    return {"engine": engine_name, "checked": len(cases),
+            "strata": dict(Counter(case["stratum"] for case in cases)), "mismatches": mismatches}
+
+
+def report_mismatches(report: dict):
+    logger.info(f"Engine {report['engine']}: {report['checked']} cases "
+                f"({', '.join(f'{k} {v}' for k, v in report['strata'].items())}), "
+                f"{len(report['mismatches'])} mismatches")
+    for m in report["mismatches"]:
+        logger.error(f"  [{m['stratum']}] {m['chart']} Lv.{m['masterlv']} {m['deck']}: "
+                     f"expected {m['expected']:,}, got {m['actual']:,}")
+        logger.error(f"    first divergence: {m['divergence']}")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description='模擬引擎一致性測試')
+    parser.add_argument('--engine', type=str, default="reference", help='引擎名稱或 模組:函式 (預設: reference)')
+    parser.add_argument('--data', type=str, metavar='DIR', help='包含 Data/ 的目錄 (預設: 產生合成資料)')
+    parser.add_argument('--charts', nargs='+', metavar='ID:DIFF', help='測試譜面 (預設: 合成資料的全部 Master 譜面)')
+    parser.add_argument('--per-stratum', type=int, default=10, help='每份譜面每個分層的卡組數 (預設: 10)')
+    parser.add_argument('--seed', type=int, default=0, help='抽樣與合成資料的隨機種子')
+    parser.add_argument('--golden', type=str, metavar='FILE', help='改與 golden 檔的參考結果比較')
+    parser.add_argument('--save-golden', type=str, metavar='FILE', help='把參考實作的結果存為 golden 檔')
+    parser.add_argument('--certify', action='store_true', help='全部一致時寫出證書，允許 MainBatch 使用該引擎')
+    args = parser.parse_args()
+
+    from src.utils.synthetic_data import DIFFICULTIES, generate_fixture
+
+    cwd = os.getcwd()
+    golden = None
+    if args.golden:
+        with open(args.golden, "r", encoding="utf-8") as f:
+            golden = json.load(f)
+        if golden["implementation"] != python_implementation():
+            logger.info(f"Golden results recorded under {golden['implementation']}")
+        args.seed = golden["seed"]
+
+    with tempfile.TemporaryDirectory(prefix="sukushow-parity-") as fixture:
+        if args.data is None:
+            music_ids = generate_fixture(fixture, seed=args.seed,
+                                         carddata_path=os.path.join(cwd, "Data", "CardDatas.json"))
+            args.charts = args.charts or [f"{music_id}:{DIFFICULTIES[-1]}" for music_id in music_ids]
+        elif not args.charts and golden is None:
+            parser.error("指定 --data 時需要以 --charts 指定譜面")
+        os.chdir(args.data or fixture)
+        try:
+            if golden is not None:
+                cases = golden["cases"]
+                expected = [case.pop("expected") for case in cases]
+                charts = load_charts(sorted({case["chart"] for case in cases}))
+            else:
+                charts = load_charts([text.replace(":", "_") if ":" in text else f"{text}_02" for text in args.charts])
+                cases = sample_cases(charts, args.per_stratum, args.seed)
+                expected = None
+
+            if args.save_golden:
+                from src.core.engines import REFERENCE, load_engine
+                reference = load_engine(REFERENCE)
+                for index, case in enumerate(cases):
+                    case["expected"] = summarize(reference(make_task(case, charts[case["chart"]], index)))
+                os.chdir(cwd)
+                os.makedirs(os.path.dirname(os.path.abspath(args.save_golden)), exist_ok=True)
+                with open(args.save_golden, "w", encoding="utf-8") as f:
+                    json.dump({"implementation": python_implementation(), "seed": args.seed, "data": args.data,
+                               "cases": cases}, f, ensure_ascii=False)
+                logger.info(f"Golden results for {len(cases)} cases saved to {args.save_golden}")
+                return 0
+
+            report = check_parity(args.engine, cases, charts, expected)
+        finally:
+            os.chdir(cwd)
+
+    report_mismatches(report)
+    if report["mismatches"]:
+        return 1
+    if args.certify:
+        from src.core.engines import save_certificate
+        save_certificate(args.engine, report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,8 +6,9 @@
 import json
 import os
 import logging
-from ..core.RChart import MusicDB
 from ..config.CardLevelConfig import CARD_CACHE
+from .names import music_db as load_music_db
+from .result_stream import save_sorted_index
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='%(message)s')
@@ -122,8 +123,8 @@ def recalculate_pt(input_file, output_file, music_id, fan_levels, season_mode):
         return
 
     # 加载歌曲信息
-    music_db = MusicDB()
-    music = music_db.get_music_by_id(music_id)
+    music_db = load_music_db()
+    music = music_db.get_music_by_id(music_id) if music_db is not None else None
     if not music:
         logger.error(f"错误：找不到歌曲 {music_id}")
         return
@@ -192,6 +193,7 @@ def recalculate_pt(input_file, output_file, music_id, fan_levels, season_mode):
     # 保存结果
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(results, f, ensure_ascii=False, indent=0)
+    save_sorted_index(output_file, results)
 
     logger.info(f"结果已保存到: {output_file}")
 
@@ -0,0 +1,126 @@
+"""
+模擬結果指紋（增量重算用）
+
+每次 MainBatch 跑完一首歌，會在結果檔旁寫入 simulation_results_<id>_<tier>.meta.json，
+記錄產生這份結果的設定：卡池、各卡實際練度、熟練度、Fan Lv、賽季模式、C位/顏色覆蓋等。
+
+下次以 --delta 運行時與當前設定比對：
+    - 熟練度 / C位覆蓋 / 顏色覆蓋 / 隊長 改變 → 所有分數失效，完整重跑
+    - 只有 Fan Lv / 賽季模式 改變 → 分數仍有效，只需重算 pt
+    - 卡牌新增 / 練度改變 / 移除 → 刪除含變動卡牌的舊結果，只模擬含新增或變動卡牌的組合
+    - 必帶卡 / 必備技能類型 / 強制 DR 改變 → 舊結果仍有效，但不是同條件的完整窮舉，枚舉全部組合
+"""
+import json
+import logging
+import os
+
+from ..config.CardLevelConfig import convert_deck_to_simulator_format
+
+logger = logging.getLogger(__name__)
+
+# 任何一項改變都會使全部分數失效
+SCORE_KEYS = ("mastery_level", "center_override", "color_override", "leader_designation")
+# 只影響 pt
+PT_KEYS = ("fan_levels", "season_mode")
+# 生成器的組合規則：任何一項改變時，舊結果不是同條件的完整窮舉（放寬的規則會產生舊結果沒有的組合）
+RULE_KEYS = ("mustcards", "mustskills", "force_dr")
+
+
+def fingerprint_path(result_path: str) -> str:
+    """simulation_results_x.json -> simulation_results_x.meta.json"""
+    root, _ = os.path.splitext(result_path)
+    return root + ".meta.json"
+
+
+def build_fingerprint(card_ids: list[int], custom_card_levels, song_config: dict, fan_levels: dict,
+                      season_mode: str, mustcards: list[list], search_mode: str, force_dr: bool = False) -> dict:
+    """
+    根據當前設定建立指紋。練度記錄的是實際用於模擬的值（已套用預設與 CARD_CACHE）。
+
+    mustcards 與生成器相同：[必帶卡(全部), 必帶卡(任一), 必備技能類型 SkillEffectType]；
+    force_dr 為 DR 剪枝後是否強制每個卡組含一張 DR。
+    """
+    levels = {str(card_id): list(card_levels)
+              for card_id, card_levels in convert_deck_to_simulator_format(sorted(card_ids), custom_card_levels)}
+    return {
+        "card_levels": levels,
+        "mastery_level": int(song_config["mastery_level"]),
+        "center_override": song_config.get("center_override"),
+        "color_override": song_config.get("color_override"),
+        "leader_designation": str(song_config.get("leader_designation") or "0"),
+        "fan_levels": {str(k): v for k, v in sorted((fan_levels or {}).items())},
+        "season_mode": season_mode,
+        "mustcards": [sorted(int(c) for c in mustcards[0]), sorted(int(c) for c in mustcards[1])],
+        "mustskills": sorted(skill.name for skill in mustcards[2]),
+        "force_dr": bool(force_dr),
+        "search": search_mode,
+    }
+
+
+def load_fingerprint(result_path: str):
+    path = fingerprint_path(result_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"[Delta] 無法讀取指紋 {path}: {e}")
+        return None
+
+
+def save_fingerprint(result_path: str, fingerprint: dict):
+    with open(fingerprint_path(result_path), 'w', encoding='utf-8') as f:
+        json.dump(fingerprint, f, ensure_ascii=False, indent=1)
+
+
+def diff_fingerprint(old: dict, new: dict) -> dict:
+    """
+    比對新舊指紋。
+
+    Returns:
+        {
+            "full_rerun": bool,       # 所有舊結果失效
+            "reason": str,
+            "pt_changed": bool,       # 需要重算 pt
+            "added_cards": set,
+            "removed_cards": set,
+            "changed_cards": set,     # 練度改變
+            "exhaustive_base": bool,  # 舊結果為同條件下的完整窮舉，可只枚舉含變動卡牌的組合
+        }
+    """
+    diff = {
+        "full_rerun": False,
+        "reason": "",
+        "pt_changed": False,
+        "added_cards": set(),
+        "removed_cards": set(),
+        "changed_cards": set(),
+        "exhaustive_base": False,
+    }
+    for key in SCORE_KEYS:
+        if old.get(key) != new.get(key):
+            diff["full_rerun"] = True
+            diff["reason"] = f"{key}: {old.get(key)} -> {new.get(key)}"
+            return diff
+
+    diff["pt_changed"] = any(old.get(key) != new.get(key) for key in PT_KEYS)
+
+    old_levels = old.get("card_levels", {})
+    new_levels = new["card_levels"]
+    diff["added_cards"] = {int(c) for c in new_levels.keys() - old_levels.keys()}
+    diff["removed_cards"] = {int(c) for c in old_levels.keys() - new_levels.keys()}
+    diff["changed_cards"] = {int(c) for c in new_levels.keys() & old_levels.keys()
+                             if new_levels[c] != old_levels[c]}
+    # 沒有記錄規則的舊指紋視為規則不同
+    diff["exhaustive_base"] = old.get("search") == "exhaustive" and \
+        all(key in old and old[key] == new.get(key) for key in RULE_KEYS)
+    return diff
+
+
+def filter_stale_results(results, diff: dict) -> list[dict]:
+    """刪除包含已移除或練度改變卡牌的結果（results 可為 iter_results 等任意可迭代物件）"""
+    stale_cards = diff["removed_cards"] | diff["changed_cards"]
+    if not stale_cards:
+        return list(results)
+    return [r for r in results if not stale_cards.intersection(r["deck_card_ids"])]
@@ -0,0 +1,336 @@
+"""
+模擬結果檔的串流讀取
+
+結果檔是一個很大的 JSON 陣列（百萬筆級別），json.load 會一次載入全部。
+這裡以 JSONDecoder.raw_decode 逐筆解析，只保留目前的緩衝區，
+適合只需要前 K 筆（結果檔已按 pt/score 由高到低排序）或逐筆處理的場合。
+
+多歌曲求解器以 load_top_results 讀取 pt 前 N 名：有二進位索引時只讀取開頭約 N 筆，
+否則串流解析並以堆積保留前 N 名，記憶體用量均為 O(N)。
+需要更多卡組時由 TopResultSource 重新讀取更長的前綴。
+"""
+import heapq
+import itertools
+import json
+import os
+import struct
+
+_WHITESPACE = " \t\n\r"
+
+
+def iter_results(path: str, chunk_size: int = 1 << 20):
+    """
+    逐筆產生結果檔中的物件。
+
+    Args:
+        path: JSON 陣列檔案路徑
+        chunk_size: 每次讀取的字元數
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = f.read(chunk_size)
+        pos = 0
+        started = False
+        eof = not buf
+        # 是否嘗試整批解析目前緩衝區（失敗後直到讀入新資料前都改為逐筆解析）
+        batch = True
+        while True:
+            # 跳過空白、起始 '[' 與分隔 ','
+            while True:
+                while pos < len(buf) and buf[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buf) or eof:
+                    break
+                buf, pos = f.read(chunk_size), 0
+                eof = not buf
+                batch = True
+            if pos >= len(buf):
+                if not started:
+                    raise ValueError(f"{path} 不是 JSON 陣列")
+                raise ValueError(f"{path} 在陣列結束前中斷")
+            ch = buf[pos]
+            if not started:
+                if ch != '[':
+                    raise ValueError(f"{path} 不是 JSON 陣列")
+                started = True
+                pos += 1
+                continue
+            if ch == ',':
+                pos += 1
+                continue
+            if ch == ']':
+                return
+
+            # 緩衝區中到最後一個 '}' 為止的物件一次交給 json.loads（C 實作，比逐筆 raw_decode 快數倍）；
+            # 最後一個 '}' 若落在未完整讀入的物件或字串中，解析必定失敗，此時改為逐筆解析
+            if batch:
+                cut = buf.rfind('}', pos) + 1
+                try:
+                    objs = json.loads('[' + buf[pos:cut] + ']') if cut > pos else None
+                except json.JSONDecodeError:
+                    objs = None
+                if objs:
+                    yield from objs
+                    buf, pos = buf[cut:], 0
+                    continue
+                batch = False
+
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise
+                buf = buf[pos:] + chunk
+                pos = 0
+                batch = True
+                continue
+            yield obj
+            pos = end
+            if pos >= chunk_size:
+                buf = buf[pos:]
+                pos = 0
+
+
+def write_results(path: str, results) -> int:
+    """
+    逐筆寫出結果檔（格式與 json.dump(results, f, indent=0) 相同），返回寫出的筆數
+
+    results 可以是任意可迭代物件，記憶體用量與筆數無關。
+    """
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for r in results:
+            f.write(",\n" if count else "[\n")
+            f.write(json.dumps(r, ensure_ascii=False, indent=0))
+            count += 1
+        f.write("\n]" if count else "[]")
+    return count
+
+
+def read_top_results(path: str, k: int) -> list[dict]:
+    """讀取結果檔前 k 筆（結果檔按 pt/score 由高到低排序）"""
+    return list(itertools.islice(iter_results(path), k))
+
+
+# === 已排序的二進位索引 ===
+# 結果檔按 pt 降序存檔時，同時寫出一份定長記錄的二進位副本 (*.sorted.bin)，
+# 讀取前 N 名時只需從頭讀取約 N 筆記錄，不必解析整個 JSON。
+# 標頭記錄來源 JSON 的大小與修改時間，JSON 被其他工具改寫後副本自動失效。
+INDEX_SUFFIX = ".sorted.bin"
+INDEX_MAGIC = b"SKRI"
+INDEX_VERSION = 1
+DECK_SIZE = 6
+_HEADER = struct.Struct("<4sIQqQ")  # magic, version, JSON 大小, JSON 修改時間 (ns), 記錄數
+_RECORD = struct.Struct(f"<qqi{DECK_SIZE}i")  # pt, score, center_card, deck_card_ids
+_INDEX_KEYS = {"deck_card_ids", "center_card", "score", "pt"}
+
+
+def index_path(path: str) -> str:
+    """結果檔對應的二進位索引路徑"""
+    return os.path.splitext(path)[0] + INDEX_SUFFIX
+
+
+def save_sorted_index(path: str, results: list[dict]) -> bool:
+    """
+    為剛寫入的結果檔寫出二進位索引，返回是否寫出
+
+    results 必須與 path 的內容相同且已按 pt 降序排列；
+    含有其他欄位或卡組不是 6 張卡的結果無法以定長記錄保存，此時刪除舊索引並返回 False。
+    """
+    target = index_path(path)
+    if any(r.keys() != _INDEX_KEYS or len(r["deck_card_ids"]) != DECK_SIZE for r in results):
+        if os.path.exists(target):
+            os.remove(target)
+        return False
+
+    stat = os.stat(path)
+    tmp = target + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime_ns, len(results)))
+        pack = _RECORD.pack
+        for r in results:
+            center = r["center_card"]
+            f.write(pack(r["pt"], r["score"], -1 if center is None else center, *r["deck_card_ids"]))
+    os.replace(tmp, target)
+    return True
+
+
+def build_sorted_index(path: str) -> bool:
+    """
+    以串流方式為既有的結果檔補建二進位索引，返回是否寫出
+
+    只在結果檔已按 pt 降序排列且每筆都能以定長記錄保存時寫出，記憶體用量與檔案大小無關；
+    否則刪除寫到一半的暫存檔並返回 False。
+    """
+    target = index_path(path)
+    stat = os.stat(path)
+    tmp = target + ".tmp"
+    count = 0
+    last_pt = None
+    ok = True
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime_ns, 0))
+        pack = _RECORD.pack
+        for r in iter_results(path):
+            if r.keys() != _INDEX_KEYS or len(r["deck_card_ids"]) != DECK_SIZE or (
+                    last_pt is not None and r["pt"] > last_pt):
+                ok = False
+                break
+            center = r["center_card"]
+            f.write(pack(r["pt"], r["score"], -1 if center is None else center, *r["deck_card_ids"]))
+            last_pt = r["pt"]
+            count += 1
+        if ok:
+            f.seek(0)
+            f.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime_ns, count))
+    if not ok:
+        os.remove(tmp)
+        return False
+    os.replace(tmp, target)
+    return True
+
+
+def open_sorted_index(path: str):
+    """
+    開啟與結果檔相符的二進位索引，返回 (檔案物件, 記錄數)；沒有索引或已失效時返回 None
+    """
+    target = index_path(path)
+    if not os.path.exists(target) or not os.path.exists(path):
+        return None
+    f = open(target, "rb")
+    header = f.read(_HEADER.size)
+    stat = os.stat(path)
+    if len(header) == _HEADER.size:
+        magic, version, size, mtime_ns, count = _HEADER.unpack(header)
+        if (magic, version, size, mtime_ns) == (INDEX_MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime_ns):
+            return f, count
+    f.close()
+    return None
+
+
+def iter_sorted_index(f, chunk_records: int = 4096):
+    """逐筆產生二進位索引中的結果（格式與結果檔中的物件相同）"""
+    while True:
+        chunk = f.read(_RECORD.size * chunk_records)
+        if not chunk:
+            return
+        for pt, score, center, *deck in _RECORD.iter_unpack(chunk[:len(chunk) - len(chunk) % _RECORD.size]):
+            yield {"deck_card_ids": deck, "center_card": None if center < 0 else center, "score": score, "pt": pt}
+
+
+def load_top_results(path: str, n: int, forbidden_cards=None, dedupe: bool = False) -> tuple[list[dict], dict]:
+    """
+    讀取結果檔中 pt 最高的 n 筆不含禁卡的結果，記憶體用量為 O(n)
+
+    有相符的二進位索引時從頭讀取到湊滿 n 筆即停止；否則串流解析整個 JSON，
+    以大小為 n 的最小堆積保留前 n 名。兩者的結果與「全部載入、按 pt 穩定排序後取前 n 筆」相同
+    （去重時，同 pt 的組合在被擠出前 n 名後又以更高 pt 出現的情況下，順序可能不同）。
+
+    Args:
+        path: 結果檔路徑
+        n: 保留的筆數
+        forbidden_cards: 禁卡 ID，含有任一張的結果會被略過
+        dedupe: 相同卡牌組合（不計順序）只保留 pt 最高的一筆
+
+    Returns:
+        (results, stats)：results 按 pt 降序；stats 為
+        {"total": 結果檔總筆數, "scanned": 實際讀取筆數, "forbidden": 讀取中略過的禁卡筆數,
+         "source": "index" 或 "json"}
+    """
+    forbidden = set(forbidden_cards or ())
+    stats = {"total": 0, "scanned": 0, "forbidden": 0, "source": "json"}
+    if n <= 0:
+        return [], stats
+
+    def allowed(record):
+        if forbidden and not forbidden.isdisjoint(record["deck_card_ids"]):
+            stats["forbidden"] += 1
+            return False
+        return True
+
+    opened = open_sorted_index(path)
+    if opened is not None:
+        # 索引已按 pt 降序排列：依序取前 n 筆即可
+        f, stats["total"] = opened
+        stats["source"] = "index"
+        results = []
+        seen = set()
+        with f:
+            for record in iter_sorted_index(f):
+                stats["scanned"] += 1
+                if not allowed(record):
+                    continue
+                if dedupe:
+                    key = tuple(sorted(record["deck_card_ids"]))
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                results.append(record)
+                if len(results) >= n:
+                    break
+        return results, stats
+
+    # 堆積元素 (pt, -讀取順序, 組合鍵)，堆頂為目前第 n 名；同分時先讀到的優先，
+    # 與穩定排序的結果一致（去重時以該組合第一次讀到的順序為準）
+    heap = []
+    best = {}  # 組合鍵 -> (pt, 讀取順序, 結果)
+
+    def is_live(item):
+        entry = best.get(item[2])
+        return entry is not None and entry[0] == item[0] and entry[1] == -item[1]
+
+    for seq, record in enumerate(iter_results(path)):
+        stats["scanned"] += 1
+        if not allowed(record):
+            continue
+        pt = record["pt"]
+        key = tuple(sorted(record["deck_card_ids"])) if dedupe else seq
+        if dedupe and key in best:
+            if pt <= best[key][0]:
+                continue
+            # 同組合的新 pt 較高：沿用原本的讀取順序，舊的堆積元素留待彈出時略過
+            seq = best[key][1]
+        elif len(best) >= n:
+            while not is_live(heap[0]):
+                heapq.heappop(heap)
+            if (pt, -seq) <= heap[0][:2]:
+                continue
+            del best[heapq.heappop(heap)[2]]
+        best[key] = (pt, seq, record)
+        heapq.heappush(heap, (pt, -seq, key))
+        if len(heap) > 2 * n + 1024:
+            heap = [(p, -s, k) for k, (p, s, _) in best.items()]
+            heapq.heapify(heap)
+    stats["total"] = stats["scanned"]
+
+    # (pt, -讀取順序) 降序即 pt 降序、同分時先讀到的在前
+    live = sorted((item for item in heap if is_live(item)), reverse=True)
+    return [best[key][2] for _, _, key in live], stats
+
+
+class TopResultSource:
+    """
+    一首歌 pt 前 n 名的非禁卡結果，並記錄下一筆的 pt，供求解器判斷是否需要載入更多卡組
+
+    load 只會擴充：前 n 筆的內容與順序和較小的 n 相同（load_top_results 的結果為穩定排序的前綴）。
+
+    Args:
+        path: 結果檔路徑
+        n: 初始載入筆數
+        forbidden_cards: 禁卡 ID
+    """
+
+    def __init__(self, path: str, n: int, forbidden_cards=None):
+        self.path = path
+        self.forbidden_cards = forbidden_cards
+        self.results = []
+        self.next_pt = None
+        self.stats = {}
+        self.load(n)
+
+    def load(self, n: int):
+        """重新讀取前 n 筆；多讀一筆以取得下一筆的 pt（已讀完時為 None）"""
+        results, self.stats = load_top_results(self.path, n + 1, self.forbidden_cards)
+        self.next_pt = results[n]["pt"] if len(results) > n else None
+        self.results = results[:n]
@@ -0,0 +1,367 @@
+"""
+合成譜面 / 卡池測試資料產生器
+
+倉庫只附帶 Data/CardDatas.json 與 Data/Musics.yaml，缺少譜面 (.bytes)、
+musicscore CSV 與技能資料庫，乾淨的 checkout 無法建立 Chart。
+本工具以固定種子產生與遊戲資料格式完全一致的合成資料，
+用於離線效能測試與回歸測試。
+
+產生的目錄結構:
+    {out}/Data/CardDatas.json            (複製自倉庫)
+    {out}/Data/Musics.yaml               (合成歌曲)
+    {out}/Data/RhythmGameSkills.json     (合成技能)
+    {out}/Data/CenterSkills.json
+    {out}/Data/CenterAttributes.json
+    {out}/Data/bytes/rhythmgame_chart_{id}_{tier}.bytes   (raw-deflate JSON)
+    {out}/Data/csv/musicscore_{id}.csv
+
+模擬器以相對路徑讀取 Data/，使用時需在 {out} 目錄下執行:
+    python -m src.utils.synthetic_data --out fixtures/synthetic
+    python -m src.utils.synthetic_data --out fixtures/custom --scales stress --notes 3000 --bpm-changes 6
+    cd fixtures/synthetic && python ../../MainBatch.py 990101 04 50 0
+
+效能測試套件 (python -m benchmarks) 預設使用本工具產生的資料。
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import random
+import shutil
+import zlib
+from dataclasses import dataclass, replace
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 合成歌曲使用的 ID 區段，避免與正式歌曲衝突
+SYNTHETIC_MUSIC_ID_BASE = 990100
+
+DIFFICULTIES = ("01", "02", "03", "04")
+
+
+@dataclass(frozen=True)
+class ChartSpec:
+    """合成歌曲的規模，音符數為 Master 譜面的判定數（長條的每個判定點各計一個），低難度按比例減少"""
+    notes: int
+    hold_ratio: float          # 長條佔音符的比例
+    chain_ratio: float         # 長條再串接一段的機率（最多 4 段）
+    bpm_changes: int           # BPM 變化次數
+    length: float              # 歌曲長度（秒）
+    fever_section: Optional[int] = None  # Fever 所在段落 (3-5)，None 時隨機
+
+
+# 預設歌曲規模
+SCALES = {
+    "small": ChartSpec(300, 0.15, 0.3, 0, 90),
+    "realistic": ChartSpec(800, 0.2, 0.3, 1, 130),
+    "stress": ChartSpec(2000, 0.25, 0.4, 3, 150),
+}
+
+# 合成技能原型: (技能效果ID列表, 條件ID列表, 基礎AP消耗)
+# 數值部分會依技能等級縮放
+SKILL_ARCHETYPES = [
+    ([200012000], ["0"], 12),                              # 分
+    ([200009000, 100010000], ["0", "0"], 10),              # 分 + 回AP
+    ([300000060], ["0"], 8),                               # 电
+    ([300000040, 200006000], ["0", "0"], 11),              # 电 + 分
+    ([701005000], ["0"], 7),                               # 分加成
+    ([801008000], ["0"], 7),                               # 电加成
+    ([702003000, 801005000], ["0", "0"], 9),               # 双次分加成 + 电加成
+    ([500000000, 100020000], ["0", "0"], 9),               # 洗牌 + 回AP
+    ([500000000, 300000030], ["0", "0"], 10),              # 洗牌 + 电
+    ([400002000, 300000030], ["0", "0"], 8),               # 回血 + 电
+    ([200015000, 410001000], ["1000000", "0"], 13),        # Fever中 分, 扣血
+    ([200008000, 200006000], ["0", "2100010"], 12),        # 分, Voltage Lv.10以上追加分
+    ([300000050, 600000000], ["0", "5100002"], 6),         # 电, 打出3次后除外
+    ([200007000, 100010000], ["3205000", "0"], 9),         # 血量50%以下 分, 回AP
+]
+
+# 合成 C 位技能: (條件ID, 效果ID)
+CENTER_SKILL_ARCHETYPES = [
+    (["1000000"], [300000100]),                  # Live开始时 加电
+    (["2000000"], [200050000]),                  # Live结束时 加分
+    (["3000000"], [100050000]),                  # Fever开始时 回AP
+    (["3000000,5100010"], [200030000]),          # Fever开始时且Voltage Lv.10以上 加分
+    (["1000000"], [400003000]),                  # Live开始时 回血
+]
+
+# 合成 C 位特性: (目標ID, 效果ID)
+CENTER_ATTRIBUTE_ARCHETYPES = [
+    (["50000"], [10005000]),                     # 全员 Smile +50%
+    (["50000"], [20005000]),                     # 全员 Pure +50%
+    (["50000"], [30005000]),                     # 全员 Cool +50%
+    (["50000", "50000"], [10003000, 91000001]),  # 全员 Smile +30%, AP消耗 -1
+    (["50000"], [101000100]),                    # 技能CD -1s
+    (["50000"], [70002000]),                     # 全员 血量 +20%
+]
+
+
+def _note_flags(note_type: int, start_pos: tuple[int, int], end_pos: tuple[int, int]) -> int:
+    """與 Chart._generate_flags 相同的位元排列 (不含鏡像)"""
+    l1, r1 = start_pos
+    l2, r2 = end_pos
+    return (note_type & 0xF) | (r1 & 0x3F) << 4 | (r2 & 0x3F) << 10 | (l1 & 0x3F) << 16 | (l2 & 0x3F) << 22
+
+
+def _fmt_time(t: float) -> str:
+    return f"{t:.7g}"
+
+
+def _bpm_at(bpms: list[dict], t: float) -> float:
+    bpm = bpms[0]["Bpm"]
+    for data in bpms:
+        if data["Time"] < t:
+            bpm = data["Bpm"]
+        else:
+            break
+    return bpm
+
+
+def generate_chart(spec: ChartSpec, note_count: int, seed: int) -> dict:
+    """
+    產生一份合成譜面 (與 .bytes 解壓後的 JSON 結構相同)
+
+    判定數為 note_count：剩餘的判定平均分配到剩餘時間，音符起點落在 1/8 拍格上，
+    長條可與之後的音符重疊。長條的判定點按半拍步進，串接長條的終點時間與下一段
+    起點時間、位置完全相同，可觸發 Chart 的合併邏輯；同一串長條使用起點的 BPM，
+    合併後重新計算的判定點與原本相同（浮點誤差偶爾使整份譜面少一個判定）。
+    """
+    rng = random.Random(seed)
+    length = spec.length
+    bpms = [{"Time": 0.0, "Bpm": float(rng.choice([120, 150, 170, 180]))}]
+    for i in range(spec.bpm_changes):
+        bpms.append({
+            "Time": round(length * (i + 1) / (spec.bpm_changes + 1), 3),
+            "Bpm": float(rng.choice([110, 140, 160, 190, 200])),
+        })
+
+    notes = []
+    count = 0
+    t = 2.0
+    end_limit = length - 3.0
+
+    while count < note_count:
+        half_beat = 30.0 / _bpm_at(bpms, t)
+        lane = rng.randint(0, 50)
+        pos = (lane, lane + 8)
+        remaining = note_count - count
+        roll = rng.random()
+        if roll < spec.hold_ratio and remaining >= 3 and t + half_beat <= length - 1.0:
+            segments = 1
+            while rng.random() < spec.chain_ratio and segments < 4:
+                segments += 1
+            start = t
+            budget = remaining - 1  # 起點另計一個判定
+            for _ in range(segments):
+                steps = min(rng.randint(2, 6), budget, int((length - 1.0 - start) / half_beat))
+                if steps < 1:
+                    break
+                holds = [_fmt_time(start + half_beat * k) for k in range(1, steps + 1)]
+                next_lane = min(50, max(0, pos[0] + rng.randint(-6, 6)))
+                end_pos = (next_lane, next_lane + 8)
+                notes.append({"Flags": _note_flags(1, pos, end_pos), "just": _fmt_time(start), "holds": holds})
+                budget -= steps
+                count += steps
+                start = float(holds[-1])
+                pos = end_pos
+            count += 1
+        else:
+            note_type = 0
+            if roll < spec.hold_ratio + 0.12:
+                note_type = 2  # Flick
+            elif roll < spec.hold_ratio + 0.22:
+                note_type = 3  # Trace
+            notes.append({"Flags": _note_flags(note_type, pos, pos), "just": _fmt_time(t), "holds": []})
+            count += 1
+
+        # 剩餘判定平均分配到剩餘時間，落在 1/8 拍格上；時間用完時其餘音符疊在最後一拍
+        grid = half_beat / 4
+        gap = (end_limit - t) / max(1, note_count - count)
+        t = min(end_limit, t + grid * max(1, round(gap * rng.uniform(0.5, 1.5) / grid)))
+
+    # 與正式譜面相同，音符按時間排列、Uid 遞增
+    notes.sort(key=lambda note: float(note["just"]))
+    for uid, note in enumerate(notes, start=1):
+        note["Uid"] = uid
+    return {"Bpms": bpms, "Notes": [{"Uid": n["Uid"], "Flags": n["Flags"], "just": n["just"], "holds": n["holds"]}
+                                    for n in notes]}
+
+
+def write_chart_bytes(path: str, chart_data: dict):
+    """以 raw deflate (wbits=-15) 壓縮 JSON，與 Chart._loadbytes 的讀取方式對應"""
+    compressor = zlib.compressobj(level=9, wbits=-15)
+    payload = compressor.compress(json.dumps(chart_data, ensure_ascii=False).encode("utf-8"))
+    payload += compressor.flush()
+    with open(path, "wb") as f:
+        f.write(payload)
+
+
+def write_musicscore_csv(path: str, length: float, sections: int = 5):
+    """
+    產生 musicscore CSV，只包含 Chart._loadcsv 讀取的段落標記 (key_type=20)
+    段落均分整首歌，Fever 區間由 Musics.yaml 的 FeverSectionNo 決定
+    """
+    with open(path, "w", encoding="UTF-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["key_type", "song_time"])
+        writer.writeheader()
+        for i in range(1, sections + 1):
+            writer.writerow({"key_type": "20", "song_time": int(length * 1000 * i / (sections + 1))})
+
+
+def generate_skill_dbs(db_card: dict, seed: int) -> tuple[dict, dict, dict]:
+    """
+    為 CardDatas.json 中的每張卡產生合成技能、C位技能、C位特性
+
+    鍵值規則與 RSkill 相同:
+        技能:     str(RhythmGameSkillSeriesId * 100 + lv)
+        C位技能:  str(CenterSkillSeriesId * 100 + lv)
+        C位特性:  str(CenterAttributeSeriesId + 1)
+    """
+    rhythm_skills = {}
+    center_skills = {}
+    center_attributes = {}
+
+    for card_key in sorted(db_card):
+        card = db_card[card_key]
+        rng = random.Random(seed * 1_000_003 + card["CardSeriesId"])
+        effects, conditions, base_cost = SKILL_ARCHETYPES[rng.randrange(len(SKILL_ARCHETYPES))]
+
+        for series_id in sorted(set(card["RhythmGameSkillSeriesId"])):
+            evo = series_id % 10
+            for lv in range(1, 15):
+                scale = 0.6 + 0.4 * lv / 14
+                scaled_effects = []
+                for effect in effects:
+                    if effect // 10 ** 8 in (5, 6):
+                        # 洗牌/除外没有数值部分
+                        scaled_effects.append(effect)
+                        continue
+                    head, value = divmod(effect, 10 ** 6)
+                    scaled_effects.append(head * 10 ** 6 + int(value * scale))
+                rhythm_skills[str(series_id * 100 + lv)] = {
+                    "RhythmGameSkillSeriesId": series_id,
+                    "RhythmGameSkillName": f"Synthetic {card_key}",
+                    "ConsumeAP": max(1, base_cost - evo // 2),
+                    "Description": "",
+                    "RhythmGameSkillConditionIds": list(conditions),
+                    "RhythmGameSkillEffectId": scaled_effects,
+                }
+
+        center_series = card["CenterSkillSeriesId"]
+        if center_series:
+            skill_conditions, skill_effects = CENTER_SKILL_ARCHETYPES[rng.randrange(len(CENTER_SKILL_ARCHETYPES))]
+            for lv in range(1, 15):
+                center_skills[str(center_series * 100 + lv)] = {
+                    "CenterSkillSeriesId": center_series,
+                    "CenterSkillName": f"Synthetic {card_key}",
+                    "Description": "",
+                    "CenterSkillConditionIds": list(skill_conditions),
+                    "CenterSkillEffectId": list(skill_effects),
+                }
+
+        attribute_series = card["CenterAttributeSeriesId"]
+        if attribute_series:
+            targets, attribute_effects = CENTER_ATTRIBUTE_ARCHETYPES[rng.randrange(len(CENTER_ATTRIBUTE_ARCHETYPES))]
+            center_attributes[str(attribute_series + 1)] = {
+                "CenterAttributeSeriesId": attribute_series,
+                "CenterAttributeName": f"Synthetic {card_key}",
+                "Description": "",
+                "TargetIds": list(targets),
+                "CenterAttributeEffectId": list(attribute_effects),
+            }
+
+    return rhythm_skills, center_skills, center_attributes
+
+
+def generate_fixture(out_dir: str, specs: dict = None, seed: int = 0,
+                     carddata_path: str = os.path.join("Data", "CardDatas.json")) -> list[str]:
+    """
+    產生完整的合成資料目錄
+
+    Args:
+        out_dir: 輸出根目錄 (其下建立 Data/)
+        specs: {名稱: ChartSpec}，每個規格一首歌，預設為 SCALES
+        seed: 隨機種子，相同種子產生逐位元組相同的資料
+        carddata_path: 卡牌資料來源
+
+    Returns:
+        產生的歌曲 ID 列表，順序與 specs 相同
+    """
+    if specs is None:
+        specs = SCALES
+    data_dir = os.path.join(out_dir, "Data")
+    os.makedirs(os.path.join(data_dir, "bytes"), exist_ok=True)
+    os.makedirs(os.path.join(data_dir, "csv"), exist_ok=True)
+
+    with open(carddata_path, "r", encoding="UTF-8") as f:
+        db_card = json.load(f)
+    shutil.copyfile(carddata_path, os.path.join(data_dir, "CardDatas.json"))
+
+    characters = sorted({card["CharactersId"] for card in db_card.values()})
+    musics = []
+    music_ids = []
+    for index, (name, spec) in enumerate(specs.items()):
+        music_id = SYNTHETIC_MUSIC_ID_BASE + index + 1
+        rng = random.Random(seed * 7919 + music_id)
+        center = rng.choice(characters)
+        singers = rng.sample([c for c in characters if c != center], 2)
+        fever_section = rng.choice([3, 4, 5])
+        musics.append({
+            "Id": music_id,
+            "OrderId": music_id,
+            "Title": f"Synthetic {name}",
+            "JacketId": music_id,
+            "SoundId": music_id * 100 + 1,
+            "MusicType": rng.randint(1, 3),
+            "PlayTime": int(spec.length * 1000),
+            "CenterCharacterId": center,
+            "SingerCharacterId": ",".join(str(c) for c in singers),
+            "FeverSectionNo": spec.fever_section or fever_section,
+        })
+        music_ids.append(str(music_id))
+
+        for tier_index, tier in enumerate(DIFFICULTIES):
+            # 低難度按比例減少判定數
+            tier_notes = max(50, spec.notes * (tier_index + 1) // len(DIFFICULTIES))
+            chart_data = generate_chart(spec, tier_notes, seed * 104729 + music_id * 10 + tier_index)
+            write_chart_bytes(os.path.join(data_dir, "bytes", f"rhythmgame_chart_{music_id}_{tier}.bytes"), chart_data)
+        write_musicscore_csv(os.path.join(data_dir, "csv", f"musicscore_{music_id}.csv"), spec.length)
+
+    import yaml
+    with open(os.path.join(data_dir, "Musics.yaml"), "w", encoding="UTF-8") as f:
+        yaml.safe_dump(musics, f, allow_unicode=True, sort_keys=False)
+
+    rhythm_skills, center_skills, center_attributes = generate_skill_dbs(db_card, seed)
+    for filename, db in (("RhythmGameSkills.json", rhythm_skills),
+                         ("CenterSkills.json", center_skills),
+                         ("CenterAttributes.json", center_attributes)):
+        with open(os.path.join(data_dir, filename), "w", encoding="UTF-8") as f:
+            json.dump(db, f, ensure_ascii=False)
+
+    logger.info(f"Synthetic fixture written to {out_dir}: songs {music_ids}")
+    return music_ids
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    parser = argparse.ArgumentParser(description='產生合成譜面與技能資料 (離線效能測試用)')
+    parser.add_argument('--out', type=str, default=os.path.join("fixtures", "synthetic"),
+                        help='輸出根目錄 (預設: fixtures/synthetic)')
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=list(SCALES),
+                        help='要產生的歌曲規模')
+    parser.add_argument('--seed', type=int, default=0, help='隨機種子')
+    parser.add_argument('--notes', type=int, help='覆寫 Master 譜面的判定數')
+    parser.add_argument('--hold-ratio', type=float, help='覆寫長條比例')
+    parser.add_argument('--chain-ratio', type=float, help='覆寫長條串接機率')
+    parser.add_argument('--bpm-changes', type=int, help='覆寫 BPM 變化次數')
+    parser.add_argument('--length', type=float, help='覆寫歌曲長度（秒）')
+    parser.add_argument('--fever-section', type=int, choices=[3, 4, 5], help='覆寫 Fever 所在段落')
+    args = parser.parse_args()
+
+    overrides = {field: getattr(args, field) for field in
+                 ("notes", "hold_ratio", "chain_ratio", "bpm_changes", "length", "fever_section")
+                 if getattr(args, field) is not None}
+    generate_fixture(args.out, {name: replace(SCALES[name], **overrides) for name in args.scales}, args.seed)
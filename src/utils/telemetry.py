@@ -0,0 +1,315 @@
+"""
+MainBatch 執行中的吞吐量監測
+
+無人看管的長時間執行時，定期把以下指標寫成 JSON lines（可另寫 Prometheus text-file）：
+
+    - 整體與最近一段時間的每秒卡組數、每個子行程的每秒卡組數
+    - 主行程忙碌比例（處理結果、寫暫存檔的時間）與其中的 I/O 比例
+    - 卡組生成器忙碌比例、送任務時被管線阻塞的比例（back-pressure）
+    - 已生成未返回的任務數、主行程中已到達未處理的結果數
+    - 各行程的 RSS、本首歌的預估剩餘時間
+
+並依這些比例粗略判斷瓶頸（generator / workers / main / io）。
+
+設定來自 YAML 的 telemetry 區塊（見 ConfigManager.DEFAULT_TELEMETRY_CONFIG），
+未啟用時 SongTelemetry 的包裝函式直接返回原物件，不增加任何開銷。
+
+用法（MainBatch）：
+    telemetry = SongTelemetry(config, song="405119_02", total=總卡組數, processes=n)
+    tasks = telemetry.wrap_tasks(tasks)
+    results = pool.imap_unordered(telemetry.wrap_worker(func), tasks, chunksize)
+    telemetry.start()
+    for result in telemetry.watch(results):
+        ...
+        with telemetry.io():
+            save(...)
+    telemetry.finish()
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# 判斷瓶頸的忙碌比例門檻
+BUSY_THRESHOLD = 0.8
+
+
+def rss_mb(pid: int) -> float:
+    """行程的常駐記憶體 (MB)，無法取得時返回 None"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / 2 ** 20
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class WorkerTagged:
+    """在子行程的結果中加上行程 ID，供主行程統計每個子行程的吞吐量"""
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, task):
+        result = self.func(task)
+        if result is not None:
+            result["worker"] = os.getpid()
+        return result
+
+
+class SongTelemetry:
+    """單首歌的吞吐量監測"""
+
+    def __init__(self, config: dict, song: str, total: int = None, processes: int = 1, log_dir: str = "log"):
+        """
+        Args:
+            config: ConfigManager.get_telemetry_config() 的結果
+            song: 歌曲標籤（寫入每筆記錄）
+            total: 本首歌預計的結果數，None 時不估計剩餘時間
+            processes: 子行程數
+            log_dir: jsonl_path 未設定時寫入 log_dir/telemetry.jsonl
+        """
+        self.enabled = bool(config.get("enabled"))
+        self.interval = max(0.5, float(config.get("interval", 10)))
+        self.jsonl_path = config.get("jsonl_path") or os.path.join(log_dir, "telemetry.jsonl")
+        self.prometheus_path = config.get("prometheus_path")
+        self.song = song
+        self.total = total
+        self.processes = processes
+
+        self.start_time = None
+        self.generated = 0
+        self.generator_time = 0.0
+        self.feed_time = 0.0
+        self.received = 0
+        self.wait_time = 0.0
+        self.io_time = 0.0
+        self.per_worker = Counter()
+        self._results_iter = None
+        self._last = None  # 上一筆記錄的 (時間, 結果數, 每個子行程的結果數)
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- 包裝 ---
+
+    def wrap_tasks(self, tasks):
+        """包裝任務產生器，計時卡組生成與送入管線的時間"""
+        if not self.enabled:
+            return tasks
+        return self._timed_tasks(tasks)
+
+    def _timed_tasks(self, tasks):
+        # 在行程池的送任務執行緒中執行
+        it = iter(tasks)
+        while True:
+            t0 = perf_counter()
+            try:
+                task = next(it)
+            except StopIteration:
+                return
+            t1 = perf_counter()
+            self.generator_time += t1 - t0
+            self.generated += 1
+            yield task
+            # 從 yield 返回前，送任務執行緒在把上一批任務寫入管線（管線滿時阻塞）
+            self.feed_time += perf_counter() - t1
+
+    def wrap_worker(self, func):
+        """包裝子行程的模擬函式，在結果中標記子行程"""
+        if not self.enabled:
+            return func
+        return WorkerTagged(func)
+
+    def watch(self, results):
+        """包裝結果迭代器，計時主行程等待結果的時間"""
+        if not self.enabled:
+            return results
+        self._results_iter = iter(results)
+        return self._watched(self._results_iter)
+
+    def _watched(self, it):
+        while True:
+            t0 = perf_counter()
+            try:
+                result = next(it)
+            except StopIteration:
+                return
+            self.wait_time += perf_counter() - t0
+            self.received += 1
+            if result is not None:  # 順序搜索中沒有合法排列的組合
+                self.per_worker[result.pop("worker", None)] += 1
+            yield result
+
+    def io(self):
+        """計時主行程的檔案寫入"""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed_io()
+
+    @contextmanager
+    def _timed_io(self):
+        t0 = perf_counter()
+        try:
+            yield
+        finally:
+            self.io_time += perf_counter() - t0
+
+    # --- 記錄 ---
+
+    def start(self):
+        if not self.enabled:
+            return
+        self.start_time = perf_counter()
+        self._last = (self.start_time, 0, Counter())
+        directory = os.path.dirname(self.jsonl_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write(self.sample())
+
+    def finish(self):
+        """停止定期記錄並寫出最後一筆"""
+        if not self.enabled or self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        sample = self.sample(final=True)
+        self.write(sample)
+        logger.info(f"[Telemetry] {sample['results']:,} results, {sample['decks_per_second']:,.0f} decks/s, "
+                    f"main busy {sample['main_busy']:.0%}, generator busy {sample['generator_busy']:.0%}, "
+                    f"bottleneck: {sample['bottleneck']}")
+
+    def sample(self, final: bool = False) -> dict:
+        now = perf_counter()
+        elapsed = max(now - self.start_time, 1e-9)
+        last_time, last_received, last_workers = self._last
+        window = max(now - last_time, 1e-9)
+        received = self.received
+        workers = Counter(self.per_worker)
+        self._last = (now, received, workers)
+
+        overall = received / elapsed
+        recent = (received - last_received) / window
+        # 主行程忙碌 = 不在等待結果的時間（結果處理、暫存檔寫入等）
+        main_busy = min(1.0, max(0.0, 1 - self.wait_time / elapsed))
+        generator_busy = min(1.0, self.generator_time / elapsed)
+        pipe_blocked = min(1.0, self.feed_time / elapsed)
+        io_busy = min(1.0, self.io_time / elapsed)
+        buffered = len(getattr(self._results_iter, "_items", ()))
+        eta = None
+        if self.total and not final:
+            rate = recent or overall
+            eta = (self.total - received) / rate if rate > 0 else None
+
+        return {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "song": self.song,
+            "final": final,
+            "elapsed": round(elapsed, 3),
+            "results": received,
+            "total": self.total,
+            "decks_per_second": overall,
+            "recent_decks_per_second": recent,
+            "workers": {
+                str(pid): {
+                    "results": count,
+                    "decks_per_second": (count - last_workers.get(pid, 0)) / window,
+                    "rss_mb": rss_mb(pid),
+                }
+                for pid, count in sorted(workers.items(), key=lambda item: str(item[0])) if pid is not None
+            },
+            "main_busy": main_busy,
+            "io_busy": io_busy,
+            "generator_busy": generator_busy,
+            "pipe_blocked": pipe_blocked,
+            "generated": self.generated,
+            "in_flight": max(0, self.generated - received),
+            "buffered": buffered,
+            "rss_mb": rss_mb(os.getpid()),
+            "eta_seconds": eta,
+            "bottleneck": self.bottleneck(main_busy, io_busy, generator_busy),
+        }
+
+    def bottleneck(self, main_busy: float, io_busy: float, generator_busy: float) -> str:
+        """
+        粗略判斷瓶頸：
+            io:        主行程大部分時間在寫檔
+            main:      主行程幾乎不等待結果（結果處理跟不上）
+            generator: 送任務執行緒幾乎一直在生成卡組
+            workers:   以上皆否，子行程的模擬速度決定吞吐量
+        """
+        if main_busy >= BUSY_THRESHOLD:
+            return "io" if io_busy >= main_busy / 2 else "main"
+        if generator_busy >= BUSY_THRESHOLD:
+            return "generator"
+        return "workers"
+
+    def write(self, sample: dict):
+        try:
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(sample, ensure_ascii=False) + "\n")
+            if self.prometheus_path:
+                write_prometheus(self.prometheus_path, sample)
+        except OSError as e:
+            logger.warning(f"[Telemetry] 無法寫入記錄: {e}")
+
+
+def write_prometheus(path: str, sample: dict):
+    """以 Prometheus text-file 格式（node_exporter textfile collector）覆寫指標檔"""
+    song = sample["song"]
+    gauges = [
+        ("decks_per_second", "Overall simulated decks per second", sample["decks_per_second"]),
+        ("recent_decks_per_second", "Decks per second since the previous sample", sample["recent_decks_per_second"]),
+        ("results", "Results received for the current song", sample["results"]),
+        ("main_busy_ratio", "Fraction of time the main process was not waiting for results", sample["main_busy"]),
+        ("io_busy_ratio", "Fraction of time the main process spent writing files", sample["io_busy"]),
+        ("generator_busy_ratio", "Fraction of time spent generating decks", sample["generator_busy"]),
+        ("pipe_blocked_ratio", "Fraction of time the task feeder spent writing to the worker pipe",
+         sample["pipe_blocked"]),
+        ("in_flight", "Tasks generated but not yet returned", sample["in_flight"]),
+        ("buffered", "Results received by the pool but not yet processed", sample["buffered"]),
+        ("rss_megabytes", "Resident memory of the main process", sample["rss_mb"]),
+        ("eta_seconds", "Estimated remaining time for the current song", sample["eta_seconds"]),
+    ]
+    lines = []
+    for name, help_text, value in gauges:
+        if value is None:
+            continue
+        lines.append(f"# HELP sukushow_{name} {help_text}")
+        lines.append(f"# TYPE sukushow_{name} gauge")
+        lines.append(f'sukushow_{name}{{song="{song}"}} {value}')
+    for metric, key, help_text in (("worker_decks_per_second", "decks_per_second", "Decks per second per worker"),
+                                   ("worker_rss_megabytes", "rss_mb", "Resident memory per worker")):
+        lines.append(f"# HELP sukushow_{metric} {help_text}")
+        lines.append(f"# TYPE sukushow_{metric} gauge")
+        for pid, worker in sample["workers"].items():
+            if worker[key] is not None:
+                lines.append(f'sukushow_{metric}{{song="{song}",worker="{pid}"}} {worker[key]}')
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # 先寫暫存檔再替換，避免收集器讀到寫一半的檔案
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
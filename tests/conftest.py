@@ -0,0 +1,34 @@
+"""
+測試共用設定：與 benchmarks 相同，以專案根目錄匯入 src 與根目錄的腳本
+
+需要模擬器資料庫的測試使用合成資料 (src/utils/synthetic_data.py)。Simulator_core 在第一次匯入時
+以目前目錄讀取 Data/，因此這些測試只在 fixture 切換目錄後才匯入 src.core / src.deck_gen。
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def synthetic_dir(tmp_path_factory):
+    """產生合成資料，返回 (目錄, 歌曲 ID 列表)"""
+    from src.utils.synthetic_data import generate_fixture
+
+    if "src.core.Simulator_core" in sys.modules:
+        pytest.skip("Simulator_core 已以其他目錄的資料載入")
+    fixture = tmp_path_factory.mktemp("synthetic")
+    music_ids = generate_fixture(str(fixture), seed=0, carddata_path=os.path.join(ROOT, "Data", "CardDatas.json"))
+    return fixture, music_ids
+
+
+@pytest.fixture
+def synthetic_data(synthetic_dir, monkeypatch):
+    """切換到合成資料目錄，返回歌曲 ID 列表"""
+    fixture, music_ids = synthetic_dir
+    monkeypatch.chdir(fixture)
+    return music_ids
@@ -0,0 +1,55 @@
+"""
+同一行程內以不同練度模擬同一卡組 (src/core/RDeck.py CardSpecTable、src/core/Simulator_core.py StatePool)
+
+CardSpec 與重用的卡牌物件都以卡牌 ID + 練度區分；若只以卡牌 ID 快取，後面的練度會沿用第一次的數值。
+同一行程中依序以 [1,1,1]、[130,14,14]、[1,1,1] 模擬，分數必須與各自在全新行程中模擬的結果相同。
+"""
+import os
+import subprocess
+import sys
+
+from src.utils.synthetic_data import DIFFICULTIES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DECK = [1032506, 1022504, 1032406, 1041403, 1042516, 1052505]
+MASTERY = 50
+LEVEL_SETS = [[1, 1, 1], [130, 14, 14], [1, 1, 1]]
+
+SCRIPT = """
+import sys
+from src.config.CardLevelConfig import convert_deck_to_simulator_format
+from src.core.Simulator_core import run_game_simulation
+from src.utils.parity import load_charts
+
+label, mastery, levels, deck = sys.argv[1], int(sys.argv[2]), eval(sys.argv[3]), eval(sys.argv[4])
+chart = load_charts([label])[label]
+task = (convert_deck_to_simulator_format(deck, {card_id: levels for card_id in deck}), chart, mastery, 0, deck, -1)
+print(run_game_simulation(task)["final_score"])
+"""
+
+
+def simulate(chart, levels: list[int]) -> int:
+    from src.config.CardLevelConfig import convert_deck_to_simulator_format
+    from src.core.Simulator_core import run_game_simulation
+
+    deck = list(DECK)
+    task = (convert_deck_to_simulator_format(deck, {card_id: levels for card_id in deck}), chart, MASTERY, 0, deck, -1)
+    return run_game_simulation(task)["final_score"]
+
+
+def fresh_process_score(label: str, levels: list[int]) -> int:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    output = subprocess.run([sys.executable, "-c", SCRIPT, label, str(MASTERY), repr(levels), repr(DECK)],
+                            capture_output=True, text=True, check=True, env=env)
+    return int(output.stdout.split()[-1])
+
+
+def test_levels_in_one_process_match_fresh_processes(synthetic_data):
+    from src.utils.parity import load_charts
+
+    label = f"{synthetic_data[0]}_{DIFFICULTIES[-1]}"
+    chart = load_charts([label])[label]
+    scores = [simulate(chart, levels) for levels in LEVEL_SETS]
+    assert scores == [fresh_process_score(label, levels) for levels in LEVEL_SETS]
+    assert scores[1] > scores[0] == scores[2]
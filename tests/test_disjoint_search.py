@@ -0,0 +1,133 @@
+"""
+多歌曲求解器的搜尋核心（search_disjoint / search_numpy / optimizer_core）
+
+以小型隨機卡組比較各核心與 itertools.product 窮舉的前 K 名總 Pt：
+pt 範圍小以產生大量同分，並包含 pt 為 0 的卡組；每種卡牌排除上限設定各測一次。
+"""
+import functools
+import itertools
+import os
+import random
+import sys
+
+import pytest
+
+from src.optimizer.disjoint_search import search_disjoint, solve
+from src.optimizer.exclusion import EXCLUDE_CARDS, EXCLUDE_NONE, EXCLUDE_PAIRS
+from src.optimizer.expansion import LevelPool
+from src.optimizer.numpy_search import search_numpy
+
+try:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cython"))
+    import optimizer_core
+except ImportError:
+    optimizer_core = None
+
+needs_cython = pytest.mark.skipif(optimizer_core is None, reason="Cython 模組 optimizer_core 未編譯")
+EXCLUSIONS = {"none": EXCLUDE_NONE, "cards": EXCLUDE_CARDS, "pairs": EXCLUDE_PAIRS}
+
+
+def cython_search(**kwargs):
+    return functools.partial(optimizer_core.optimize_songs_top_k, **kwargs) if optimizer_core else None
+
+
+ENGINES = (
+    [pytest.param(functools.partial(search_disjoint, exclusion=e), id=f"python-{name}")
+     for name, e in EXCLUSIONS.items()]
+    + [pytest.param(search_numpy, id="numpy")]
+    + [pytest.param(cython_search(exclusion=e), id=f"cython-{name}", marks=needs_cython)
+       for name, e in EXCLUSIONS.items()]
+    + [pytest.param(cython_search(threads=3), id="cython-threads", marks=needs_cython)]
+)
+
+
+def random_levels(rng: random.Random, n_songs: int, n_cards: int = None, n_decks: int = None) -> list[list[dict]]:
+    """每首歌數個隨機卡組，按 pt 降序；pt 只取 0 至 5 以產生同分"""
+    n_cards = n_cards or rng.randint(12, 24)
+    levels_raw = []
+    for _ in range(n_songs):
+        records = [{"deck_card_ids": rng.sample(range(100, 100 + n_cards), 6), "score": 0, "pt": rng.randint(0, 5)}
+                   for _ in range(n_decks or rng.randint(1, 12))]
+        levels_raw.append(sorted(records, key=lambda r: r["pt"], reverse=True))
+    return LevelPool(levels_raw).levels
+
+
+def disjoint(decks) -> bool:
+    cards = [cid for deck in decks for cid in deck["deck"]]
+    return len(set(cards)) == len(cards)
+
+
+def brute_force(levels: list[list[dict]], k: int) -> list[int]:
+    """按給定順序窮舉每首歌各一個卡組，卡組互不重複的前 K 名總 Pt"""
+    totals = [sum(deck["pt"] for deck in decks) for decks in itertools.product(*levels) if disjoint(decks)]
+    return sorted(totals, reverse=True)[:k]
+
+
+def check_indices(levels: list[list[dict]], result: list[tuple]):
+    for total_pt, indices in result:
+        decks = [levels[j][i] for j, i in enumerate(indices)]
+        assert disjoint(decks)
+        assert sum(deck["pt"] for deck in decks) == total_pt
+
+
+@pytest.mark.parametrize("search", ENGINES)
+@pytest.mark.parametrize("seed", range(30))
+def test_search_matches_brute_force(search, seed):
+    rng = random.Random(seed)
+    levels = random_levels(rng, rng.randint(1, 4))
+    k = rng.choice([1, 4, 50])
+
+    result = search(levels, k)
+    assert [t for t, _ in result] == brute_force(levels, k)
+    check_indices(levels, result)
+
+
+@pytest.mark.parametrize("search", ENGINES)
+def test_zero_pt_combos_are_kept(search):
+    levels = LevelPool([
+        [{"deck_card_ids": [1, 2, 3, 4, 5, 6], "score": 0, "pt": 0}],
+        [{"deck_card_ids": [7, 8, 9, 10, 11, 12], "score": 0, "pt": 0}],
+    ]).levels
+    assert search(levels, 3) == [(0, (0, 0))]
+
+
+@pytest.mark.parametrize("search", ENGINES)
+@pytest.mark.parametrize("seed", range(10))
+def test_floor(search, seed):
+    rng = random.Random(seed)
+    levels = random_levels(rng, 3)
+    floor = rng.randint(0, 12)
+    expected = [t for t in brute_force(levels, 10) if t > floor]
+    assert [t for t, _ in search(levels, 10, floor=floor)] == expected
+
+
+@pytest.mark.parametrize("search", ENGINES)
+@pytest.mark.parametrize("seed", range(10))
+def test_solve_subsets(search, seed):
+    rng = random.Random(seed)
+    levels = random_levels(rng, 4)
+    song_count, k = rng.randint(1, 3), rng.choice([1, 5])
+    expected = sorted((t for songs in itertools.combinations(levels, song_count)
+                       for t in brute_force(list(songs), k)), reverse=True)[:k]
+    assert [t for t, _ in solve(levels, song_count, k, search=search)] == expected
+
+
+@pytest.mark.parametrize("search", ENGINES)
+@pytest.mark.parametrize("n_cards", [65, 130, 250])
+def test_wide_card_pools(search, n_cards):
+    """卡牌超過 64 種時遮罩跨越多個 word"""
+    rng = random.Random(n_cards)
+    levels = random_levels(rng, 3, n_cards, n_decks=30)
+    assert max(deck["mask"].bit_length() for level in levels for deck in level) > 64
+    assert [t for t, _ in search(levels, 20)] == brute_force(levels, 20)
+
+
+@needs_cython
+@pytest.mark.parametrize("seed", range(10))
+def test_cython_ties_in_index_order(seed):
+    """Cython 版本同分時按卡組索引的字典序，與執行緒數無關"""
+    rng = random.Random(seed)
+    levels = random_levels(rng, 3)
+    result = optimizer_core.optimize_songs_top_k(levels, 50)
+    assert result == sorted(result, key=lambda c: (-c[0], c[1]))
+    assert optimizer_core.optimize_songs_top_k(levels, 50, threads=4) == result
@@ -0,0 +1,128 @@
+"""
+TOP_N 截斷下的擴充與最佳性證明 (src/optimizer/expansion.py)
+
+以小型隨機結果檔比較：只載入前 N 名再擴充的結果，與載入全部卡組後以 itertools.product
+窮舉的前 K 名總 Pt 相同，且已證明最佳；已載入的卡組中沒有組合時不可直接降級。
+"""
+import itertools
+import os
+import random
+
+import pytest
+
+from src.optimizer.disjoint_search import search_disjoint, solve
+from src.optimizer.expansion import LevelPool, expand_until_proven, solve_until_proven
+from src.optimizer.numpy_search import search_numpy
+from src.optimizer.session import OptimizerSession
+from src.utils.result_stream import TopResultSource, write_results
+
+ENGINES = [search_disjoint, search_numpy]
+
+
+def record(cards, pt: int) -> dict:
+    return {"deck_card_ids": list(cards), "center_card": None, "score": pt * 10, "pt": pt}
+
+
+def write_song(directory, music_id: str, records: list[dict]) -> str:
+    path = os.path.join(directory, f"simulation_results_{music_id}_02.json")
+    write_results(path, sorted(records, key=lambda r: r["pt"], reverse=True))
+    return path
+
+
+def random_songs(rng: random.Random, n_songs: int, n_cards: int, n_decks: int) -> list[list[dict]]:
+    """每首歌 n_decks 個隨機卡組，pt 範圍小以產生同分"""
+    songs = []
+    for _ in range(n_songs):
+        records = [record(rng.sample(range(1, n_cards + 1), 6), rng.randint(0, 30)) for _ in range(n_decks)]
+        songs.append(sorted(records, key=lambda r: r["pt"], reverse=True))
+    return songs
+
+
+def brute_force(songs: list[list[dict]], song_count: int, k: int) -> list[int]:
+    """全部卡組中 song_count 首歌卡組互不重複的前 K 名總 Pt"""
+    totals = []
+    for subset in itertools.combinations(songs, song_count):
+        for decks in itertools.product(*subset):
+            cards = [cid for deck in decks for cid in deck["deck_card_ids"]]
+            if len(set(cards)) == len(cards):
+                totals.append(sum(deck["pt"] for deck in decks))
+    return sorted(totals, reverse=True)[:k]
+
+
+def check_combos(combos: list[tuple]):
+    for total_pt, combo in combos:
+        decks = [d for d in combo if d is not None]
+        cards = [cid for d in decks for cid in d["deck"]]
+        assert len(set(cards)) == len(cards)
+        assert sum(d["pt"] for d in decks) == total_pt
+
+
+@pytest.mark.parametrize("search", ENGINES, ids=lambda f: f.__name__)
+@pytest.mark.parametrize("seed", range(8))
+def test_expand_matches_fully_loaded(tmp_path, search, seed):
+    rng = random.Random(seed)
+    n_songs = rng.choice([2, 3])
+    songs = random_songs(rng, n_songs, n_cards=rng.randint(14, 20), n_decks=rng.randint(8, 20))
+    paths = [write_song(tmp_path, str(i), records) for i, records in enumerate(songs)]
+    k = rng.choice([1, 3, 5])
+
+    sources = [TopResultSource(path, rng.randint(1, 3)) for path in paths]
+    pool = LevelPool([source.results for source in sources])
+    best = solve(pool.levels, n_songs, k, search=search)
+    best, bound = expand_until_proven(pool, sources, n_songs, k, best, search, max_n=1000)
+
+    full = LevelPool(songs)
+    assert bound is None
+    assert [t for t, _ in best] == [t for t, _ in solve(full.levels, n_songs, k, search=search)]
+    assert [t for t, _ in best] == brute_force(songs, n_songs, k)
+    check_combos(best)
+
+
+def overlapping_top_decks(directory) -> list[str]:
+    """
+    每首歌的第 1 名只有 12 種卡：前 1 名中沒有三首歌互不重複的組合，
+    但第 1 首歌的第 2 名可與其餘兩首歌的第 1 名組成 90 + 100 + 100 = 290
+    """
+    return [
+        write_song(directory, "1", [record(range(1, 7), 100), record(range(13, 19), 90)]),
+        write_song(directory, "2", [record(range(7, 13), 100)]),
+        write_song(directory, "3", [record(range(1, 7), 100)]),
+    ]
+
+
+@pytest.mark.parametrize("search", ENGINES, ids=lambda f: f.__name__)
+def test_expands_before_downgrading(tmp_path, search):
+    sources = [TopResultSource(path, 1) for path in overlapping_top_decks(tmp_path)]
+    pool = LevelPool([source.results for source in sources])
+
+    best, song_count, bound = solve_until_proven(pool, sources, 3, 1, search, max_n=1000)
+    assert (song_count, bound) == (3, None)
+    assert best[0][0] == 290
+
+
+def test_downgrade_at_max_n_is_not_proven(tmp_path):
+    sources = [TopResultSource(path, 1) for path in overlapping_top_decks(tmp_path)]
+    pool = LevelPool([source.results for source in sources])
+
+    best, song_count, bound = solve_until_proven(pool, sources, 3, 1, search_disjoint, max_n=1)
+    assert song_count == 2
+    assert best[0][0] == 200
+    assert bound is not None
+
+
+def test_downgrade_when_proven_infeasible(tmp_path):
+    paths = [write_song(tmp_path, str(i), [record(range(1, 7), 10 + i)]) for i in range(3)]
+    sources = [TopResultSource(path, 1) for path in paths]
+    pool = LevelPool([source.results for source in sources])
+
+    best, song_count, bound = solve_until_proven(pool, sources, 3, 1, search_disjoint, max_n=1000)
+    assert best == [] and song_count == 1 and bound is None
+
+
+def test_session_expands_before_downgrading(tmp_path):
+    overlapping_top_decks(tmp_path)
+    session = OptimizerSession(str(tmp_path), top_n=1, max_top_n=1000, search=search_disjoint)
+
+    result = session.query([("1", "02"), ("2", "02"), ("3", "02")])
+    assert (result["song_count"], result["bound"]) == (3, None)
+    assert result["combos"][0][0] == 290
@@ -0,0 +1,66 @@
+"""
+出牌順序搜索 (src/deck_gen/OrderSearch.py)
+
+沒有合法排列的組合（例如全是分卡）與窮舉模式一致：不產生結果，不讓行程池中斷；
+單次交換無法同時修正首尾時，_repair 另外挑選合法的第一張與最後一張。
+"""
+import random
+
+import pytest
+
+ORDER_CONFIG = {"max_evals": 20, "random_seeds": 2, "seed": 0}
+
+
+def fake_simulate(task):
+    deck, chart, mastery, index, order, center_index = task
+    return {"final_score": sum(order) % 97, "deck_card_ids": list(order), "center_card": None,
+            "original_deck_index": index, "cards_played_log": []}
+
+
+class FakeChart:
+    class music:
+        CenterCharacterId = 0
+
+
+@pytest.fixture
+def tags(synthetic_data, monkeypatch):
+    """以假卡牌 ID 設定技能 tag，返回設定函式"""
+    from src.deck_gen import DeckGen2
+
+    def set_tags(mapping: dict):
+        for card_id, tag_set in mapping.items():
+            monkeypatch.setitem(DeckGen2.DB_TAG, card_id, set(tag_set))
+    return set_tags
+
+
+def test_repair_places_first_and_last_independently(tags):
+    from src.core.SkillResolver import SkillEffectType
+    from src.deck_gen.DeckGen2 import is_valid_order
+    from src.deck_gen.OrderSearch import _repair
+
+    both = {SkillEffectType.ScoreGain, SkillEffectType.DeckReset}
+    # 只有 2 可放第一位、只有 3 可放最後一位，兩者都不在首尾：一次交換無法修正
+    tags({1: both, 2: {SkillEffectType.DeckReset}, 3: {SkillEffectType.ScoreGain}, 4: both, 5: both, 6: both})
+    repaired = _repair([1, 2, 3, 4, 5, 6])
+    assert repaired is not None and is_valid_order(repaired)
+    assert (repaired[0], repaired[-1]) == (2, 3)
+
+
+def test_composition_without_valid_order(tags, monkeypatch):
+    from src.core.SkillResolver import SkillEffectType
+    from src.deck_gen import OrderSearch
+
+    composition = (1, 2, 3, 4, 5, 6)
+    tags({card_id: {SkillEffectType.ScoreGain} for card_id in composition})
+    monkeypatch.setattr(OrderSearch, "convert_deck_to_simulator_format", lambda deck, levels=None: deck)
+    assert OrderSearch._repair(list(composition)) is None
+    assert OrderSearch.heuristic_orders(composition, random.Random(0)) == []
+
+    task = (composition, fake_simulate, FakeChart(), 50, None, 0, ORDER_CONFIG, 0)
+    assert OrderSearch.optimize_order(task) is None
+    assert OrderSearch.audit_composition(task) is None
+
+    # 有合法排列時照常返回結果
+    tags({6: set()})
+    result = OrderSearch.optimize_order(task)
+    assert result is not None and result["deck_card_ids"][0] == 6 and result["simulations"] >= 1
@@ -0,0 +1,90 @@
+"""
+模擬引擎一致性測試 (src/utils/parity.py)
+
+以合成資料 (src/utils/synthetic_data.py) 對每個已登錄的引擎執行與 python -m src.utils.parity
+相同的分層比較：每份 Master 譜面、每個分層各 PER_STRATUM 個卡組，與參考實作的結果必須完全一致。
+另以故意偏移分數的引擎確認比較確實能抓到差異、定位第一個分歧的事件，且該引擎無法通過證書檢查。
+"""
+import os
+
+import pytest
+
+from src.core.engines import ENGINES, REFERENCE, certified_engine, load_engine
+from src.utils.parity import STRATA, check_parity, load_charts, make_task, sample_cases, summarize
+from src.utils.synthetic_data import DIFFICULTIES
+
+PER_STRATUM = 5
+PERTURBED = "perturbed"
+PERTURB_AT = 3
+
+
+def perturbed_engine(task: tuple, trace: list = None) -> dict:
+    """參考實作的結果，但自第 PERTURB_AT 個事件處理之後分數多 1"""
+    from src.core.Simulator_core import run_game_simulation
+
+    states = []
+    result = run_game_simulation(task, trace=states)
+    if trace is not None:
+        trace.extend(state if i < PERTURB_AT else state[:2] + (state[2] + 1,) + state[3:]
+                     for i, state in enumerate(states))
+    result["final_score"] += 1
+    return result
+
+
+@pytest.fixture(scope="module")
+def parity_cases(synthetic_dir):
+    """在合成資料目錄中讀取 Master 譜面並分層抽樣"""
+    fixture, music_ids = synthetic_dir
+    cwd = os.getcwd()
+    os.chdir(fixture)
+    try:
+        charts = load_charts([f"{music_id}_{DIFFICULTIES[-1]}" for music_id in music_ids])
+        yield charts, sample_cases(charts, PER_STRATUM, seed=0)
+    finally:
+        os.chdir(cwd)
+
+
+def test_cases_cover_every_stratum(parity_cases):
+    charts, cases = parity_cases
+    counts = {stratum: sum(1 for case in cases if case["stratum"] == stratum) for stratum in STRATA}
+    assert counts == {stratum: PER_STRATUM * len(charts) for stratum in STRATA}
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_engine_matches_reference(parity_cases, engine):
+    charts, cases = parity_cases
+    report = check_parity(engine, cases, charts)
+    assert report["checked"] == len(cases)
+    assert report["mismatches"] == []
+
+
+def test_reference_is_order_independent(parity_cases):
+    """逆序重新執行參考實作（共用的模擬狀態被重複使用）後，與順序執行的結果相同"""
+    charts, cases = parity_cases
+    reference = load_engine(REFERENCE)
+    golden = [None] * len(cases)
+    for index in reversed(range(len(cases))):
+        golden[index] = summarize(reference(make_task(cases[index], charts[cases[index]["chart"]], index)))
+    assert check_parity(REFERENCE, cases, charts, golden)["mismatches"] == []
+
+
+def test_perturbed_engine_is_detected(parity_cases, monkeypatch, tmp_path):
+    charts, cases = parity_cases
+    monkeypatch.setitem(ENGINES, PERTURBED, f"{__name__}:perturbed_engine")
+    report = check_parity(PERTURBED, cases, charts)
+    assert len(report["mismatches"]) == len(cases)
+
+    reference = load_engine(REFERENCE)
+    for index, mismatch in enumerate(report["mismatches"]):
+        assert mismatch["actual"] == mismatch["expected"] + 1
+        expected_trace = []
+        reference(make_task(cases[index], charts[cases[index]["chart"]], index), trace=expected_trace)
+        divergence = mismatch["divergence"]
+        assert divergence["index"] == PERTURB_AT
+        assert divergence["after_event"] == expected_trace[PERTURB_AT - 1][:2]
+        assert divergence["actual_state"][2] == divergence["expected_state"][2] + 1
+
+    # 沒有證書的引擎不能交給 MainBatch 使用
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError):
+        certified_engine(PERTURBED)
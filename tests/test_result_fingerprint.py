@@ -0,0 +1,54 @@
+"""
+增量重算的結果指紋 (src/utils/result_fingerprint.py)
+
+生成器的組合規則（必帶卡、必備技能類型、強制 DR）改變時，舊結果不是同條件的完整窮舉，
+--delta 不可只枚舉含變動卡牌的組合。
+"""
+import pytest
+
+from src.core.SkillResolver import SkillEffectType
+from src.utils.result_fingerprint import build_fingerprint, diff_fingerprint, filter_stale_results
+
+CARDS = [1011501, 1021701, 1032528]
+SONG = {"mastery_level": 50, "leader_designation": "0"}
+SKILLS = [SkillEffectType.DeckReset, SkillEffectType.ScoreGain, SkillEffectType.VoltagePointChange]
+
+
+def fingerprint(mustcards=None, force_dr=False, search="exhaustive", card_ids=CARDS):
+    return build_fingerprint(card_ids, None, SONG, {}, "sukushow", mustcards or [[], [], SKILLS], search, force_dr)
+
+
+def test_same_rules_are_exhaustive_base():
+    diff = diff_fingerprint(fingerprint(), fingerprint(card_ids=CARDS + [1041513]))
+    assert diff["exhaustive_base"] and diff["added_cards"] == {1041513}
+
+
+@pytest.mark.parametrize("new", [
+    fingerprint(mustcards=[[], [], SKILLS[:2]]),
+    fingerprint(mustcards=[[], [], SKILLS + [SkillEffectType.NextAPGainRateChange]]),
+    fingerprint(mustcards=[[1011501], [], SKILLS]),
+    fingerprint(force_dr=True),
+], ids=["fewer-skills", "more-skills", "mustcards", "force-dr"])
+def test_rule_change_is_not_exhaustive_base(new):
+    diff = diff_fingerprint(fingerprint(), new)
+    assert not diff["full_rerun"] and not diff["exhaustive_base"]
+    assert not diff_fingerprint(new, fingerprint())["exhaustive_base"]
+
+
+def test_skill_order_does_not_matter():
+    assert diff_fingerprint(fingerprint(), fingerprint(mustcards=[[], [], SKILLS[::-1]]))["exhaustive_base"]
+
+
+def test_fingerprint_without_rules_is_not_exhaustive_base():
+    old = fingerprint()
+    del old["mustskills"], old["force_dr"]
+    assert not diff_fingerprint(old, fingerprint())["exhaustive_base"]
+
+
+def test_filter_stale_results_streams():
+    old, new = fingerprint(), fingerprint()
+    new["card_levels"][str(CARDS[0])] = [1, 1, 1]
+    diff = diff_fingerprint(old, new)
+    results = [{"deck_card_ids": [CARDS[0], 2]}, {"deck_card_ids": [3, 4]}]
+    assert filter_stale_results(iter(results), diff) == results[1:]
+    assert filter_stale_results(iter(results), diff_fingerprint(old, old)) == results
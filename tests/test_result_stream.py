@@ -0,0 +1,135 @@
+"""
+結果檔的串流讀取與二進位索引 (src/utils/result_stream.py)
+
+以 json.load 全部載入、按 pt 穩定排序後的結果為準，比較 iter_results、load_top_results
+（有無索引、禁卡、去重）與 TopResultSource。
+"""
+import json
+import os
+import random
+
+import pytest
+
+from src.utils.result_stream import (TopResultSource, build_sorted_index, index_path, iter_results,
+                                     load_top_results, read_top_results, save_sorted_index, write_results)
+
+
+def random_results(rng: random.Random, n: int) -> list[dict]:
+    """n 筆隨機結果；卡牌種類少、pt 範圍小，產生重複組合與同分"""
+    return [{"deck_card_ids": rng.sample(range(1, 10), 6), "center_card": rng.choice([None, 1, 2]),
+             "score": rng.randint(0, 10 ** 6), "pt": rng.randint(0, 20)} for _ in range(n)]
+
+
+def reference(path: str, n: int, forbidden=(), dedupe: bool = False) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        results = [r for r in json.load(f) if set(forbidden).isdisjoint(r["deck_card_ids"])]
+    if dedupe:
+        # 每個組合保留 pt 最高的一筆，排序時沿用該組合第一次出現的位置
+        best = {}
+        for seq, r in enumerate(results):
+            key = tuple(sorted(r["deck_card_ids"]))
+            if key not in best:
+                best[key] = (seq, r)
+            elif r["pt"] > best[key][1]["pt"]:
+                best[key] = (best[key][0], r)
+        results = [r for _, r in sorted(best.values(), key=lambda item: item[0])]
+    return sorted(results, key=lambda r: r["pt"], reverse=True)[:n]
+
+
+@pytest.mark.parametrize("indent", [None, 0, 2])
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_iter_results_matches_json_load(tmp_path, indent, chunk_size):
+    path = tmp_path / "results.json"
+    data = random_results(random.Random(chunk_size), 50) + [{"text": "含 ] 與 } 的字串", "nested": [[1], {"a": []}]}]
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=indent), encoding="utf-8")
+    assert list(iter_results(str(path), chunk_size)) == data
+
+
+@pytest.mark.parametrize("count", [0, 1, 30])
+def test_write_results_round_trip(tmp_path, count):
+    path = str(tmp_path / "results.json")
+    data = random_results(random.Random(count), count)
+    assert write_results(path, iter(data)) == count
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == data
+    assert list(iter_results(path)) == data
+    assert read_top_results(path, 5) == data[:5]
+
+
+@pytest.mark.parametrize("sort", [True, False], ids=["sorted", "unsorted"])
+@pytest.mark.parametrize("seed", range(10))
+def test_load_top_results_matches_json_load(tmp_path, sort, seed):
+    rng = random.Random(seed)
+    data = random_results(rng, rng.randint(0, 200))
+    if sort:
+        data.sort(key=lambda r: r["pt"], reverse=True)
+    path = str(tmp_path / "results.json")
+    write_results(path, data)
+    if sort:
+        assert save_sorted_index(path, data)
+
+    for n in [1, 5, 50, 500]:
+        for forbidden in [(), (rng.randint(1, 9),)]:
+            results, stats = load_top_results(path, n, forbidden)
+            assert results == reference(path, n, forbidden)
+            assert stats["source"] == ("index" if sort else "json")
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_load_top_results_dedupe(tmp_path, seed):
+    """去重時同分組合的先後可能不同，比較 pt 序列與每個組合保留的 pt"""
+    rng = random.Random(seed)
+    data = random_results(rng, 200)
+    path = str(tmp_path / "results.json")
+    write_results(path, data)
+
+    for n in [1, 10, 100]:
+        results, _ = load_top_results(path, n, dedupe=True)
+        expected = reference(path, n, dedupe=True)
+        keys = [tuple(sorted(r["deck_card_ids"])) for r in results]
+        assert len(set(keys)) == len(keys)
+        assert [r["pt"] for r in results] == [r["pt"] for r in expected]
+        best = {tuple(sorted(r["deck_card_ids"])): r["pt"] for r in reference(path, len(data), dedupe=True)}
+        assert all(best[key] == r["pt"] for key, r in zip(keys, results))
+
+
+def test_index_matches_json_and_goes_stale(tmp_path):
+    data = sorted(random_results(random.Random(0), 100), key=lambda r: r["pt"], reverse=True)
+    path = str(tmp_path / "results.json")
+    write_results(path, data)
+    assert build_sorted_index(path)
+    assert os.path.exists(index_path(path))
+
+    from_index, stats = load_top_results(path, 30)
+    assert stats["source"] == "index" and stats["scanned"] == 30
+    os.remove(index_path(path))
+    assert load_top_results(path, 30)[0] == from_index
+
+    # 結果檔改寫後索引失效，改為串流解析
+    build_sorted_index(path)
+    write_results(path, data[:10])
+    results, stats = load_top_results(path, 30)
+    assert stats["source"] == "json" and results == data[:10]
+
+
+def test_build_sorted_index_rejects_unsorted(tmp_path):
+    data = [{"deck_card_ids": [1, 2, 3, 4, 5, 6], "center_card": None, "score": 0, "pt": pt} for pt in (1, 2)]
+    path = str(tmp_path / "results.json")
+    write_results(path, data)
+    assert not build_sorted_index(path)
+    assert not os.path.exists(index_path(path))
+    assert not os.path.exists(index_path(path) + ".tmp")
+
+
+def test_top_result_source_extends_prefix(tmp_path):
+    data = random_results(random.Random(1), 60)
+    path = str(tmp_path / "results.json")
+    write_results(path, data)
+    expected = reference(path, len(data), forbidden=(3,))
+
+    source = TopResultSource(path, 5, forbidden_cards=[3])
+    assert source.results == expected[:5] and source.next_pt == expected[5]["pt"]
+    source.load(20)
+    assert source.results == expected[:20] and source.next_pt == expected[20]["pt"]
+    source.load(len(data))
+    assert source.results == expected and source.next_pt is None